@@ -1,58 +1,76 @@
-import json
+import asyncio
 import threading
+import time
+import numpy as np
 import websocket
-from typing import Dict, List, Any, Optional, Callable, TypeVar, Generic, Union
+from async_transport import AsyncWebSocketTransport
+from inbound_queue import CoalescingQueue
+from codec import JsonCodec, get_codec
+from messages import (ExtServerMessage, ExtPlayerIdResponse, ExtJoinMapInitiated, ExtJoinMapCompleted,
+                      ExtLeaveMapInitiated, ExtLeaveMapCompleted, ExtPlayerJoinedMap, ExtPlayerLeftMap,
+                      ExtPlayerPositionChange, ExtMoveInitiated, ExtMoveCompleted, ExtMoveFailed,
+                      ExtFightStarted, ExtFightEnded, ExtCardImages, ExtCardDrawn, ExtFightStateUpdate,
+                      ExtTurnStarted, ExtTurnEnded, ExtCardPlayCompleted, ExtCardPlayFailed,
+                      ExtEffectApplied, decode_message, get_message_type)
+from observation import (default_encoder, REGION_TURN, REGION_PLAYER_STATS, REGION_OPPONENT_STATS,
+                         REGION_PLAYER_HAND, REGION_ALL)
+from message_trace import INBOUND, OUTBOUND
+from metrics import Metrics
+from pathfinding import PathCache, default_path_cache
+from spatial_index import SpatialIndex
+from subscriptions import Subscription, SubscriptionExecutor, Subscriptions
+from svg_cache import SvgCache, default_svg_cache
+from models import (MapPosition, PlayerMapInfo, MapInfo, CardInfo, StatusEffectInfo,
+                    TilemapData, PlayerFightStateDto, FightSnapshot)
+from typing import Dict, List, Any, Optional, Callable, Set, Tuple, TypeVar, Generic, Union
 
 T = TypeVar('T')
 
-class MapPosition:
-    """Represents a position on a map."""
-    def __init__(self, x: int, y: int):
-        self.x = x
-        self.y = y
+# Seconds the awaitable request methods wait for a response by default
+DEFAULT_REQUEST_TIMEOUT = 5.0
 
-class PlayerMapInfo:
-    """Information about a player on a map."""
-    def __init__(self, position: MapPosition, fight_id: Optional[str] = None):
-        self.position = position
-        self.fight_id = fight_id
+# Asyncio mode: sends from send() still in flight before it refuses more
+MAX_PENDING_SENDS = 64
 
-class CardInfo:
-    """Information about a card."""
-    def __init__(self, id: str, name: str, type: str, subtype: str, cost: int, description: str):
-        self.id = id
-        self.name = name
-        self.type = type
-        self.subtype = subtype
-        self.cost = cost
-        self.description = description
+# Transport closes scheduled by dispose(), referenced until done so they are not garbage collected
+_closing_tasks: Set[asyncio.Task] = set()
 
-class StatusEffectInfo:
-    """Information about a status effect."""
-    def __init__(self, type: str, value: int, duration: int):
-        self.type = type
-        self.value = value
-        self.duration = duration
 
-class TilemapData:
-    """Represents tilemap data for a map."""
-    def __init__(self, width: int, height: int, tiles: List[List[int]]):
-        self.width = width
-        self.height = height
-        self.tiles = tiles
+def _same_position(a: Any, b: Any) -> bool:
+    """Compare positions by coordinates, whatever class the codec decoded them into."""
+    return a is not None and b is not None and a.x == b.x and a.y == b.y
 
-class PlayerFightStateDto:
-    """Data transfer object for player fight state."""
-    def __init__(self, player_id: str, hit_points: int, action_points: int, 
-                 deck_count: int, discard_pile_count: int, 
-                 hand: List[CardInfo], status_effects: List[StatusEffectInfo]):
-        self.player_id = player_id
-        self.hit_points = hit_points
-        self.action_points = action_points
-        self.deck_count = deck_count
-        self.discard_pile_count = discard_pile_count
-        self.hand = hand
-        self.status_effects = status_effects
+
+def _ends_fight_of(msg: Any, player_id: Optional[str]) -> bool:
+    """Check if a message ends player_id's fight; ExtFightEnded is broadcast to the whole map."""
+    return msg.message_type == "ExtFightEnded" and player_id in (msg.winner_id, msg.loser_id)
+
+
+def _set_future_result(future: asyncio.Future, result: Any):
+    if not future.done():
+        future.set_result(result)
+
+
+class _Waiter:
+    """A future waiting for the first server message of some types that matches a predicate."""
+    __slots__ = ("message_types", "predicate", "future", "exclusive")
+
+    def __init__(self, message_types: Tuple[str, ...], predicate: Optional[Callable[[Any], bool]],
+                 future: asyncio.Future, exclusive: bool):
+        self.message_types = message_types
+        self.predicate = predicate
+        self.future = future
+        self.exclusive = exclusive  # A request, answered by one response only
+
+
+class _Call:
+    """A function queued for the dispatch thread in order with the messages, see call_soon."""
+    __slots__ = ("function", "args")
+    message_type = None  # Never coalesced
+
+    def __init__(self, function: Callable[..., Any], args: Tuple[Any, ...]):
+        self.function = function
+        self.args = args
 
 class GameContext:
     """
@@ -62,12 +80,22 @@ class GameContext:
     This Python class mirrors the functionality of the C# GameStateContext class.
     """
     
-    def __init__(self, server_url: str):
+    def __init__(self, server_url: str, use_asyncio: bool = False, max_queue: int = 0,
+                 codec: Union[str, JsonCodec, None] = "auto", svg_cache: Optional[SvgCache] = None,
+                 advertise_cached_card_images: bool = False, inbound_capacity: int = 0):
         """
         Initialize a new instance of the GameContext class.
         
         Args:
             server_url: WebSocket URL of the game server
+            use_asyncio: Run the connection on the current asyncio event loop instead of a thread
+            max_queue: Asyncio mode only; keep up to this many messages for recv(), dropping the
+                oldest when full (0 disables recv)
+            codec: Codec instance or name ("json", "orjson", "msgspec", "auto")
+            svg_cache: Card SVG cache, the process-wide default_svg_cache by default
+            advertise_cached_card_images: Tell the server which SVGs are cached once the player ID arrives
+            inbound_capacity: Threaded mode only; queue up to this many messages for a dispatcher
+                thread, coalescing stale position updates (0 handles each frame on the websocket thread)
         """
         # Player data
         self.player_id: Optional[str] = None
@@ -79,6 +107,7 @@ class GameContext:
         
         # Other players
         self.other_player_info: Dict[str, PlayerMapInfo] = {}  # Dictionary of player_id -> PlayerMapInfo
+        self.player_index = SpatialIndex()  # Grid of other player positions, kept in sync with other_player_info
         
         # Active fights
         self.active_fights: Dict[str, List[str]] = {}  # Dictionary of fight_id -> list of player_ids
@@ -88,8 +117,12 @@ class GameContext:
         self.opponent_id: Optional[str] = None
         
         # Card battle state
-        self.card_svg_data: Dict[str, str] = {}  # Dictionary of card_id -> svg data
-        self.cards_in_hand: List[CardInfo] = []  # List of CardInfo objects
+        self.card_svg_data: Dict[str, str] = {}  # Dictionary of card_id -> svg data, shared strings from svg_cache
+        self.svg_cache: SvgCache = svg_cache if svg_cache is not None else default_svg_cache
+        self.advertise_cached_card_images = advertise_cached_card_images
+        self._new_card_svgs = False  # SVGs received since the last advertisement
+        # Hands and status effects are tuples, replaced rather than mutated, so snapshots can share them
+        self.cards_in_hand: Tuple[CardInfo, ...] = ()
         self.player_hit_points: int = 50
         self.player_action_points: int = 0
         self.player_deck_count: int = 0
@@ -98,22 +131,63 @@ class GameContext:
         self.opponent_action_points: int = 0
         self.opponent_deck_count: int = 0
         self.opponent_discard_pile_count: int = 0
-        self.opponent_cards_in_hand: List[CardInfo] = []  # List of CardInfo objects
-        self.player_status_effects: List[StatusEffectInfo] = []  # List of StatusEffectInfo objects
-        self.opponent_status_effects: List[StatusEffectInfo] = []  # List of StatusEffectInfo objects
+        self.opponent_cards_in_hand: Tuple[CardInfo, ...] = ()
+        self.player_status_effects: Tuple[StatusEffectInfo, ...] = ()
+        self.opponent_status_effects: Tuple[StatusEffectInfo, ...] = ()
         self.last_played_card: Optional[CardInfo] = None  # CardInfo object
         self.current_turn_player_id: Optional[str] = None
         
         # Pending operations
         self.pending_move: Optional[MapPosition] = None
+        self.move_path: List[MapPosition] = []  # Remaining steps queued by path_to
+        self._move_rerouted = False
+        self.path_cache: PathCache = default_path_cache
+        
+        # Persistent observation, patched lazily from the regions handlers mark dirty
+        self.observation_version: int = 0
+        self._observation = default_encoder.allocate()
+        self._observation_dirty: int = REGION_ALL
         
         # WebSocket client setup
         self.server_url = server_url
         self.websocket = None
         self.websocket_thread = None
         
+        # Optional queue between the websocket thread and the handlers, see inbound_queue
+        self.inbound_capacity = inbound_capacity
+        self.inbound_queue: Optional[CoalescingQueue] = None
+        self.dispatch_thread = None
+        
+        # Message serialization
+        self.codec: JsonCodec = codec if isinstance(codec, JsonCodec) else get_codec(codec)
+        
+        # Asyncio transport setup
+        self.use_asyncio = use_asyncio
+        self.max_queue = max_queue
+        self.transport: Optional[AsyncWebSocketTransport] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # The loop connect() ran on
+        self._send_tasks: Set[asyncio.Task] = set()  # Sends from send() not yet accepted by the socket
+        
+        # In-process server, set by FightSimulator.attach
+        self.simulator = None
+        
+        # Shared connection and this context's session on it, set by MultiplexConnection.attach
+        self.multiplexer = None
+        self.session_id: Optional[str] = None
+        
+        # Optional message_trace.TraceRecorder capturing raw frames in both directions
+        self.recorder = None
+        
+        # Instrumentation, None (and free) until enable_metrics is called
+        self.metrics: Optional[Metrics] = None
+        
         # Event callbacks
         self.on_server_message_callbacks: List[Callable[[Any], None]] = []
+        self.subscriptions = Subscriptions()  # Type-filtered callbacks, see subscribe
+        
+        # Futures of the awaitable request API, by the message types that resolve them
+        self._waiters: Dict[str, List[_Waiter]] = {}
+        self._waiters_lock = threading.Lock()  # Handlers may run on the websocket thread
 
     @property
     def is_in_fight(self) -> bool:
@@ -130,8 +204,75 @@ class GameContext:
         """Check if it's currently the player's turn in a card battle."""
         return self.current_turn_player_id == self.player_id
     
+    def encode_observation(self, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode the card battle state as a fixed-size float32 vector.
+        
+        Args:
+            out: Optional preallocated buffer of shape (state_dim,) to write into
+            
+        Returns:
+            The observation vector (see observation.py for the layout)
+        """
+        return default_encoder.encode(self, out)
+    
+    def get_observation(self) -> np.ndarray:
+        """
+        Get the persistent observation vector, patching only regions changed since the last call.
+        
+        The same buffer is returned on every call and must not be modified.
+        Compare observation_version with the last value seen to skip
+        re-reading when nothing changed.
+        
+        Returns:
+            The observation vector (see observation.py for the layout)
+        """
+        if self._observation_dirty:
+            default_encoder.update(self, self._observation, self._observation_dirty)
+            self._observation_dirty = 0
+        return self._observation
+    
+    def invalidate_observation(self, regions: int = REGION_ALL):
+        """
+        Mark observation regions as changed.
+        
+        Handlers call this for the fields their message touched; call it
+        directly after modifying fight state attributes from outside.
+        
+        Args:
+            regions: REGION_* flags from observation.py
+        """
+        self._observation_dirty |= regions
+        self.observation_version += 1
+    
+    @staticmethod
+    def encode_observations(contexts: List["GameContext"], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode several contexts into one (N, state_dim) float32 array.
+        
+        Args:
+            contexts: The contexts to encode, one per row
+            out: Optional preallocated buffer of shape (N, state_dim) to write into
+            
+        Returns:
+            The batch of observation vectors
+        """
+        return default_encoder.encode_batch(contexts, out)
+    
     async def connect(self):
-        """Connect to the WebSocket server."""
+        """
+        Connect to the WebSocket server.
+        
+        In asyncio mode the connection is opened on the running event loop and
+        no thread is started; otherwise websocket-client runs in a daemon thread.
+        """
+        if self.use_asyncio:
+            self._loop = asyncio.get_running_loop()
+            self.transport = AsyncWebSocketTransport(self.server_url, self._process_message, self.max_queue)
+            await self.transport.connect()
+            print("WebSocket connection opened")
+            return
+        
         self.websocket = websocket.WebSocketApp(
             self.server_url,
             on_message=self._on_message,
@@ -140,30 +281,163 @@ class GameContext:
             on_open=self._on_open
         )
         
+        self.start_dispatcher()
+        
         # Start the WebSocket connection in a separate thread
         self.websocket_thread = threading.Thread(target=self.websocket.run_forever)
         self.websocket_thread.daemon = True
         self.websocket_thread.start()
     
+    def start_dispatcher(self):
+        """
+        Start the dispatch thread if an inbound_capacity is set.
+        
+        connect() calls this; a connection that feeds the context frames
+        itself, such as MultiplexConnection.attach, calls it instead.
+        """
+        if self.inbound_capacity > 0 and self.inbound_queue is None:
+            # Run handlers and callbacks on their own thread so a slow consumer never stalls the socket
+            self.inbound_queue = CoalescingQueue(self.inbound_capacity)
+            self.dispatch_thread = threading.Thread(target=self._dispatch_loop, args=(self.inbound_queue,))
+            self.dispatch_thread.daemon = True
+            self.dispatch_thread.start()
+    
     def _on_open(self, ws):
         """Handle WebSocket connection opened event."""
         print("WebSocket connection opened")
     
     def _on_message(self, ws, message):
         """Handle incoming WebSocket messages."""
+        inbound_queue = self.inbound_queue
+        if inbound_queue is None:
+            self._process_message(message)
+            return
         try:
-            # Deserialize the message
-            msg_data = json.loads(message)
-            ext_server_message = msg_data  # In a real implementation, deserialize to proper object
-            
-            # Process the message
-            self.on_receive(ext_server_message)
+            decoded = self._decode_frame(message)
+            if decoded is not None:
+                inbound_queue.put(decoded[0], decoded)
+        except Exception as e:
+            print(f"Error processing message: {e}")
+    
+    def deliver(self, message: Union[str, bytes, Dict[str, Any]]):
+        """
+        Handle a server message from an in-process source exactly like a socket frame.
+        
+        The message takes the path of a frame from the websocket: the trace
+        recorder, the inbound queue if there is one, then the handlers,
+        waiters, subscriptions, server message callbacks and metrics.
+        FightSimulator.attach and TraceReader.replay deliver through here.
+        
+        Args:
+            message: A raw frame, or a message dict as the simulator builds them
+        """
+        self._on_message(None, message)
+    
+    def call_soon(self, function: Callable[..., Any], *args: Any):
+        """
+        Run a function on the thread that handles this context's messages.
+        
+        Lets another thread (e.g. an inference worker) act on the context
+        without racing its handlers: in asyncio mode the function is scheduled
+        on the event loop, with a dispatch thread it is queued behind the
+        messages already waiting. Without either, it runs at once on the
+        calling thread.
+        
+        Args:
+            function: The function to run
+            *args: Arguments to pass to it
+        """
+        if self.transport is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(function, *args)
+            return
+        inbound_queue = self.inbound_queue
+        if inbound_queue is not None:
+            call = _Call(function, args)
+            if inbound_queue.put(call, call):
+                return
+        function(*args)
+    
+    def _dispatch_loop(self, inbound_queue: CoalescingQueue):
+        """Apply queued messages and calls until the queue is closed and drained."""
+        while True:
+            decoded = inbound_queue.get()
+            if decoded is None:
+                return
+            try:
+                if type(decoded) is _Call:
+                    decoded.function(*decoded.args)
+                else:
+                    self._dispatch(*decoded)
+            except Exception as e:
+                print(f"Error processing message: {e}")
+    
+    def _process_message(self, message: Any) -> Optional[ExtServerMessage]:
+        """
+        Deserialize a raw frame, update the state and notify callbacks.
+        
+        Args:
+            message: The raw frame received from the server
             
-            # Notify callbacks
-            for callback in self.on_server_message_callbacks:
-                callback(ext_server_message)
+        Returns:
+            The deserialized message, or None if it could not be processed
+        """
+        try:
+            decoded = self._decode_frame(message)
+            if decoded is None:
+                return None
+            return self._dispatch(*decoded)
         except Exception as e:
             print(f"Error processing message: {e}")
+            return None
+    
+    def _decode_frame(self, message: Any) -> Optional[Tuple[ExtServerMessage, int, int]]:
+        """
+        Deserialize a raw frame into (message, frame size, decode nanoseconds), or None.
+        
+        Message dicts from an in-process server are decoded from the dict and
+        count as frames of size 0.
+        """
+        is_dict = isinstance(message, dict)
+        if self.recorder is not None:
+            self.recorder.record(INBOUND, self.codec.dumps(message) if is_dict else message)
+        
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter_ns()
+        
+        # Deserialize the message into its typed message object
+        ext_server_message = decode_message(message) if is_dict else self.codec.decode(message)
+        size = 0 if is_dict else len(message)
+        if ext_server_message is None:
+            if metrics is not None:
+                metrics.record_frame(None, size, 0, 0)
+            print(f"Message type {get_message_type(message if is_dict else self.codec.loads(message))} not handled")
+            return None
+        
+        return ext_server_message, size, time.perf_counter_ns() - started if metrics is not None else 0
+    
+    def _dispatch(self, ext_server_message: ExtServerMessage, size: int, decode_ns: int) -> ExtServerMessage:
+        """Update the state from a decoded message and notify callbacks."""
+        metrics = self.metrics
+        
+        # Process the message
+        self.on_receive(ext_server_message)
+        
+        if metrics is not None:
+            handled = time.perf_counter_ns()
+        
+        # Notify callbacks
+        for callback in self.on_server_message_callbacks:
+            callback(ext_server_message)
+        
+        if metrics is not None:
+            metrics.record_frame(ext_server_message.message_type, size, decode_ns, time.perf_counter_ns() - handled)
+            if self.inbound_queue is not None:
+                metrics.record_queue_depth(len(self.inbound_queue))
+            elif self.transport is not None and self.transport.inbound is not None:
+                metrics.record_queue_depth(self.transport.inbound.qsize())
+        
+        return ext_server_message
     
     def _on_error(self, ws, error):
         """Handle WebSocket error event."""
@@ -177,22 +451,110 @@ class GameContext:
         """
         Send a message to the server.
         
+        In asyncio mode the frame is sent by a task on the running loop. Once
+        MAX_PENDING_SENDS of those wait for the socket, the message is refused
+        instead of queued; await send_async to wait for room.
+        
         Args:
             message: The message to send
             
         Returns:
-            bool: True if the message was sent successfully, False otherwise
+            bool: True if the message was sent (or, in asyncio mode, queued) successfully, False otherwise
         """
+        metrics = self.metrics
+        if self.simulator is not None:
+            if metrics is not None:
+                metrics.record_sent(get_message_type(message), time.perf_counter_ns())
+            return self.simulator.receive(self.player_id, message)
+        
+        if self.multiplexer is not None:
+            try:
+                # The tag leads so the server-side routing sees it first
+                serialized_message = self.codec.dumps({"SessionId": self.session_id, **message})
+                if metrics is not None:
+                    metrics.record_sent(get_message_type(message), time.perf_counter_ns())
+                if not self.multiplexer.send_frame(serialized_message):
+                    return False
+                if self.recorder is not None:
+                    self.recorder.record(OUTBOUND, serialized_message)
+                return True
+            except Exception as e:
+                print(f"Error sending message: {e}")
+                return False
+        
+        if self.transport:
+            if not self.transport.connected:
+                return False
+            if len(self._send_tasks) >= MAX_PENDING_SENDS:
+                print(f"Send queue full, dropped {get_message_type(message)}")
+                return False
+            try:
+                task = asyncio.get_running_loop().create_task(self.send_async(message))
+                self._send_tasks.add(task)
+                task.add_done_callback(self._send_tasks.discard)
+                return True
+            except RuntimeError as e:
+                print(f"Error sending message: {e}")
+                return False
+        
         if self.websocket and self.websocket.sock and self.websocket.sock.connected:
             try:
-                serialized_message = json.dumps(message)
+                serialized_message = self.codec.dumps(message)
+                if metrics is not None:
+                    metrics.record_sent(get_message_type(message), time.perf_counter_ns())
                 self.websocket.send(serialized_message)
+                if self.recorder is not None:
+                    self.recorder.record(OUTBOUND, serialized_message)
                 return True
             except Exception as e:
                 print(f"Error sending message: {e}")
                 return False
         return False
     
+    async def send_async(self, message: Any) -> bool:
+        """
+        Send a message to the server over the asyncio transport.
+        
+        Waits until the socket has accepted the frame, so callers that await
+        each send are naturally throttled to the speed of the connection.
+        
+        Args:
+            message: The message to send
+            
+        Returns:
+            bool: True if the message was sent successfully, False otherwise
+        """
+        if not self.transport or not self.transport.connected:
+            return False
+        try:
+            serialized_message = self.codec.dumps(message)
+            if self.metrics is not None:
+                self.metrics.record_sent(get_message_type(message), time.perf_counter_ns())
+            await self.transport.send(serialized_message)
+            if self.recorder is not None:
+                self.recorder.record(OUTBOUND, serialized_message)
+            return True
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return False
+    
+    async def recv(self) -> ExtServerMessage:
+        """
+        Wait for the next server message in asyncio mode.
+        
+        The message has already been applied to the game state and passed to
+        the callbacks when it is returned.
+        
+        Returns:
+            The next server message
+            
+        Raises:
+            ConnectionError: If the connection is closed and no messages remain
+        """
+        if not self.transport:
+            raise RuntimeError("recv() is only available when use_asyncio is enabled")
+        return await self.transport.recv()
+    
     def add_server_message_callback(self, callback: Callable[[Any], None]):
         """
         Add a callback for server messages.
@@ -202,60 +564,86 @@ class GameContext:
         """
         self.on_server_message_callbacks.append(callback)
     
-    def on_receive(self, ext_server_message: Dict[str, Any]):
+    def subscribe(self, message_types: Union[str, Tuple[str, ...], None], callback: Callable[[Any], None],
+                  executor: SubscriptionExecutor = None, max_pending: int = 0) -> Subscription:
+        """
+        Subscribe a callback to some server message types.
+        
+        Unlike server message callbacks, subscribers only see the types they
+        ask for, are also called for messages from a FightSimulator, and can
+        run off the receiving thread: with an executor (e.g. a shared
+        ThreadPoolExecutor) or an asyncio event loop, messages are queued per
+        subscriber and handled in arrival order without ever blocking the
+        state updates.
+        
+        Args:
+            message_types: A message type, a tuple of them, or None for every type
+            callback: Function taking the decoded server message, called after the state is updated
+            executor: Executor or event loop to run the callback on, inline by default
+            max_pending: Off-thread only; drop the oldest queued message beyond this many (0 is unbounded)
+            
+        Returns:
+            The Subscription, for unsubscribe() and its stats
+        """
+        return self.subscriptions.subscribe(message_types, callback, executor, max_pending)
+    
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription and drop its queued messages."""
+        self.subscriptions.unsubscribe(subscription)
+    
+    def on_receive(self, ext_server_message: Union[ExtServerMessage, Dict[str, Any]]):
         """
         Process an incoming server message and update the game state.
         
+        Runs the handler, waiters and subscriptions only; deliver() takes the
+        full path of a socket frame, including server message callbacks.
+        
         Args:
-            ext_server_message: The server message to process
+            ext_server_message: The decoded server message, or a raw message dict to decode
         """
-        # Extract message type
-        message_type = ext_server_message.get("Type")
+        if isinstance(ext_server_message, dict):
+            message_type = get_message_type(ext_server_message)
+            ext_server_message = decode_message(ext_server_message)
+        else:
+            message_type = ext_server_message.message_type
         
-        # Map message types to handler methods
-        handlers = {
-            # Connection messages
-            "ExtPlayerIdResponse": self._on_ext_player_id_response,
-            
-            # Map messages
-            "ExtMapListResponse": lambda _: None,  # No state change
-            "ExtJoinMapInitiated": self._on_ext_join_map_initiated,
-            "ExtJoinMapCompleted": self._on_ext_join_map_completed,
-            "ExtJoinMapFailed": lambda _: None,  # Handle join map failure
-            "ExtLeaveMapInitiated": self._on_ext_leave_map_initiated,
-            "ExtLeaveMapCompleted": self._on_ext_leave_map_completed,
-            "ExtLeaveMapFailed": lambda _: None,  # Handle leave map failure
-            "ExtPlayerJoinedMap": self._on_ext_player_joined_map,
-            "ExtPlayerLeftMap": self._on_ext_player_left_map,
-            "ExtPlayerPositionChange": self._on_ext_player_position_change,
-            
-            # Movement messages
-            "ExtMoveInitiated": self._on_ext_move_initiated,
-            "ExtMoveCompleted": self._on_ext_move_completed,
-            "ExtMoveFailed": self._on_ext_move_failed,
-            
-            # Fight messages
-            "ExtFightStarted": self._on_ext_fight_started,
-            "ExtFightEnded": self._on_ext_fight_ended,
-            
-            # Card battle messages
-            "ExtCardImages": self._on_ext_card_images,
-            "ExtCardDrawn": self._on_ext_card_drawn,
-            "ExtTurnStarted": self._on_ext_turn_started,
-            "ExtTurnEnded": self._on_ext_turn_ended,
-            "ExtCardPlayInitiated": lambda _: None,  # No state change
-            "ExtCardPlayCompleted": self._on_ext_card_play_completed,
-            "ExtCardPlayFailed": self._on_ext_card_play_failed,
-            "ExtEffectApplied": self._on_ext_effect_applied,
-            "ExtFightStateUpdate": self._on_ext_fight_state_update,
-        }
-        
-        # Call the appropriate handler
-        handler = handlers.get(message_type)
+        # Call the appropriate handler from the class-level dispatch table
+        handler = self._message_handlers.get(message_type) if ext_server_message is not None else None
         if handler:
-            handler(ext_server_message)
+            metrics = self.metrics
+            if metrics is None:
+                handler(self, ext_server_message)
+            else:
+                started = time.perf_counter_ns()
+                handler(self, ext_server_message)
+                now = time.perf_counter_ns()
+                metrics.record_received(message_type, now - started, now,
+                                        _ends_fight_of(ext_server_message, self.player_id))
         else:
             print(f"Message type {message_type} not handled")
+        
+        # Resolve awaiting requests once the state reflects the message
+        if self._waiters and ext_server_message is not None:
+            self._resolve_waiters(message_type, ext_server_message)
+        
+        # Hand the message to the subscribers of its type
+        if self.subscriptions and ext_server_message is not None:
+            self.subscriptions.publish(message_type, ext_server_message)
+    
+    def enable_metrics(self) -> Metrics:
+        """
+        Start collecting per message type counters, latencies and round-trip times.
+        
+        Returns:
+            The Metrics instance, also available as self.metrics
+        """
+        if self.metrics is None:
+            self.metrics = Metrics()
+        return self.metrics
+    
+    def disable_metrics(self):
+        """Stop collecting metrics and drop what was recorded."""
+        self.metrics = None
     
     def add_player(self, player_id: str, player_info: PlayerMapInfo):
         """
@@ -268,6 +656,8 @@ class GameContext:
         if player_id != self.player_id:
             # Store the player info
             self.other_player_info[player_id] = player_info
+            if player_info.position is not None:
+                self.player_index.set_position(player_id, player_info.position.x, player_info.position.y)
             
             # If the player is in a fight, add them to the active_fights dictionary
             if player_info.fight_id:
@@ -287,6 +677,7 @@ class GameContext:
             # Update the player's position
             old_info = self.other_player_info[player_id]
             self.other_player_info[player_id] = PlayerMapInfo(position, old_info.fight_id)
+            self.player_index.set_position(player_id, position.x, position.y)
     
     def remove_player(self, player_id: str):
         """
@@ -296,44 +687,434 @@ class GameContext:
             player_id: The ID of the player to remove
         """
         self.other_player_info.pop(player_id, None)
+        self.player_index.remove(player_id)
+    
+    def players_within(self, radius: int) -> List[str]:
+        """
+        Other players within a number of moves of the player.
+        
+        Args:
+            radius: Maximum Chebyshev distance in tiles, inclusive
+            
+        Returns:
+            Player IDs sorted by distance, empty if the player is not on a map
+        """
+        if self.player_position is None:
+            return []
+        return [player_id for player_id, _ in
+                self.player_index.within(self.player_position.x, self.player_position.y, radius)]
+    
+    def nearest_available_opponent(self) -> Optional[str]:
+        """
+        Closest other player who is not in a fight.
+        
+        Returns:
+            The player ID, or None if nobody is available
+        """
+        if self.player_position is None:
+            return None
+        other_player_info = self.other_player_info
+        nearest = self.player_index.nearest(self.player_position.x, self.player_position.y,
+                                            lambda player_id: other_player_info[player_id].fight_id is None)
+        return nearest[0] if nearest is not None else None
+    
+    def is_tile_occupied(self, position: MapPosition) -> bool:
+        """Check if another player stands on a tile."""
+        return self.player_index.is_occupied(position.x, position.y)
+    
+    def send_cached_card_images(self) -> bool:
+        """
+        Advertise the cached card SVGs so the server sends empty SvgData for them.
+        
+        The advertised SVGs are pinned in the cache so they can always be resolved.
+        
+        Returns:
+            bool: True if the request was sent
+        """
+        self._new_card_svgs = False
+        return self.send({"MessageType": "ExtCachedCardImagesRequest",
+                          "CardSvgHashes": self.svg_cache.card_hashes(pin=True)})
+    
+    def _store_card_svg(self, card_id: str, svg_data: Optional[str]):
+        if svg_data:
+            self.card_svg_data[card_id] = self.svg_cache.put(card_id, svg_data)
+            self._new_card_svgs = True
+        else:
+            # Empty when the server knows the SVG is cached
+            cached = self.svg_cache.get(card_id)
+            if cached is not None:
+                self.card_svg_data[card_id] = cached
+    
+    def path_to(self, position: MapPosition, stop_distance: int = 0) -> List[MapPosition]:
+        """
+        Walk to a tile along a shortest path.
+        
+        The first step is sent immediately and each following step as soon as
+        the previous move completes, so the caller does not need to poll.
+        A rejected step (e.g. onto a tile another player just entered) is
+        routed around once; after that the walk stops.
+        
+        Args:
+            position: The target tile
+            stop_distance: Stop this many moves short, e.g. 1 to end next to another player
+            
+        Returns:
+            The planned steps, empty if the target is unreachable or already reached
+        """
+        self.move_path = []
+        self._move_rerouted = False
+        if self.player_position is None or self.current_tilemap_data is None:
+            return []
+        path = self.path_cache.find_path(self.current_map_id, self.current_tilemap_data,
+                                         self.player_position, position, stop_distance)
+        if path:
+            self.move_path = list(path)
+            self._send_next_step()
+        return path
+    
+    def cancel_path(self):
+        """Stop walking after the move in flight, if any."""
+        self.move_path = []
+    
+    def _send_next_step(self):
+        step = self.move_path.pop(0)
+        self.send({"MessageType": "ExtPlayerMoveRequest", "NewPosition": {"X": step.x, "Y": step.y}})
+    
+    def _reroute_step(self, failed: MapPosition):
+        """Replace a rejected step with a free neighbour that is as close to the target."""
+        if self._move_rerouted or failed is None or self.player_position is None or self.current_tilemap_data is None:
+            self.move_path = []
+            return
+        self._move_rerouted = True
+        target = self.move_path[-1]
+        field = self.path_cache.distance_field(self.current_map_id, self.current_tilemap_data,
+                                               (target.x, target.y))
+        step = field.next_step(self.player_position.x, self.player_position.y,
+                               lambda x, y: (x == failed.x and y == failed.y) or self.player_index.is_occupied(x, y))
+        if step is None:
+            self.move_path = []
+            return
+        self.move_path = [MapPosition(*step)] + field.path(step[0], step[1])
+        self._send_next_step()
+    
+    #region Snapshots
+    
+    def snapshot(self) -> FightSnapshot:
+        """
+        Capture the card-battle state without copying hands or status effects.
+        
+        Returns:
+            An immutable FightSnapshot sharing its tuples with this context
+        """
+        return FightSnapshot(
+            self.current_fight_id, self.opponent_id, self.current_turn_player_id,
+            self.player_hit_points, self.player_action_points, self.player_deck_count,
+            self.player_discard_pile_count, self.cards_in_hand, self.player_status_effects,
+            self.opponent_hit_points, self.opponent_action_points, self.opponent_deck_count,
+            self.opponent_discard_pile_count, self.opponent_cards_in_hand, self.opponent_status_effects,
+            self.last_played_card)
+    
+    def restore(self, snapshot: FightSnapshot):
+        """
+        Put the card-battle state back to a snapshot, e.g. after exploring a line of play.
+        
+        Map, connection and card image state are left alone.
+        
+        Args:
+            snapshot: A snapshot from this or another context, or a fork of one
+        """
+        (self.current_fight_id, self.opponent_id, self.current_turn_player_id,
+         self.player_hit_points, self.player_action_points, self.player_deck_count,
+         self.player_discard_pile_count, self.cards_in_hand, self.player_status_effects,
+         self.opponent_hit_points, self.opponent_action_points, self.opponent_deck_count,
+         self.opponent_discard_pile_count, self.opponent_cards_in_hand, self.opponent_status_effects,
+         self.last_played_card) = snapshot
+        self.invalidate_observation(REGION_ALL)
+    
+    #endregion
+    
+    #region Awaitable Requests
+    
+    def _add_waiter(self, message_types: Tuple[str, ...], predicate: Optional[Callable[[Any], bool]],
+                    exclusive: bool) -> _Waiter:
+        waiter = _Waiter(message_types, predicate, asyncio.get_running_loop().create_future(), exclusive)
+        with self._waiters_lock:
+            for message_type in message_types:
+                self._waiters.setdefault(message_type, []).append(waiter)
+        return waiter
+    
+    def _remove_waiter(self, waiter: _Waiter):
+        with self._waiters_lock:
+            for message_type in waiter.message_types:
+                waiters = self._waiters.get(message_type)
+                if waiters is not None and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self._waiters[message_type]
+    
+    def _resolve_waiters(self, message_type: str, msg: ExtServerMessage):
+        """Resolve the oldest matching request and every matching wait_for."""
+        resolved = []
+        with self._waiters_lock:
+            request_resolved = False
+            for waiter in self._waiters.get(message_type, ()):
+                if waiter.future.done() or (waiter.exclusive and request_resolved):
+                    continue
+                if waiter.predicate is None or waiter.predicate(msg):
+                    resolved.append(waiter)
+                    request_resolved = request_resolved or waiter.exclusive
+        if not resolved:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for waiter in resolved:
+            self._remove_waiter(waiter)
+            loop = waiter.future.get_loop()
+            if running is loop:
+                _set_future_result(waiter.future, msg)
+            else:
+                # Threaded mode: handlers run on the websocket thread
+                loop.call_soon_threadsafe(_set_future_result, waiter.future, msg)
+    
+    async def _await_waiter(self, waiter: _Waiter, timeout: Optional[float]) -> ExtServerMessage:
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        finally:
+            self._remove_waiter(waiter)
+    
+    def _cancel_waiters(self):
+        with self._waiters_lock:
+            waiters = {id(waiter): waiter for group in self._waiters.values() for waiter in group}
+            self._waiters.clear()
+        for waiter in waiters.values():
+            loop = waiter.future.get_loop()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(waiter.future.cancel)
+    
+    async def wait_for(self, message_types: Union[str, Tuple[str, ...]],
+                       predicate: Optional[Callable[[Any], bool]] = None,
+                       timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> ExtServerMessage:
+        """
+        Wait for the next server message of some types, after it has been applied to the state.
+        
+        Args:
+            message_types: A message type or tuple of types, e.g. "ExtTurnStarted"
+            predicate: Optional filter on the message
+            timeout: Seconds to wait, None to wait forever
+            
+        Returns:
+            The first matching message
+            
+        Raises:
+            asyncio.TimeoutError: If no matching message arrived in time
+        """
+        if isinstance(message_types, str):
+            message_types = (message_types,)
+        return await self._await_waiter(self._add_waiter(message_types, predicate, False), timeout)
+    
+    async def request(self, message: Dict[str, Any], responses: Tuple[str, ...],
+                      predicate: Optional[Callable[[Any], bool]] = None,
+                      timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> ExtServerMessage:
+        """
+        Send a request and wait for its response.
+        
+        The response future is registered before sending, so a reply the
+        simulator delivers synchronously is not missed. Several requests may
+        be in flight; each response resolves the oldest request it matches.
+        
+        Args:
+            message: The request to send
+            responses: Message types that answer it
+            predicate: Optional filter telling this request's response apart
+            timeout: Seconds to wait, None to wait forever
+            
+        Returns:
+            The response message
+            
+        Raises:
+            ConnectionError: If the request could not be sent
+            asyncio.TimeoutError: If no response arrived in time
+        """
+        waiter = self._add_waiter(responses, predicate, True)
+        sent = await self.send_async(message) if self.transport else self.send(message)
+        if not sent:
+            self._remove_waiter(waiter)
+            raise ConnectionError(f"Could not send {get_message_type(message)}")
+        return await self._await_waiter(waiter, timeout)
+    
+    async def request_player_id(self, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> str:
+        """Ask the server for this connection's player ID."""
+        response = await self.request({"MessageType": "ExtPlayerIdRequest"}, ("ExtPlayerIdResponse",),
+                                      timeout=timeout)
+        return response.player_id
+    
+    async def join_map(self, map_id: str, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> bool:
+        """
+        Join a map.
+        
+        Returns:
+            bool: True once joined, False if the server refused
+        """
+        response = await self.request({"MessageType": "ExtJoinMapRequest", "MapId": map_id},
+                                      ("ExtJoinMapCompleted", "ExtJoinMapFailed"),
+                                      lambda msg: msg.map_id == map_id, timeout)
+        return response.message_type == "ExtJoinMapCompleted"
+    
+    async def leave_map(self, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> bool:
+        """
+        Leave the current map.
+        
+        Returns:
+            bool: True once left, False if the server refused
+        """
+        response = await self.request({"MessageType": "ExtLeaveMapRequest", "MapId": self.current_map_id},
+                                      ("ExtLeaveMapCompleted", "ExtLeaveMapFailed"), timeout=timeout)
+        return response.message_type == "ExtLeaveMapCompleted"
+    
+    async def move(self, position: MapPosition, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> bool:
+        """
+        Move to an adjacent tile.
+        
+        The server tracks one pending move per player, so await each move
+        before sending the next; path_to walks longer distances.
+        
+        Returns:
+            bool: True once moved, False if the server rejected the move
+        """
+        response = await self.request(
+            {"MessageType": "ExtPlayerMoveRequest", "NewPosition": {"X": position.x, "Y": position.y}},
+            ("ExtMoveCompleted", "ExtMoveFailed"),
+            lambda msg: _same_position(msg.new_position if msg.message_type == "ExtMoveCompleted"
+                                       else msg.attempted_position, position),
+            timeout)
+        return response.message_type == "ExtMoveCompleted"
+    
+    async def challenge(self, target_id: str, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> bool:
+        """
+        Challenge another player and wait for the fight to start.
+        
+        The server does not answer refused challenges (e.g. the target is
+        already fighting), so those end in a timeout.
+        
+        Returns:
+            bool: True once the fight has started
+        """
+        player_id = self.player_id
+        await self.request({"MessageType": "ExtFightChallengeRequest", "TargetId": target_id},
+                           ("ExtFightStarted",),
+                           lambda msg: {msg.player1_id, msg.player2_id} == {player_id, target_id}, timeout)
+        return True
+    
+    async def play_card(self, card_id: str, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> bool:
+        """
+        Play a card from the hand.
+        
+        Plays that cannot succeed (not this player's turn, card not in hand,
+        too few action points) return False without a round trip. The server
+        drops a player's own ExtCardPlayCompleted, so a play is confirmed by
+        the ExtFightStateUpdate that follows it, or by the end of the fight
+        if the card won it.
+        
+        Returns:
+            bool: True once the card has been played
+        """
+        if not (self.is_in_fight and self.is_player_turn):
+            return False
+        card = next((c for c in self.cards_in_hand if c.id == card_id), None)
+        if card is None or card.cost > self.player_action_points:
+            return False
+        player_id = self.player_id
+        response = await self.request({"MessageType": "ExtPlayCardRequest", "CardId": card_id},
+                                      ("ExtFightStateUpdate", "ExtFightEnded", "ExtCardPlayFailed"),
+                                      lambda msg: (msg.card_id == card_id if msg.message_type == "ExtCardPlayFailed"
+                                                   else msg.message_type == "ExtFightStateUpdate"
+                                                   or _ends_fight_of(msg, player_id)),
+                                      timeout)
+        return response.message_type != "ExtCardPlayFailed"
+    
+    async def end_turn(self, timeout: Optional[float] = DEFAULT_REQUEST_TIMEOUT) -> bool:
+        """
+        End the current turn.
+        
+        Returns:
+            bool: True once the turn has ended, False if it was not this player's turn
+        """
+        if not (self.is_in_fight and self.is_player_turn):
+            return False
+        player_id = self.player_id
+        await self.request({"MessageType": "ExtEndTurnRequest"}, ("ExtTurnEnded", "ExtFightEnded"),
+                           lambda msg: (_ends_fight_of(msg, player_id) if msg.message_type == "ExtFightEnded"
+                                        else msg.player_id == player_id),
+                           timeout)
+        return True
+    
+    async def wait_for_turn(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until it is this player's turn, in the current fight or the next one.
+        
+        Args:
+            timeout: Seconds to wait, None to wait forever
+            
+        Returns:
+            bool: True when the turn starts, False if the player's fight ends first
+            
+        Raises:
+            asyncio.TimeoutError: If neither happened in time
+        """
+        if self.is_in_fight and self.is_player_turn:
+            return True
+        player_id = self.player_id
+        msg = await self.wait_for(
+            ("ExtTurnStarted", "ExtFightEnded"),
+            lambda msg: (msg.active_player_id == player_id if msg.message_type == "ExtTurnStarted"
+                         else _ends_fight_of(msg, player_id)),
+            timeout)
+        return msg.message_type == "ExtTurnStarted"
+    
+    #endregion
     
     #region Connection Message Handlers
     
-    def _on_ext_player_id_response(self, msg: Dict[str, Any]):
+    def _on_ext_player_id_response(self, msg: ExtPlayerIdResponse):
         """Handle the player ID response message."""
-        self.player_id = msg.get("PlayerId")
+        self.player_id = msg.player_id
+        self.invalidate_observation(REGION_TURN)
+        if self.advertise_cached_card_images:
+            self.send_cached_card_images()
     
     #endregion
     
     #region Map Message Handlers
     
-    def _on_ext_join_map_initiated(self, msg: Dict[str, Any]):
+    def _on_ext_join_map_initiated(self, msg: ExtJoinMapInitiated):
         """Handle the join map initiated message."""
-        self.current_map_id = msg.get("MapId")
+        self.current_map_id = msg.map_id
     
-    def _on_ext_join_map_completed(self, msg: Dict[str, Any]):
+    def _on_ext_join_map_completed(self, msg: ExtJoinMapCompleted):
         """Handle the join map completed message."""
         # Set map data
-        self.current_map_id = msg.get("MapId")
-        self.current_tilemap_data = msg.get("TilemapData")  # Assuming TilemapData can be deserialized
+        self.current_map_id = msg.map_id
+        self.current_tilemap_data = msg.tilemap_data
         
         # Set player position
-        self.player_position = msg.get("Position")  # Assuming Position can be deserialized
+        self.player_position = msg.position
         
         # Add other players
         self.other_player_info.clear()
+        self.player_index.clear()
         
-        player_info = msg.get("PlayerInfo", {})
-        for player_id, info in player_info.items():
+        for player_id, info in msg.player_info.items():
             if player_id != self.player_id:
-                self.add_player(player_id, info)  # Assuming PlayerMapInfo can be deserialized
+                self.add_player(player_id, info)
     
-    def _on_ext_leave_map_initiated(self, msg: Dict[str, Any]):
+    def _on_ext_leave_map_initiated(self, msg: ExtLeaveMapInitiated):
         """Handle the leave map initiated message."""
         # No state changes needed
         pass
     
-    def _on_ext_leave_map_completed(self, msg: Dict[str, Any]):
+    def _on_ext_leave_map_completed(self, msg: ExtLeaveMapCompleted):
         """Handle the leave map completed message."""
         # Clear map data
         self.current_map_id = None
@@ -344,11 +1125,12 @@ class GameContext:
         
         # Clear other players
         self.other_player_info.clear()
+        self.player_index.clear()
     
-    def _on_ext_player_joined_map(self, msg: Dict[str, Any]):
+    def _on_ext_player_joined_map(self, msg: ExtPlayerJoinedMap):
         """Handle the player joined map message."""
-        player_id = msg.get("PlayerId")
-        position = msg.get("Position")  # Assuming Position can be deserialized
+        player_id = msg.player_id
+        position = msg.position
         
         if player_id != self.player_id and position is not None:
             # Create player info
@@ -357,17 +1139,17 @@ class GameContext:
             # Add player to collections
             self.add_player(player_id, player_info)
     
-    def _on_ext_player_left_map(self, msg: Dict[str, Any]):
+    def _on_ext_player_left_map(self, msg: ExtPlayerLeftMap):
         """Handle the player left map message."""
-        player_id = msg.get("PlayerId")
+        player_id = msg.player_id
         
         if player_id != self.player_id:
             self.remove_player(player_id)
     
-    def _on_ext_player_position_change(self, msg: Dict[str, Any]):
+    def _on_ext_player_position_change(self, msg: ExtPlayerPositionChange):
         """Handle the player position change message."""
-        player_id = msg.get("PlayerId")
-        position = msg.get("Position")  # Assuming Position can be deserialized
+        player_id = msg.player_id
+        position = msg.position
         
         if player_id == self.player_id and position is not None:
             # Update player position
@@ -380,28 +1162,33 @@ class GameContext:
     
     #region Movement Message Handlers
     
-    def _on_ext_move_initiated(self, msg: Dict[str, Any]):
+    def _on_ext_move_initiated(self, msg: ExtMoveInitiated):
         """Handle the move initiated message."""
-        self.pending_move = msg.get("NewPosition")  # Assuming NewPosition can be deserialized
+        self.pending_move = msg.new_position
     
-    def _on_ext_move_completed(self, msg: Dict[str, Any]):
+    def _on_ext_move_completed(self, msg: ExtMoveCompleted):
         """Handle the move completed message."""
-        self.player_position = msg.get("NewPosition")  # Assuming NewPosition can be deserialized
+        self.player_position = msg.new_position
         self.pending_move = None
+        self._move_rerouted = False
+        if self.move_path:
+            self._send_next_step()
     
-    def _on_ext_move_failed(self, msg: Dict[str, Any]):
+    def _on_ext_move_failed(self, msg: ExtMoveFailed):
         """Handle the move failed message."""
         self.pending_move = None
+        if self.move_path:
+            self._reroute_step(msg.attempted_position)
     
     #endregion
     
     #region Fight Message Handlers
     
-    def _on_ext_fight_started(self, msg: Dict[str, Any]):
+    def _on_ext_fight_started(self, msg: ExtFightStarted):
         """Handle the fight started message."""
-        fight_id = msg.get("FightId")
-        player1_id = msg.get("Player1Id")
-        player2_id = msg.get("Player2Id")
+        fight_id = msg.fight_id
+        player1_id = msg.player1_id
+        player2_id = msg.player2_id
         
         # Add the fight to active fights
         self.active_fights[fight_id] = [player1_id, player2_id]
@@ -422,7 +1209,7 @@ class GameContext:
             
             # Reset card battle state for new fight
             self.card_svg_data.clear()
-            self.cards_in_hand.clear()
+            self.cards_in_hand = ()
             self.player_hit_points = 50
             self.player_action_points = 0
             self.player_deck_count = 0
@@ -431,16 +1218,17 @@ class GameContext:
             self.opponent_action_points = 0
             self.opponent_deck_count = 0
             self.opponent_discard_pile_count = 0
-            self.opponent_cards_in_hand.clear()
-            self.player_status_effects.clear()
-            self.opponent_status_effects.clear()
+            self.opponent_cards_in_hand = ()
+            self.player_status_effects = ()
+            self.opponent_status_effects = ()
             self.current_turn_player_id = None
+            self.invalidate_observation(REGION_ALL)
     
-    def _on_ext_fight_ended(self, msg: Dict[str, Any]):
+    def _on_ext_fight_ended(self, msg: ExtFightEnded):
         """Handle the fight ended message."""
-        fight_id = msg.get("FightId")
-        winner_id = msg.get("WinnerId")
-        loser_id = msg.get("LoserId")
+        fight_id = msg.fight_id
+        winner_id = msg.winner_id
+        loser_id = msg.loser_id
         
         # Remove the fight from active fights
         self.active_fights.pop(fight_id, None)
@@ -456,12 +1244,14 @@ class GameContext:
         
         # Reset fight state if the player was involved
         if winner_id == self.player_id or loser_id == self.player_id:
+            if self.advertise_cached_card_images and self._new_card_svgs:
+                self.send_cached_card_images()
             self.current_fight_id = None
             self.opponent_id = None
             
             # Reset card battle state
             self.card_svg_data.clear()
-            self.cards_in_hand.clear()
+            self.cards_in_hand = ()
             self.player_hit_points = 50
             self.player_action_points = 0
             self.player_deck_count = 0
@@ -470,146 +1260,211 @@ class GameContext:
             self.opponent_action_points = 0
             self.opponent_deck_count = 0
             self.opponent_discard_pile_count = 0
-            self.opponent_cards_in_hand.clear()
-            self.player_status_effects.clear()
-            self.opponent_status_effects.clear()
+            self.opponent_cards_in_hand = ()
+            self.player_status_effects = ()
+            self.opponent_status_effects = ()
             self.current_turn_player_id = None
+            self.invalidate_observation(REGION_ALL)
     
     #endregion
     
     #region Card Battle Message Handlers
     
-    def _on_ext_card_images(self, msg: Dict[str, Any]):
+    def _on_ext_card_images(self, msg: ExtCardImages):
         """Handle the card images message."""
-        card_svg_data = msg.get("CardSvgData", {})
-        for card_id, svg_data in card_svg_data.items():
-            self.card_svg_data[card_id] = svg_data
+        for card_id, svg_data in msg.card_svg_data.items():
+            self._store_card_svg(card_id, svg_data)
     
-    def _on_ext_card_drawn(self, msg: Dict[str, Any]):
+    def _on_ext_card_drawn(self, msg: ExtCardDrawn):
         """Handle the card drawn message."""
         # Only update the SVG data cache, don't modify the hand
-        card_id = msg.get("CardInfo", {}).get("Id")
-        svg_data = msg.get("SvgData")
+        card_id = msg.card_info.id if msg.card_info else None
+        svg_data = msg.svg_data
         
-        if card_id and svg_data:
-            self.card_svg_data[card_id] = svg_data
+        if card_id:
+            self._store_card_svg(card_id, svg_data)
         
         # Hand updates are now handled by _on_ext_fight_state_update
     
-    def _on_ext_turn_started(self, msg: Dict[str, Any]):
+    def _on_ext_turn_started(self, msg: ExtTurnStarted):
         """Handle the turn started message."""
-        self.current_turn_player_id = msg.get("ActivePlayerId")
+        self.current_turn_player_id = msg.active_player_id
+        self.invalidate_observation(REGION_TURN)
         
         # Card handling is now managed by _on_ext_fight_state_update
     
-    def _on_ext_turn_ended(self, msg: Dict[str, Any]):
+    def _on_ext_turn_ended(self, msg: ExtTurnEnded):
         """Handle the turn ended message."""
-        player_id = msg.get("PlayerId")
+        player_id = msg.player_id
         
         if player_id == self.player_id:
             # Player's turn ended
             self.current_turn_player_id = self.opponent_id
             
             # Clear player's hand as it's moved to discard pile
-            self.cards_in_hand.clear()
+            self.cards_in_hand = ()
+            self.invalidate_observation(REGION_TURN | REGION_PLAYER_STATS | REGION_PLAYER_HAND)
         else:
             # Opponent's turn ended
             self.current_turn_player_id = self.player_id
             
             # Clear opponent's hand as it's moved to discard pile
-            self.opponent_cards_in_hand.clear()
+            self.opponent_cards_in_hand = ()
+            self.invalidate_observation(REGION_TURN | REGION_OPPONENT_STATS)
     
-    def _on_ext_card_play_completed(self, msg: Dict[str, Any]):
+    def _on_ext_card_play_completed(self, msg: ExtCardPlayCompleted):
         """Handle the card play completed message."""
-        player_id = msg.get("PlayerId")
-        played_card = msg.get("PlayedCard")  # Assuming PlayedCard can be deserialized
+        player_id = msg.player_id
+        played_card = msg.played_card
         
         if played_card:
-            card_id = played_card.get("Id")
+            card_id = played_card.id
             
             # Store the last played card
             self.last_played_card = played_card
             
             if player_id == self.player_id:
                 # Remove the card from the player's hand
-                self.cards_in_hand = [card for card in self.cards_in_hand if card.id != card_id]
+                self.cards_in_hand = tuple(card for card in self.cards_in_hand if card.id != card_id)
+                self.invalidate_observation(REGION_PLAYER_STATS | REGION_PLAYER_HAND)
             else:
                 # Remove the card from the opponent's hand
-                self.opponent_cards_in_hand = [card for card in self.opponent_cards_in_hand if card.id != card_id]
+                self.opponent_cards_in_hand = tuple(card for card in self.opponent_cards_in_hand if card.id != card_id)
+                self.invalidate_observation(REGION_OPPONENT_STATS)
     
-    def _on_ext_card_play_failed(self, msg: Dict[str, Any]):
+    def _on_ext_card_play_failed(self, msg: ExtCardPlayFailed):
         """Handle the card play failed message."""
         # Handle card play failure (log or other handling)
         pass
     
-    def _on_ext_effect_applied(self, msg: Dict[str, Any]):
+    def _on_ext_effect_applied(self, msg: ExtEffectApplied):
         """Handle the effect applied message."""
-        target_player_id = msg.get("TargetPlayerId")
-        effect_type = msg.get("EffectType")
-        value = msg.get("Value", 0)
+        target_player_id = msg.target_player_id
+        effect_type = msg.effect_type
+        value = msg.value
         
         # Update player stats based on effect
         if target_player_id == self.player_id:
             if effect_type == "Damage":
                 self.player_hit_points = max(0, self.player_hit_points - value)
+                self.invalidate_observation(REGION_PLAYER_STATS)
             elif effect_type == "Heal":
                 self.player_hit_points = min(50, self.player_hit_points + value)
+                self.invalidate_observation(REGION_PLAYER_STATS)
         else:
             if effect_type == "Damage":
                 self.opponent_hit_points = max(0, self.opponent_hit_points - value)
+                self.invalidate_observation(REGION_OPPONENT_STATS)
             elif effect_type == "Heal":
                 self.opponent_hit_points = min(50, self.opponent_hit_points + value)
+                self.invalidate_observation(REGION_OPPONENT_STATS)
     
-    def _on_ext_fight_state_update(self, msg: Dict[str, Any]):
+    def _on_ext_fight_state_update(self, msg: ExtFightStateUpdate):
         """Handle the fight state update message."""
-        self.current_turn_player_id = msg.get("CurrentTurnPlayerId")
+        self.current_turn_player_id = msg.current_turn_player_id
         
         # Get player and opponent states
-        player_state = msg.get("PlayerState", {})
-        opponent_state = msg.get("OpponentState", {})
-        
-        # Determine which state belongs to the player and which to the opponent
-        player_state_id = player_state.get("PlayerId")
-        opponent_state_id = opponent_state.get("PlayerId")
+        player_state = msg.player_state
+        opponent_state = msg.opponent_state
         
         # Set player and opponent states based on player ID
-        if player_state_id == self.player_id:
+        if player_state.player_id == self.player_id:
             self._set_player_state(player_state)
             self._set_opponent_state(opponent_state)
         else:
             self._set_player_state(opponent_state)
             self._set_opponent_state(player_state)
+        
+        self.invalidate_observation(REGION_ALL)
     
-    def _set_player_state(self, state: Dict[str, Any]):
+    def _set_player_state(self, state: PlayerFightStateDto):
         """Set the player's state in a card battle."""
-        self.player_hit_points = state.get("HitPoints", 50)
-        self.player_action_points = state.get("ActionPoints", 0)
-        self.player_deck_count = state.get("DeckCount", 0)
-        self.player_discard_pile_count = state.get("DiscardPileCount", 0)
+        self.player_hit_points = state.hit_points
+        self.player_action_points = state.action_points
+        self.player_deck_count = state.deck_count
+        self.player_discard_pile_count = state.discard_pile_count
         
         # Update player hand
-        self.cards_in_hand = state.get("Hand", [])  # Assuming CardInfo objects can be deserialized
+        self.cards_in_hand = tuple(state.hand)
         
         # Update player status effects
-        self.player_status_effects = state.get("StatusEffects", [])  # Assuming StatusEffectInfo objects can be deserialized
+        self.player_status_effects = tuple(state.status_effects)
     
-    def _set_opponent_state(self, state: Dict[str, Any]):
+    def _set_opponent_state(self, state: PlayerFightStateDto):
         """Set the opponent's state in a card battle."""
-        self.opponent_hit_points = state.get("HitPoints", 50)
-        self.opponent_action_points = state.get("ActionPoints", 0)
-        self.opponent_deck_count = state.get("DeckCount", 0)
-        self.opponent_discard_pile_count = state.get("DiscardPileCount", 0)
+        self.opponent_hit_points = state.hit_points
+        self.opponent_action_points = state.action_points
+        self.opponent_deck_count = state.deck_count
+        self.opponent_discard_pile_count = state.discard_pile_count
         
         # Update opponent hand
-        self.opponent_cards_in_hand = state.get("Hand", [])  # Assuming CardInfo objects can be deserialized
+        self.opponent_cards_in_hand = tuple(state.hand)
         
         # Update opponent status effects
-        self.opponent_status_effects = state.get("StatusEffects", [])  # Assuming StatusEffectInfo objects can be deserialized
+        self.opponent_status_effects = tuple(state.status_effects)
+    
+    def _ignore_message(self, msg: ExtServerMessage):
+        """Handle messages that carry no client state change."""
+        pass
     
     #endregion
     
+    # Map message types to handler functions, built once when the class is created
+    _message_handlers: Dict[str, Callable[["GameContext", Any], None]] = {
+        # Connection messages
+        "ExtPlayerIdResponse": _on_ext_player_id_response,
+        
+        # Map messages
+        "ExtMapListResponse": _ignore_message,  # No state change
+        "ExtJoinMapInitiated": _on_ext_join_map_initiated,
+        "ExtJoinMapCompleted": _on_ext_join_map_completed,
+        "ExtJoinMapFailed": _ignore_message,  # Handle join map failure
+        "ExtLeaveMapInitiated": _on_ext_leave_map_initiated,
+        "ExtLeaveMapCompleted": _on_ext_leave_map_completed,
+        "ExtLeaveMapFailed": _ignore_message,  # Handle leave map failure
+        "ExtPlayerJoinedMap": _on_ext_player_joined_map,
+        "ExtPlayerLeftMap": _on_ext_player_left_map,
+        "ExtPlayerPositionChange": _on_ext_player_position_change,
+        
+        # Movement messages
+        "ExtMoveInitiated": _on_ext_move_initiated,
+        "ExtMoveCompleted": _on_ext_move_completed,
+        "ExtMoveFailed": _on_ext_move_failed,
+        
+        # Fight messages
+        "ExtFightStarted": _on_ext_fight_started,
+        "ExtFightEnded": _on_ext_fight_ended,
+        
+        # Card battle messages
+        "ExtCardImages": _on_ext_card_images,
+        "ExtCardDrawn": _on_ext_card_drawn,
+        "ExtTurnStarted": _on_ext_turn_started,
+        "ExtTurnEnded": _on_ext_turn_ended,
+        "ExtCardPlayInitiated": _ignore_message,  # No state change
+        "ExtCardPlayCompleted": _on_ext_card_play_completed,
+        "ExtCardPlayFailed": _on_ext_card_play_failed,
+        "ExtEffectApplied": _on_ext_effect_applied,
+        "ExtFightStateUpdate": _on_ext_fight_state_update,
+    }
+    
     def dispose(self):
         """Dispose of resources."""
+        self._cancel_waiters()
+        self.subscriptions.close()
+        
+        if self.multiplexer is not None:
+            self.multiplexer.detach(self)
+        
+        if self.transport:
+            # Cannot await here, so schedule the close on the running loop
+            try:
+                task = asyncio.get_running_loop().create_task(self.transport.close())
+                _closing_tasks.add(task)
+                task.add_done_callback(_closing_tasks.discard)
+            except RuntimeError:
+                pass
+            self.transport = None
+        
         if self.websocket:
             self.websocket.close()
             self.websocket = None
@@ -617,3 +1472,18 @@ class GameContext:
         if self.websocket_thread and self.websocket_thread.is_alive():
             self.websocket_thread.join(timeout=1.0)
             self.websocket_thread = None
+        
+        if self.inbound_queue is not None:
+            self.inbound_queue.close()
+            if self.dispatch_thread is not None and self.dispatch_thread is not threading.current_thread():
+                self.dispatch_thread.join(timeout=1.0)
+            self.dispatch_thread = None
+            self.inbound_queue = None
+    
+    async def dispose_async(self):
+        """Dispose of resources, waiting for the asyncio transport to close cleanly."""
+        if self.transport:
+            await self.transport.close()
+            self.transport = None
+        
+        self.dispose()
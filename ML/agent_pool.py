@@ -0,0 +1,718 @@
+"""
+Multi-process agent pool that shards GameContext connections across cores.
+
+Each worker process owns a shard of GameContexts, batches the observations of
+the contexts whose turn it is, runs a policy on the batch and sends the chosen
+actions. Observations and transitions come back to the parent through
+shared-memory ring buffers (one single-producer single-consumer ring per worker
+and stream), so no per-step pickling happens between processes.
+
+Transition records are float32 rows laid out as:
+
+    [0:D]        observation the action was chosen on
+    [D]          action (card index in card_library.ALL_CARDS order, or END_TURN)
+    [D+1]        reward (+1 win, -1 loss, 0 otherwise)
+    [D+2]        done flag
+    [D+3:2D+3]   next observation
+
+where D is state_dim.
+
+Backends:
+    - "simulator": pairs of contexts play each other on an in-process
+      FightSimulator, so fights start immediately and need no server
+    - "server": contexts connect to server_url and act in whatever fights
+      they are in; getting them into fights is left to the caller's policy
+      or to other clients challenging them
+
+Run from the ML directory, e.g.:
+    python agent_pool.py --workers 4 --contexts 64 --seconds 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from GameContext import GameContext
+from batch_env import NUM_ACTIONS, action_to_message, context_action_mask
+from observation import DEFAULT_STATE_DIM
+from simulator import FightSimulator
+
+# Worker stats columns, cumulative across restarts of the same worker slot
+STAT_HEARTBEAT = 0
+STAT_PID = 1
+STAT_STEPS = 2
+STAT_TRANSITIONS = 3
+STAT_DROPPED = 4
+STAT_EPISODES = 5
+STAT_ERRORS = 6
+NUM_STATS = 7
+
+# Seconds a server backend agent waits for its last action to change the state
+# before deciding again, e.g. after a rejected card play
+ACTION_TIMEOUT = 5.0
+
+# Fights still running after this many decisions are abandoned as a draw,
+# which also gets simulator fights out of a stale double knockout
+DEFAULT_MAX_FIGHT_STEPS = 2000
+
+
+def transition_size(state_dim: int) -> int:
+    """Length of one transition record for the given observation size."""
+    return 2 * state_dim + 3
+
+
+class SharedRingBuffer:
+    """
+    Single-producer single-consumer ring of fixed-size float32 records in shared memory.
+
+    The header holds the write and read counters as int64. Only the producer
+    advances the write counter and only the consumer advances the read
+    counter, so no lock is needed. Records pushed while the ring is full are
+    dropped and reported to the caller.
+    """
+
+    _HEADER_BYTES = 16
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, record_size: int, owner: bool):
+        self.shm = shm
+        self.capacity = capacity
+        self.record_size = record_size
+        self.owner = owner
+        self._header = np.ndarray((2,), dtype=np.int64, buffer=shm.buf)
+        self._data = np.ndarray((capacity, record_size), dtype=np.float32,
+                                buffer=shm.buf, offset=self._HEADER_BYTES)
+
+    @classmethod
+    def create(cls, capacity: int, record_size: int) -> "SharedRingBuffer":
+        """Allocate a new zeroed ring; the creator unlinks it on close()."""
+        size = cls._HEADER_BYTES + capacity * record_size * 4
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm, capacity, record_size, owner=True)
+        ring._header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, capacity: int, record_size: int) -> "SharedRingBuffer":
+        """Attach to a ring created by another process."""
+        return cls(shared_memory.SharedMemory(name=name), capacity, record_size, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def __len__(self) -> int:
+        return int(self._header[0] - self._header[1])
+
+    def push_many(self, records: np.ndarray) -> int:
+        """
+        Append records, producer side.
+
+        Args:
+            records: Array of shape (N, record_size)
+
+        Returns:
+            The number of records written; the rest did not fit
+        """
+        write_index = int(self._header[0])
+        count = min(len(records), self.capacity - (write_index - int(self._header[1])))
+        if count <= 0:
+            return 0
+
+        start = write_index % self.capacity
+        first = min(count, self.capacity - start)
+        self._data[start:start + first] = records[:first]
+        if count > first:
+            self._data[:count - first] = records[first:count]
+
+        # Publish only after the data is in place
+        self._header[0] = write_index + count
+        return count
+
+    def pop_batch(self, max_records: Optional[int] = None) -> np.ndarray:
+        """
+        Remove and return the oldest records, consumer side.
+
+        Args:
+            max_records: Upper bound on the number of records, all available by default
+
+        Returns:
+            A copy of shape (N, record_size), N may be zero
+        """
+        read_index = int(self._header[1])
+        count = int(self._header[0]) - read_index
+        if max_records is not None:
+            count = min(count, max_records)
+        if count <= 0:
+            return np.empty((0, self.record_size), dtype=np.float32)
+
+        start = read_index % self.capacity
+        first = min(count, self.capacity - start)
+        if count > first:
+            batch = np.concatenate((self._data[start:], self._data[:count - first]))
+        else:
+            batch = self._data[start:start + count].copy()
+
+        self._header[1] = read_index + count
+        return batch
+
+    def close(self):
+        """Release the mapping, and the segment itself if this process created it."""
+        self._header = None
+        self._data = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def random_policy(observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    """
+    Pick a uniformly random valid action per row.
+
+    Args:
+        observations: Batch of shape (N, state_dim)
+        masks: Bool batch of shape (N, NUM_ACTIONS) of valid actions
+
+    Returns:
+        Int array of N actions
+    """
+    scores = np.random.random(masks.shape)
+    scores[~masks] = -1.0
+    return scores.argmax(axis=1)
+
+
+#region Worker
+
+
+class _Agent:
+    """One context driven by a worker, with the decision awaiting its outcome."""
+    __slots__ = ("context", "simulator", "fight_id", "observation", "action",
+                 "last_version", "sent_at", "winner_id", "fight_steps")
+
+    def __init__(self, context: GameContext, simulator: Optional[FightSimulator] = None):
+        self.context = context
+        self.simulator = simulator
+        self.fight_id: Optional[str] = None
+        self.observation: Optional[np.ndarray] = None
+        self.action = 0
+        self.last_version = -1
+        self.sent_at = 0.0
+        self.winner_id: Optional[str] = None
+        self.fight_steps = 0
+
+
+def _connect_threaded(context: GameContext):
+    """
+    Connect a threaded GameContext from the worker's synchronous loop.
+
+    connect() only starts the websocket thread, so a throwaway event loop
+    will do. An asyncio-mode transport would die with that loop, so those
+    contexts are refused.
+    """
+    if context.use_asyncio:
+        raise ValueError("The server backend drives threaded GameContexts only, not use_asyncio ones")
+    asyncio.run(context.connect())
+
+
+class _Worker:
+    """Runs inside a pool process; see AgentPool for the arguments."""
+
+    def __init__(self, worker_id: int, num_contexts: int, backend: str, server_url: str,
+                 policy: Callable[[np.ndarray, np.ndarray], np.ndarray], state_dim: int,
+                 transitions: SharedRingBuffer, observations: Optional[SharedRingBuffer],
+                 stats: np.ndarray, stop_event: Any, max_fight_steps: int, seed: Optional[int]):
+        self.worker_id = worker_id
+        self.backend = backend
+        self.policy = policy
+        self.state_dim = state_dim
+        self.transitions = transitions
+        self.observations = observations
+        self.stats = stats
+        self.stop_event = stop_event
+        self.max_fight_steps = max_fight_steps
+        self.agents: List[_Agent] = []
+
+        if backend == "simulator":
+            for pair in range((num_contexts + 1) // 2):
+                simulator = FightSimulator(f"w{worker_id}_p{pair}_a", f"w{worker_id}_p{pair}_b",
+                                           seed=None if seed is None else seed + pair, include_svg=False)
+                for player_id in (simulator.player1_id, simulator.player2_id):
+                    context = GameContext(server_url)
+                    simulator.attach(context, player_id)
+                    self.agents.append(_Agent(context, simulator))
+        elif backend == "server":
+            for _ in range(num_contexts):
+                agent = _Agent(GameContext(server_url))
+                agent.context.add_server_message_callback(self._fight_end_callback(agent))
+                _connect_threaded(agent.context)
+                self.agents.append(agent)
+        else:
+            raise ValueError(f"Unknown backend {backend!r}")
+
+        self._batch = np.zeros((len(self.agents), state_dim), dtype=np.float32)
+        self._masks = np.zeros((len(self.agents), NUM_ACTIONS), dtype=bool)
+        self._records = np.zeros((2 * len(self.agents), transition_size(state_dim)), dtype=np.float32)
+        self._record_count = 0
+
+    @staticmethod
+    def _fight_end_callback(agent: _Agent) -> Callable[[Any], None]:
+        def callback(msg: Any):
+            if msg.message_type == "ExtFightEnded":
+                agent.winner_id = msg.winner_id
+        return callback
+
+    def run(self):
+        stats = self.stats
+        stats[STAT_PID] = os.getpid()
+        while not self.stop_event.is_set():
+            stats[STAT_HEARTBEAT] = time.time()
+            if self.backend == "simulator":
+                self._start_idle_fights()
+            if not self._step():
+                time.sleep(0.001)
+            self._flush()
+
+    def dispose(self):
+        for agent in self.agents:
+            agent.context.dispose()
+
+    def _start_idle_fights(self):
+        for agent in self.agents[::2]:
+            simulator = agent.simulator
+            if simulator.is_active:
+                continue
+            for player in self.agents:
+                if player.simulator is simulator:
+                    self._check_fight_over(player)
+            simulator.start_fight()
+            self.stats[STAT_EPISODES] += 1
+
+    def _step(self) -> bool:
+        """Decide for every agent whose turn it is; returns False if none was ready."""
+        acting = []
+        now = time.time()
+        for agent in self.agents:
+            context = agent.context
+            self._check_fight_over(agent)
+            if context.current_fight_id is None or not context.is_player_turn:
+                continue
+            if agent.fight_steps >= self.max_fight_steps:
+                self._abandon_fight(agent)
+                continue
+            if (agent.simulator is None and agent.last_version == context.observation_version
+                    and now - agent.sent_at < ACTION_TIMEOUT):
+                # Waiting for the server to answer the previous action
+                continue
+            acting.append(agent)
+
+        if not acting:
+            return False
+
+        count = len(acting)
+        batch = self._batch[:count]
+        masks = self._masks[:count]
+        for row, agent in enumerate(acting):
+            batch[row] = agent.context.get_observation()
+            masks[row] = context_action_mask(agent.context)
+
+        actions = self.policy(batch, masks)
+        if self.observations is not None:
+            self.observations.push_many(batch)
+
+        for row, agent in enumerate(acting):
+            action = int(actions[row])
+            if agent.observation is not None:
+                self._record(agent.observation, agent.action, 0.0, False, batch[row])
+            else:
+                agent.observation = np.empty(self.state_dim, dtype=np.float32)
+            agent.observation[:] = batch[row]
+            agent.action = action
+            agent.fight_id = agent.context.current_fight_id
+            agent.fight_steps += 1
+            agent.last_version = agent.context.observation_version
+            agent.sent_at = now
+            agent.context.send(action_to_message(action))
+            self._check_fight_over(agent)
+
+        self.stats[STAT_STEPS] += count
+        return True
+
+    def _check_fight_over(self, agent: _Agent):
+        """Close the pending transition of an agent whose fight has ended."""
+        if agent.observation is None or agent.context.current_fight_id == agent.fight_id:
+            return
+        winner_id = agent.simulator.winner_id if agent.simulator is not None else agent.winner_id
+        if winner_id is None:
+            reward = 0.0
+        else:
+            reward = 1.0 if winner_id == agent.context.player_id else -1.0
+        self._finish(agent, reward)
+        if agent.simulator is None:
+            self.stats[STAT_EPISODES] += 1
+
+    def _abandon_fight(self, agent: _Agent):
+        """End an overlong fight as a draw for both sides."""
+        simulator = agent.simulator
+        if simulator is None:
+            # The server keeps the fight going; stop recording it
+            self._finish(agent, 0.0)
+            return
+        for player in self.agents:
+            if player.simulator is simulator and player.observation is not None:
+                self._finish(player, 0.0)
+        # The next loop starts a new fight on this simulator
+        simulator.abandon_fight()
+
+    def _finish(self, agent: _Agent, reward: float):
+        self._record(agent.observation, agent.action, reward, True, agent.context.get_observation())
+        agent.observation = None
+        agent.fight_id = None
+        agent.fight_steps = 0
+        agent.last_version = -1
+        agent.winner_id = None
+
+    def _record(self, observation: np.ndarray, action: int, reward: float, done: bool,
+                next_observation: np.ndarray):
+        if self._record_count == len(self._records):
+            self._flush()
+        d = self.state_dim
+        record = self._records[self._record_count]
+        record[:d] = observation
+        record[d] = action
+        record[d + 1] = reward
+        record[d + 2] = done
+        record[d + 3:] = next_observation
+        self._record_count += 1
+
+    def _flush(self):
+        count = self._record_count
+        if count == 0:
+            return
+        written = self.transitions.push_many(self._records[:count])
+        self.stats[STAT_TRANSITIONS] += written
+        self.stats[STAT_DROPPED] += count - written
+        self._record_count = 0
+
+
+def _worker_main(worker_id: int, num_contexts: int, backend: str, server_url: str,
+                 policy: Callable[[np.ndarray, np.ndarray], np.ndarray], state_dim: int,
+                 transitions_spec: Tuple[str, int], observations_spec: Optional[Tuple[str, int]],
+                 stats_name: str, num_workers: int, stop_event: Any, max_fight_steps: int,
+                 seed: Optional[int]):
+    """Process entry point; attaches the shared buffers and runs until stop_event is set."""
+    transitions = SharedRingBuffer.attach(transitions_spec[0], transitions_spec[1], transition_size(state_dim))
+    observations = None
+    if observations_spec is not None:
+        observations = SharedRingBuffer.attach(observations_spec[0], observations_spec[1], state_dim)
+    stats_shm = shared_memory.SharedMemory(name=stats_name)
+    stats = np.ndarray((num_workers, NUM_STATS), dtype=np.float64, buffer=stats_shm.buf)[worker_id]
+
+    worker = None
+    try:
+        worker = _Worker(worker_id, num_contexts, backend, server_url, policy, state_dim,
+                         transitions, observations, stats, stop_event, max_fight_steps, seed)
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        stats[STAT_ERRORS] += 1
+        print(f"Agent pool worker {worker_id} failed: {e}")
+        raise
+    finally:
+        if worker is not None:
+            worker.dispose()
+        # Views into shared memory must go before the segments are closed
+        worker = None
+        del stats
+        transitions.close()
+        if observations is not None:
+            observations.close()
+        stats_shm.close()
+
+
+#endregion
+
+
+class AgentPool:
+    """
+    Shards GameContext connections over worker processes.
+
+    Call start(), then collect() periodically to drain transitions, stats()
+    for per-worker health and throughput, and shutdown() when done. A monitor
+    thread restarts workers that die or stop sending heartbeats.
+    """
+
+    def __init__(self, num_workers: int = 0, contexts_per_worker: int = 32, backend: str = "simulator",
+                 server_url: str = "ws://127.0.0.1:8080/ws",
+                 policy: Callable[[np.ndarray, np.ndarray], np.ndarray] = random_policy,
+                 state_dim: int = DEFAULT_STATE_DIM, ring_capacity: int = 65536,
+                 observation_capacity: int = 0, heartbeat_timeout: float = 30.0,
+                 max_fight_steps: int = DEFAULT_MAX_FIGHT_STEPS, seed: Optional[int] = None):
+        """
+        Initialize a new instance of the AgentPool class.
+
+        Args:
+            num_workers: Number of worker processes, the CPU count by default
+            contexts_per_worker: GameContexts owned by each worker
+            backend: "simulator" or "server"
+            server_url: WebSocket URL of the game server for the server backend
+            policy: Picklable function mapping (observations, action masks) to actions
+            state_dim: Length of each observation vector
+            ring_capacity: Transition records buffered per worker
+            observation_capacity: Observations buffered per worker, 0 to not ship observations
+            heartbeat_timeout: Seconds without a heartbeat before a worker is restarted
+            max_fight_steps: Decisions after which a fight is abandoned as a draw
+            seed: Base seed for the simulator backend
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.contexts_per_worker = contexts_per_worker
+        self.backend = backend
+        self.server_url = server_url
+        self.policy = policy
+        self.state_dim = state_dim
+        self.ring_capacity = ring_capacity
+        self.observation_capacity = observation_capacity
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_fight_steps = max_fight_steps
+        self.seed = seed
+
+        # Spawn so workers behave the same on Windows and do not inherit sockets
+        self._mp = multiprocessing.get_context("spawn")
+        self._stop_event = self._mp.Event()
+        self._processes: List[Optional[Any]] = [None] * self.num_workers
+        self._restarts = [0] * self.num_workers
+        self._started_at = [0.0] * self.num_workers
+        self._transitions: List[SharedRingBuffer] = []
+        self._observations: List[SharedRingBuffer] = []
+        self._stats_shm: Optional[shared_memory.SharedMemory] = None
+        self._stats: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+        self._monitor_thread: Optional[threading.Thread] = None
+        self._last_stats: Dict[int, Tuple[float, np.ndarray]] = {}
+
+    def start(self, monitor_interval: float = 1.0):
+        """
+        Allocate the shared buffers and start the workers.
+
+        Args:
+            monitor_interval: Seconds between health checks, 0 to not start the monitor thread
+        """
+        record_size = transition_size(self.state_dim)
+        self._transitions = [SharedRingBuffer.create(self.ring_capacity, record_size)
+                             for _ in range(self.num_workers)]
+        if self.observation_capacity:
+            self._observations = [SharedRingBuffer.create(self.observation_capacity, self.state_dim)
+                                  for _ in range(self.num_workers)]
+        self._stats_shm = shared_memory.SharedMemory(create=True, size=self.num_workers * NUM_STATS * 8)
+        self._stats = np.ndarray((self.num_workers, NUM_STATS), dtype=np.float64, buffer=self._stats_shm.buf)
+        self._stats[:] = 0.0
+        self._stop_event.clear()
+
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+
+        if monitor_interval > 0:
+            self._monitor_thread = threading.Thread(target=self._monitor_loop, args=(monitor_interval,),
+                                                    daemon=True)
+            self._monitor_thread.start()
+
+    def _spawn(self, worker_id: int):
+        observations_spec = None
+        if self._observations:
+            observations_spec = (self._observations[worker_id].name, self.observation_capacity)
+        seed = None if self.seed is None else self.seed + worker_id * 100003 + self._restarts[worker_id]
+        process = self._mp.Process(
+            target=_worker_main,
+            args=(worker_id, self.contexts_per_worker, self.backend, self.server_url, self.policy,
+                  self.state_dim, (self._transitions[worker_id].name, self.ring_capacity), observations_spec,
+                  self._stats_shm.name, self.num_workers, self._stop_event, self.max_fight_steps, seed),
+            name=f"agent-pool-{worker_id}",
+            daemon=True,
+        )
+        # Counts as a heartbeat while the new process imports
+        self._stats[worker_id, STAT_HEARTBEAT] = time.time()
+        self._started_at[worker_id] = time.time()
+        process.start()
+        self._processes[worker_id] = process
+
+    def _monitor_loop(self, interval: float):
+        while not self._stop_event.wait(interval):
+            self.monitor()
+
+    def monitor(self) -> List[int]:
+        """
+        Restart workers that exited or stopped sending heartbeats.
+
+        Returns:
+            Ids of the restarted workers
+        """
+        restarted = []
+        with self._lock:
+            if self._stop_event.is_set():
+                return restarted
+            now = time.time()
+            for worker_id, process in enumerate(self._processes):
+                if process is None:
+                    continue
+                stale = now - self._stats[worker_id, STAT_HEARTBEAT] > self.heartbeat_timeout
+                if process.is_alive() and not stale:
+                    continue
+                if process.is_alive():
+                    print(f"Agent pool worker {worker_id} missed its heartbeat, restarting")
+                    process.terminate()
+                else:
+                    print(f"Agent pool worker {worker_id} exited with code {process.exitcode}, restarting")
+                process.join(timeout=1.0)
+                self._restarts[worker_id] += 1
+                self._spawn(worker_id)
+                restarted.append(worker_id)
+        return restarted
+
+    def collect(self, max_per_worker: Optional[int] = None) -> np.ndarray:
+        """
+        Drain buffered transitions from every worker.
+
+        Args:
+            max_per_worker: Upper bound on records taken from each worker
+
+        Returns:
+            Float32 array of shape (N, 2 * state_dim + 3), see the module docstring
+        """
+        batches = [ring.pop_batch(max_per_worker) for ring in self._transitions]
+        if not batches:
+            return np.empty((0, transition_size(self.state_dim)), dtype=np.float32)
+        return np.concatenate(batches)
+
+    def collect_observations(self, max_per_worker: Optional[int] = None) -> np.ndarray:
+        """Drain the observation batches workers ran their policy on (needs observation_capacity)."""
+        batches = [ring.pop_batch(max_per_worker) for ring in self._observations]
+        if not batches:
+            return np.empty((0, self.state_dim), dtype=np.float32)
+        return np.concatenate(batches)
+
+    def split_transitions(self, records: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray,
+                                                                np.ndarray, np.ndarray]:
+        """
+        Split transition records into views of their fields.
+
+        Returns:
+            (observations, actions, rewards, dones, next_observations)
+        """
+        d = self.state_dim
+        return (records[:, :d], records[:, d].astype(np.int64), records[:, d + 1],
+                records[:, d + 2] > 0.5, records[:, d + 3:])
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Per-worker health and throughput.
+
+        Rates are measured since the previous stats() call.
+
+        Returns:
+            One dict per worker with alive, pid, restarts, heartbeat_age,
+            steps, transitions, dropped, episodes, errors, steps_per_sec,
+            transitions_per_sec and buffered
+        """
+        now = time.time()
+        result = []
+        for worker_id in range(self.num_workers):
+            process = self._processes[worker_id]
+            row = self._stats[worker_id].copy()
+            last_time, last_row = self._last_stats.get(worker_id, (self._started_at[worker_id], np.zeros(NUM_STATS)))
+            elapsed = max(now - last_time, 1e-9)
+            self._last_stats[worker_id] = (now, row)
+            result.append({
+                "worker_id": worker_id,
+                "alive": process is not None and process.is_alive(),
+                "pid": int(row[STAT_PID]),
+                "restarts": self._restarts[worker_id],
+                "heartbeat_age": now - row[STAT_HEARTBEAT],
+                "steps": int(row[STAT_STEPS]),
+                "transitions": int(row[STAT_TRANSITIONS]),
+                "dropped": int(row[STAT_DROPPED]),
+                "episodes": int(row[STAT_EPISODES]),
+                "errors": int(row[STAT_ERRORS]),
+                "steps_per_sec": (row[STAT_STEPS] - last_row[STAT_STEPS]) / elapsed,
+                "transitions_per_sec": (row[STAT_TRANSITIONS] - last_row[STAT_TRANSITIONS]) / elapsed,
+                "buffered": len(self._transitions[worker_id]),
+            })
+        return result
+
+    def shutdown(self, timeout: float = 5.0):
+        """
+        Stop the workers and release the shared buffers.
+
+        Workers dispose their GameContexts on the way out; any that have not
+        exited after timeout seconds are terminated.
+        """
+        with self._lock:
+            self._stop_event.set()
+        if self._monitor_thread is not None:
+            self._monitor_thread.join(timeout=timeout)
+            self._monitor_thread = None
+
+        deadline = time.time() + timeout
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=max(deadline - time.time(), 0.0))
+        for worker_id, process in enumerate(self._processes):
+            if process is not None and process.is_alive():
+                print(f"Agent pool worker {worker_id} did not stop, terminating")
+                process.terminate()
+                process.join(timeout=1.0)
+        self._processes = [None] * self.num_workers
+
+        for ring in self._transitions + self._observations:
+            ring.close()
+        self._transitions = []
+        self._observations = []
+        if self._stats_shm is not None:
+            self._stats = None
+            self._stats_shm.close()
+            self._stats_shm.unlink()
+            self._stats_shm = None
+
+    def __enter__(self) -> "AgentPool":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an agent pool with a random policy and report throughput")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes, the CPU count by default")
+    parser.add_argument("--contexts", type=int, default=32, help="GameContexts per worker")
+    parser.add_argument("--backend", choices=("simulator", "server"), default="simulator")
+    parser.add_argument("--server-url", default="ws://127.0.0.1:8080/ws")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    pool = AgentPool(args.workers, args.contexts, args.backend, args.server_url)
+    pool.start()
+    try:
+        collected = 0
+        deadline = time.time() + args.seconds
+        while time.time() < deadline:
+            time.sleep(1.0)
+            collected += len(pool.collect())
+            for worker in pool.stats():
+                print(f"worker {worker['worker_id']}: alive={worker['alive']} restarts={worker['restarts']} "
+                      f"steps/s={worker['steps_per_sec']:.0f} episodes={worker['episodes']} "
+                      f"dropped={worker['dropped']} errors={worker['errors']}")
+        print(f"collected {collected} transitions")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
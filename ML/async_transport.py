@@ -0,0 +1,144 @@
+import asyncio
+from typing import Any, Callable, Optional
+
+try:
+    import websockets
+    from websockets.exceptions import ConnectionClosed
+except ImportError:  # websockets is only needed for the asyncio transport
+    websockets = None
+    ConnectionClosed = Exception
+
+# Marker placed on the inbound queue once the connection has gone away
+_CLOSED = object()
+
+# Frames the websockets library buffers before it stops reading the socket (its own default)
+WEBSOCKET_MAX_QUEUE = 16
+
+
+class AsyncWebSocketTransport:
+    """
+    WebSocket transport that runs entirely on an asyncio event loop.
+
+    Each transport owns one reader task instead of an OS thread, so a single
+    process can host hundreds of GameContext instances on one loop.
+
+    send() awaits until the frame has been handed to the socket, so a fast
+    producer is slowed to the speed of the network.
+
+    Inbound frames are always handled as they arrive. With max_queue set,
+    processed messages are also kept on a bounded queue for recv(); once it
+    is full the oldest message is dropped, so state updates never wait for a
+    caller that reads slowly or not at all.
+    """
+
+    def __init__(self, server_url: str, on_message: Callable[[Any], Any], max_queue: int = 0):
+        """
+        Initialize a new instance of the AsyncWebSocketTransport class.
+
+        Args:
+            server_url: WebSocket URL of the game server
+            on_message: Called with every raw frame; its return value is queued for recv()
+            max_queue: Messages kept for recv(), dropping the oldest beyond that; 0 disables recv()
+        """
+        self.server_url = server_url
+        self.on_message = on_message
+        self.max_queue = max_queue
+        self.connection = None
+        self.inbound: Optional[asyncio.Queue] = asyncio.Queue(max_queue) if max_queue > 0 else None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connected = False
+        self._closed = False
+
+        # Messages dropped from a full recv() queue
+        self.dropped = 0
+
+    @property
+    def connected(self) -> bool:
+        """Check if the transport currently has an open connection."""
+        return self._connected
+
+    async def connect(self):
+        """Open the WebSocket connection and start the reader task."""
+        if websockets is None:
+            raise RuntimeError("The asyncio transport requires the 'websockets' package")
+
+        self.connection = await websockets.connect(self.server_url, max_queue=max(self.max_queue, WEBSOCKET_MAX_QUEUE))
+        self._connected = True
+        self._closed = False
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def _read_loop(self):
+        """Receive frames until the connection closes, feeding them to on_message."""
+        try:
+            async for frame in self.connection:
+                message = self.on_message(frame)
+                if self.inbound is not None and message is not None:
+                    self._enqueue(message)
+        except ConnectionClosed as e:
+            print(f"WebSocket connection closed: {e}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"WebSocket error: {e}")
+        finally:
+            self._connected = False
+            self._closed = True
+            if self.inbound is not None:
+                self._enqueue(_CLOSED)
+
+    def _enqueue(self, message: Any):
+        """Queue a message for recv(), dropping the oldest one when the queue is full."""
+        inbound = self.inbound
+        if inbound.full():
+            inbound.get_nowait()
+            self.dropped += 1
+        inbound.put_nowait(message)
+
+    async def send(self, data: Any):
+        """
+        Send a serialized frame, waiting until the socket has accepted it.
+
+        Args:
+            data: The serialized message to send
+        """
+        if not self._connected:
+            raise ConnectionError("Transport is not connected")
+        await self.connection.send(data)
+
+    async def recv(self) -> Any:
+        """
+        Wait for the next processed message.
+
+        Returns:
+            The value returned by on_message for the next frame
+
+        Raises:
+            ConnectionError: If the connection closed and no messages remain
+        """
+        if self.inbound is None:
+            raise RuntimeError("recv() is disabled when max_queue is 0")
+        if self._closed and self.inbound.empty():
+            raise ConnectionError("Transport is closed")
+
+        message = await self.inbound.get()
+        if message is _CLOSED:
+            raise ConnectionError("Transport is closed")
+        return message
+
+    async def close(self):
+        """Close the connection and wait for the reader task to finish."""
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+        if self._reader_task is not None:
+            if not self._reader_task.done():
+                self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
+            self._reader_task = None
+
+        self._connected = False
+        self._closed = True
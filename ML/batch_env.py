@@ -0,0 +1,557 @@
+"""
+Vectorized card battle environment running many fights in lock-step NumPy arrays.
+
+Implements the same rules as simulator.py (and so FightState and the card
+effect handlers), but stores hands, decks and discard piles as per-card counts
+and status effects as fixed slots, so one step() advances every fight at once.
+Observations use the layout of observation.py, seen from one player's side,
+so policies trained here run unchanged on GameContext.get_observation().
+
+Actions are card indices in card_library.ALL_CARDS order, or END_TURN. Use
+action_to_message to turn an action into the request a GameContext sends.
+
+Differences from the server:
+    - Fights are truncated as a draw after max_turns turns, so stalled
+      fights (e.g. after a double knockout) still finish
+    - Status effects beyond max_effects per player are dropped
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from card_library import ALL_CARDS, CARD_INDEX
+from models import STATUS_EFFECT_INDEX
+from observation import (DEFAULT_STATE_DIM, IN_FIGHT_OFFSET, PLAYER_TURN_OFFSET, PLAYER_STATS_OFFSET,
+                         OPPONENT_STATS_OFFSET, PLAYER_HAND_OFFSET, PLAYER_EFFECT_COUNT_OFFSET,
+                         PLAYER_EFFECT_MAGNITUDE_OFFSET, OPPONENT_EFFECT_COUNT_OFFSET,
+                         OPPONENT_EFFECT_MAGNITUDE_OFFSET, NUM_CARDS, NUM_STATUS_EFFECT_TYPES,
+                         OBSERVATION_SIZE)
+from simulator import STARTING_HP, STARTING_ACTION_POINTS, MAX_HAND_SIZE, CARDS_PER_TURN, DECK_SIZE
+
+END_TURN = NUM_CARDS
+NUM_ACTIONS = NUM_CARDS + 1
+
+CARD_COSTS = np.array([card.cost for card in ALL_CARDS], dtype=np.int32)
+
+DAMAGE_OVER_TIME = STATUS_EFFECT_INDEX["DamageOverTime"]
+HEAL_OVER_TIME = STATUS_EFFECT_INDEX["HealOverTime"]
+DAMAGE_REDUCTION = STATUS_EFFECT_INDEX["DamageReduction"]
+DAMAGE_BOOST = STATUS_EFFECT_INDEX["DamageBoost"]
+DODGE_CHANCE = STATUS_EFFECT_INDEX["DodgeChance"]
+DAMAGE_REFLECTION = STATUS_EFFECT_INDEX["DamageReflection"]
+CARD_LOCK = STATUS_EFFECT_INDEX["CardLock"]
+MAX_HEALTH_BOOST = STATUS_EFFECT_INDEX["MaxHealthBoost"]
+ACTION_POINT_BOOST = STATUS_EFFECT_INDEX["ActionPointBoost"]
+ENVIRONMENT_EFFECT = STATUS_EFFECT_INDEX["EnvironmentEffect"]
+
+# Handler method per (type, subtype), mirrors simulator.EFFECT_HANDLERS
+_HANDLER_NAMES: Dict[Tuple[str, str], str] = {
+    ("Attack", "DirectDamage"): "_direct_damage",
+    ("Attack", "AreaOfEffect"): "_area_of_effect",
+    ("Attack", "Piercing"): "_piercing",
+    ("Attack", "Vampiric"): "_vampiric",
+    ("Attack", "Combo"): "_direct_damage",  # Combo always activates on the server
+    ("Defense", "Shield"): "_shield",
+    ("Defense", "Redirect"): "_redirect",
+    ("Defense", "Heal"): "_enhanced_heal",
+    ("Defense", "Dodge"): "_dodge",
+    ("Defense", "Fortify"): "_fortify",
+    ("Utility", "Draw"): None,  # Notification only
+    ("Utility", "EnergyBoost"): "_energy_boost",
+    ("Utility", "Discard"): None,
+    ("Utility", "Lock"): "_lock",
+    ("Utility", "Transform"): None,
+    ("Special", "Ultimate"): "_ultimate",
+    ("Special", "Environment"): "_environment",
+    ("Special", "Summon"): "_summon",
+    ("Special", "Curse"): "_curse",
+    ("Special", "Fusion"): "_fusion",
+}
+
+_FALLBACK_HANDLER_NAMES: Dict[str, str] = {
+    "Attack": "_piercing",  # Same formula as the basic attack
+    "Defense": "_basic_defense",
+    "Utility": "_basic_utility",
+    "Special": "_basic_special",
+}
+
+
+def _handler_name(card) -> Optional[str]:
+    key = (card.type, card.subtype)
+    if key in _HANDLER_NAMES:
+        return _HANDLER_NAMES[key]
+    return _FALLBACK_HANDLER_NAMES.get(card.type)
+
+
+def action_to_message(action: int) -> Dict[str, Any]:
+    """
+    Convert an action into the client request for the live server or simulator.
+
+    Args:
+        action: Card index in ALL_CARDS order, or END_TURN
+
+    Returns:
+        The request dict to pass to GameContext.send
+    """
+    if action == END_TURN:
+        return {"MessageType": "ExtEndTurnRequest"}
+    return {"MessageType": "ExtPlayCardRequest", "CardId": ALL_CARDS[action].id}
+
+
+def context_action_mask(context: Any) -> np.ndarray:
+    """
+    Valid actions for a GameContext, in the same action space as BatchFightEnv.
+
+    Args:
+        context: The GameContext whose hand and action points are used
+
+    Returns:
+        Bool array of shape (NUM_ACTIONS,); END_TURN is always valid
+    """
+    mask = np.zeros(NUM_ACTIONS, dtype=bool)
+    mask[END_TURN] = True
+    if context.is_player_turn:
+        for card in context.cards_in_hand:
+            index = CARD_INDEX.get(card.id)
+            if index is not None and card.cost <= context.player_action_points:
+                mask[index] = True
+    return mask
+
+
+class BatchFightEnv:
+    """
+    Runs num_envs card battles between two players in NumPy arrays.
+
+    Player 0 is the challenger and takes the first turn, like player 1 on the
+    server. Each step applies one action per fight for the player whose turn
+    it is. Finished fights are reset automatically.
+    """
+
+    def __init__(self, num_envs: int, seed: Optional[int] = None, state_dim: int = DEFAULT_STATE_DIM,
+                 max_effects: int = 16, max_turns: int = 200):
+        """
+        Initialize a new instance of the BatchFightEnv class.
+
+        Args:
+            num_envs: Number of concurrent fights
+            seed: Seed for decks, draws and dodge rolls
+            state_dim: Observation length, matches model.state_dim in config.json
+            max_effects: Status effect slots per player
+            max_turns: Turns after which a fight ends as a draw
+        """
+        if state_dim < OBSERVATION_SIZE:
+            raise ValueError(f"state_dim must be at least {OBSERVATION_SIZE}, got {state_dim}")
+        self.num_envs = num_envs
+        self.state_dim = state_dim
+        self.max_effects = max_effects
+        self.max_turns = max_turns
+        self.rng = np.random.default_rng(seed)
+
+        n = num_envs
+        self.hit_points = np.zeros((n, 2), dtype=np.int32)
+        self.max_hit_points = np.zeros((n, 2), dtype=np.int32)
+        self.action_points = np.zeros((n, 2), dtype=np.int32)
+        self.hand = np.zeros((n, 2, NUM_CARDS), dtype=np.int32)
+        self.deck = np.zeros((n, 2, NUM_CARDS), dtype=np.int32)
+        self.discard = np.zeros((n, 2, NUM_CARDS), dtype=np.int32)
+
+        # Status effect slots, kept in application order; type -1 marks a free slot
+        self.effect_type = np.full((n, 2, max_effects), -1, dtype=np.int32)
+        self.effect_magnitude = np.zeros((n, 2, max_effects), dtype=np.int32)
+        self.effect_duration = np.zeros((n, 2, max_effects), dtype=np.int32)
+
+        # Environment effects are one instance shared by both players, ticked on every turn
+        self.environment_magnitude = np.zeros((n, max_effects), dtype=np.int32)
+        self.environment_duration = np.zeros((n, max_effects), dtype=np.int32)
+        self.environment_present = np.zeros((n, 2, max_effects), dtype=bool)
+
+        self.turn = np.zeros(n, dtype=np.int32)
+        self.turn_count = np.zeros(n, dtype=np.int32)
+        self.episode_steps = np.zeros(n, dtype=np.int32)
+
+        self._all = np.arange(n)
+        self._handlers = {}
+        for index, card in enumerate(ALL_CARDS):
+            name = _handler_name(card)
+            if name is not None:
+                self._handlers.setdefault(name, []).append(index)
+        self._card_handler = np.full(NUM_CARDS, -1, dtype=np.int32)
+        self._handler_methods = []
+        for handler_index, (name, cards) in enumerate(self._handlers.items()):
+            self._card_handler[cards] = handler_index
+            self._handler_methods.append(getattr(self, name))
+
+        self.reset()
+
+    #region Episode Control
+
+    def reset(self, envs: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Start new fights with fresh random decks.
+
+        Args:
+            envs: Indices of the fights to reset, all by default
+
+        Returns:
+            Observations of all fights for the player to act
+        """
+        e = self._all if envs is None else np.asarray(envs)
+        if len(e):
+            self.hit_points[e] = STARTING_HP
+            self.max_hit_points[e] = STARTING_HP
+            self.action_points[e] = 0
+            self.hand[e] = 0
+            self.discard[e] = 0
+            # Each player's deck is DECK_SIZE uniform picks from the library, like Player
+            self.deck[e] = self.rng.multinomial(DECK_SIZE, np.full(NUM_CARDS, 1.0 / NUM_CARDS), size=(len(e), 2))
+            self.effect_type[e] = -1
+            self.effect_magnitude[e] = 0
+            self.effect_duration[e] = 0
+            self.environment_present[e] = False
+            self.environment_duration[e] = 0
+            self.turn[e] = 0
+            self.turn_count[e] = 0
+            self.episode_steps[e] = 0
+            self._start_turn(e, np.zeros(len(e), dtype=np.int32))
+        return self.observations()
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Apply one action per fight for the player whose turn it is.
+
+        Invalid card plays are ignored, like the server does.
+
+        Args:
+            actions: Int array of shape (num_envs,), card index or END_TURN
+
+        Returns:
+            Tuple of (observations for the next player to act,
+            rewards for the acting player: 1 win, -1 loss, 0 otherwise,
+            done flags, info with "winner" (-1 none or draw) and "actor")
+        """
+        actions = np.asarray(actions)
+        actor = self.turn.copy()
+        self.episode_steps += 1
+        winner = np.full(self.num_envs, -1, dtype=np.int32)
+        done = np.zeros(self.num_envs, dtype=bool)
+
+        # Card plays
+        card = np.minimum(actions, NUM_CARDS - 1)
+        plays = (actions != END_TURN) & self._can_play(self._all, actor, card)
+        e = np.flatnonzero(plays)
+        if len(e):
+            p = actor[e]
+            c = card[e]
+            self.action_points[e, p] -= CARD_COSTS[c]
+            # PlayCard removes the card from the hand without discarding it
+            self.hand[e, p, c] -= 1
+            handlers = self._card_handler[c]
+            for handler_index in np.unique(handlers):
+                if handler_index < 0:
+                    continue
+                m = handlers == handler_index
+                self._handler_methods[handler_index](e[m], p[m], 1 - p[m], CARD_COSTS[c[m]])
+
+            # Game over is only checked after a card play, as on the server. With
+            # both players down there is no winner and the fight carries on.
+            hp = self.hit_points[e]
+            over = (hp <= 0).any(axis=1) & (hp > 0).any(axis=1)
+            done[e] = over
+            winner[e] = np.where(over, np.where(hp[:, 0] > 0, 0, 1), -1)
+
+        # Turn ends
+        e = np.flatnonzero(actions == END_TURN)
+        if len(e):
+            p = actor[e]
+            self.discard[e, p] += self.hand[e, p]
+            self.hand[e, p] = 0
+            self.turn_count[e] += 1
+            self._start_turn(e, 1 - p)
+            done[e] |= self.turn_count[e] >= self.max_turns
+
+        rewards = np.where(winner == actor, 1.0, np.where(winner >= 0, -1.0, 0.0)).astype(np.float32)
+        finished = np.flatnonzero(done)
+        if len(finished):
+            self.reset(finished)
+        return self.observations(), rewards, done, {"winner": winner, "actor": actor}
+
+    #endregion
+
+    #region Actions
+
+    def _can_play(self, e: np.ndarray, p: np.ndarray, card: np.ndarray) -> np.ndarray:
+        return (self.hand[e, p, card] > 0) & (self.action_points[e, p] >= CARD_COSTS[card])
+
+    def action_mask(self) -> np.ndarray:
+        """
+        Valid actions for the player to act in every fight.
+
+        Returns:
+            Bool array of shape (num_envs, NUM_ACTIONS); END_TURN is always valid
+        """
+        mask = np.ones((self.num_envs, NUM_ACTIONS), dtype=bool)
+        p = self.turn
+        mask[:, :NUM_CARDS] = ((self.hand[self._all, p] > 0)
+                               & (self.action_points[self._all, p][:, None] >= CARD_COSTS[None, :]))
+        return mask
+
+    def sample_actions(self) -> np.ndarray:
+        """Pick a random playable card per fight, or END_TURN when there is none."""
+        mask = self.action_mask()
+        scores = self.rng.random((self.num_envs, NUM_CARDS)) * mask[:, :NUM_CARDS]
+        actions = scores.argmax(axis=1)
+        return np.where(mask[:, :NUM_CARDS].any(axis=1), actions, END_TURN)
+
+    #endregion
+
+    #region Turn Flow
+
+    def _start_turn(self, e: np.ndarray, p: np.ndarray):
+        """Process status effects, grant action points and draw, mirroring FightState.StartTurn."""
+        self.turn[e] = p
+        for k in range(self.max_effects):
+            effect_type = self.effect_type[e, p, k]
+            active = effect_type >= 0
+            if not active.any():
+                continue
+            magnitude = self.effect_magnitude[e, p, k]
+
+            m = effect_type == DAMAGE_OVER_TIME
+            if m.any():
+                self._damage(e[m], p[m], magnitude[m])
+            m = effect_type == HEAL_OVER_TIME
+            if m.any():
+                self._heal(e[m], p[m], magnitude[m])
+            m = effect_type == ACTION_POINT_BOOST
+            if m.any():
+                self.action_points[e[m], p[m]] += magnitude[m]
+
+            # Expired effects are removed right away, before later effects deal damage
+            self.effect_duration[e, p, k] -= active
+            expired = active & (self.effect_duration[e, p, k] <= 0)
+            self.effect_type[e[expired], p[expired], k] = -1
+        self._compact_effects(e, p)
+
+        # The shared environment instance ticks on either player's turn
+        present = self.environment_present[e, p]
+        self.environment_duration[e] -= present
+        self.environment_present[e, p] = present & (self.environment_duration[e] > 0)
+
+        self.action_points[e, p] += STARTING_ACTION_POINTS
+        self._draw(e, p)
+
+    def _draw(self, e: np.ndarray, p: np.ndarray):
+        """Draw up to CARDS_PER_TURN cards, reshuffling the discard pile into an empty deck."""
+        remaining = np.minimum(CARDS_PER_TURN, MAX_HAND_SIZE - self.hand[e, p].sum(axis=1))
+        for _ in range(CARDS_PER_TURN):
+            m = remaining > 0
+            if not m.any():
+                break
+            e, p, remaining = e[m], p[m], remaining[m]
+
+            deck = self.deck[e, p]
+            empty = deck.sum(axis=1) == 0
+            if empty.any():
+                ee, pe = e[empty], p[empty]
+                self.deck[ee, pe] += self.discard[ee, pe]
+                self.discard[ee, pe] = 0
+                deck = self.deck[e, p]
+
+            total = deck.sum(axis=1)
+            m = total > 0
+            e, p, remaining, deck, total = e[m], p[m], remaining[m], deck[m], total[m]
+            if not len(e):
+                break
+
+            # Top card of a shuffled deck: a uniform pick among the remaining cards
+            target = (self.rng.random(len(e)) * total).astype(np.int32)
+            card = (np.cumsum(deck, axis=1) > target[:, None]).argmax(axis=1)
+            self.deck[e, p, card] -= 1
+            self.hand[e, p, card] += 1
+            remaining = remaining - 1
+
+    def _compact_effects(self, e: np.ndarray, p: np.ndarray):
+        """Move free slots to the end, keeping the application order of active effects."""
+        effect_type = self.effect_type[e, p]
+        order = np.argsort(effect_type < 0, axis=1, kind="stable")
+        self.effect_type[e, p] = np.take_along_axis(effect_type, order, axis=1)
+        self.effect_magnitude[e, p] = np.take_along_axis(self.effect_magnitude[e, p], order, axis=1)
+        self.effect_duration[e, p] = np.take_along_axis(self.effect_duration[e, p], order, axis=1)
+
+    #endregion
+
+    #region Rules
+
+    def _effect_sum(self, e: np.ndarray, p: np.ndarray, effect_type: int) -> np.ndarray:
+        return np.where(self.effect_type[e, p] == effect_type, self.effect_magnitude[e, p], 0).sum(axis=1)
+
+    def _damage(self, e: np.ndarray, target: np.ndarray, amount: np.ndarray):
+        """Mirrors FightState.ApplyDamage with the other player as the attacker."""
+        attacker = 1 - target
+        boosted = amount + amount * self._effect_sum(e, attacker, DAMAGE_BOOST) // 100
+
+        # Every dodge effect rolls independently
+        dodge = np.where(self.effect_type[e, target] == DODGE_CHANCE, self.effect_magnitude[e, target], 0)
+        hit_chance = np.prod(1.0 - dodge / 100.0, axis=1)
+        hit = self.rng.random(len(e)) < hit_chance
+
+        damage = np.maximum(0, boosted - self._effect_sum(e, target, DAMAGE_REDUCTION))
+        self.hit_points[e, target] = np.where(hit, np.maximum(0, self.hit_points[e, target] - damage),
+                                              self.hit_points[e, target])
+        reflected = self._effect_sum(e, target, DAMAGE_REFLECTION)
+        self.hit_points[e, attacker] = np.where(hit, np.maximum(0, self.hit_points[e, attacker] - reflected),
+                                                self.hit_points[e, attacker])
+
+    def _heal(self, e: np.ndarray, p: np.ndarray, amount: np.ndarray):
+        self.hit_points[e, p] = np.minimum(self.max_hit_points[e, p], self.hit_points[e, p] + amount)
+
+    def _add_effect(self, e: np.ndarray, p: np.ndarray, effect_type: int, magnitude, duration):
+        """Append a status effect in the first free slot, dropping it when all slots are used."""
+        slot = (self.effect_type[e, p] >= 0).sum(axis=1)
+        m = slot < self.max_effects
+        e, p, slot = e[m], p[m], slot[m]
+        self.effect_type[e, p, slot] = effect_type
+        self.effect_magnitude[e, p, slot] = np.broadcast_to(magnitude, m.shape)[m]
+        self.effect_duration[e, p, slot] = np.broadcast_to(duration, m.shape)[m]
+
+    #endregion
+
+    #region Card Effects
+
+    def _basic_defense(self, e, p, t, c):
+        self._heal(e, p, c * 2)
+
+    def _basic_utility(self, e, p, t, c):
+        self.action_points[e, p] += (c + 1) // 2
+
+    def _basic_special(self, e, p, t, c):
+        self._damage(e, t, c * 2)
+        self._heal(e, p, c)
+
+    def _direct_damage(self, e, p, t, c):
+        self._damage(e, t, c * 3)
+
+    def _area_of_effect(self, e, p, t, c):
+        self._damage(e, t, (c * 2 * 0.8).astype(np.int32))
+
+    def _piercing(self, e, p, t, c):
+        self._damage(e, t, c * 2)
+
+    def _vampiric(self, e, p, t, c):
+        damage = (c * 2 * 0.7).astype(np.int32)
+        self._damage(e, t, damage)
+        self._heal(e, p, damage // 2)
+
+    def _shield(self, e, p, t, c):
+        self._heal(e, p, c * 2)
+        self._add_effect(e, p, DAMAGE_REDUCTION, c, 2)
+
+    def _redirect(self, e, p, t, c):
+        self._heal(e, p, (c * 2 * 0.7).astype(np.int32))
+        self._damage(e, t, c)
+        self._add_effect(e, p, DAMAGE_REFLECTION, c, 2)
+
+    def _enhanced_heal(self, e, p, t, c):
+        self._heal(e, p, c * 3)
+
+    def _dodge(self, e, p, t, c):
+        self._heal(e, p, (c * 2 * 0.6).astype(np.int32))
+        self._add_effect(e, p, DODGE_CHANCE, 50, 2)
+
+    def _fortify(self, e, p, t, c):
+        self.max_hit_points[e, p] += c // 2
+        self._heal(e, p, c // 2)
+        self._add_effect(e, p, MAX_HEALTH_BOOST, c // 2, -1)
+
+    def _energy_boost(self, e, p, t, c):
+        self.action_points[e, p] += (c + 1) // 2 + c // 2
+        self._add_effect(e, p, ACTION_POINT_BOOST, c // 2, 3)
+
+    def _lock(self, e, p, t, c):
+        self._add_effect(e, t, CARD_LOCK, 1, c)
+
+    def _ultimate(self, e, p, t, c):
+        self._damage(e, t, c * 3)
+        self._heal(e, p, c * 3 // 2)
+        self._add_effect(e, p, DAMAGE_BOOST, 50, 3)
+        self._add_effect(e, p, ACTION_POINT_BOOST, 1, 3)
+
+    def _environment(self, e, p, t, c):
+        free = ~self.environment_present[e].any(axis=1)
+        slot = free.argmax(axis=1)
+        m = free[np.arange(len(e)), slot]
+        e, slot, c = e[m], slot[m], c[m]
+        self.environment_magnitude[e, slot] = c
+        self.environment_duration[e, slot] = c
+        self.environment_present[e, :, slot] = True
+
+    def _summon(self, e, p, t, c):
+        self._damage(e, t, c)
+        self._add_effect(e, t, DAMAGE_OVER_TIME, c, c)
+
+    def _curse(self, e, p, t, c):
+        self._damage(e, t, c)
+        self._add_effect(e, t, DAMAGE_OVER_TIME, c // 2, c)
+
+    def _fusion(self, e, p, t, c):
+        damage = c * 3 // 2
+        healing = damage // 2
+        action_points = c // 2
+        self._damage(e, t, damage)
+        self._heal(e, p, healing)
+        self.action_points[e, p] += action_points
+        self._add_effect(e, t, DAMAGE_OVER_TIME, damage // 3, 2)
+        self._add_effect(e, p, HEAL_OVER_TIME, healing // 3, 2)
+        self._add_effect(e, p, ACTION_POINT_BOOST, action_points // 2, 2)
+
+    #endregion
+
+    #region Observations
+
+    def observations(self, player: Optional[np.ndarray] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode every fight in the observation.py layout.
+
+        Args:
+            player: Side to observe per fight (0 or 1), the player to act by default
+            out: Optional preallocated float32 buffer of shape (num_envs, state_dim)
+
+        Returns:
+            The observation batch
+        """
+        n = self.num_envs
+        p = self.turn if player is None else np.broadcast_to(np.asarray(player, dtype=np.int32), (n,))
+        o = 1 - p
+        e = self._all
+        if out is None:
+            out = np.zeros((n, self.state_dim), dtype=np.float32)
+        else:
+            out[:, OBSERVATION_SIZE:] = 0.0
+
+        out[:, IN_FIGHT_OFFSET] = 1.0
+        out[:, PLAYER_TURN_OFFSET] = self.turn == p
+
+        for offset, side in ((PLAYER_STATS_OFFSET, p), (OPPONENT_STATS_OFFSET, o)):
+            out[:, offset] = self.hit_points[e, side]
+            out[:, offset + 1] = self.action_points[e, side]
+            out[:, offset + 2] = self.deck[e, side].sum(axis=1)
+            out[:, offset + 3] = self.discard[e, side].sum(axis=1)
+            out[:, offset + 4] = self.hand[e, side].sum(axis=1)
+
+        out[:, PLAYER_HAND_OFFSET:PLAYER_HAND_OFFSET + NUM_CARDS] = self.hand[e, p]
+
+        types = np.arange(NUM_STATUS_EFFECT_TYPES)
+        for count_offset, magnitude_offset, side in (
+                (PLAYER_EFFECT_COUNT_OFFSET, PLAYER_EFFECT_MAGNITUDE_OFFSET, p),
+                (OPPONENT_EFFECT_COUNT_OFFSET, OPPONENT_EFFECT_MAGNITUDE_OFFSET, o)):
+            one_hot = self.effect_type[e, side][:, :, None] == types
+            counts = one_hot.sum(axis=1)
+            magnitudes = (one_hot * self.effect_magnitude[e, side][:, :, None]).sum(axis=1)
+            environment = self.environment_present[e, side]
+            counts[:, ENVIRONMENT_EFFECT] += environment.sum(axis=1)
+            magnitudes[:, ENVIRONMENT_EFFECT] += (environment * self.environment_magnitude).sum(axis=1)
+            out[:, count_offset:count_offset + NUM_STATUS_EFFECT_TYPES] = counts
+            out[:, magnitude_offset:magnitude_offset + NUM_STATUS_EFFECT_TYPES] = magnitudes
+        return out
+
+    #endregion
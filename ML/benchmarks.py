@@ -0,0 +1,539 @@
+"""
+Micro-benchmarks for the Python game client.
+
+Run from the ML directory, e.g.:
+    python benchmarks.py on_receive --trace recorded_messages.jsonl
+    python benchmarks.py codecs
+    python benchmarks.py simulator
+    python benchmarks.py batch_env --envs 4096
+    python benchmarks.py snapshot
+    python benchmarks.py inference --agents 1024
+    python benchmarks.py subscriptions
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Iterable, Optional
+
+from GameContext import GameContext
+from batch_env import BatchFightEnv
+from codec import available_codecs, get_codec
+from inference import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT, InferenceBroker, MlpPolicy
+from messages import decode_message
+from metrics import LatencyHistogram
+from simulator import ASSETS_DIR, FightSimulator
+
+
+def load_message_stream(path: str) -> List[Dict[str, Any]]:
+    """
+    Load a recorded message stream.
+
+    Args:
+        path: File with one raw server message (JSON object) per line
+
+    Returns:
+        The messages in recorded order
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def generate_message_stream(num_fights: int = 20, map_width: int = 32, map_height: int = 32,
+                            num_players: int = 16, player_id: str = "player_0") -> List[Dict[str, Any]]:
+    """
+    Build a synthetic message stream shaped like a real session.
+
+    The stream joins a map, receives position updates from other players and
+    then plays num_fights short card battles against one of them.
+    """
+    opponent_id = "player_1"
+    svg = "<svg>" + "x" * 4000 + "</svg>"
+    cards = [{"Id": f"atk_{i:03d}", "Name": f"Card {i}", "Description": "Deal damage", "Cost": 1 + i % 4}
+             for i in range(1, 6)]
+
+    def fight_state(turn_player_id: str, hp: int) -> Dict[str, Any]:
+        def player_state(pid: str) -> Dict[str, Any]:
+            return {"PlayerId": pid, "HitPoints": hp, "ActionPoints": 3, "Hand": cards,
+                    "DeckCount": 15, "DiscardPileCount": 5,
+                    "StatusEffects": [{"Id": "shield_1", "Name": "Shield", "Description": "Reduces damage",
+                                       "Duration": 2, "Type": "DamageReduction", "Magnitude": 2}]}
+        return {"MessageType": "ExtFightStateUpdate", "CurrentTurnPlayerId": turn_player_id,
+                "PlayerState": player_state(player_id), "OpponentState": player_state(opponent_id)}
+
+    messages: List[Dict[str, Any]] = [
+        {"MessageType": "ExtPlayerIdResponse", "PlayerId": player_id},
+        {"MessageType": "ExtJoinMapInitiated", "MapId": "map1"},
+        {"MessageType": "ExtJoinMapCompleted", "MapId": "map1", "PlayerId": player_id,
+         "Position": {"X": 0, "Y": 0},
+         "TilemapData": {"Width": map_width, "Height": map_height, "TileData": [0] * (map_width * map_height)},
+         "PlayerInfo": {f"player_{i}": {"Position": {"X": i % map_width, "Y": i // map_width}, "FightId": None}
+                        for i in range(num_players)}},
+    ]
+    for step in range(num_players * 4):
+        pid = f"player_{1 + step % (num_players - 1)}"
+        messages.append({"MessageType": "ExtPlayerPositionChange", "PlayerId": pid,
+                         "Position": {"X": step % map_width, "Y": (step * 7) % map_height}})
+
+    for fight in range(num_fights):
+        fight_id = f"fight_{fight}"
+        messages.append({"MessageType": "ExtFightStarted", "FightId": fight_id,
+                         "Player1Id": player_id, "Player2Id": opponent_id})
+        for turn in range(6):
+            active = player_id if turn % 2 == 0 else opponent_id
+            messages.append({"MessageType": "ExtTurnStarted", "ActivePlayerId": active})
+            for card in cards:
+                messages.append({"MessageType": "ExtCardDrawn", "CardInfo": card, "SvgData": svg})
+            messages.append({"MessageType": "ExtCardImages", "CardSvgData": {c["Id"]: svg for c in cards}})
+            messages.append(fight_state(active, 10 - turn))
+            messages.append({"MessageType": "ExtCardPlayCompleted", "PlayerId": active, "PlayedCard": cards[0],
+                             "Effect": "Dealt 3 damage", "IsVisible": True})
+            messages.append({"MessageType": "ExtEffectApplied", "TargetPlayerId": opponent_id,
+                             "EffectType": "Damage", "Value": 3, "Source": cards[0]["Name"]})
+            messages.append({"MessageType": "ExtTurnEnded", "PlayerId": active})
+        messages.append({"MessageType": "ExtFightEnded", "FightId": fight_id, "WinnerId": player_id,
+                         "LoserId": opponent_id, "Reason": "Player defeated"})
+    return messages
+
+
+def replay_messages(context: GameContext, messages: Iterable[Any], repeat: int = 1) -> float:
+    """
+    Feed a message stream through context.on_receive.
+
+    Args:
+        context: The context that receives the messages
+        messages: Raw message dicts or already decoded messages
+        repeat: Number of times to replay the stream
+
+    Returns:
+        float: Messages processed per second
+    """
+    messages = list(messages)
+    on_receive = context.on_receive
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            on_receive(message)
+    elapsed = time.perf_counter() - start
+    return len(messages) * repeat / elapsed if elapsed > 0 else float("inf")
+
+
+def bench_on_receive(trace: Optional[str] = None, repeat: int = 20) -> Dict[str, float]:
+    """
+    Measure on_receive throughput for decode + dispatch and for dispatch alone.
+
+    Args:
+        trace: Optional recorded message stream, a synthetic stream is used otherwise
+        repeat: Number of times to replay the stream
+
+    Returns:
+        Dict of messages/sec per measurement
+    """
+    messages = load_message_stream(trace) if trace else generate_message_stream()
+    decoded = [m for m in (decode_message(m) for m in messages) if m is not None]
+
+    results = {
+        "decode_and_dispatch": replay_messages(GameContext("ws://localhost"), messages, repeat),
+        "dispatch_only": replay_messages(GameContext("ws://localhost"), decoded, repeat),
+    }
+    for name, rate in results.items():
+        print(f"{name:>24}: {rate:12,.0f} msg/s ({len(messages)} messages x {repeat})")
+    return results
+
+
+def representative_payloads() -> Dict[str, str]:
+    """
+    Build serialized frames for the largest and most frequent server messages.
+
+    Returns:
+        Dict of payload name -> JSON frame
+    """
+    card_svg_data = {}
+    for path in sorted(glob.glob(os.path.join(ASSETS_DIR, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            card_svg_data[os.path.splitext(os.path.basename(path))[0]] = f.read()
+
+    stream = generate_message_stream(num_fights=1, map_width=64, map_height=64, num_players=64)
+    first_of = {}
+    for message in stream:
+        first_of.setdefault(message["MessageType"], message)
+
+    payloads = {
+        "ExtCardImages": {"MessageType": "ExtCardImages", "CardSvgData": card_svg_data},
+        "ExtJoinMapCompleted": first_of["ExtJoinMapCompleted"],
+        "ExtFightStateUpdate": first_of["ExtFightStateUpdate"],
+        "ExtPlayerPositionChange": first_of["ExtPlayerPositionChange"],
+    }
+    return {name: json.dumps(payload) for name, payload in payloads.items()}
+
+
+def bench_codecs(min_time: float = 0.5) -> Dict[str, Dict[str, float]]:
+    """
+    Compare decode and encode rates of every installed codec.
+
+    Args:
+        min_time: Minimum seconds spent on each measurement
+
+    Returns:
+        Dict of codec name -> measurement name -> operations/sec
+    """
+    payloads = representative_payloads()
+    results: Dict[str, Dict[str, float]] = {}
+
+    def rate(fn, arg) -> float:
+        count = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            for _ in range(100):
+                fn(arg)
+            count += 100
+            elapsed = time.perf_counter() - start
+        return count / elapsed
+
+    for name in available_codecs():
+        codec = get_codec(name)
+        results[name] = {}
+        for payload_name, frame in payloads.items():
+            results[name][f"decode {payload_name}"] = rate(codec.decode, frame)
+            results[name][f"encode {payload_name}"] = rate(codec.dumps, json.loads(frame))
+
+    names = list(results)
+    print(f"{'ops/s':>32}" + "".join(f"{name:>14}" for name in names))
+    for measurement in results[names[0]]:
+        print(f"{measurement:>32}" + "".join(f"{results[name][measurement]:14,.0f}" for name in names))
+    return results
+
+
+def bench_simulator(num_fights: int = 2000, seed: int = 0) -> Dict[str, float]:
+    """
+    Measure simulator step rates with random agents.
+
+    "headless" runs the rules only; "contexts" attaches two GameContexts that
+    pick their actions from their own state through send(), as an agent would.
+
+    Args:
+        num_fights: Number of fights per measurement
+        seed: Seed for the simulator and the agents
+
+    Returns:
+        Dict of steps/sec per measurement
+    """
+    results = {}
+
+    sim = FightSimulator(seed=seed)
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(num_fights):
+        steps += sim.run_random_fight()
+    results["headless"] = steps / (time.perf_counter() - start)
+
+    sim = FightSimulator(seed=seed)
+    contexts = {}
+    for player_id in (sim.player1_id, sim.player2_id):
+        contexts[player_id] = GameContext("ws://localhost")
+        sim.attach(contexts[player_id], player_id)
+    rng = random.Random(seed)
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(num_fights):
+        sim.start_fight()
+        # Cap fights that never end after a double knockout
+        for _ in range(1000):
+            if not sim.is_active:
+                break
+            context = contexts[sim.state.current_turn_player_id]
+            playable = [c for c in context.cards_in_hand if c.cost <= context.player_action_points]
+            if playable:
+                context.send({"MessageType": "ExtPlayCardRequest", "CardId": rng.choice(playable).id})
+            else:
+                context.send({"MessageType": "ExtEndTurnRequest"})
+            steps += 1
+    results["contexts"] = steps / (time.perf_counter() - start)
+
+    for name, rate in results.items():
+        print(f"{name:>24}: {rate:12,.0f} steps/s ({num_fights} fights)")
+    return results
+
+
+# GameContext attributes a lookahead had to deepcopy before FightSnapshot
+FIGHT_ATTRIBUTES = (
+    "current_fight_id", "opponent_id", "current_turn_player_id",
+    "player_hit_points", "player_action_points", "player_deck_count", "player_discard_pile_count",
+    "cards_in_hand", "player_status_effects",
+    "opponent_hit_points", "opponent_action_points", "opponent_deck_count", "opponent_discard_pile_count",
+    "opponent_cards_in_hand", "opponent_status_effects", "last_played_card",
+)
+
+
+def bench_snapshot(num_forks: int = 100000, seed: int = 0) -> Dict[str, float]:
+    """
+    Measure how fast the card-battle state of a context can be forked and restored.
+
+    The context is taken mid-fight from the simulator, with cards in hand
+    and status effects on both players where the seed allows.
+
+    Args:
+        num_forks: Operations per measurement
+        seed: Seed for the simulator
+
+    Returns:
+        Dict of operations/sec per measurement
+    """
+    sim = FightSimulator(seed=seed, include_svg=False)
+    context = GameContext("ws://localhost")
+    opponent = GameContext("ws://localhost")
+    sim.attach(context, sim.player1_id)
+    sim.attach(opponent, sim.player2_id)
+    rng = random.Random(seed)
+    sim.start_fight()
+    # Both sides play at random until the player starts their third turn of a fight
+    player_turns = 1
+    while player_turns < 3:
+        if not sim.is_active:
+            sim.start_fight()
+            player_turns = 1
+        turn_context = context if sim.state.current_turn_player_id == sim.player1_id else opponent
+        playable = [c for c in turn_context.cards_in_hand if c.cost <= turn_context.player_action_points]
+        if playable:
+            turn_context.send({"MessageType": "ExtPlayCardRequest", "CardId": rng.choice(playable).id})
+        else:
+            turn_context.send({"MessageType": "ExtEndTurnRequest"})
+            player_turns += turn_context is opponent and sim.is_active
+
+    results = {}
+    start = time.perf_counter()
+    for _ in range(num_forks):
+        copy.deepcopy({name: getattr(context, name) for name in FIGHT_ATTRIBUTES})
+    results["deepcopy"] = num_forks / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(num_forks):
+        context.snapshot()
+    results["snapshot"] = num_forks / (time.perf_counter() - start)
+
+    snapshot = context.snapshot()
+    hand = snapshot.player_hand
+    start = time.perf_counter()
+    for _ in range(num_forks):
+        snapshot._replace(opponent_hit_points=snapshot.opponent_hit_points - 6, player_hand=hand[1:])
+    results["fork"] = num_forks / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(num_forks):
+        context.restore(snapshot)
+    results["restore"] = num_forks / (time.perf_counter() - start)
+
+    print(f"hand {len(hand)} cards, effects {len(snapshot.player_status_effects)}"
+          f"/{len(snapshot.opponent_status_effects)}")
+    for name, rate in results.items():
+        print(f"{name:>24}: {rate:12,.0f} forks/s ({num_forks} forks)")
+    return results
+
+
+def bench_batch_env(num_envs: int = 4096, num_steps: int = 200, seed: int = 0) -> float:
+    """
+    Measure BatchFightEnv throughput with random valid actions.
+
+    Args:
+        num_envs: Number of concurrent fights
+        num_steps: Number of batched steps
+        seed: Seed for the environment
+
+    Returns:
+        float: Fight steps per second, summed over all fights
+    """
+    env = BatchFightEnv(num_envs, seed=seed)
+    start = time.perf_counter()
+    for _ in range(num_steps):
+        env.step(env.sample_actions())
+    rate = num_envs * num_steps / (time.perf_counter() - start)
+    print(f"{'batch_env':>24}: {rate:12,.0f} steps/s ({num_envs} fights x {num_steps} steps)")
+    return rate
+
+
+def bench_inference(num_agents: int = 1024, num_decisions: int = 50000,
+                    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT,
+                    seed: int = 0) -> Dict[str, float]:
+    """
+    Compare decision throughput and latency of per-agent and brokered inference.
+
+    Both run the config.json-sized MlpPolicy on observations and masks taken
+    from BatchFightEnv fights. Unbatched, every decision is its own
+    batch-of-one forward pass. Brokered, num_agents agents each keep one
+    request in flight and submit the next as soon as theirs is answered.
+
+    Args:
+        num_agents: Concurrent agents for the broker
+        num_decisions: Decisions per measurement
+        max_batch_size: Broker batch size limit
+        max_wait: Broker wait limit in seconds
+        seed: Seed for the policy and the environment
+
+    Returns:
+        Dict of decisions/sec per measurement
+    """
+    policy = MlpPolicy(seed=seed)
+    env = BatchFightEnv(num_agents, seed=seed)
+    for _ in range(5):
+        env.step(env.sample_actions())
+    observations = env.observations()
+    masks = env.action_mask()
+
+    results = {}
+    latency = LatencyHistogram()
+    start = time.perf_counter()
+    for i in range(num_decisions):
+        row = i % num_agents
+        started = time.perf_counter_ns()
+        policy(observations[row:row + 1], masks[row:row + 1])
+        latency.record(time.perf_counter_ns() - started)
+    results["unbatched"] = num_decisions / (time.perf_counter() - start)
+    summary = latency.summary()
+    print(f"{'unbatched':>24}: {results['unbatched']:12,.0f} decisions/s, "
+          f"p50 {summary['p50_ms']:.3f} ms, p99 {summary['p99_ms']:.3f} ms")
+
+    broker = InferenceBroker(policy, max_batch_size, max_wait)
+    remaining = [num_decisions]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def submit(agent: int):
+        broker.submit_callback(observations[agent], masks[agent], lambda _, agent=agent: on_decision(agent))
+
+    def on_decision(agent: int):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] <= 0
+            more = remaining[0] >= num_agents
+        if finished:
+            done.set()
+        elif more:
+            submit(agent)
+
+    broker.start()
+    start = time.perf_counter()
+    for agent in range(min(num_agents, num_decisions)):
+        submit(agent)
+    done.wait()
+    results["brokered"] = num_decisions / (time.perf_counter() - start)
+    broker.close()
+    stats = broker.stats()
+    summary = stats["latency"]
+    print(f"{'brokered':>24}: {results['brokered']:12,.0f} decisions/s, "
+          f"p50 {summary['p50_ms']:.3f} ms, p99 {summary['p99_ms']:.3f} ms, "
+          f"mean batch {stats['mean_batch_size']:.1f} ({num_agents} agents)")
+    return results
+
+def bench_subscriptions(repeat: int = 5, handler_us: float = 50.0, num_filtered: int = 32) -> Dict[str, float]:
+    """
+    Measure how a slow subscriber affects the receive path, inline versus on a thread pool.
+
+    Args:
+        repeat: Number of times to replay the synthetic stream
+        handler_us: Busy time of the slow subscriber per message, in microseconds
+        num_filtered: Extra subscribers to a type the stream never carries, to show routing cost
+
+    Returns:
+        Dict of receive-path messages/sec per setup
+    """
+    messages = [m for m in (decode_message(m) for m in generate_message_stream()) if m is not None]
+    handler_ns = int(handler_us * 1000)
+
+    def slow_logger(_):
+        deadline = time.perf_counter_ns() + handler_ns
+        while time.perf_counter_ns() < deadline:
+            pass
+
+    def add_filtered(context: GameContext):
+        for _ in range(num_filtered):
+            context.subscribe("ExtMapListResponse", lambda _: None)
+
+    results = {}
+    context = GameContext("ws://localhost")
+    results["no_subscribers"] = replay_messages(context, messages, repeat)
+
+    context = GameContext("ws://localhost")
+    add_filtered(context)
+    results["filtered_out"] = replay_messages(context, messages, repeat)
+
+    context = GameContext("ws://localhost")
+    context.subscribe(None, slow_logger)
+    results["inline_subscriber"] = replay_messages(context, messages, repeat)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        context = GameContext("ws://localhost")
+        subscription = context.subscribe(None, slow_logger, executor=executor)
+        results["pooled_subscriber"] = replay_messages(context, messages, repeat)
+        drain_started = time.perf_counter()
+        while subscription.depth:
+            time.sleep(0.001)
+        drain_time = time.perf_counter() - drain_started
+
+    for name, rate in results.items():
+        print(f"{name:>24}: {rate:12,.0f} msg/s ({len(messages)} messages x {repeat})")
+    stats = subscription.stats()
+    print(f"{'pooled backlog':>24}: max depth {stats['max_depth']:,}, drained {drain_time:.2f}s after the stream, "
+          f"handler p50 {stats['handler']['p50_ms'] * 1000:.1f} us, "
+          f"queue wait p99 {stats['queue_wait']['p99_ms']:.1f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameContext micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    on_receive_parser = subparsers.add_parser("on_receive", help="Replay a message stream through on_receive")
+    on_receive_parser.add_argument("--trace", help="JSON-lines file of recorded server messages")
+    on_receive_parser.add_argument("--repeat", type=int, default=20)
+
+    codecs_parser = subparsers.add_parser("codecs", help="Compare JSON codec backends")
+    codecs_parser.add_argument("--min-time", type=float, default=0.5)
+
+    simulator_parser = subparsers.add_parser("simulator", help="Random-agent step rate of the fight simulator")
+    simulator_parser.add_argument("--fights", type=int, default=2000)
+    simulator_parser.add_argument("--seed", type=int, default=0)
+
+    batch_env_parser = subparsers.add_parser("batch_env", help="Step rate of the vectorized environment")
+    batch_env_parser.add_argument("--envs", type=int, default=4096)
+    batch_env_parser.add_argument("--steps", type=int, default=200)
+
+    snapshot_parser = subparsers.add_parser("snapshot", help="Fork and restore rate of the card-battle state")
+    snapshot_parser.add_argument("--forks", type=int, default=100000)
+    snapshot_parser.add_argument("--seed", type=int, default=0)
+
+    inference_parser = subparsers.add_parser("inference", help="Brokered versus per-agent policy inference")
+    inference_parser.add_argument("--agents", type=int, default=1024)
+    inference_parser.add_argument("--decisions", type=int, default=50000)
+    inference_parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    inference_parser.add_argument("--max-wait", type=float, default=DEFAULT_MAX_WAIT)
+
+    subscriptions_parser = subparsers.add_parser("subscriptions", help="Receive rate with a slow subscriber")
+    subscriptions_parser.add_argument("--repeat", type=int, default=5)
+    subscriptions_parser.add_argument("--handler-us", type=float, default=50.0)
+    subscriptions_parser.add_argument("--filtered", type=int, default=32)
+
+    args = parser.parse_args()
+    if args.benchmark == "on_receive":
+        bench_on_receive(args.trace, args.repeat)
+    elif args.benchmark == "codecs":
+        bench_codecs(args.min_time)
+    elif args.benchmark == "simulator":
+        bench_simulator(args.fights, args.seed)
+    elif args.benchmark == "batch_env":
+        bench_batch_env(args.envs, args.steps)
+    elif args.benchmark == "snapshot":
+        bench_snapshot(args.forks, args.seed)
+    elif args.benchmark == "inference":
+        bench_inference(args.agents, args.decisions, args.max_batch_size, args.max_wait)
+    elif args.benchmark == "subscriptions":
+        bench_subscriptions(args.repeat, args.handler_us, args.filtered)
+
+
+if __name__ == "__main__":
+    main()
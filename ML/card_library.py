@@ -0,0 +1,80 @@
+"""
+Static library of all cards available in the game.
+
+Mirrors GameServer.Application.Models.CardLibrary; keep the two in sync.
+"""
+from typing import Dict, List, Optional
+from models import CardInfo
+
+# Attack Cards (15)
+ATTACK_CARDS: List[CardInfo] = [
+    CardInfo("atk_001", "Fireball", "Attack", "DirectDamage", 2, "Deal 4 damage to target"),
+    CardInfo("atk_002", "Lightning Strike", "Attack", "DirectDamage", 3, "Deal 6 damage to target"),
+    CardInfo("atk_003", "Ice Shard", "Attack", "DirectDamage", 1, "Deal 2 damage and slow target"),
+    CardInfo("atk_004", "Earthquake", "Attack", "AreaOfEffect", 4, "Deal 3 damage to all enemies"),
+    CardInfo("atk_005", "Meteor Shower", "Attack", "AreaOfEffect", 5, "Deal 4 damage to all enemies"),
+    CardInfo("atk_006", "Chain Lightning", "Attack", "AreaOfEffect", 3, "Deal 2 damage to three random targets"),
+    CardInfo("atk_007", "Armor Pierce", "Attack", "Piercing", 2, "Deal 3 damage, ignoring shields"),
+    CardInfo("atk_008", "Shadow Strike", "Attack", "Piercing", 3, "Deal 5 damage, ignoring shields"),
+    CardInfo("atk_009", "Void Blade", "Attack", "Piercing", 4, "Deal 7 damage, ignoring shields"),
+    CardInfo("atk_010", "Life Drain", "Attack", "Vampiric", 3, "Deal 3 damage and heal for the amount"),
+    CardInfo("atk_011", "Soul Siphon", "Attack", "Vampiric", 4, "Deal 5 damage and heal for the amount"),
+    CardInfo("atk_012", "Blood Leech", "Attack", "Vampiric", 2, "Deal 2 damage and heal for double the amount"),
+    CardInfo("atk_013", "Quick Strike", "Attack", "Combo", 1, "Deal 2 damage, +2 if played after another attack"),
+    CardInfo("atk_014", "Double Slash", "Attack", "Combo", 2, "Deal 3 damage, +3 if played after another attack"),
+    CardInfo("atk_015", "Triple Thrust", "Attack", "Combo", 3, "Deal 4 damage, +4 if played after another attack"),
+]
+
+# Defense Cards (15)
+DEFENSE_CARDS: List[CardInfo] = [
+    CardInfo("def_001", "Iron Shield", "Defense", "Shield", 2, "Reduce next damage by 4"),
+    CardInfo("def_002", "Magic Barrier", "Defense", "Shield", 3, "Reduce next damage by 6"),
+    CardInfo("def_003", "Energy Shield", "Defense", "Shield", 4, "Reduce all damage by 2 for 2 turns"),
+    CardInfo("def_004", "Mirror Shield", "Defense", "Redirect", 3, "Return 50% of next damage taken"),
+    CardInfo("def_005", "Reflection Ward", "Defense", "Redirect", 4, "Return 100% of next damage taken"),
+    CardInfo("def_006", "Spell Bounce", "Defense", "Redirect", 5, "Return next spell with 50% more damage"),
+    CardInfo("def_007", "Minor Heal", "Defense", "Heal", 2, "Restore 4 health"),
+    CardInfo("def_008", "Major Heal", "Defense", "Heal", 4, "Restore 8 health"),
+    CardInfo("def_009", "Regeneration", "Defense", "Heal", 3, "Restore 2 health per turn for 3 turns"),
+    CardInfo("def_010", "Quick Step", "Defense", "Dodge", 1, "50% chance to dodge next attack"),
+    CardInfo("def_011", "Smoke Screen", "Defense", "Dodge", 3, "75% chance to dodge next 2 attacks"),
+    CardInfo("def_012", "Phase Shift", "Defense", "Dodge", 4, "100% chance to dodge next attack"),
+    CardInfo("def_013", "Steel Skin", "Defense", "Fortify", 3, "Increase defense by 2 for 3 turns"),
+    CardInfo("def_014", "Diamond Shell", "Defense", "Fortify", 4, "Increase defense by 3 for 3 turns"),
+    CardInfo("def_015", "Adamantine Aura", "Defense", "Fortify", 5, "Increase defense by 4 for 3 turns"),
+]
+
+# Utility Cards (10)
+UTILITY_CARDS: List[CardInfo] = [
+    CardInfo("utl_001", "Strategic Planning", "Utility", "Draw", 2, "Draw 2 cards"),
+    CardInfo("utl_002", "Deep Insight", "Utility", "Draw", 4, "Draw 3 cards"),
+    CardInfo("utl_003", "Energy Surge", "Utility", "EnergyBoost", 0, "Gain 2 energy this turn"),
+    CardInfo("utl_004", "Mana Crystal", "Utility", "EnergyBoost", 2, "Gain 3 energy this turn"),
+    CardInfo("utl_005", "Mind Drain", "Utility", "Discard", 3, "Opponent discards 2 random cards"),
+    CardInfo("utl_006", "Memory Wipe", "Utility", "Discard", 5, "Opponent discards 3 random cards"),
+    CardInfo("utl_007", "Seal Magic", "Utility", "Lock", 3, "Block opponent's special cards for 2 turns"),
+    CardInfo("utl_008", "Silence", "Utility", "Lock", 4, "Block opponent's utility cards for 2 turns"),
+    CardInfo("utl_009", "Transmute", "Utility", "Transform", 2, "Transform a card in hand into a random card"),
+    CardInfo("utl_010", "Polymorph", "Utility", "Transform", 4, "Transform target card into a basic attack card"),
+]
+
+# Special Cards (5)
+SPECIAL_CARDS: List[CardInfo] = [
+    CardInfo("spc_001", "Dragon's Breath", "Special", "Ultimate", 8, "Deal 12 damage to all enemies and apply burn"),
+    CardInfo("spc_002", "Storm Field", "Special", "Environment", 6, "All players take 2 damage per turn and spells cost +1"),
+    CardInfo("spc_003", "Phoenix Ally", "Special", "Summon", 7, "Summon a Phoenix that deals 3 damage per turn"),
+    CardInfo("spc_004", "Doom Mark", "Special", "Curse", 5, "Target takes 2 additional damage from all sources"),
+    CardInfo("spc_005", "Element Merge", "Special", "Fusion", 4, "Combine 2 cards in hand, adding their effects together"),
+]
+
+ALL_CARDS: List[CardInfo] = ATTACK_CARDS + DEFENSE_CARDS + UTILITY_CARDS + SPECIAL_CARDS
+
+# Card id -> position in ALL_CARDS, stable for one-hot and count encodings
+CARD_INDEX: Dict[str, int] = {card.id: index for index, card in enumerate(ALL_CARDS)}
+
+CARDS_BY_ID: Dict[str, CardInfo] = {card.id: card for card in ALL_CARDS}
+
+
+def get_card(card_id: str) -> Optional[CardInfo]:
+    """Look up a card by its id, or None if it is not in the library."""
+    return CARDS_BY_ID.get(card_id)
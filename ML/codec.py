@@ -0,0 +1,378 @@
+"""
+Pluggable JSON codecs for the game client.
+
+- json: the standard library, always available
+- orjson: faster parse/serialize, decodes into the classes in messages.py
+- msgspec: schema-driven decoding straight from the frame into Struct
+  message types, without building intermediate dicts; nested payloads are
+  still converted to the models.py classes, so it decodes at about the
+  rate of orjson
+
+get_codec falls back to the standard library when the requested backend
+is not installed.
+"""
+import json
+from typing import Dict, List, Any, Optional, ClassVar, Union
+
+from messages import ExtServerMessage, decode_message
+from models import (CardInfo, MapInfo, MapPosition, PlayerFightStateDto, PlayerMapInfo, StatusEffectInfo,
+                    TilemapData)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class JsonCodec:
+    """Codec backed by the standard library json module."""
+    name = "json"
+
+    def dumps(self, message: Any) -> str:
+        """Serialize an outgoing message."""
+        return json.dumps(message)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Parse a frame into plain Python objects."""
+        return json.loads(data)
+
+    def decode(self, data: Union[str, bytes]) -> Optional[ExtServerMessage]:
+        """Parse a frame into its typed server message, or None if the type is unknown."""
+        return decode_message(json.loads(data))
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec backed by orjson."""
+    name = "orjson"
+
+    def dumps(self, message: Any) -> str:
+        # Text frames, so hand back str rather than orjson's bytes
+        return orjson.dumps(message).decode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+    def decode(self, data: Union[str, bytes]) -> Optional[ExtServerMessage]:
+        return decode_message(orjson.loads(data))
+
+
+if msgspec is not None:
+    #region Message Schemas
+
+    # Structs use the same snake_case attribute names as messages.py, so the
+    # GameContext handlers work on either representation. rename="pascal"
+    # maps them onto the server's PascalCase JSON keys. Nested payloads end up
+    # in the context's state, so each message's __post_init__ (which msgspec
+    # runs after decoding) swaps them for the models.py classes the other
+    # codecs produce. The annotations describe the wire schema msgspec
+    # decodes; once a message is built, its nested fields hold MapPosition,
+    # CardInfo, etc. rather than the Structs named here. The conversion
+    # costs back what skipping dicts saves: `python benchmarks.py codecs`
+    # measures msgspec at about orjson's decode rate (both ~60k/s for
+    # ExtFightStateUpdate, ~0.8M/s for ExtPlayerPositionChange).
+
+    class MapPositionStruct(msgspec.Struct, rename="pascal", frozen=True):
+        x: int = 0
+        y: int = 0
+
+    class PlayerMapInfoStruct(msgspec.Struct, rename="pascal"):
+        position: Optional[MapPositionStruct] = None
+        fight_id: Optional[str] = None
+
+    class MapInfoStruct(msgspec.Struct, rename="pascal"):
+        id: Optional[str] = None
+        name: Optional[str] = None
+        width: int = 0
+        height: int = 0
+        player_count: int = 0
+
+    class TilemapDataStruct(msgspec.Struct, rename="pascal"):
+        width: int = 0
+        height: int = 0
+        tile_data: List[int] = []
+
+    class CardInfoStruct(msgspec.Struct, rename="pascal"):
+        id: Optional[str] = None
+        name: Optional[str] = None
+        description: Optional[str] = None
+        cost: int = 0
+        type: Optional[str] = None
+        subtype: Optional[str] = None
+
+    class StatusEffectInfoStruct(msgspec.Struct, rename="pascal"):
+        id: Optional[str] = None
+        name: Optional[str] = None
+        description: Optional[str] = None
+        duration: int = 0
+        type: Optional[str] = None
+        value: int = msgspec.field(default=0, name="Magnitude")
+
+    class PlayerFightStateStruct(msgspec.Struct, rename="pascal"):
+        player_id: Optional[str] = None
+        hit_points: int = 50
+        action_points: int = 0
+        hand: List[CardInfoStruct] = []
+        deck_count: int = 0
+        discard_pile_count: int = 0
+        status_effects: List[StatusEffectInfoStruct] = []
+
+    def _position(position: Optional[MapPositionStruct]) -> Optional[MapPosition]:
+        return MapPosition(position.x, position.y) if position is not None else None
+
+    def _card(card: Optional[CardInfoStruct]) -> Optional[CardInfo]:
+        if card is None:
+            return None
+        return CardInfo(card.id, card.name, card.type, card.subtype, card.cost, card.description)
+
+    def _effect(effect: StatusEffectInfoStruct) -> StatusEffectInfo:
+        return StatusEffectInfo(effect.type, effect.value, effect.duration, effect.id, effect.name, effect.description)
+
+    def _fight_state(state: PlayerFightStateStruct) -> PlayerFightStateDto:
+        return PlayerFightStateDto(state.player_id, state.hit_points, state.action_points, state.deck_count,
+                                   state.discard_pile_count, [_card(card) for card in state.hand],
+                                   [_effect(effect) for effect in state.status_effects])
+
+    class _ServerStruct(msgspec.Struct, rename="pascal", tag_field="MessageType", tag=True):
+        message_type: ClassVar[str] = ""
+
+    class ExtPlayerIdResponseStruct(_ServerStruct, tag="ExtPlayerIdResponse"):
+        message_type: ClassVar[str] = "ExtPlayerIdResponse"
+        player_id: Optional[str] = None
+
+    class ExtMapListResponseStruct(_ServerStruct, tag="ExtMapListResponse"):
+        message_type: ClassVar[str] = "ExtMapListResponse"
+        maps: List[MapInfoStruct] = []
+
+        def __post_init__(self):
+            self.maps = [MapInfo(m.id, m.name, m.width, m.height, m.player_count) for m in self.maps]
+
+    class ExtJoinMapInitiatedStruct(_ServerStruct, tag="ExtJoinMapInitiated"):
+        message_type: ClassVar[str] = "ExtJoinMapInitiated"
+        map_id: Optional[str] = None
+
+    class ExtJoinMapCompletedStruct(_ServerStruct, tag="ExtJoinMapCompleted"):
+        message_type: ClassVar[str] = "ExtJoinMapCompleted"
+        map_id: Optional[str] = None
+        player_id: Optional[str] = None
+        position: Optional[MapPositionStruct] = None
+        tilemap_data: Optional[TilemapDataStruct] = None
+        player_info: Dict[str, PlayerMapInfoStruct] = {}
+
+        def __post_init__(self):
+            self.position = _position(self.position)
+            tilemap_data = self.tilemap_data
+            if tilemap_data is not None:
+                self.tilemap_data = TilemapData(tilemap_data.width, tilemap_data.height, tilemap_data.tile_data)
+            self.player_info = {player_id: PlayerMapInfo(_position(info.position), info.fight_id)
+                                for player_id, info in self.player_info.items()}
+
+    class ExtJoinMapFailedStruct(_ServerStruct, tag="ExtJoinMapFailed"):
+        message_type: ClassVar[str] = "ExtJoinMapFailed"
+        map_id: Optional[str] = None
+        error_message: Optional[str] = None
+
+    class ExtLeaveMapInitiatedStruct(_ServerStruct, tag="ExtLeaveMapInitiated"):
+        message_type: ClassVar[str] = "ExtLeaveMapInitiated"
+        map_id: Optional[str] = None
+
+    class ExtLeaveMapCompletedStruct(_ServerStruct, tag="ExtLeaveMapCompleted"):
+        message_type: ClassVar[str] = "ExtLeaveMapCompleted"
+        map_id: Optional[str] = None
+
+    class ExtLeaveMapFailedStruct(_ServerStruct, tag="ExtLeaveMapFailed"):
+        message_type: ClassVar[str] = "ExtLeaveMapFailed"
+        map_id: Optional[str] = None
+        error_message: Optional[str] = None
+
+    class ExtPlayerJoinedMapStruct(_ServerStruct, tag="ExtPlayerJoinedMap"):
+        message_type: ClassVar[str] = "ExtPlayerJoinedMap"
+        player_id: Optional[str] = None
+        position: Optional[MapPositionStruct] = None
+
+        def __post_init__(self):
+            self.position = _position(self.position)
+
+    class ExtPlayerLeftMapStruct(_ServerStruct, tag="ExtPlayerLeftMap"):
+        message_type: ClassVar[str] = "ExtPlayerLeftMap"
+        player_id: Optional[str] = None
+
+    class ExtMoveInitiatedStruct(_ServerStruct, tag="ExtMoveInitiated"):
+        message_type: ClassVar[str] = "ExtMoveInitiated"
+        new_position: Optional[MapPositionStruct] = None
+
+        def __post_init__(self):
+            self.new_position = _position(self.new_position)
+
+    class ExtMoveCompletedStruct(_ServerStruct, tag="ExtMoveCompleted"):
+        message_type: ClassVar[str] = "ExtMoveCompleted"
+        new_position: Optional[MapPositionStruct] = None
+
+        def __post_init__(self):
+            self.new_position = _position(self.new_position)
+
+    class ExtMoveFailedStruct(_ServerStruct, tag="ExtMoveFailed"):
+        message_type: ClassVar[str] = "ExtMoveFailed"
+        attempted_position: Optional[MapPositionStruct] = None
+        error_message: Optional[str] = None
+
+        def __post_init__(self):
+            self.attempted_position = _position(self.attempted_position)
+
+    class ExtPlayerPositionChangeStruct(_ServerStruct, tag="ExtPlayerPositionChange"):
+        message_type: ClassVar[str] = "ExtPlayerPositionChange"
+        player_id: Optional[str] = None
+        position: Optional[MapPositionStruct] = None
+
+        def __post_init__(self):
+            self.position = _position(self.position)
+
+    class ExtFightStartedStruct(_ServerStruct, tag="ExtFightStarted"):
+        message_type: ClassVar[str] = "ExtFightStarted"
+        fight_id: Optional[str] = None
+        player1_id: Optional[str] = msgspec.field(default=None, name="Player1Id")
+        player2_id: Optional[str] = msgspec.field(default=None, name="Player2Id")
+
+    class ExtFightEndedStruct(_ServerStruct, tag="ExtFightEnded"):
+        message_type: ClassVar[str] = "ExtFightEnded"
+        fight_id: Optional[str] = None
+        winner_id: Optional[str] = None
+        loser_id: Optional[str] = None
+        reason: Optional[str] = None
+
+    class ExtCardImagesStruct(_ServerStruct, tag="ExtCardImages"):
+        message_type: ClassVar[str] = "ExtCardImages"
+        card_svg_data: Dict[str, str] = {}
+
+    class ExtCardDrawnStruct(_ServerStruct, tag="ExtCardDrawn"):
+        message_type: ClassVar[str] = "ExtCardDrawn"
+        card_info: Optional[CardInfoStruct] = None
+        svg_data: Optional[str] = None
+
+        def __post_init__(self):
+            self.card_info = _card(self.card_info)
+
+    class ExtFightStateUpdateStruct(_ServerStruct, tag="ExtFightStateUpdate"):
+        message_type: ClassVar[str] = "ExtFightStateUpdate"
+        current_turn_player_id: Optional[str] = None
+        player_state: PlayerFightStateStruct = msgspec.field(default_factory=PlayerFightStateStruct)
+        opponent_state: PlayerFightStateStruct = msgspec.field(default_factory=PlayerFightStateStruct)
+
+        def __post_init__(self):
+            self.player_state = _fight_state(self.player_state)
+            self.opponent_state = _fight_state(self.opponent_state)
+
+    class ExtTurnStartedStruct(_ServerStruct, tag="ExtTurnStarted"):
+        message_type: ClassVar[str] = "ExtTurnStarted"
+        active_player_id: Optional[str] = None
+
+    class ExtTurnEndedStruct(_ServerStruct, tag="ExtTurnEnded"):
+        message_type: ClassVar[str] = "ExtTurnEnded"
+        player_id: Optional[str] = None
+
+    class ExtCardPlayInitiatedStruct(_ServerStruct, tag="ExtCardPlayInitiated"):
+        message_type: ClassVar[str] = "ExtCardPlayInitiated"
+        card_id: Optional[str] = None
+
+    class ExtCardPlayCompletedStruct(_ServerStruct, tag="ExtCardPlayCompleted"):
+        message_type: ClassVar[str] = "ExtCardPlayCompleted"
+        player_id: Optional[str] = None
+        played_card: Optional[CardInfoStruct] = None
+        effect: Optional[str] = None
+        is_visible: bool = True
+
+        def __post_init__(self):
+            self.played_card = _card(self.played_card)
+
+    class ExtCardPlayFailedStruct(_ServerStruct, tag="ExtCardPlayFailed"):
+        message_type: ClassVar[str] = "ExtCardPlayFailed"
+        card_id: Optional[str] = None
+        error_message: Optional[str] = None
+
+    class ExtEffectAppliedStruct(_ServerStruct, tag="ExtEffectApplied"):
+        message_type: ClassVar[str] = "ExtEffectApplied"
+        target_player_id: Optional[str] = None
+        effect_type: Optional[str] = None
+        value: int = 0
+        source: Optional[str] = None
+
+    SERVER_MESSAGE_STRUCTS = (
+        ExtPlayerIdResponseStruct,
+        ExtMapListResponseStruct, ExtJoinMapInitiatedStruct, ExtJoinMapCompletedStruct, ExtJoinMapFailedStruct,
+        ExtLeaveMapInitiatedStruct, ExtLeaveMapCompletedStruct, ExtLeaveMapFailedStruct,
+        ExtPlayerJoinedMapStruct, ExtPlayerLeftMapStruct, ExtPlayerPositionChangeStruct,
+        ExtMoveInitiatedStruct, ExtMoveCompletedStruct, ExtMoveFailedStruct,
+        ExtFightStartedStruct, ExtFightEndedStruct,
+        ExtCardImagesStruct, ExtCardDrawnStruct, ExtFightStateUpdateStruct, ExtTurnStartedStruct,
+        ExtTurnEndedStruct, ExtCardPlayInitiatedStruct, ExtCardPlayCompletedStruct, ExtCardPlayFailedStruct,
+        ExtEffectAppliedStruct,
+    )
+
+    #endregion
+
+
+class MsgspecCodec(JsonCodec):
+    """
+    Codec that decodes frames directly into msgspec Structs.
+
+    The tagged union on MessageType lets msgspec pick the schema from the
+    frame itself, so no intermediate dict is built for known messages.
+    Frames that do not match a schema (legacy "Type" key, unknown types)
+    go through the generic dict decoder instead.
+    """
+    name = "msgspec"
+
+    def __init__(self):
+        self._decoder = msgspec.json.Decoder(Union[SERVER_MESSAGE_STRUCTS])
+        self._encoder = msgspec.json.Encoder()
+
+    def dumps(self, message: Any) -> str:
+        return self._encoder.encode(message).decode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return msgspec.json.decode(data)
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        try:
+            return self._decoder.decode(data)
+        except msgspec.ValidationError:
+            return decode_message(msgspec.json.decode(data))
+
+
+CODECS = {
+    JsonCodec.name: (JsonCodec, lambda: True),
+    OrjsonCodec.name: (OrjsonCodec, lambda: orjson is not None),
+    MsgspecCodec.name: (MsgspecCodec, lambda: msgspec is not None),
+}
+
+
+def available_codecs() -> List[str]:
+    """Names of the codecs whose backend is installed."""
+    return [name for name, (_, is_available) in CODECS.items() if is_available()]
+
+
+def get_codec(name: Optional[str] = "auto") -> JsonCodec:
+    """
+    Create a codec by name.
+
+    Args:
+        name: "json", "orjson", "msgspec" or "auto" (orjson if installed, else json)
+
+    Returns:
+        The requested codec, or the stdlib codec if its backend is not installed
+    """
+    if name is None or name == "auto":
+        name = OrjsonCodec.name if orjson is not None else JsonCodec.name
+
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec: {name}")
+
+    codec_class, is_available = CODECS[name]
+    if not is_available():
+        print(f"Codec {name} is not installed, falling back to json")
+        return JsonCodec()
+    return codec_class()
@@ -0,0 +1,177 @@
+"""
+Bounded queue of decoded server messages between the websocket thread and the handlers.
+
+When the consumer lags (e.g. policy inference running in a callback), the
+queue absorbs bursts instead of stalling the socket, and superseded
+ExtPlayerPositionChange messages are coalesced: only the newest position of
+each player stays queued. Every other message keeps its arrival order, so
+fight and card-battle messages are applied exactly as the server sent them.
+
+A coalesced position is removed from its old slot and queued at the arrival
+point of the newer one, so it is never applied ahead of a message (such as
+ExtPlayerLeftMap) that came before it.
+
+Once capacity messages are queued, a coalescible message without an older
+entry to replace evicts the oldest queued coalescible message (counted as
+dropped), or is itself dropped if there is none, and any other message blocks
+the producer until the consumer catches up, which pushes back on the server
+through TCP.
+"""
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+DEFAULT_CAPACITY = 1024
+
+# Message type -> attribute identifying what a newer message of that type supersedes
+COALESCED_MESSAGES: Dict[str, str] = {
+    "ExtPlayerPositionChange": "player_id",
+}
+
+
+class CoalescingQueue:
+    """Thread-safe bounded FIFO that keeps only the newest coalescible message per key."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, coalesced_messages: Optional[Dict[str, str]] = None):
+        """
+        Initialize a new instance of the CoalescingQueue class.
+
+        Args:
+            capacity: Messages held before dropping or blocking
+            coalesced_messages: Message type -> key attribute, COALESCED_MESSAGES by default
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.coalesced_messages = COALESCED_MESSAGES if coalesced_messages is None else coalesced_messages
+
+        # Entries are [message, payload] lists; a coalesced entry is blanked in place and skipped by get()
+        self._entries: Deque[List[Any]] = deque()
+        self._latest: Dict[Any, List[Any]] = {}
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        # Counters
+        self.enqueued = 0
+        self.dispatched = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.max_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def closed(self) -> bool:
+        """Check if close() has been called."""
+        return self._closed
+
+    def put(self, message: Any, payload: Any = None) -> bool:
+        """
+        Queue a message, blocking while the queue is full unless it can be coalesced or dropped.
+
+        Args:
+            message: The decoded server message, used for coalescing
+            payload: What get() returns for it, the message itself by default
+
+        Returns:
+            bool: False if the message was dropped or the queue is closed
+        """
+        entry = [message, message if payload is None else payload]
+        key_attribute = self.coalesced_messages.get(message.message_type)
+        with self._lock:
+            if self._closed:
+                return False
+            if key_attribute is not None:
+                key = (message.message_type, getattr(message, key_attribute))
+                previous = self._latest.get(key)
+                if previous is not None:
+                    self._blank(key, previous)
+                    self.coalesced += 1
+                elif self._size >= self.capacity:
+                    self.dropped += 1
+                    if not self._latest:
+                        return False
+                    # Evict the oldest queued coalescible message; _latest is kept in queue order
+                    oldest = next(iter(self._latest))
+                    self._blank(oldest, self._latest[oldest])
+                self._latest[key] = entry
+            elif self._size >= self.capacity:
+                self.blocked += 1
+                while self._size >= self.capacity and not self._closed:
+                    self._not_full.wait()
+                if self._closed:
+                    return False
+
+            self._entries.append(entry)
+            self._size += 1
+            self.enqueued += 1
+            if self._size > self.max_size:
+                self.max_size = self._size
+            # Blanked entries pile up while the consumer is stalled; compact once they outnumber live ones
+            if len(self._entries) > 2 * self._size + 64:
+                self._entries = deque(e for e in self._entries if e[0] is not None)
+            self._not_empty.notify()
+        return True
+
+    def _blank(self, key: Any, entry: List[Any]):
+        """Remove a queued coalescible entry; get() skips its blanked slot."""
+        del self._latest[key]
+        entry[0] = None
+        entry[1] = None
+        self._size -= 1
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Wait for the oldest live message.
+
+        Args:
+            timeout: Seconds to wait, None to wait until a message arrives or the queue closes
+
+        Returns:
+            The payload of the message, or None on timeout or once closed and drained
+        """
+        with self._lock:
+            while self._size == 0:
+                if self._closed or not self._not_empty.wait(timeout):
+                    return None
+            entries = self._entries
+            while True:
+                entry = entries.popleft()
+                message = entry[0]
+                if message is not None:
+                    break
+            key_attribute = self.coalesced_messages.get(message.message_type)
+            if key_attribute is not None:
+                key = (message.message_type, getattr(message, key_attribute))
+                if self._latest.get(key) is entry:
+                    del self._latest[key]
+            self._size -= 1
+            self.dispatched += 1
+            self._not_full.notify()
+            return entry[1]
+
+    def close(self):
+        """Stop accepting messages and wake every waiting thread; queued messages can still be drained."""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        """Current size and lifetime counters, for tuning capacity under load."""
+        with self._lock:
+            return {
+                "size": self._size,
+                "capacity": self.capacity,
+                "max_size": self.max_size,
+                "enqueued": self.enqueued,
+                "dispatched": self.dispatched,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "blocked": self.blocked,
+            }
@@ -0,0 +1,346 @@
+"""
+Dynamic-batching policy inference for many GameContext agents.
+
+Agents submit decision requests (an observation and its action mask) to an
+InferenceBroker instead of running the model themselves. A worker thread
+collects pending requests until max_batch_size are waiting or the oldest has
+waited max_wait seconds, runs the policy once on the whole batch and answers
+every request through its future, or through a plain callback on the
+cheaper submit_callback path. Batching trades a bounded wait for far fewer, larger
+forward passes, which is what a CPU model needs under thousands of agents.
+
+Policies have the AgentPool signature, (observations, masks) -> actions, so
+the same function can run in a pool worker or behind a broker. MlpPolicy is
+a NumPy stand-in for the model in config.json (state_dim -> num_layers x
+hidden_dim -> NUM_ACTIONS) for when no trained model is loaded.
+
+Decision latency, from submit to result, is recorded into a metrics
+LatencyHistogram; stats() reports its p50 and p99 with batch sizes and
+throughput. Compare with unbatched inference with:
+    python benchmarks.py inference
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from batch_env import NUM_ACTIONS, action_to_message, context_action_mask
+from metrics import LatencyHistogram
+from observation import DEFAULT_STATE_DIM
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT = 0.002  # Seconds the oldest request may wait for the batch to fill
+DEFAULT_HIDDEN_DIM = 256  # model.hidden_dim in config.json
+DEFAULT_NUM_LAYERS = 2  # model.num_layers in config.json
+
+
+class MlpPolicy:
+    """
+    Greedy masked policy over a ReLU MLP with NumPy float32 weights.
+
+    Picklable, so it can also be passed to AgentPool as its policy.
+    """
+
+    def __init__(self, state_dim: int = DEFAULT_STATE_DIM, hidden_dim: int = DEFAULT_HIDDEN_DIM,
+                 num_layers: int = DEFAULT_NUM_LAYERS, num_actions: int = NUM_ACTIONS, seed: Optional[int] = None):
+        """
+        Initialize a new instance of the MlpPolicy class with random weights.
+
+        Args:
+            state_dim: Length of each observation vector
+            hidden_dim: Width of the hidden layers
+            num_layers: Number of hidden layers
+            num_actions: Number of action logits
+            seed: Random seed for the weights
+        """
+        rng = np.random.default_rng(seed)
+        sizes = [state_dim] + [hidden_dim] * num_layers + [num_actions]
+        self.weights: List[np.ndarray] = []
+        self.biases: List[np.ndarray] = []
+        for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+            self.weights.append((rng.standard_normal((fan_in, fan_out)) * np.sqrt(2.0 / fan_in)).astype(np.float32))
+            self.biases.append(np.zeros(fan_out, dtype=np.float32))
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], seed: Optional[int] = None) -> "MlpPolicy":
+        """Create a policy shaped by the model section of config.json."""
+        model = config.get("model", {})
+        return cls(model.get("state_dim", DEFAULT_STATE_DIM), model.get("hidden_dim", DEFAULT_HIDDEN_DIM),
+                   model.get("num_layers", DEFAULT_NUM_LAYERS), seed=seed)
+
+    def logits(self, observations: np.ndarray) -> np.ndarray:
+        """Forward pass on a batch of shape (N, state_dim)."""
+        x = observations
+        last = len(self.weights) - 1
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            x = x @ weight
+            x += bias
+            if i < last:
+                np.maximum(x, 0.0, out=x)
+        return x
+
+    def __call__(self, observations: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        logits = self.logits(observations)
+        logits[~masks] = -np.inf
+        return logits.argmax(axis=1)
+
+
+class _Request:
+    __slots__ = ("observation", "mask", "future", "callback", "submitted_ns")
+
+    def __init__(self, observation: np.ndarray, mask: np.ndarray, future: Optional[Future],
+                 callback: Optional[Callable[[Optional[int]], None]], submitted_ns: int):
+        self.observation = observation
+        self.mask = mask
+        self.future = future
+        self.callback = callback
+        self.submitted_ns = submitted_ns
+
+    def resolve(self, action: Optional[int], error: Optional[BaseException] = None):
+        if self.future is None:
+            self.callback(action)
+        elif error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(action)
+
+
+class InferenceBroker:
+    """Batches decision requests from many agents into single policy calls on a worker thread."""
+
+    def __init__(self, policy: Callable[[np.ndarray, np.ndarray], np.ndarray],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT,
+                 state_dim: int = DEFAULT_STATE_DIM):
+        """
+        Initialize a new instance of the InferenceBroker class.
+
+        Args:
+            policy: Function mapping (observations, action masks) to actions, as for AgentPool
+            max_batch_size: Requests per policy call at most
+            max_wait: Seconds the oldest pending request waits for more to arrive
+            state_dim: Length of each observation vector
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+        self.policy = policy
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._pending: List[_Request] = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._observations = np.zeros((max_batch_size, state_dim), dtype=np.float32)
+        self._masks = np.zeros((max_batch_size, NUM_ACTIONS), dtype=bool)
+
+        # Stats, written by the worker thread only
+        self.latency = LatencyHistogram()
+        self.decisions = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.errors = 0
+        self._started_at = time.perf_counter()
+
+    def start(self):
+        """Start the worker thread."""
+        if self._thread is None:
+            self._closed = False
+            self._started_at = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, name="inference-broker")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def close(self, timeout: float = 1.0):
+        """Stop the worker after the pending requests; later submits fail."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def __enter__(self) -> "InferenceBroker":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, observation: np.ndarray, mask: np.ndarray) -> Future:
+        """
+        Queue a decision request.
+
+        Args:
+            observation: Observation vector of shape (state_dim,); copied, so the caller may reuse it
+            mask: Bool action mask of shape (NUM_ACTIONS,)
+
+        Returns:
+            Future resolving to the chosen action
+        """
+        future: Future = Future()
+        self._enqueue(_Request(np.array(observation, dtype=np.float32), mask, future, None, time.perf_counter_ns()))
+        return future
+
+    def submit_callback(self, observation: np.ndarray, mask: np.ndarray,
+                        callback: Callable[[Optional[int]], None]):
+        """
+        Queue a decision request answered by a plain callback, which skips the cost of a Future.
+
+        Args:
+            observation: Observation vector of shape (state_dim,); copied, so the caller may reuse it
+            mask: Bool action mask of shape (NUM_ACTIONS,)
+            callback: Called on the broker thread with the action, or None if the policy failed or the broker is closed
+        """
+        self._enqueue(_Request(np.array(observation, dtype=np.float32), mask, None, callback, time.perf_counter_ns()))
+
+    def _enqueue(self, request: _Request):
+        with self._condition:
+            if not self._closed:
+                self._pending.append(request)
+                # Wake the worker for the first request and for a full batch; it times out on its own otherwise
+                if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                    self._condition.notify()
+                return
+        request.resolve(None, RuntimeError("InferenceBroker is closed"))
+
+    def submit_context(self, context: Any) -> Future:
+        """Queue a decision for the current state of a GameContext."""
+        return self.submit(context.get_observation(), context_action_mask(context))
+
+    def decide(self, observation: np.ndarray, mask: np.ndarray, timeout: Optional[float] = None) -> int:
+        """Submit a request and wait for its action."""
+        return int(self.submit(observation, mask).result(timeout))
+
+    async def decide_async(self, observation: np.ndarray, mask: np.ndarray) -> int:
+        """Submit a request and await its action on the running event loop."""
+        return int(await asyncio.wrap_future(self.submit(observation, mask)))
+
+    def _run(self):
+        condition = self._condition
+        while True:
+            with condition:
+                while not self._pending and not self._closed:
+                    condition.wait()
+                if not self._pending:
+                    return
+                # Hold the batch open until it fills or the oldest request has waited max_wait
+                deadline = self._pending[0].submitted_ns + int(self.max_wait * 1e9)
+                while len(self._pending) < self.max_batch_size and not self._closed:
+                    remaining = (deadline - time.perf_counter_ns()) / 1e9
+                    if remaining <= 0 or not condition.wait(remaining):
+                        break
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+            self._infer(batch)
+
+    def _infer(self, batch: List[_Request]):
+        count = len(batch)
+        observations = self._observations[:count]
+        masks = self._masks[:count]
+        for row, request in enumerate(batch):
+            observations[row] = request.observation
+            masks[row] = request.mask
+        try:
+            actions = self.policy(observations, masks).tolist()
+        except Exception as e:
+            self.errors += 1
+            for request in batch:
+                request.resolve(None, e)
+            return
+
+        self.batches += 1
+        self.decisions += count
+        if count == self.max_batch_size:
+            self.full_batches += 1
+        now = time.perf_counter_ns()
+        self.latency.record_many(now - np.fromiter((r.submitted_ns for r in batch), dtype=np.int64, count=count))
+        for request, action in zip(batch, actions):
+            request.resolve(action)
+
+    def stats(self) -> Dict[str, Any]:
+        """Decisions, batch sizes, throughput and decision latency (see LatencyHistogram.summary)."""
+        elapsed = max(time.perf_counter() - self._started_at, 1e-9)
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "decisions": self.decisions,
+            "batches": self.batches,
+            "mean_batch_size": self.decisions / self.batches if self.batches else 0.0,
+            "full_batches": self.full_batches,
+            "pending": pending,
+            "errors": self.errors,
+            "decisions_per_sec": self.decisions / elapsed,
+            "latency": self.latency.summary(),
+        }
+
+
+class BrokerAgent:
+    """
+    Plays a GameContext's turns with decisions from an InferenceBroker.
+
+    Attached as a server message callback, every ExtFightStateUpdate that
+    makes it this player's turn submits a request, and the action is sent
+    when the broker resolves it. A decision whose state changed while it was
+    pending is dropped and requested again, and no new request is made until
+    the state has changed since the last action sent.
+
+    Decisions are handed back through GameContext.call_soon, so the agent's
+    state and the context are only touched on the thread that handles the
+    context's messages, never on the broker thread.
+    """
+
+    def __init__(self, context: Any, broker: InferenceBroker, attach: bool = True):
+        """
+        Initialize a new instance of the BrokerAgent class.
+
+        Args:
+            context: The GameContext to play for
+            broker: The broker to request decisions from
+            attach: Register as a server message callback on the context
+        """
+        self.context = context
+        self.broker = broker
+        self._pending_version: Optional[int] = None
+        self._sent_version: Optional[int] = None
+        if attach:
+            context.add_server_message_callback(self._on_server_message)
+
+    def _on_server_message(self, msg: Any):
+        if msg.message_type in ("ExtFightStateUpdate", "ExtTurnEnded", "ExtFightEnded"):
+            self.step()
+
+    def step(self) -> bool:
+        """
+        Request a decision if it is this player's turn and none is pending.
+
+        Returns:
+            bool: True if a request was submitted
+        """
+        context = self.context
+        if self._pending_version is not None or not (context.is_in_fight and context.is_player_turn):
+            return False
+        if context.observation_version == self._sent_version:
+            # Still waiting for the server to answer the last action
+            return False
+        self._pending_version = context.observation_version
+        self.broker.submit_callback(context.get_observation(), context_action_mask(context), self._on_decision)
+        return True
+
+    def _on_decision(self, action: Optional[int]):
+        """Runs on the broker thread."""
+        self.context.call_soon(self._apply_decision, action)
+
+    def _apply_decision(self, action: Optional[int]):
+        version = self._pending_version
+        self._pending_version = None
+        if action is None:
+            return
+        context = self.context
+        if context.observation_version != version or not context.is_player_turn:
+            self.step()
+            return
+        self._sent_version = version
+        context.send(action_to_message(action))
@@ -0,0 +1,460 @@
+"""
+Synthetic load generator: thousands of scripted GameContext clients against a live server.
+
+Every client is an asyncio-mode GameContext (one socket, no thread) running
+one of three scripts, mixed by weight:
+
+    - walker: random walk on the map, one adjacent step at a time
+    - churner: joins the map, walks for a while, leaves and joins again
+    - fighter: challenges the nearest available opponent, then plays cards
+
+Any client can be pulled into a fight since the server auto-accepts
+challenges, so every script plays its turns while in a fight.
+
+Concurrency ramps through a schedule of stages, e.g. "100:30,500:60,1000:60"
+for 100 clients for 30 seconds, then 500, then 1000. Clients are spread over
+worker processes, each with its own event loop, and stages are aligned on
+wall-clock deadlines so all processes ramp together. After every stage each
+process sends its clients' merged Metrics to the parent, which reports:
+
+    - messages received per request sent, and position updates received per
+      completed move; both are counted on the clients, so they show what
+      reached the harness rather than server-side fan-out (broadcasts to
+      players outside the harness, or lost on the way, are not seen)
+    - client-observed round-trip percentiles per request type
+    - error rates: failure responses, timeouts, refused and dropped connections
+
+To run against a server on the same Linux box, raise the open file limit
+first (ulimit -n 65536); every client holds one socket on each side. The
+default map (32x32) has room for about a thousand players.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import queue
+import random
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from GameContext import GameContext
+from metrics import Metrics
+from models import MapPosition
+
+SCRIPTS = ("walker", "churner", "fighter")
+
+DEFAULT_SCHEDULE = "50:20,200:30,500:30"
+DEFAULT_MIX = "walker=0.5,churner=0.2,fighter=0.3"
+
+# Responses that mean the server rejected a request
+ERROR_MESSAGES = ("ExtJoinMapFailed", "ExtLeaveMapFailed", "ExtMoveFailed", "ExtCardPlayFailed")
+
+# Seconds a client waits for a response before counting a timeout
+RESPONSE_TIMEOUT = 5.0
+
+# Seconds a fighter waits for an unanswered challenge; busy targets never reply
+CHALLENGE_TIMEOUT = 2.0
+
+# Seconds a churner stays on the map between joins
+CHURN_DWELL = (2.0, 10.0)
+
+STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+class Stage(NamedTuple):
+    """One step of the ramp: hold this many clients for this long."""
+    clients: int
+    seconds: float
+
+
+def parse_schedule(text: str) -> List[Stage]:
+    """Parse "clients:seconds,clients:seconds,..." into stages."""
+    stages = []
+    for part in text.split(","):
+        clients, _, seconds = part.strip().partition(":")
+        stages.append(Stage(int(clients), float(seconds)))
+    return stages
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse "script=weight,..." into script weights."""
+    mix = {}
+    for part in text.split(","):
+        script, _, weight = part.strip().partition("=")
+        if script not in SCRIPTS:
+            raise ValueError(f"Unknown script {script!r}, expected one of {', '.join(SCRIPTS)}")
+        mix[script] = float(weight) if weight else 1.0
+    return mix
+
+
+def share(total: int, index: int, parts: int) -> int:
+    """Clients run by process index when total is split over parts processes."""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+class ScriptedClient:
+    """One connection driven by a script until stopped."""
+
+    def __init__(self, script: str, server_url: str, map_id: str, think_time: float,
+                 counters: Counter, rng: random.Random):
+        """
+        Initialize a new instance of the ScriptedClient class.
+
+        Args:
+            script: One of SCRIPTS
+            server_url: WebSocket URL of the game server
+            map_id: Map to join
+            think_time: Mean pause between actions in seconds
+            counters: Harness counters shared by the clients of a process
+            rng: Random source for this client
+        """
+        self.script = script
+        self.map_id = map_id
+        self.think_time = think_time
+        self.counters = counters
+        self.rng = rng
+        self.stopping = False
+        # recv() is not used, so skip the inbound queue entirely
+        self.context = GameContext(server_url, use_asyncio=True, max_queue=0)
+        self.context.enable_metrics()
+        self._leave_at = 0.0
+
+    @property
+    def connected(self) -> bool:
+        """Check if the client is connected to the server."""
+        return self.context.transport is not None and self.context.transport.connected
+
+    def take_metrics(self) -> Metrics:
+        """Hand over what was recorded so far and start a fresh Metrics."""
+        metrics = self.context.metrics
+        self.context.disable_metrics()
+        self.context.enable_metrics()
+        return metrics
+
+    async def _timed(self, label: str, operation: Awaitable[Any], count_timeout: bool = True) -> Optional[Any]:
+        """Await a GameContext request, returning None and counting a timeout if it is not answered."""
+        try:
+            return await operation
+        except asyncio.TimeoutError:
+            if count_timeout:
+                self.counters[f"timeout:{label}"] += 1
+            return None
+        except ConnectionError:
+            # The loop notices the closed transport and counts the disconnect
+            return None
+
+    #region Script
+
+    async def run(self):
+        """Connect, then act until stopped or disconnected."""
+        try:
+            await self.context.connect()
+        except Exception as e:
+            self.counters["connect_failures"] += 1
+            print(f"Error connecting: {e}")
+            return
+        self.counters["connects"] += 1
+        context = self.context
+        try:
+            if await self._timed("player_id", context.request_player_id(RESPONSE_TIMEOUT)) is None:
+                return
+            while not self.stopping:
+                if not self.connected:
+                    self.counters["disconnects"] += 1
+                    return
+                if context.is_in_fight:
+                    await self._fight_step()
+                    continue
+                if context.current_tilemap_data is None:
+                    await self._join()
+                elif self.script == "churner" and time.monotonic() >= self._leave_at:
+                    await self._timed("leave_map", context.leave_map(RESPONSE_TIMEOUT))
+                elif self.script == "fighter" and self.rng.random() < 0.5:
+                    await self._challenge()
+                else:
+                    await self._walk()
+                await asyncio.sleep(self.think_time * self.rng.uniform(0.5, 1.5))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await context.dispose_async()
+
+    async def _join(self):
+        joined = await self._timed("join_map", self.context.join_map(self.map_id, RESPONSE_TIMEOUT))
+        if joined:
+            self._leave_at = time.monotonic() + self.rng.uniform(*CHURN_DWELL)
+        elif joined is not None:
+            # The map is full or the server is shedding load; back off
+            await asyncio.sleep(self.think_time * 5)
+
+    async def _walk(self):
+        context = self.context
+        position = context.player_position
+        tilemap = context.current_tilemap_data
+        if position is None or tilemap is None:
+            return
+        steps = [(position.x + dx, position.y + dy) for dx, dy in STEPS]
+        free = [(x, y) for x, y in steps if 0 <= x < tilemap.width and 0 <= y < tilemap.height
+                and not context.player_index.is_occupied(x, y)]
+        if free:
+            await self._timed("move", context.move(MapPosition(*self.rng.choice(free)), RESPONSE_TIMEOUT))
+
+    async def _challenge(self):
+        opponent_id = self.context.nearest_available_opponent()
+        if opponent_id is None:
+            await self._walk()
+            return
+        started = await self._timed("challenge", self.context.challenge(opponent_id, CHALLENGE_TIMEOUT),
+                                    count_timeout=False)
+        self.counters["challenges_accepted" if started else "challenges_unanswered"] += 1
+
+    async def _fight_step(self):
+        context = self.context
+        if not await self._timed("turn", context.wait_for_turn(RESPONSE_TIMEOUT), count_timeout=False):
+            return
+        await asyncio.sleep(self.think_time * self.rng.uniform(0.5, 1.5))
+        playable = [card for card in context.cards_in_hand if card.cost <= context.player_action_points]
+        if playable:
+            await self._timed("play_card", context.play_card(self.rng.choice(playable).id, RESPONSE_TIMEOUT))
+        else:
+            await self._timed("end_turn", context.end_turn(RESPONSE_TIMEOUT))
+
+    #endregion
+
+
+class LoadGenerator:
+    """The clients of one process and their bookkeeping between reports."""
+
+    def __init__(self, server_url: str, map_id: str, mix: Dict[str, float], think_time: float,
+                 spawn_rate: float, seed: Optional[int] = None):
+        """
+        Initialize a new instance of the LoadGenerator class.
+
+        Args:
+            server_url: WebSocket URL of the game server
+            map_id: Map the clients join
+            mix: Script name -> weight
+            think_time: Mean pause between a client's actions in seconds
+            spawn_rate: New connections opened per second while ramping up
+            seed: Random seed
+        """
+        self.server_url = server_url
+        self.map_id = map_id
+        self.scripts = list(mix)
+        self.weights = [mix[script] for script in self.scripts]
+        self.think_time = think_time
+        self.spawn_rate = spawn_rate
+        self.rng = random.Random(seed)
+        self.counters: Counter = Counter()
+        self.clients: List[Tuple[ScriptedClient, asyncio.Task]] = []
+        self._retired = Metrics()
+
+    async def set_clients(self, count: int, deadline: float):
+        """
+        Start or stop clients until count are running, spawning no faster than spawn_rate.
+
+        Args:
+            count: Target number of clients
+            deadline: time.time() after which no more clients are spawned
+        """
+        # Forget clients that ended on their own, keeping what they recorded
+        for client, task in [entry for entry in self.clients if entry[1].done()]:
+            self._retired.merge(client.take_metrics())
+            self.clients.remove((client, task))
+
+        while len(self.clients) > count:
+            client, task = self.clients.pop()
+            client.stopping = True
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self._retired.merge(client.take_metrics())
+
+        interval = 1.0 / self.spawn_rate if self.spawn_rate > 0 else 0.0
+        while len(self.clients) < count and time.time() < deadline:
+            script = self.rng.choices(self.scripts, self.weights)[0]
+            client = ScriptedClient(script, self.server_url, self.map_id, self.think_time, self.counters,
+                                    random.Random(self.rng.getrandbits(64)))
+            self.clients.append((client, asyncio.get_running_loop().create_task(client.run())))
+            if interval:
+                await asyncio.sleep(interval)
+
+    def take_report(self) -> Tuple[int, Dict[str, int], Metrics]:
+        """Connected clients, counters and merged metrics since the last report; resets both."""
+        metrics = self._retired
+        self._retired = Metrics()
+        connected = 0
+        for client, _ in self.clients:
+            metrics.merge(client.take_metrics())
+            connected += client.connected
+        counters = dict(self.counters)
+        self.counters.clear()
+        return connected, counters, metrics
+
+    async def close(self):
+        """Stop every client."""
+        await self.set_clients(0, 0.0)
+
+
+async def run_schedule(schedule: Sequence[Stage], started_at: float, process_index: int, num_processes: int,
+                       report: Callable[[int, int, Dict[str, int], Metrics], None], **options):
+    """
+    Run this process's share of every stage, reporting at each stage's deadline.
+
+    Args:
+        schedule: The stages of the whole run
+        started_at: time.time() at which the first stage starts, shared by all processes
+        process_index: Index of this process
+        num_processes: Processes the clients are split over
+        report: Called with (stage index, connected clients, counters, metrics) after each stage
+        **options: LoadGenerator arguments
+    """
+    generator = LoadGenerator(**options)
+    await asyncio.sleep(max(0.0, started_at - time.time()))
+    deadline = started_at
+    try:
+        for index, stage in enumerate(schedule):
+            deadline += stage.seconds
+            await generator.set_clients(share(stage.clients, process_index, num_processes), deadline)
+            await asyncio.sleep(max(0.0, deadline - time.time()))
+            report(index, *generator.take_report())
+    finally:
+        await generator.close()
+
+
+def _process_main(process_index: int, num_processes: int, schedule: List[Stage], started_at: float,
+                  results: "mp.Queue", options: Dict[str, Any]):
+    """Entry point of a load generator process."""
+    def report(index: int, connected: int, counters: Dict[str, int], metrics: Metrics):
+        results.put((index, connected, counters, metrics))
+
+    options["seed"] = None if options.get("seed") is None else options["seed"] + process_index
+    try:
+        asyncio.run(run_schedule(schedule, started_at, process_index, num_processes, report, **options))
+    except KeyboardInterrupt:
+        pass
+
+
+def summarize(stage: Stage, connected: int, counters: Dict[str, int], metrics: Metrics) -> Dict[str, Any]:
+    """
+    Turn the merged results of a stage into the numbers worth reporting.
+
+    Args:
+        stage: The stage
+        connected: Clients still connected at the end of the stage
+        counters: Harness counters summed over processes
+        metrics: Client metrics merged over every client
+
+    Returns:
+        A JSON-serializable report
+    """
+    sent = sum(metrics.sent.values())
+    received = sum(metrics.received.values())
+    moves = metrics.received.get("ExtMoveCompleted", 0)
+    errors = {message_type: metrics.received[message_type]
+              for message_type in ERROR_MESSAGES if metrics.received.get(message_type)}
+    for key in ("connect_failures", "disconnects"):
+        if counters.get(key):
+            errors[key] = counters[key]
+    timeouts = sum(value for key, value in counters.items() if key.startswith("timeout:"))
+    if timeouts:
+        errors["timeouts"] = timeouts
+    attempts = sent + counters.get("connect_failures", 0) + counters.get("connects", 0)
+    return {
+        "clients": stage.clients,
+        "connected": connected,
+        "seconds": stage.seconds,
+        "sent_per_s": sent / stage.seconds,
+        "received_per_s": received / stage.seconds,
+        "received_per_request": received / sent if sent else 0.0,
+        "positions_per_move": metrics.received.get("ExtPlayerPositionChange", 0) / moves if moves else 0.0,
+        "errors": errors,
+        "error_rate": sum(errors.values()) / attempts if attempts else 0.0,
+        "challenges": {key: counters.get(key, 0) for key in ("challenges_accepted", "challenges_unanswered")},
+        "round_trip": {request_type: histogram.summary()
+                       for request_type, histogram in sorted(metrics.round_trip.items())},
+        "decode_failures": metrics.decode_failures,
+    }
+
+
+def format_summary(index: int, summary: Dict[str, Any]) -> str:
+    """One stage report as a few human-readable lines."""
+    lines = [f"stage {index}: {summary['connected']}/{summary['clients']} clients connected, "
+             f"sent {summary['sent_per_s']:.0f}/s, received {summary['received_per_s']:.0f}/s, "
+             f"client-side {summary['received_per_request']:.1f} received per request, "
+             f"{summary['positions_per_move']:.1f} positions per move, "
+             f"error rate {summary['error_rate']:.2%}"]
+    if summary["errors"]:
+        lines.append("  errors: " + ", ".join(f"{key}={value}" for key, value in sorted(summary["errors"].items())))
+    for request_type, rtt in summary["round_trip"].items():
+        lines.append(f"  {request_type:<26} n={rtt['count']:<7} p50={rtt['p50_ms']:.2f}ms "
+                     f"p90={rtt['p90_ms']:.2f}ms p99={rtt['p99_ms']:.2f}ms max={rtt['max_ms']:.2f}ms")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp scripted clients against a game server and report load")
+    parser.add_argument("--server-url", default="ws://127.0.0.1:8080/ws")
+    parser.add_argument("--map-id", default="map1")
+    parser.add_argument("--schedule", default=DEFAULT_SCHEDULE, help="clients:seconds stages, comma separated")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="script=weight pairs, comma separated")
+    parser.add_argument("--processes", type=int, default=1, help="Load generator processes")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds between a client's actions")
+    parser.add_argument("--spawn-rate", type=float, default=100.0, help="New connections per second per process")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", default=None, help="Also write the stage reports to this file")
+    args = parser.parse_args()
+
+    schedule = parse_schedule(args.schedule)
+    options = {"server_url": args.server_url, "map_id": args.map_id, "mix": parse_mix(args.mix),
+               "think_time": args.think_time, "spawn_rate": args.spawn_rate, "seed": args.seed}
+    num_processes = max(1, args.processes)
+    # Give every process time to import and start its loop before the first stage
+    started_at = time.time() + 2.0
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_process_main, args=(i, num_processes, schedule, started_at, results, options),
+                             daemon=True)
+                 for i in range(num_processes)]
+    for process in processes:
+        process.start()
+
+    summaries = []
+    reports: Dict[int, List[Tuple[int, Dict[str, int], Metrics]]] = {}
+    try:
+        for index, stage in enumerate(schedule):
+            # Processes report independently, so a fast one may already be a stage ahead
+            while len(reports.get(index, ())) < num_processes:
+                stage_index, *report = results.get(timeout=max(0.0, started_at - time.time()) + stage.seconds + 60.0)
+                reports.setdefault(stage_index, []).append(report)
+            connected = 0
+            counters: Counter = Counter()
+            metrics = Metrics()
+            for process_connected, process_counters, process_metrics in reports.pop(index):
+                connected += process_connected
+                counters.update(process_counters)
+                metrics.merge(process_metrics)
+            summary = summarize(stage, connected, counters, metrics)
+            summaries.append(summary)
+            print(format_summary(index, summary))
+    except queue.Empty:
+        print("A load generator process stopped reporting")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.join(timeout=10.0)
+            if process.is_alive():
+                process.terminate()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
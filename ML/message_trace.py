@@ -0,0 +1,529 @@
+"""
+Compressed, append-only traces of server traffic and a memory-mapped replayer.
+
+A trace is a directory of segment files plus an episode index:
+
+    segment_000000.trace   file header, then compressed blocks
+    segment_000001.trace   started once the previous one passes segment_bytes
+    episodes.jsonl         one line per ExtFightStarted..ExtFightEnded episode
+
+File header (8 bytes): b"CFTR", format version, codec id, 2 reserved bytes.
+Block: <III compressed size, raw size, record count; then the compressed
+records. Record: <dBI timestamp, direction, payload length; then the raw
+frame exactly as sent or received.
+
+Records are compressed a block at a time (zstd, then lz4, then zlib,
+whichever is installed) because single messages are too small to compress
+well. The index stores the (segment, block offset, record number) of each
+episode's first and last message, so an episode is read by seeking straight
+to its blocks.
+
+Attach a TraceRecorder to GameContext.recorder to capture its traffic;
+record() only queues the frame and a writer thread does the rest.
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import queue
+import random
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+INBOUND = 0
+OUTBOUND = 1
+
+FILE_MAGIC = b"CFTR"
+FORMAT_VERSION = 1
+FILE_HEADER = struct.Struct("<4sBBxx")
+BLOCK_HEADER = struct.Struct("<III")
+RECORD_HEADER = struct.Struct("<dBI")
+
+INDEX_FILE = "episodes.jsonl"
+
+# A record as returned by the reader: (timestamp, direction, frame)
+TraceRecord = Tuple[float, int, bytes]
+
+# (segment number, block offset, record number within the block)
+TracePosition = Tuple[int, int, int]
+
+
+#region Compression
+
+
+class _ZlibCompressor:
+    codec_id = 1
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 6)
+
+    def decompress(self, data: bytes, raw_size: int) -> bytes:
+        return zlib.decompress(data)
+
+
+class _Lz4Compressor:
+    codec_id = 2
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    def decompress(self, data: bytes, raw_size: int) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+class _ZstdCompressor:
+    codec_id = 3
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes, raw_size: int) -> bytes:
+        return self._decompressor.decompress(data, max_output_size=raw_size)
+
+
+def _compressor_factories() -> Dict[str, Any]:
+    factories = {"zlib": _ZlibCompressor}
+    if lz4_frame is not None:
+        factories["lz4"] = _Lz4Compressor
+    if zstandard is not None:
+        factories["zstd"] = _ZstdCompressor
+    return factories
+
+
+def get_compressor(name: str = "auto"):
+    """
+    Get a block compressor by name ("zstd", "lz4", "zlib" or "auto").
+
+    "auto" picks the best installed; an unavailable name falls back to zlib.
+    """
+    factories = _compressor_factories()
+    if name == "auto":
+        name = "zstd" if "zstd" in factories else "lz4" if "lz4" in factories else "zlib"
+    factory = factories.get(name)
+    if factory is None:
+        print(f"Trace compression {name} is not installed, falling back to zlib")
+        factory = _ZlibCompressor
+    return factory()
+
+
+def _compressor_for_id(codec_id: int):
+    for factory in _compressor_factories().values():
+        if factory.codec_id == codec_id:
+            return factory()
+    raise ValueError(f"Trace compression id {codec_id} is not installed")
+
+
+#endregion
+
+
+def _segment_path(directory: str, number: int) -> str:
+    return os.path.join(directory, f"segment_{number:06d}.trace")
+
+
+def _segment_numbers(directory: str) -> List[int]:
+    numbers = []
+    for path in glob.glob(os.path.join(directory, "segment_*.trace")):
+        try:
+            numbers.append(int(os.path.basename(path)[8:-6]))
+        except ValueError:
+            pass
+    return sorted(numbers)
+
+
+class TraceRecorder:
+    """
+    Writes timestamped frames to compressed segment files from a background thread.
+
+    record() never touches the disk, so it is safe to call from the websocket
+    receive thread or an event loop.
+    """
+
+    def __init__(self, directory: str, compression: str = "auto", block_bytes: int = 64 * 1024,
+                 segment_bytes: int = 64 * 1024 * 1024, flush_interval: float = 1.0):
+        """
+        Initialize a new instance of the TraceRecorder class and start its writer thread.
+
+        Args:
+            directory: Trace directory; new segments are appended after existing ones
+            compression: "zstd", "lz4", "zlib" or "auto"
+            block_bytes: Uncompressed size at which a block is compressed and written
+            segment_bytes: File size at which a new segment is started
+            flush_interval: Seconds after which a partial block is written anyway
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compressor = get_compressor(compression)
+        self.block_bytes = block_bytes
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.records_written = 0
+        self.bytes_written = 0
+
+        existing = _segment_numbers(directory)
+        self._segment_number = existing[-1] + 1 if existing else 0
+        self._file = None
+        self._file_size = 0
+        self._block = bytearray()
+        self._block_records = 0
+        self._open_episodes: Dict[str, TracePosition] = {}
+        self._pending_episodes: List[Dict[str, Any]] = []
+        self._queue: "queue.SimpleQueue[Optional[Tuple[float, int, Any]]]" = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="trace-recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, direction: int, frame: Union[str, bytes], timestamp: Optional[float] = None):
+        """
+        Queue one frame.
+
+        Args:
+            direction: INBOUND for server messages, OUTBOUND for client requests
+            frame: The raw frame as sent or received
+            timestamp: Seconds since the epoch, now by default
+        """
+        if not self._closed:
+            self._queue.put((time.time() if timestamp is None else timestamp, direction, frame))
+
+    def close(self):
+        """Write everything queued so far and close the files."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> "TraceRecorder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    #region Writer Thread
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+            if item:
+                try:
+                    self._append(*item)
+                except Exception as e:
+                    print(f"Error recording trace: {e}")
+            if self._block_records and (len(self._block) >= self.block_bytes
+                                        or time.monotonic() - last_flush >= self.flush_interval):
+                self._write_block()
+                last_flush = time.monotonic()
+
+        if self._block_records:
+            self._write_block()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, timestamp: float, direction: int, frame: Union[str, bytes]):
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        if self._file is None:
+            self._open_segment()
+
+        if direction == INBOUND:
+            self._track_episode(frame)
+        self._block += RECORD_HEADER.pack(timestamp, direction, len(frame))
+        self._block += frame
+        self._block_records += 1
+
+    def _position(self) -> TracePosition:
+        """Position of the next record appended to the current block."""
+        return self._segment_number, self._file_size, self._block_records
+
+    def _track_episode(self, frame: bytes):
+        # Cheap substring test first; only fight start/end frames are parsed
+        if b"ExtFight" not in frame:
+            return
+        if b"ExtFightStarted" not in frame and b"ExtFightEnded" not in frame:
+            return
+        try:
+            data = json.loads(frame)
+        except ValueError:
+            return
+        message_type = data.get("MessageType") or data.get("Type")
+        fight_id = data.get("FightId")
+        if message_type == "ExtFightStarted":
+            self._open_episodes[fight_id] = self._position()
+        elif message_type == "ExtFightEnded" and fight_id in self._open_episodes:
+            start = self._open_episodes.pop(fight_id)
+            self._pending_episodes.append({"fight_id": fight_id, "start": list(start),
+                                           "end": list(self._position()),
+                                           "winner_id": data.get("WinnerId"), "loser_id": data.get("LoserId")})
+
+    def _open_segment(self):
+        self._file = open(_segment_path(self.directory, self._segment_number), "wb")
+        self._file.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, self.compressor.codec_id))
+        self._file_size = FILE_HEADER.size
+
+    def _write_block(self):
+        raw = bytes(self._block)
+        compressed = self.compressor.compress(raw)
+        self._file.write(BLOCK_HEADER.pack(len(compressed), len(raw), self._block_records))
+        self._file.write(compressed)
+        self._file.flush()
+        self._file_size += BLOCK_HEADER.size + len(compressed)
+        self.records_written += self._block_records
+        self.bytes_written += BLOCK_HEADER.size + len(compressed)
+        self._block.clear()
+        self._block_records = 0
+
+        # Episodes are indexed only once their last block is on disk
+        if self._pending_episodes:
+            with open(os.path.join(self.directory, INDEX_FILE), "a", encoding="utf-8") as f:
+                for episode in self._pending_episodes:
+                    f.write(json.dumps(episode) + "\n")
+            self._pending_episodes.clear()
+
+        if self._file_size >= self.segment_bytes:
+            self._file.close()
+            self._file = None
+            self._segment_number += 1
+            # Open episodes keep their start positions in the previous segment
+
+    #endregion
+
+
+class TraceReader:
+    """
+    Reads a trace directory through memory-mapped segments.
+
+    Blocks are located by walking their headers, without decompressing
+    anything; the most recently used block is kept decompressed.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize a new instance of the TraceReader class.
+
+        Args:
+            directory: Trace directory written by a TraceRecorder
+        """
+        self.directory = directory
+        self.segment_numbers = _segment_numbers(directory)
+        self._maps: Dict[int, Tuple[Any, Any, Any]] = {}
+        self._block_offsets: Dict[int, List[int]] = {}
+        self._cached_block: Optional[Tuple[Tuple[int, int], List[TraceRecord]]] = None
+        self._episodes: Optional[List[Dict[str, Any]]] = None
+
+    def close(self):
+        """Unmap every segment."""
+        for file, mapped, _ in self._maps.values():
+            mapped.close()
+            file.close()
+        self._maps.clear()
+        self._cached_block = None
+
+    def __enter__(self) -> "TraceReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _segment(self, number: int) -> Tuple[Any, Any]:
+        entry = self._maps.get(number)
+        if entry is None:
+            file = open(_segment_path(self.directory, number), "rb")
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, codec_id = FILE_HEADER.unpack_from(mapped, 0)
+            if magic != FILE_MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"Segment {number} is not a version {FORMAT_VERSION} trace")
+            entry = (file, mapped, _compressor_for_id(codec_id))
+            self._maps[number] = entry
+        return entry[1], entry[2]
+
+    def block_offsets(self, segment: int) -> List[int]:
+        """Offsets of the complete blocks in a segment; a block cut short by a crash is ignored."""
+        offsets = self._block_offsets.get(segment)
+        if offsets is None:
+            mapped, _ = self._segment(segment)
+            offsets = []
+            offset = FILE_HEADER.size
+            size = len(mapped)
+            while offset + BLOCK_HEADER.size <= size:
+                compressed_size = BLOCK_HEADER.unpack_from(mapped, offset)[0]
+                end = offset + BLOCK_HEADER.size + compressed_size
+                if end > size:
+                    break
+                offsets.append(offset)
+                offset = end
+            self._block_offsets[segment] = offsets
+        return offsets
+
+    def read_block(self, segment: int, offset: int) -> List[TraceRecord]:
+        """Decompress and split one block into records."""
+        key = (segment, offset)
+        if self._cached_block is not None and self._cached_block[0] == key:
+            return self._cached_block[1]
+
+        mapped, compressor = self._segment(segment)
+        compressed_size, raw_size, count = BLOCK_HEADER.unpack_from(mapped, offset)
+        start = offset + BLOCK_HEADER.size
+        raw = compressor.decompress(mapped[start:start + compressed_size], raw_size)
+
+        records = []
+        position = 0
+        unpack_from = RECORD_HEADER.unpack_from
+        header_size = RECORD_HEADER.size
+        for _ in range(count):
+            timestamp, direction, length = unpack_from(raw, position)
+            position += header_size
+            records.append((timestamp, direction, raw[position:position + length]))
+            position += length
+        self._cached_block = (key, records)
+        return records
+
+    def records(self, direction: Optional[int] = None,
+                start: Optional[TracePosition] = None) -> Iterator[TraceRecord]:
+        """
+        Iterate over records in recorded order.
+
+        Args:
+            direction: Only INBOUND or OUTBOUND records, all by default
+            start: Position to start from, the beginning by default
+        """
+        for _, record in self._positioned_records(start or (-1, 0, 0)):
+            if direction is None or record[1] == direction:
+                yield record
+
+    #region Episodes
+
+    def episodes(self) -> List[Dict[str, Any]]:
+        """
+        Indexed episodes, in the order they ended.
+
+        Returns:
+            Dicts with fight_id, winner_id, loser_id and the start/end positions
+        """
+        if self._episodes is None:
+            self._episodes = []
+            path = os.path.join(self.directory, INDEX_FILE)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self._episodes = [json.loads(line) for line in f if line.strip()]
+        return self._episodes
+
+    def episode_records(self, episode: Dict[str, Any], direction: Optional[int] = INBOUND) -> List[TraceRecord]:
+        """
+        Records from an episode's ExtFightStarted to its ExtFightEnded, inclusive.
+
+        Args:
+            episode: An entry from episodes()
+            direction: Only INBOUND or OUTBOUND records, None for both
+
+        Returns:
+            The records, read by seeking straight to the episode's blocks
+        """
+        end = tuple(episode["end"])
+        result = []
+        for position, record in self._positioned_records(tuple(episode["start"])):
+            if direction is None or record[1] == direction:
+                result.append(record)
+            if position == end:
+                break
+        return result
+
+    def sample_episode(self, rng: Optional[random.Random] = None,
+                       direction: Optional[int] = INBOUND) -> List[TraceRecord]:
+        """Records of a uniformly random indexed episode, empty if there are none."""
+        episodes = self.episodes()
+        if not episodes:
+            return []
+        return self.episode_records((rng or random).choice(episodes), direction)
+
+    def _positioned_records(self, start: TracePosition) -> Iterator[Tuple[TracePosition, TraceRecord]]:
+        first_segment, first_offset, first_record = start
+        for segment in self.segment_numbers:
+            if segment < first_segment:
+                continue
+            for offset in self.block_offsets(segment):
+                if segment == first_segment and offset < first_offset:
+                    continue
+                block = self.read_block(segment, offset)
+                skip = first_record if (segment, offset) == (first_segment, first_offset) else 0
+                for index in range(skip, len(block)):
+                    yield (segment, offset, index), block[index]
+
+    #endregion
+
+    def replay(self, context: Any, records: Optional[Iterator[TraceRecord]] = None,
+               speed: Optional[float] = None) -> int:
+        """
+        Feed recorded server messages into a GameContext.
+
+        Frames go through context.deliver, the path of a socket frame, so
+        server message callbacks and metrics see them too. A context with an
+        inbound_capacity applies them on its dispatcher thread, possibly after
+        this returns.
+
+        Args:
+            context: The GameContext to deliver the frames to
+            records: Records to replay, every inbound record by default
+            speed: None for as fast as possible, 1.0 for the recorded pace, 2.0 for twice as fast
+
+        Returns:
+            The number of frames delivered
+        """
+        if records is None:
+            records = self.records(INBOUND)
+        deliver = context.deliver
+        delivered = 0
+        first_timestamp = None
+        started = time.monotonic()
+        for timestamp, direction, frame in records:
+            if direction != INBOUND:
+                continue
+            if speed:
+                if first_timestamp is None:
+                    first_timestamp = timestamp
+                delay = (timestamp - first_timestamp) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            deliver(frame)
+            delivered += 1
+        return delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a recorded trace")
+    parser.add_argument("directory", help="Trace directory written by TraceRecorder")
+    args = parser.parse_args()
+
+    with TraceReader(args.directory) as reader:
+        records = sum(1 for _ in reader.records())
+        segments = reader.segment_numbers
+        size = sum(os.path.getsize(_segment_path(args.directory, n)) for n in segments)
+        print(f"segments: {len(segments)}  records: {records}  bytes: {size}  "
+              f"episodes: {len(reader.episodes())}")
+
+
+if __name__ == "__main__":
+    main()
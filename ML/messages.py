@@ -0,0 +1,438 @@
+from typing import Dict, List, Any, Optional, Callable
+from models import (MapPosition, PlayerMapInfo, MapInfo, CardInfo, StatusEffectInfo,
+                    TilemapData, PlayerFightStateDto)
+
+# Server messages carry their class name in "MessageType"; older recordings use "Type"
+MESSAGE_TYPE_KEY = "MessageType"
+LEGACY_MESSAGE_TYPE_KEY = "Type"
+
+
+def get_message_type(data: Dict[str, Any]) -> Optional[str]:
+    """Read the message type name from a raw message dict."""
+    return data.get(MESSAGE_TYPE_KEY) or data.get(LEGACY_MESSAGE_TYPE_KEY)
+
+
+class ExtServerMessage:
+    """
+    Base class for all messages sent from server to client.
+
+    Mirrors the C# ExtServerMessage hierarchy in GameServer.Shared.Messages.
+    Each subclass decodes its payload in a single pass in from_dict.
+    """
+    __slots__ = ()
+    message_type = ""
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.message_type}({fields})"
+
+
+#region Connection Messages
+
+class ExtPlayerIdResponse(ExtServerMessage):
+    """Server response with connection confirmation."""
+    __slots__ = ("player_id",)
+    message_type = "ExtPlayerIdResponse"
+
+    def __init__(self, player_id: str):
+        self.player_id = player_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtPlayerIdResponse":
+        return ExtPlayerIdResponse(data.get("PlayerId"))
+
+#endregion
+
+#region Map Messages
+
+class ExtMapListResponse(ExtServerMessage):
+    """Server response with available maps."""
+    __slots__ = ("maps",)
+    message_type = "ExtMapListResponse"
+
+    def __init__(self, maps: List[MapInfo]):
+        self.maps = maps
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtMapListResponse":
+        return ExtMapListResponse([MapInfo.from_dict(m) for m in data.get("Maps") or ()])
+
+
+class ExtJoinMapInitiated(ExtServerMessage):
+    """Server notification that map join process has started."""
+    __slots__ = ("map_id",)
+    message_type = "ExtJoinMapInitiated"
+
+    def __init__(self, map_id: str):
+        self.map_id = map_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtJoinMapInitiated":
+        return ExtJoinMapInitiated(data.get("MapId"))
+
+
+class ExtJoinMapCompleted(ExtServerMessage):
+    """Server notification that map join has completed successfully."""
+    __slots__ = ("map_id", "player_id", "position", "tilemap_data", "player_info")
+    message_type = "ExtJoinMapCompleted"
+
+    def __init__(self, map_id: str, player_id: str, position: Optional[MapPosition],
+                 tilemap_data: Optional[TilemapData], player_info: Dict[str, PlayerMapInfo]):
+        self.map_id = map_id
+        self.player_id = player_id
+        self.position = position
+        self.tilemap_data = tilemap_data
+        self.player_info = player_info
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtJoinMapCompleted":
+        info_from_dict = PlayerMapInfo.from_dict
+        player_info = data.get("PlayerInfo") or {}
+        return ExtJoinMapCompleted(
+            data.get("MapId"),
+            data.get("PlayerId"),
+            MapPosition.from_dict(data.get("Position")),
+            TilemapData.from_dict(data.get("TilemapData")),
+            {player_id: info_from_dict(info) for player_id, info in player_info.items()},
+        )
+
+
+class ExtJoinMapFailed(ExtServerMessage):
+    """Server notification that map join has failed."""
+    __slots__ = ("map_id", "error_message")
+    message_type = "ExtJoinMapFailed"
+
+    def __init__(self, map_id: str, error_message: str):
+        self.map_id = map_id
+        self.error_message = error_message
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtJoinMapFailed":
+        return ExtJoinMapFailed(data.get("MapId"), data.get("ErrorMessage"))
+
+
+class ExtLeaveMapInitiated(ExtServerMessage):
+    """Server notification that map leave process has started."""
+    __slots__ = ("map_id",)
+    message_type = "ExtLeaveMapInitiated"
+
+    def __init__(self, map_id: str):
+        self.map_id = map_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtLeaveMapInitiated":
+        return ExtLeaveMapInitiated(data.get("MapId"))
+
+
+class ExtLeaveMapCompleted(ExtServerMessage):
+    """Server notification that map leave has completed successfully."""
+    __slots__ = ("map_id",)
+    message_type = "ExtLeaveMapCompleted"
+
+    def __init__(self, map_id: str):
+        self.map_id = map_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtLeaveMapCompleted":
+        return ExtLeaveMapCompleted(data.get("MapId"))
+
+
+class ExtLeaveMapFailed(ExtServerMessage):
+    """Server notification that map leave has failed."""
+    __slots__ = ("map_id", "error_message")
+    message_type = "ExtLeaveMapFailed"
+
+    def __init__(self, map_id: str, error_message: str):
+        self.map_id = map_id
+        self.error_message = error_message
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtLeaveMapFailed":
+        return ExtLeaveMapFailed(data.get("MapId"), data.get("ErrorMessage"))
+
+
+class ExtPlayerJoinedMap(ExtServerMessage):
+    """Server notification that a player has joined the map."""
+    __slots__ = ("player_id", "position")
+    message_type = "ExtPlayerJoinedMap"
+
+    def __init__(self, player_id: str, position: Optional[MapPosition]):
+        self.player_id = player_id
+        self.position = position
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtPlayerJoinedMap":
+        return ExtPlayerJoinedMap(data.get("PlayerId"), MapPosition.from_dict(data.get("Position")))
+
+
+class ExtPlayerLeftMap(ExtServerMessage):
+    """Server notification that a player has left the map."""
+    __slots__ = ("player_id",)
+    message_type = "ExtPlayerLeftMap"
+
+    def __init__(self, player_id: str):
+        self.player_id = player_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtPlayerLeftMap":
+        return ExtPlayerLeftMap(data.get("PlayerId"))
+
+#endregion
+
+#region Movement Messages
+
+class ExtMoveInitiated(ExtServerMessage):
+    """Server notification that move process has started."""
+    __slots__ = ("new_position",)
+    message_type = "ExtMoveInitiated"
+
+    def __init__(self, new_position: Optional[MapPosition]):
+        self.new_position = new_position
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtMoveInitiated":
+        return ExtMoveInitiated(MapPosition.from_dict(data.get("NewPosition")))
+
+
+class ExtMoveCompleted(ExtServerMessage):
+    """Server notification that move has completed successfully."""
+    __slots__ = ("new_position",)
+    message_type = "ExtMoveCompleted"
+
+    def __init__(self, new_position: Optional[MapPosition]):
+        self.new_position = new_position
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtMoveCompleted":
+        return ExtMoveCompleted(MapPosition.from_dict(data.get("NewPosition")))
+
+
+class ExtMoveFailed(ExtServerMessage):
+    """Server notification that move has failed."""
+    __slots__ = ("attempted_position", "error_message")
+    message_type = "ExtMoveFailed"
+
+    def __init__(self, attempted_position: Optional[MapPosition], error_message: str):
+        self.attempted_position = attempted_position
+        self.error_message = error_message
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtMoveFailed":
+        return ExtMoveFailed(MapPosition.from_dict(data.get("AttemptedPosition")), data.get("ErrorMessage"))
+
+
+class ExtPlayerPositionChange(ExtServerMessage):
+    """Server notification of a player position change."""
+    __slots__ = ("player_id", "position")
+    message_type = "ExtPlayerPositionChange"
+
+    def __init__(self, player_id: str, position: Optional[MapPosition]):
+        self.player_id = player_id
+        self.position = position
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtPlayerPositionChange":
+        return ExtPlayerPositionChange(data.get("PlayerId"), MapPosition.from_dict(data.get("Position")))
+
+#endregion
+
+#region Fight Messages
+
+class ExtFightStarted(ExtServerMessage):
+    """Server notification that a fight has started."""
+    __slots__ = ("fight_id", "player1_id", "player2_id")
+    message_type = "ExtFightStarted"
+
+    def __init__(self, fight_id: str, player1_id: str, player2_id: str):
+        self.fight_id = fight_id
+        self.player1_id = player1_id
+        self.player2_id = player2_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtFightStarted":
+        return ExtFightStarted(data.get("FightId"), data.get("Player1Id"), data.get("Player2Id"))
+
+
+class ExtFightEnded(ExtServerMessage):
+    """Server notification that a fight has ended."""
+    __slots__ = ("fight_id", "winner_id", "loser_id", "reason")
+    message_type = "ExtFightEnded"
+
+    def __init__(self, fight_id: str, winner_id: str, loser_id: str, reason: str):
+        self.fight_id = fight_id
+        self.winner_id = winner_id
+        self.loser_id = loser_id
+        self.reason = reason
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtFightEnded":
+        return ExtFightEnded(data.get("FightId"), data.get("WinnerId"), data.get("LoserId"), data.get("Reason"))
+
+#endregion
+
+#region Card Battle Messages
+
+class ExtCardImages(ExtServerMessage):
+    """Server notification with SVG data for multiple cards."""
+    __slots__ = ("card_svg_data",)
+    message_type = "ExtCardImages"
+
+    def __init__(self, card_svg_data: Dict[str, str]):
+        self.card_svg_data = card_svg_data
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtCardImages":
+        return ExtCardImages(data.get("CardSvgData") or {})
+
+
+class ExtCardDrawn(ExtServerMessage):
+    """Server notification about a newly drawn card."""
+    __slots__ = ("card_info", "svg_data")
+    message_type = "ExtCardDrawn"
+
+    def __init__(self, card_info: Optional[CardInfo], svg_data: Optional[str]):
+        self.card_info = card_info
+        self.svg_data = svg_data
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtCardDrawn":
+        return ExtCardDrawn(CardInfo.from_dict(data.get("CardInfo")), data.get("SvgData"))
+
+
+class ExtFightStateUpdate(ExtServerMessage):
+    """Server notification with complete fight state update."""
+    __slots__ = ("current_turn_player_id", "player_state", "opponent_state")
+    message_type = "ExtFightStateUpdate"
+
+    def __init__(self, current_turn_player_id: str, player_state: PlayerFightStateDto,
+                 opponent_state: PlayerFightStateDto):
+        self.current_turn_player_id = current_turn_player_id
+        self.player_state = player_state
+        self.opponent_state = opponent_state
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtFightStateUpdate":
+        return ExtFightStateUpdate(
+            data.get("CurrentTurnPlayerId"),
+            PlayerFightStateDto.from_dict(data.get("PlayerState")),
+            PlayerFightStateDto.from_dict(data.get("OpponentState")),
+        )
+
+
+class ExtTurnStarted(ExtServerMessage):
+    """Server notification that a turn has started."""
+    __slots__ = ("active_player_id",)
+    message_type = "ExtTurnStarted"
+
+    def __init__(self, active_player_id: str):
+        self.active_player_id = active_player_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtTurnStarted":
+        return ExtTurnStarted(data.get("ActivePlayerId"))
+
+
+class ExtTurnEnded(ExtServerMessage):
+    """Server notification that a turn has ended."""
+    __slots__ = ("player_id",)
+    message_type = "ExtTurnEnded"
+
+    def __init__(self, player_id: str):
+        self.player_id = player_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtTurnEnded":
+        return ExtTurnEnded(data.get("PlayerId"))
+
+
+class ExtCardPlayInitiated(ExtServerMessage):
+    """Server notification that card play process has started."""
+    __slots__ = ("card_id",)
+    message_type = "ExtCardPlayInitiated"
+
+    def __init__(self, card_id: str):
+        self.card_id = card_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtCardPlayInitiated":
+        return ExtCardPlayInitiated(data.get("CardId"))
+
+
+class ExtCardPlayCompleted(ExtServerMessage):
+    """Server notification that card play has completed successfully."""
+    __slots__ = ("player_id", "played_card", "effect", "is_visible")
+    message_type = "ExtCardPlayCompleted"
+
+    def __init__(self, player_id: str, played_card: Optional[CardInfo], effect: str, is_visible: bool = True):
+        self.player_id = player_id
+        self.played_card = played_card
+        self.effect = effect
+        self.is_visible = is_visible
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtCardPlayCompleted":
+        return ExtCardPlayCompleted(data.get("PlayerId"), CardInfo.from_dict(data.get("PlayedCard")),
+                                    data.get("Effect"), data.get("IsVisible", True))
+
+
+class ExtCardPlayFailed(ExtServerMessage):
+    """Server notification that card play has failed."""
+    __slots__ = ("card_id", "error_message")
+    message_type = "ExtCardPlayFailed"
+
+    def __init__(self, card_id: str, error_message: str):
+        self.card_id = card_id
+        self.error_message = error_message
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtCardPlayFailed":
+        return ExtCardPlayFailed(data.get("CardId"), data.get("ErrorMessage"))
+
+
+class ExtEffectApplied(ExtServerMessage):
+    """Server notification that a card effect was applied."""
+    __slots__ = ("target_player_id", "effect_type", "value", "source")
+    message_type = "ExtEffectApplied"
+
+    def __init__(self, target_player_id: str, effect_type: str, value: int, source: str):
+        self.target_player_id = target_player_id
+        self.effect_type = effect_type
+        self.value = value
+        self.source = source
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ExtEffectApplied":
+        return ExtEffectApplied(data.get("TargetPlayerId"), data.get("EffectType"),
+                                data.get("Value", 0), data.get("Source"))
+
+#endregion
+
+# Message type name -> single-pass decoder, built once at import time
+MESSAGE_CLASSES = (
+    ExtPlayerIdResponse,
+    ExtMapListResponse, ExtJoinMapInitiated, ExtJoinMapCompleted, ExtJoinMapFailed,
+    ExtLeaveMapInitiated, ExtLeaveMapCompleted, ExtLeaveMapFailed,
+    ExtPlayerJoinedMap, ExtPlayerLeftMap, ExtPlayerPositionChange,
+    ExtMoveInitiated, ExtMoveCompleted, ExtMoveFailed,
+    ExtFightStarted, ExtFightEnded,
+    ExtCardImages, ExtCardDrawn, ExtFightStateUpdate, ExtTurnStarted, ExtTurnEnded,
+    ExtCardPlayInitiated, ExtCardPlayCompleted, ExtCardPlayFailed, ExtEffectApplied,
+)
+
+MESSAGE_DECODERS: Dict[str, Callable[[Dict[str, Any]], ExtServerMessage]] = {
+    cls.message_type: cls.from_dict for cls in MESSAGE_CLASSES
+}
+
+
+def decode_message(data: Dict[str, Any]) -> Optional[ExtServerMessage]:
+    """
+    Decode a raw server message dict into its typed message object.
+
+    Args:
+        data: The message as parsed from JSON
+
+    Returns:
+        The decoded message, or None if the message type is unknown
+    """
+    decoder = MESSAGE_DECODERS.get(get_message_type(data))
+    return decoder(data) if decoder else None
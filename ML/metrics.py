@@ -0,0 +1,341 @@
+"""
+Low-overhead client metrics: per message type counters, latency histograms
+and request round-trip times.
+
+GameContext.metrics is None unless enable_metrics() is called, so the only
+cost when switched off is one attribute check per message.
+
+Latencies are recorded in nanoseconds into log-linear histograms in the style
+of HdrHistogram: every power of two is split into 2 ** SUB_BUCKET_BITS
+linear buckets, which bounds the relative error of any percentile to about
+1 / 2 ** SUB_BUCKET_BITS while keeping recording to a few integer operations.
+
+Round trips are matched first in, first out per request type, against the
+first response type in REQUEST_RESPONSES that arrives.
+"""
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Request type -> server messages that answer it. The server routes a player's
+# own ExtCardPlayCompleted to the map actor, which drops it, so a card play is
+# answered in practice by the ExtFightStateUpdate that follows it.
+REQUEST_RESPONSES: Dict[str, Tuple[str, ...]] = {
+    "ExtPlayerIdRequest": ("ExtPlayerIdResponse",),
+    "ExtMapListRequest": ("ExtMapListResponse",),
+    "ExtJoinMapRequest": ("ExtJoinMapCompleted", "ExtJoinMapFailed"),
+    "ExtLeaveMapRequest": ("ExtLeaveMapCompleted", "ExtLeaveMapFailed"),
+    "ExtPlayerMoveRequest": ("ExtMoveCompleted", "ExtMoveFailed"),
+    "ExtFightChallengeRequest": ("ExtFightStarted",),
+    "ExtPlayCardRequest": ("ExtCardPlayCompleted", "ExtCardPlayFailed", "ExtFightStateUpdate"),
+    "ExtEndTurnRequest": ("ExtTurnEnded",),
+}
+
+# Response type -> request types it can answer
+_RESPONSE_REQUESTS: Dict[str, Tuple[str, ...]] = {}
+for _request, _responses in REQUEST_RESPONSES.items():
+    for _response in _responses:
+        _RESPONSE_REQUESTS[_response] = _RESPONSE_REQUESTS.get(_response, ()) + (_request,)
+
+# Requests left unanswered when a fight ends, e.g. the card play that won it
+FIGHT_REQUESTS = ("ExtPlayCardRequest", "ExtEndTurnRequest")
+
+# Unanswered requests older than this are dropped instead of skewing RTTs
+MAX_PENDING_REQUESTS = 64
+
+
+class LatencyHistogram:
+    """Log-linear histogram of non-negative integer durations in nanoseconds."""
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * (64 * _SUB_BUCKETS)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket_index(value: int) -> int:
+        """Bucket of a value; exact below 2 * 2 ** SUB_BUCKET_BITS."""
+        if value < 2 * _SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """Lowest value that falls into a bucket."""
+        if index < 2 * _SUB_BUCKETS:
+            return index
+        shift = (index >> SUB_BUCKET_BITS) - 1
+        return (index - (shift << SUB_BUCKET_BITS)) << shift
+
+    def record(self, value: int):
+        """Add one duration."""
+        if value < 0:
+            value = 0
+        self.counts[self.bucket_index(value)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def record_many(self, values: np.ndarray):
+        """Add a batch of durations, bucketed with array operations instead of one call each."""
+        values = np.maximum(np.asarray(values, dtype=np.int64), 0)
+        if len(values) == 0:
+            return
+        # frexp gives the bit length exactly for integers below 2 ** 53
+        shift = np.maximum(np.frexp(values.astype(np.float64))[1] - SUB_BUCKET_BITS - 1, 0)
+        indices = np.where(values < 2 * _SUB_BUCKETS, values, (shift << SUB_BUCKET_BITS) + (values >> shift))
+        counts = self.counts
+        bucket_counts = np.bincount(indices)
+        for index in np.flatnonzero(bucket_counts):
+            counts[index] += int(bucket_counts[index])
+        low = int(values.min())
+        high = int(values.max())
+        if self.count == 0 or low < self.min:
+            self.min = low
+        if high > self.max:
+            self.max = high
+        self.count += len(values)
+        self.total += int(values.sum())
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add the durations recorded by another histogram, e.g. from another client."""
+        if other.count == 0:
+            return
+        counts = self.counts
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                counts[index] += bucket_count
+        if self.count == 0 or other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, percent: float) -> int:
+        """Value at a percentile (0-100), reported as its bucket's upper bound capped at max."""
+        if self.count == 0:
+            return 0
+        threshold = max(1, int(self.count * percent / 100.0 + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count:
+                seen += bucket_count
+                if seen >= threshold:
+                    return min(self.bucket_value(index + 1) - 1, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Count, mean, min, max and p50/p90/p99/p999 in milliseconds."""
+        scale = 1e-6
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * scale if self.count else 0.0,
+            "min_ms": self.min * scale,
+            "max_ms": self.max * scale,
+            "p50_ms": self.percentile(50) * scale,
+            "p90_ms": self.percentile(90) * scale,
+            "p99_ms": self.percentile(99) * scale,
+            "p999_ms": self.percentile(99.9) * scale,
+        }
+
+
+class Metrics:
+    """Counters and histograms for one GameContext."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.received: Dict[str, int] = {}
+        self.received_bytes: Dict[str, int] = {}
+        self.sent: Dict[str, int] = {}
+        self.decode_failures = 0
+        self.decode: Dict[str, LatencyHistogram] = {}
+        self.handler: Dict[str, LatencyHistogram] = {}
+        self.callbacks: Dict[str, LatencyHistogram] = {}
+        self.round_trip: Dict[str, LatencyHistogram] = {}
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self._pending: Dict[str, Deque[int]] = {}
+
+    @staticmethod
+    def _histogram(histograms: Dict[str, LatencyHistogram], message_type: str) -> LatencyHistogram:
+        histogram = histograms.get(message_type)
+        if histogram is None:
+            histogram = histograms[message_type] = LatencyHistogram()
+        return histogram
+
+    #region Recording
+
+    def record_received(self, message_type: str, handler_ns: int, now_ns: int, ends_own_fight: bool = False):
+        """
+        Count a dispatched message, time its handler and close any round trip it answers.
+
+        Args:
+            message_type: Type of the dispatched message
+            handler_ns: Time spent in its handler
+            now_ns: perf_counter_ns() after the handler
+            ends_own_fight: The message is an ExtFightEnded of this player's fight; the server
+                broadcasts ExtFightEnded map-wide, so only then are pending fight requests dropped
+        """
+        self.received[message_type] = self.received.get(message_type, 0) + 1
+        self._histogram(self.handler, message_type).record(handler_ns)
+
+        if message_type == "ExtFightEnded":
+            if not ends_own_fight:
+                return
+            for request_type in FIGHT_REQUESTS:
+                pending = self._pending.get(request_type)
+                if pending:
+                    pending.clear()
+            return
+
+        requests = _RESPONSE_REQUESTS.get(message_type)
+        if requests:
+            pending = self._pending
+            for request_type in requests:
+                sent = pending.get(request_type)
+                if sent:
+                    self._histogram(self.round_trip, request_type).record(now_ns - sent.popleft())
+                    break
+
+    def record_frame(self, message_type: Optional[str], size: int, decode_ns: int, callbacks_ns: int):
+        """Time the decode and user callbacks of a raw frame."""
+        if message_type is None:
+            self.decode_failures += 1
+            return
+        self.received_bytes[message_type] = self.received_bytes.get(message_type, 0) + size
+        self._histogram(self.decode, message_type).record(decode_ns)
+        self._histogram(self.callbacks, message_type).record(callbacks_ns)
+
+    def record_sent(self, message_type: str, now_ns: int):
+        """Count a request and start its round-trip timer."""
+        self.sent[message_type] = self.sent.get(message_type, 0) + 1
+        if message_type in REQUEST_RESPONSES:
+            pending = self._pending.get(message_type)
+            if pending is None:
+                pending = self._pending[message_type] = deque(maxlen=MAX_PENDING_REQUESTS)
+            pending.append(now_ns)
+
+    def record_queue_depth(self, depth: int):
+        """Sample the inbound queue depth."""
+        self.queue_depth = depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def merge(self, other: "Metrics"):
+        """
+        Add the counters and histograms of another Metrics, to aggregate many clients.
+
+        Round trips still waiting for a response in other are not carried over.
+        """
+        self.started_at = min(self.started_at, other.started_at)
+        for mine, theirs in ((self.received, other.received), (self.received_bytes, other.received_bytes),
+                             (self.sent, other.sent)):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+        for mine, theirs in ((self.decode, other.decode), (self.handler, other.handler),
+                             (self.callbacks, other.callbacks), (self.round_trip, other.round_trip)):
+            for key, histogram in theirs.items():
+                self._histogram(mine, key).merge(histogram)
+        self.decode_failures += other.decode_failures
+        self.queue_depth += other.queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, other.max_queue_depth)
+
+    #endregion
+
+    #region Export
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far as plain dicts, with latencies in milliseconds."""
+        def summaries(histograms: Dict[str, LatencyHistogram]) -> Dict[str, Dict[str, float]]:
+            return {message_type: histogram.summary() for message_type, histogram in sorted(histograms.items())}
+
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        return {
+            "uptime_s": elapsed,
+            "received": dict(self.received),
+            "received_per_s": {t: n / elapsed for t, n in self.received.items()},
+            "received_bytes": dict(self.received_bytes),
+            "sent": dict(self.sent),
+            "decode_failures": self.decode_failures,
+            "decode": summaries(self.decode),
+            "handler": summaries(self.handler),
+            "callbacks": summaries(self.callbacks),
+            "round_trip": summaries(self.round_trip),
+            "pending_requests": {t: len(q) for t, q in self._pending.items() if q},
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def to_prometheus(self, prefix: str = "chickenfight_client", labels: Optional[Dict[str, str]] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix: Metric name prefix
+            labels: Extra labels added to every sample, e.g. {"player": player_id}
+
+        Returns:
+            The exposition text
+        """
+        base = "".join(f'{key}="{_escape(value)}",' for key, value in (labels or {}).items())
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Dict[str, int], label: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for key, value in sorted(values.items()):
+                lines.append(f'{prefix}_{name}{{{base}{label}="{_escape(key)}"}} {value}')
+
+        def histogram(name: str, help_text: str, histograms: Dict[str, LatencyHistogram], label: str):
+            lines.append(f"# HELP {prefix}_{name}_seconds {help_text}")
+            lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+            for key, hist in sorted(histograms.items()):
+                sample_labels = f'{base}{label}="{_escape(key)}"'
+                for quantile in (0.5, 0.9, 0.99, 0.999):
+                    value = hist.percentile(quantile * 100) * 1e-9
+                    lines.append(f'{prefix}_{name}_seconds{{{sample_labels},quantile="{quantile}"}} {value:.9f}')
+                lines.append(f"{prefix}_{name}_seconds_sum{{{sample_labels}}} {hist.total * 1e-9:.9f}")
+                lines.append(f"{prefix}_{name}_seconds_count{{{sample_labels}}} {hist.count}")
+
+        counter("messages_received_total", "Server messages dispatched, by type", self.received, "message_type")
+        counter("bytes_received_total", "Raw frame bytes received, by type", self.received_bytes, "message_type")
+        counter("messages_sent_total", "Client requests sent, by type", self.sent, "message_type")
+        histogram("decode", "Time to decode a frame", self.decode, "message_type")
+        histogram("handler", "Time spent in the state handler", self.handler, "message_type")
+        histogram("callbacks", "Time spent in server message callbacks", self.callbacks, "message_type")
+        histogram("round_trip", "Time from a request to its response", self.round_trip, "request_type")
+
+        lines.append(f"# HELP {prefix}_decode_failures_total Frames that could not be decoded")
+        lines.append(f"# TYPE {prefix}_decode_failures_total counter")
+        lines.append(f"{prefix}_decode_failures_total{{{base.rstrip(',')}}} {self.decode_failures}")
+        lines.append(f"# HELP {prefix}_inbound_queue_depth Messages waiting for recv()")
+        lines.append(f"# TYPE {prefix}_inbound_queue_depth gauge")
+        lines.append(f"{prefix}_inbound_queue_depth{{{base.rstrip(',')}}} {self.queue_depth}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, **kwargs):
+        """Write to_prometheus() to a file atomically, for node_exporter's textfile collector."""
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(**kwargs))
+        os.replace(temp_path, path)
+
+    #endregion
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
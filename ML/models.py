@@ -0,0 +1,235 @@
+from array import array
+from typing import Dict, List, Any, NamedTuple, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class MapPosition:
+    """Represents a position on a map."""
+    __slots__ = ("x", "y")
+
+    def __init__(self, x: int, y: int):
+        self.x = x
+        self.y = y
+
+    @staticmethod
+    def from_dict(data: Optional[Dict[str, Any]]) -> Optional["MapPosition"]:
+        """Decode a server MapPosition payload, or None if absent."""
+        if data is None:
+            return None
+        return MapPosition(data.get("X", 0), data.get("Y", 0))
+
+    def __eq__(self, other):
+        return isinstance(other, MapPosition) and self.x == other.x and self.y == other.y
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return f"MapPosition({self.x}, {self.y})"
+
+
+class PlayerMapInfo:
+    """Information about a player on a map."""
+    __slots__ = ("position", "fight_id")
+
+    def __init__(self, position: MapPosition, fight_id: Optional[str] = None):
+        self.position = position
+        self.fight_id = fight_id
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "PlayerMapInfo":
+        """Decode a server PlayerMapInfo payload."""
+        return PlayerMapInfo(MapPosition.from_dict(data.get("Position")), data.get("FightId"))
+
+
+class MapInfo:
+    """Information about a map offered by the server."""
+    __slots__ = ("id", "name", "width", "height", "player_count")
+
+    def __init__(self, id: str, name: str, width: int, height: int, player_count: int):
+        self.id = id
+        self.name = name
+        self.width = width
+        self.height = height
+        self.player_count = player_count
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "MapInfo":
+        """Decode a server MapInfo payload."""
+        return MapInfo(data.get("Id"), data.get("Name"), data.get("Width", 0),
+                       data.get("Height", 0), data.get("PlayerCount", 0))
+
+
+class CardInfo:
+    """Information about a card."""
+    __slots__ = ("id", "name", "type", "subtype", "cost", "description")
+
+    def __init__(self, id: str, name: str, type: str, subtype: str, cost: int, description: str):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.subtype = subtype
+        self.cost = cost
+        self.description = description
+
+    @staticmethod
+    def from_dict(data: Optional[Dict[str, Any]]) -> Optional["CardInfo"]:
+        """Decode a server CardInfo payload, or None if absent."""
+        if data is None:
+            return None
+        return CardInfo(data.get("Id"), data.get("Name"), data.get("Type"), data.get("Subtype"),
+                        data.get("Cost", 0), data.get("Description"))
+
+
+class StatusEffectInfo:
+    """Information about a status effect."""
+    __slots__ = ("type", "value", "duration", "id", "name", "description")
+
+    def __init__(self, type: str, value: int, duration: int,
+                 id: Optional[str] = None, name: Optional[str] = None, description: Optional[str] = None):
+        self.type = type
+        self.value = value
+        self.duration = duration
+        self.id = id
+        self.name = name
+        self.description = description
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "StatusEffectInfo":
+        """Decode a server StatusEffectInfo payload (Magnitude maps to value)."""
+        return StatusEffectInfo(data.get("Type"), data.get("Magnitude", 0), data.get("Duration", 0),
+                                data.get("Id"), data.get("Name"), data.get("Description"))
+
+
+class TilemapData:
+    """
+    Represents tilemap data for a map.
+
+    The server's flat TileData is stored once as a read-only int32 buffer;
+    tiles is a (height, width) view of it indexed as tiles[y, x]. Uses a numpy
+    array when numpy is installed, otherwise an array('i') behind a 2-D
+    memoryview. fingerprint hashes the tiles so caches can tell when a map changed.
+    """
+    __slots__ = ("width", "height", "tile_data", "tiles", "fingerprint")
+
+    def __init__(self, width: int, height: int, tile_data: Union[Sequence[int], bytes, memoryview]):
+        """
+        Initialize a new instance of the TilemapData class.
+
+        Args:
+            width: Map width in tiles
+            height: Map height in tiles
+            tile_data: Flat row-major tile ids, as a list or a buffer of int32
+        """
+        if len(tile_data) == 0:
+            tile_data = [0] * (width * height)
+        self.width = width
+        self.height = height
+        if np is not None:
+            if isinstance(tile_data, (bytes, bytearray, memoryview)):
+                flat = np.frombuffer(tile_data, dtype=np.int32)
+            else:
+                flat = np.array(tile_data, dtype=np.int32)
+            flat.flags.writeable = False
+            self.tile_data = flat
+            self.tiles = flat.reshape(height, width)
+        else:
+            flat = array("i", tile_data)
+            self.tile_data = flat
+            self.tiles = memoryview(flat).toreadonly().cast("B").cast("i", (height, width))
+        self.fingerprint = hash((width, height, flat.tobytes()))
+
+    def get_tile(self, x: int, y: int) -> int:
+        """Tile id at a position, or -1 outside the map like Map.GetTile on the server."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return int(self.tile_data[y * self.width + x])
+        return -1
+
+    @staticmethod
+    def from_dict(data: Optional[Dict[str, Any]]) -> Optional["TilemapData"]:
+        """Decode a server TilemapData payload."""
+        if data is None:
+            return None
+        return TilemapData(data.get("Width", 0), data.get("Height", 0), data.get("TileData") or ())
+
+
+class PlayerFightStateDto:
+    """Data transfer object for player fight state."""
+    __slots__ = ("player_id", "hit_points", "action_points", "deck_count",
+                 "discard_pile_count", "hand", "status_effects")
+
+    def __init__(self, player_id: str, hit_points: int, action_points: int,
+                 deck_count: int, discard_pile_count: int,
+                 hand: List[CardInfo], status_effects: List[StatusEffectInfo]):
+        self.player_id = player_id
+        self.hit_points = hit_points
+        self.action_points = action_points
+        self.deck_count = deck_count
+        self.discard_pile_count = discard_pile_count
+        self.hand = hand
+        self.status_effects = status_effects
+
+    @staticmethod
+    def from_dict(data: Optional[Dict[str, Any]]) -> "PlayerFightStateDto":
+        """Decode a server PlayerFightStateDto payload, using defaults for missing fields."""
+        data = data or {}
+        card_from_dict = CardInfo.from_dict
+        effect_from_dict = StatusEffectInfo.from_dict
+        return PlayerFightStateDto(
+            data.get("PlayerId"),
+            data.get("HitPoints", 50),
+            data.get("ActionPoints", 0),
+            data.get("DeckCount", 0),
+            data.get("DiscardPileCount", 0),
+            [card_from_dict(card) for card in data.get("Hand") or ()],
+            [effect_from_dict(effect) for effect in data.get("StatusEffects") or ()],
+        )
+
+
+class FightSnapshot(NamedTuple):
+    """
+    Immutable copy of the card-battle state of a GameContext, for lookahead search.
+
+    Hands and status effects are tuples shared with the context and with
+    every other snapshot taken while they were current, so a snapshot costs
+    one tuple allocation however large the state. Fork one with _replace,
+    e.g. snapshot._replace(opponent_hit_points=hp - 6, player_hand=hand[1:]),
+    which also shares every field it does not change.
+    """
+    fight_id: Optional[str]
+    opponent_id: Optional[str]
+    turn_player_id: Optional[str]
+    player_hit_points: int
+    player_action_points: int
+    player_deck_count: int
+    player_discard_pile_count: int
+    player_hand: Tuple[CardInfo, ...]
+    player_status_effects: Tuple[StatusEffectInfo, ...]
+    opponent_hit_points: int
+    opponent_action_points: int
+    opponent_deck_count: int
+    opponent_discard_pile_count: int
+    opponent_hand: Tuple[CardInfo, ...]
+    opponent_status_effects: Tuple[StatusEffectInfo, ...]
+    last_played_card: Optional[CardInfo]
+
+
+# Mirrors GameServer.Application.Models.StatusEffectType, in declaration order
+STATUS_EFFECT_TYPES = (
+    "DamageOverTime",
+    "HealOverTime",
+    "DamageReduction",
+    "DamageBoost",
+    "DodgeChance",
+    "DamageReflection",
+    "CardLock",
+    "MaxHealthBoost",
+    "ActionPointBoost",
+    "EnvironmentEffect",
+)
+
+STATUS_EFFECT_INDEX: Dict[str, int] = {name: index for index, name in enumerate(STATUS_EFFECT_TYPES)}
@@ -0,0 +1,287 @@
+"""
+Many GameContexts over one WebSocket connection.
+
+The server multiplexes a connection opened with ?multiplex=1 (see GameSession
+in WebSocketServer.cs): every frame carries a SessionId, the first frame of a
+new SessionId creates a player for it, and every reply to that player comes
+back tagged with the same SessionId. An ExtCloseSessionRequest stops one
+player and leaves the connection open.
+
+MultiplexConnection owns the socket. Attached contexts send through it with
+their session id added, and each inbound frame goes to the context of its
+SessionId. The server writes the tag as the first field, so the
+demultiplexer reads it off the start of the frame and hands the frame on
+untouched: the context decodes it once, exactly like a frame from its own
+socket (the codecs ignore the extra field). When the connection closes or
+fails, every context is detached and its send() returns False.
+
+The handlers of every context run on the connection's thread, so one slow
+callback delays all of them; give contexts an inbound_capacity to run their
+handlers on their own dispatch threads instead.
+
+Run from the ML directory against a server, e.g.:
+    python multiplex.py --sessions 500
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import websocket
+
+SESSION_ID_FIELD = "SessionId"
+MULTIPLEX_QUERY = "multiplex=1"
+
+# How the server starts every tagged frame
+_TAG_PREFIX = '{"' + SESSION_ID_FIELD + '":"'
+
+
+def multiplex_url(server_url: str) -> str:
+    """The server URL with the multiplex query parameter added."""
+    if MULTIPLEX_QUERY in server_url:
+        return server_url
+    return f"{server_url}{'&' if '?' in server_url else '?'}{MULTIPLEX_QUERY}"
+
+
+def session_id_of(frame: Any) -> Optional[str]:
+    """
+    Session id of a tagged frame.
+
+    Args:
+        frame: The raw frame, str or bytes
+
+    Returns:
+        The SessionId, or None if the frame has none
+    """
+    if isinstance(frame, (bytes, bytearray)):
+        frame = frame.decode("utf-8")
+    if frame.startswith(_TAG_PREFIX):
+        end = frame.find('"', len(_TAG_PREFIX))
+        session_id = frame[len(_TAG_PREFIX):end]
+        if end > 0 and "\\" not in session_id:
+            return session_id
+    # Escaped ids and frames not written by the server's tagging need a full parse
+    try:
+        data = json.loads(frame)
+    except ValueError:
+        return None
+    return data.get(SESSION_ID_FIELD) if isinstance(data, dict) else None
+
+
+class MultiplexConnection:
+    """One WebSocket connection carrying the sessions of many GameContexts."""
+
+    def __init__(self, server_url: str = "ws://127.0.0.1:8080/ws"):
+        """
+        Initialize a new instance of the MultiplexConnection class.
+
+        Args:
+            server_url: WebSocket URL of the game server; the multiplex query parameter is added
+        """
+        self.server_url = multiplex_url(server_url)
+        self.contexts: Dict[str, Any] = {}
+        self.websocket = None
+        self.websocket_thread = None
+        self._opened = threading.Event()
+        self._lock = threading.Lock()
+        self._session_ids = itertools.count()
+
+        # Counters
+        self.frames_received = 0
+        self.frames_sent = 0
+        self.unrouted = 0
+
+    @property
+    def connected(self) -> bool:
+        """Check if the socket is open."""
+        websocket_app = self.websocket
+        return websocket_app is not None and websocket_app.sock is not None and websocket_app.sock.connected
+
+    def connect(self, timeout: float = 10.0) -> bool:
+        """
+        Open the connection on a daemon thread and wait for it.
+
+        Args:
+            timeout: Seconds to wait for the socket to open
+
+        Returns:
+            bool: True if the connection is open
+        """
+        self._opened.clear()
+        self.websocket = websocket.WebSocketApp(
+            self.server_url,
+            on_message=self._on_message,
+            on_error=self._on_error,
+            on_close=self._on_close,
+            on_open=self._on_open
+        )
+        self.websocket_thread = threading.Thread(target=self.websocket.run_forever)
+        self.websocket_thread.daemon = True
+        self.websocket_thread.start()
+        return self._opened.wait(timeout) and self.connected
+
+    def attach(self, context: Any, session_id: Optional[str] = None) -> str:
+        """
+        Route a GameContext through this connection.
+
+        Sends an ExtPlayerIdRequest for the session, which makes the server
+        create its player and tells the context its player ID.
+
+        Args:
+            context: A GameContext that has not connected on its own
+            session_id: Tag for the context's frames, unique on this connection; generated by default
+
+        Returns:
+            The session id
+        """
+        with self._lock:
+            if session_id is None:
+                session_id = f"session_{next(self._session_ids)}"
+            if session_id in self.contexts:
+                raise ValueError(f"Session {session_id!r} is already attached")
+            self.contexts[session_id] = context
+        context.multiplexer = self
+        context.session_id = session_id
+        context.start_dispatcher()
+        context.send({"MessageType": "ExtPlayerIdRequest"})
+        return session_id
+
+    def detach(self, context: Any):
+        """Stop routing a context and close its session, which stops its player on the server."""
+        session_id = context.session_id
+        with self._lock:
+            if self.contexts.get(session_id) is not context:
+                return
+            del self.contexts[session_id]
+        self.send_frame(json.dumps({SESSION_ID_FIELD: session_id, "MessageType": "ExtCloseSessionRequest"}))
+        context.multiplexer = None
+        context.session_id = None
+
+    def send_frame(self, frame: str) -> bool:
+        """
+        Send an already tagged frame.
+
+        websocket-client serializes sends internally, so contexts may call
+        this from any thread.
+
+        Returns:
+            bool: True if the frame was sent
+        """
+        websocket_app = self.websocket
+        if websocket_app is None or websocket_app.sock is None or not websocket_app.sock.connected:
+            return False
+        try:
+            websocket_app.send(frame)
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            return False
+        self.frames_sent += 1
+        return True
+
+    def _on_open(self, ws):
+        """Handle WebSocket connection opened event."""
+        print("Multiplexed WebSocket connection opened")
+        self._opened.set()
+
+    def _on_message(self, ws, frame):
+        """Hand a frame to the context of its session."""
+        self.frames_received += 1
+        context = self.contexts.get(session_id_of(frame))
+        if context is None:
+            # Late replies to a detached session, or frames without a tag
+            self.unrouted += 1
+            return
+        context._on_message(ws, frame)
+
+    def _on_error(self, ws, error):
+        """Handle WebSocket error event."""
+        print(f"WebSocket error: {error}")
+
+    def _on_close(self, ws, close_status_code, close_msg):
+        """Handle WebSocket connection closed event; the server has stopped every session's player."""
+        print(f"Multiplexed WebSocket connection closed: {close_status_code} - {close_msg}")
+        self._release_contexts()
+
+    def _release_contexts(self):
+        """Forget every attached context, so their sends fail instead of going to a dead connection."""
+        with self._lock:
+            contexts = list(self.contexts.values())
+            self.contexts.clear()
+        for context in contexts:
+            context.multiplexer = None
+            context.session_id = None
+
+    def close(self):
+        """Close the connection; the server stops every session's player."""
+        self._release_contexts()
+
+        if self.websocket:
+            self.websocket.close()
+            self.websocket = None
+
+        if self.websocket_thread and self.websocket_thread.is_alive():
+            self.websocket_thread.join(timeout=1.0)
+            self.websocket_thread = None
+
+    def stats(self) -> Dict[str, int]:
+        """Attached sessions and frame counters."""
+        return {
+            "sessions": len(self.contexts),
+            "frames_received": self.frames_received,
+            "frames_sent": self.frames_sent,
+            "unrouted": self.unrouted,
+        }
+
+    def __enter__(self) -> "MultiplexConnection":
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+async def _run(args: argparse.Namespace):
+    from GameContext import GameContext
+
+    connection = MultiplexConnection(args.server_url)
+    if not connection.connect():
+        print(f"Could not connect to {connection.server_url}")
+        return
+    contexts: List[GameContext] = []
+    try:
+        started_at = time.perf_counter()
+        for _ in range(args.sessions):
+            context = GameContext(connection.server_url)
+            connection.attach(context)
+            contexts.append(context)
+        deadline = time.perf_counter() + args.timeout
+        while time.perf_counter() < deadline and any(c.player_id is None for c in contexts):
+            await asyncio.sleep(0.01)
+        ready = sum(c.player_id is not None for c in contexts)
+        print(f"{ready}/{args.sessions} sessions have a player ID after {time.perf_counter() - started_at:.2f}s")
+
+        if args.map_id:
+            joined = await asyncio.gather(*(c.join_map(args.map_id) for c in contexts if c.player_id),
+                                          return_exceptions=True)
+            print(f"{sum(r is True for r in joined)} joined {args.map_id}")
+        print(connection.stats())
+    finally:
+        for context in contexts:
+            context.dispose()
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open many player sessions over one multiplexed connection")
+    parser.add_argument("--server-url", default="ws://127.0.0.1:8080/ws")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--map-id", default=None, help="Also join every session to this map")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds to wait for player IDs")
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Fixed-size observation encoding of the card battle state.
+
+Layout of an observation vector (float32, padded with zeros to state_dim):
+
+    [0]        in fight flag
+    [1]        player's turn flag
+    [2:7]      player hit points, action points, deck count, discard count, hand size
+    [7:12]     opponent hit points, action points, deck count, discard count, hand size
+    [12:57]    player hand, count per card in card_library.ALL_CARDS order
+    [57:67]    player status effects, count per StatusEffectType
+    [67:77]    player status effects, summed magnitude per StatusEffectType
+    [77:87]    opponent status effects, count per StatusEffectType
+    [87:97]    opponent status effects, summed magnitude per StatusEffectType
+
+Values are raw game quantities; any normalization belongs to the model.
+
+The layout is split into regions that can be re-encoded independently, so
+message handlers only patch the slices their message touched.
+"""
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+from card_library import ALL_CARDS, CARD_INDEX
+from models import STATUS_EFFECT_TYPES, STATUS_EFFECT_INDEX
+
+# Default model input size, matches model.state_dim in config.json
+DEFAULT_STATE_DIM = 128
+
+NUM_CARDS = len(ALL_CARDS)
+NUM_STATUS_EFFECT_TYPES = len(STATUS_EFFECT_TYPES)
+
+IN_FIGHT_OFFSET = 0
+PLAYER_TURN_OFFSET = 1
+PLAYER_STATS_OFFSET = 2
+OPPONENT_STATS_OFFSET = PLAYER_STATS_OFFSET + 5
+PLAYER_HAND_OFFSET = OPPONENT_STATS_OFFSET + 5
+PLAYER_EFFECT_COUNT_OFFSET = PLAYER_HAND_OFFSET + NUM_CARDS
+PLAYER_EFFECT_MAGNITUDE_OFFSET = PLAYER_EFFECT_COUNT_OFFSET + NUM_STATUS_EFFECT_TYPES
+OPPONENT_EFFECT_COUNT_OFFSET = PLAYER_EFFECT_MAGNITUDE_OFFSET + NUM_STATUS_EFFECT_TYPES
+OPPONENT_EFFECT_MAGNITUDE_OFFSET = OPPONENT_EFFECT_COUNT_OFFSET + NUM_STATUS_EFFECT_TYPES
+
+# Number of slots actually used; the rest of state_dim stays zero
+OBSERVATION_SIZE = OPPONENT_EFFECT_MAGNITUDE_OFFSET + NUM_STATUS_EFFECT_TYPES
+
+# Dirty region flags, combine with |
+REGION_TURN = 1
+REGION_PLAYER_STATS = 2
+REGION_OPPONENT_STATS = 4
+REGION_PLAYER_HAND = 8
+REGION_PLAYER_EFFECTS = 16
+REGION_OPPONENT_EFFECTS = 32
+REGION_ALL = 63
+
+
+class ObservationEncoder:
+    """
+    Encodes GameContext card battle state into fixed-size float32 vectors.
+
+    The card id and status effect lookup tables are built once at import
+    time, so encoding only walks the hand and status effect lists.
+    """
+
+    def __init__(self, state_dim: int = DEFAULT_STATE_DIM):
+        """
+        Initialize a new instance of the ObservationEncoder class.
+
+        Args:
+            state_dim: Length of each observation vector
+        """
+        if state_dim < OBSERVATION_SIZE:
+            raise ValueError(f"state_dim must be at least {OBSERVATION_SIZE}, got {state_dim}")
+        self.state_dim = state_dim
+
+    def allocate(self, batch_size: Optional[int] = None) -> np.ndarray:
+        """Allocate a zeroed buffer for one observation or a batch of them."""
+        shape = (self.state_dim,) if batch_size is None else (batch_size, self.state_dim)
+        return np.zeros(shape, dtype=np.float32)
+
+    def encode(self, context: Any, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode one context.
+
+        Args:
+            context: The GameContext to encode
+            out: Optional preallocated float32 buffer of shape (state_dim,)
+
+        Returns:
+            The filled buffer
+        """
+        if out is None:
+            out = self.allocate()
+        self.update(context, out, REGION_ALL)
+        return out
+
+    def encode_batch(self, contexts: Sequence[Any], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Encode several contexts into the rows of one array.
+
+        Args:
+            contexts: The GameContexts to encode
+            out: Optional preallocated float32 buffer of shape (N, state_dim)
+
+        Returns:
+            The filled buffer
+        """
+        if out is None:
+            out = self.allocate(len(contexts))
+        elif out.shape[0] < len(contexts):
+            raise ValueError(f"Buffer has {out.shape[0]} rows for {len(contexts)} contexts")
+
+        for row, context in enumerate(contexts):
+            self.update(context, out[row], REGION_ALL)
+        return out
+
+    def update(self, context: Any, row: np.ndarray, regions: int = REGION_ALL):
+        """
+        Re-encode selected regions of one context in place.
+
+        Args:
+            context: The GameContext to encode
+            row: 1-D buffer of shape (state_dim,) holding the previous encoding
+            regions: REGION_* flags of the slices to rewrite
+        """
+        if regions == REGION_ALL:
+            row.fill(0.0)
+
+        if regions & REGION_TURN:
+            row[IN_FIGHT_OFFSET] = context.current_fight_id is not None
+            row[PLAYER_TURN_OFFSET] = context.is_player_turn and context.current_turn_player_id is not None
+
+        if regions & REGION_PLAYER_STATS:
+            o = PLAYER_STATS_OFFSET
+            row[o] = context.player_hit_points
+            row[o + 1] = context.player_action_points
+            row[o + 2] = context.player_deck_count
+            row[o + 3] = context.player_discard_pile_count
+            row[o + 4] = len(context.cards_in_hand)
+
+        if regions & REGION_OPPONENT_STATS:
+            o = OPPONENT_STATS_OFFSET
+            row[o] = context.opponent_hit_points
+            row[o + 1] = context.opponent_action_points
+            row[o + 2] = context.opponent_deck_count
+            row[o + 3] = context.opponent_discard_pile_count
+            row[o + 4] = len(context.opponent_cards_in_hand)
+
+        if regions & REGION_PLAYER_HAND:
+            if regions != REGION_ALL:
+                row[PLAYER_HAND_OFFSET:PLAYER_HAND_OFFSET + NUM_CARDS] = 0.0
+            encode_hand(context.cards_in_hand, row, PLAYER_HAND_OFFSET)
+
+        if regions & REGION_PLAYER_EFFECTS:
+            if regions != REGION_ALL:
+                row[PLAYER_EFFECT_COUNT_OFFSET:OPPONENT_EFFECT_COUNT_OFFSET] = 0.0
+            encode_status_effects(context.player_status_effects, row,
+                                  PLAYER_EFFECT_COUNT_OFFSET, PLAYER_EFFECT_MAGNITUDE_OFFSET)
+
+        if regions & REGION_OPPONENT_EFFECTS:
+            if regions != REGION_ALL:
+                row[OPPONENT_EFFECT_COUNT_OFFSET:OBSERVATION_SIZE] = 0.0
+            encode_status_effects(context.opponent_status_effects, row,
+                                  OPPONENT_EFFECT_COUNT_OFFSET, OPPONENT_EFFECT_MAGNITUDE_OFFSET)
+
+
+def encode_hand(hand: List[Any], row: np.ndarray, offset: int):
+    """Add per-card counts for a hand; cards outside the library are ignored."""
+    card_index = CARD_INDEX
+    for card in hand:
+        index = card_index.get(card.id)
+        if index is not None:
+            row[offset + index] += 1.0
+
+
+def encode_status_effects(effects: List[Any], row: np.ndarray, count_offset: int, magnitude_offset: int):
+    """Add per-type counts and summed magnitudes for a list of status effects."""
+    effect_index = STATUS_EFFECT_INDEX
+    for effect in effects:
+        index = effect_index.get(effect.type)
+        if index is not None:
+            row[count_offset + index] += 1.0
+            row[magnitude_offset + index] += effect.value
+
+
+# Shared encoder used by GameContext.encode_observation
+default_encoder = ObservationEncoder()
@@ -0,0 +1,231 @@
+"""
+Pathfinding over TilemapData using cached BFS distance fields.
+
+A distance field holds, for every tile, the number of moves to one target
+tile, with moves in 8 directions as the server allows (MapPosition.IsAdjacent).
+Following the field downhill from any tile gives a shortest path, so one
+field serves every agent heading for the same target. Fields are cached per
+(map_id, target) and dropped only when the map's tiles change.
+
+The server currently treats every tile as walkable and only rejects moves onto
+occupied tiles; blocked_tiles lets a cache exclude tile ids should terrain
+ever block movement. Player occupancy changes every move, so it is never baked
+into a field and is instead checked when choosing each step.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from models import MapPosition, TilemapData
+
+# Straight moves first so paths prefer them when a diagonal is no shorter
+NEIGHBOR_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+UNREACHABLE = -1
+
+
+class DistanceField:
+    """Moves from every tile of a map to one target tile."""
+    __slots__ = ("target", "distances", "width", "height")
+
+    def __init__(self, target: Tuple[int, int], distances: np.ndarray):
+        """
+        Initialize a new instance of the DistanceField class.
+
+        Args:
+            target: (x, y) of the target tile
+            distances: Read-only int32 array of shape (height, width), UNREACHABLE where blocked
+        """
+        self.target = target
+        self.distances = distances
+        self.height, self.width = distances.shape
+
+    @staticmethod
+    def compute(walkable: np.ndarray, target: Tuple[int, int]) -> "DistanceField":
+        """
+        Breadth-first search outwards from the target, one vectorized wavefront per move.
+
+        Args:
+            walkable: Bool array of shape (height, width)
+            target: (x, y) of the target tile
+
+        Returns:
+            The distance field; all UNREACHABLE if the target is off the map or blocked
+        """
+        height, width = walkable.shape
+        distances = np.full((height, width), UNREACHABLE, dtype=np.int32)
+        x, y = target
+        if 0 <= x < width and 0 <= y < height and walkable[y, x]:
+            unvisited = walkable.copy()
+            frontier = np.zeros_like(walkable)
+            frontier[y, x] = True
+            unvisited[y, x] = False
+            distance = 0
+            while frontier.any():
+                distances[frontier] = distance
+                distance += 1
+                # Dilate the frontier by one tile in all 8 directions
+                grown = frontier.copy()
+                grown[1:, :] |= frontier[:-1, :]
+                grown[:-1, :] |= frontier[1:, :]
+                row_grown = grown.copy()
+                row_grown[:, 1:] |= grown[:, :-1]
+                row_grown[:, :-1] |= grown[:, 1:]
+                frontier = row_grown & unvisited
+                unvisited &= ~frontier
+        distances.flags.writeable = False
+        return DistanceField(target, distances)
+
+    def distance(self, x: int, y: int) -> int:
+        """Moves from a tile to the target, UNREACHABLE if there is no path or the tile is off the map."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return int(self.distances[y, x])
+        return UNREACHABLE
+
+    def next_step(self, x: int, y: int,
+                  occupied: Optional[Callable[[int, int], bool]] = None) -> Optional[Tuple[int, int]]:
+        """
+        Best neighbouring tile to move to from (x, y).
+
+        Args:
+            x: Current tile column
+            y: Current tile row
+            occupied: Optional check for tiles that cannot be entered right now
+
+        Returns:
+            (x, y) of a free neighbour closer to the target, or None if there is none
+        """
+        current = self.distance(x, y)
+        if current <= 0:
+            return None
+        distances = self.distances
+        best = None
+        best_distance = current
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx = x + dx
+            ny = y + dy
+            if not (0 <= nx < self.width and 0 <= ny < self.height):
+                continue
+            distance = int(distances[ny, nx])
+            if UNREACHABLE < distance < best_distance and (occupied is None or not occupied(nx, ny)):
+                best = (nx, ny)
+                best_distance = distance
+        return best
+
+    def path(self, x: int, y: int, stop_distance: int = 0) -> List[MapPosition]:
+        """
+        Steps from (x, y) towards the target, excluding the start tile.
+
+        Args:
+            x: Start tile column
+            y: Start tile row
+            stop_distance: Stop once this many moves from the target, e.g. 1 to end next to it
+
+        Returns:
+            The positions to move through in order, empty if unreachable or already close enough
+        """
+        steps = []
+        if self.distance(x, y) == UNREACHABLE:
+            return steps
+        while self.distance(x, y) > stop_distance:
+            x, y = self.next_step(x, y)
+            steps.append(MapPosition(x, y))
+        return steps
+
+
+class PathCache:
+    """
+    LRU cache of distance fields keyed by (map_id, target), shared by every context in a process.
+
+    Each map id remembers the fingerprint of the tiles its fields were built
+    from; a lookup with different tiles drops that map's fields.
+    """
+
+    def __init__(self, max_fields: int = 1024, blocked_tiles: Iterable[int] = ()):
+        """
+        Initialize a new instance of the PathCache class.
+
+        Args:
+            max_fields: Distance fields kept before the least recently used are evicted
+            blocked_tiles: Tile ids that cannot be walked on
+        """
+        self.max_fields = max_fields
+        self.blocked_tiles: FrozenSet[int] = frozenset(blocked_tiles)
+        self.hits = 0
+        self.misses = 0
+        self._fields: "OrderedDict[Tuple[str, Tuple[int, int]], DistanceField]" = OrderedDict()
+        self._fingerprints: Dict[str, int] = {}
+        self._walkable: Dict[str, np.ndarray] = {}
+        # Contexts run handlers on their own websocket threads
+        self._lock = threading.Lock()
+
+    def distance_field(self, map_id: str, tilemap: TilemapData, target: Tuple[int, int]) -> DistanceField:
+        """
+        Get the distance field to a target, computing it on a miss.
+
+        Args:
+            map_id: Id of the map the tilemap belongs to
+            tilemap: The map's tiles
+            target: (x, y) of the target tile
+
+        Returns:
+            The shared, read-only distance field
+        """
+        key = (map_id, target)
+        with self._lock:
+            if self._fingerprints.get(map_id) != tilemap.fingerprint:
+                self._invalidate(map_id)
+                self._fingerprints[map_id] = tilemap.fingerprint
+            field = self._fields.get(key)
+            if field is not None:
+                self._fields.move_to_end(key)
+                self.hits += 1
+                return field
+            self.misses += 1
+            walkable = self._walkable.get(map_id)
+            if walkable is None:
+                walkable = self._build_walkable(tilemap)
+                self._walkable[map_id] = walkable
+
+        # Compute outside the lock; a concurrent miss on the same key just computes twice
+        field = DistanceField.compute(walkable, target)
+        with self._lock:
+            if self._fingerprints.get(map_id) == tilemap.fingerprint:
+                self._fields[key] = field
+                while len(self._fields) > self.max_fields:
+                    self._fields.popitem(last=False)
+        return field
+
+    def find_path(self, map_id: str, tilemap: TilemapData, start: MapPosition, target: MapPosition,
+                  stop_distance: int = 0) -> List[MapPosition]:
+        """Shortest step sequence from start to target, see DistanceField.path."""
+        field = self.distance_field(map_id, tilemap, (target.x, target.y))
+        return field.path(start.x, start.y, stop_distance)
+
+    def invalidate(self, map_id: Optional[str] = None):
+        """Drop the fields of one map, or of every map."""
+        with self._lock:
+            if map_id is None:
+                self._fields.clear()
+                self._fingerprints.clear()
+                self._walkable.clear()
+            else:
+                self._invalidate(map_id)
+                self._fingerprints.pop(map_id, None)
+
+    def _invalidate(self, map_id: str):
+        for key in [key for key in self._fields if key[0] == map_id]:
+            del self._fields[key]
+        self._walkable.pop(map_id, None)
+
+    def _build_walkable(self, tilemap: TilemapData) -> np.ndarray:
+        tiles = np.asarray(tilemap.tiles, dtype=np.int32).reshape(tilemap.height, tilemap.width)
+        if not self.blocked_tiles:
+            return np.ones(tiles.shape, dtype=bool)
+        return ~np.isin(tiles, list(self.blocked_tiles))
+
+
+# Shared by every GameContext in the process
+default_path_cache = PathCache()
@@ -0,0 +1,558 @@
+"""
+Monte Carlo tree search planner for card play.
+
+The tree covers the player's current turn: every node is a fight state and
+every edge plays one affordable card or ends the turn, so a path from the root
+is a card sequence within the action point budget. Leaves are scored by random
+rollouts that carry the fight on for a few turns under the simulator's rules
+(FightState, the card effect handlers and the status effect semantics), so
+the planner plays by the same rules as the server.
+
+What the client cannot see is sampled per iteration: deck and discard pile
+contents are random library cards of the known counts, as server decks are,
+and dodge rolls come from the iteration's random source. Averaging over
+iterations gives the expected (expectimax) value of each action.
+
+Different orders of the same cards usually reach the same state, so nodes are
+shared through a transposition table keyed on a canonical form of the state
+(hands sorted, effect ids and deck contents left out). Each worker process
+keeps its table between decisions.
+
+Search is root-parallel: every worker grows its own tree until the wall-clock
+budget runs out and the root statistics are summed.
+"""
+import argparse
+import itertools
+import math
+import multiprocessing as mp
+import random
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from card_library import get_card
+from models import CardInfo, FightSnapshot
+from simulator import (STARTING_HP, FightSimulator, FightState, PlayerFightState, StatusEffect,
+                       apply_card_effects, random_deck)
+
+# Action that ends the turn; every other action is a card id
+END_TURN = "EndTurn"
+
+DEFAULT_BUDGET = 0.1
+DEFAULT_EXPLORATION = 1.0
+DEFAULT_ROLLOUT_TURNS = 4
+DEFAULT_MAX_NODES = 200_000
+
+# Hit point difference at which a rollout that did not finish is scored as nearly decided
+VALUE_SCALE = float(STARTING_HP)
+
+
+class SideView(NamedTuple):
+    """What the client knows about one player, in picklable form."""
+    hit_points: int
+    max_hit_points: int
+    action_points: int
+    hand: Tuple[CardInfo, ...]
+    effects: Tuple[Tuple[str, str, str, int, int], ...]  # (id, name, type, magnitude, duration)
+    deck_count: int
+    discard_pile_count: int
+
+
+class RootView(NamedTuple):
+    """The position to search from, with the player to move first."""
+    player_id: str
+    opponent_id: str
+    player: SideView
+    opponent: SideView
+
+
+class Decision(NamedTuple):
+    """Result of a search."""
+    action: str
+    sequence: List[str]
+    visits: Dict[str, int]
+    values: Dict[str, float]
+    iterations: int
+
+
+def _side_view(hit_points: int, action_points: int, hand: Sequence[CardInfo], effects: Sequence[Any],
+               deck_count: int, discard_pile_count: int) -> SideView:
+    # The server does not send max hit points; only Fortify raises them, and its effect never expires
+    max_hit_points = STARTING_HP + sum(e.value for e in effects if e.type == "MaxHealthBoost")
+    return SideView(
+        hit_points, max(max_hit_points, hit_points), action_points,
+        # Hand cards arrive without type and subtype; the library has them
+        tuple(get_card(card.id) or card for card in hand),
+        tuple((e.id or f"effect_{i}", e.name or e.type, e.type, e.value, e.duration) for i, e in enumerate(effects)),
+        deck_count, discard_pile_count)
+
+
+def root_view(player_id: str, snapshot: FightSnapshot) -> RootView:
+    """
+    Build the search root from a GameContext snapshot.
+
+    Args:
+        player_id: The player to plan for, whose turn it is
+        snapshot: GameContext.snapshot() of that player
+
+    Returns:
+        The root view
+    """
+    return RootView(
+        player_id, snapshot.opponent_id,
+        _side_view(snapshot.player_hit_points, snapshot.player_action_points, snapshot.player_hand,
+                   snapshot.player_status_effects, snapshot.player_deck_count, snapshot.player_discard_pile_count),
+        _side_view(snapshot.opponent_hit_points, snapshot.opponent_action_points, snapshot.opponent_hand,
+                   snapshot.opponent_status_effects, snapshot.opponent_deck_count,
+                   snapshot.opponent_discard_pile_count))
+
+
+#region Rules
+
+class _RolloutState(FightState):
+    """FightState with counter effect ids, as uuid4 would dominate rollouts."""
+
+    def __init__(self, player_id: str, opponent_id: str, rng: random.Random):
+        self.current_turn_player_id = player_id
+        self.player_states: Dict[str, PlayerFightState] = {}
+        self._random = rng
+        self._effect_ids = itertools.count()
+
+    def new_effect_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._effect_ids)}"
+
+
+def _player_state(side: SideView, rng: random.Random) -> PlayerFightState:
+    state = PlayerFightState(side.max_hit_points, random_deck(rng, side.deck_count), rng)
+    state.hit_points = side.hit_points
+    state.action_points = side.action_points
+    state.hand = list(side.hand)
+    state.discard_pile = random_deck(rng, side.discard_pile_count)
+    state.active_effects = [StatusEffect(effect_id, name, "", duration, effect_type, magnitude, None)
+                            for effect_id, name, effect_type, magnitude, duration in side.effects]
+    return state
+
+
+def determinize(root: RootView, rng: random.Random) -> _RolloutState:
+    """A full fight state consistent with the root, with hidden cards sampled."""
+    state = _RolloutState(root.player_id, root.opponent_id, rng)
+    state.player_states[root.player_id] = _player_state(root.player, rng)
+    state.player_states[root.opponent_id] = _player_state(root.opponent, rng)
+    return state
+
+
+def _side_key(state: PlayerFightState) -> Tuple:
+    return (state.hit_points, state.max_hit_points, state.action_points,
+            tuple(sorted(card.id for card in state.hand)),
+            tuple(sorted((e.type, e.magnitude, e.duration) for e in state.active_effects)),
+            len(state.cards), len(state.discard_pile))
+
+
+def canonical_key(state: FightState, player_id: str, opponent_id: str) -> Tuple:
+    """Transposition key of a state: equal for states that differ only in card order or effect ids."""
+    return (state.current_turn_player_id == player_id,
+            _side_key(state.player_states[player_id]),
+            _side_key(state.player_states[opponent_id]))
+
+
+def legal_actions(state: FightState, player_id: str) -> List[str]:
+    """Distinct affordable cards in hand, then END_TURN."""
+    player_state = state.player_states[player_id]
+    action_points = player_state.action_points
+    return sorted({card.id for card in player_state.hand if card.cost <= action_points}) + [END_TURN]
+
+
+def play(state: FightState, player_id: str, card_id: str):
+    """Play a card from the hand and apply its effects."""
+    card = next(c for c in state.player_states[player_id].hand if c.id == card_id)
+    state.play_card(player_id, card)
+    apply_card_effects(state, player_id, state.other_player_id(player_id), card)
+
+
+def end_turn(state: FightState, player_id: str):
+    """Discard the hand and start the opponent's turn, as FightActor does."""
+    state.discard_hand(player_id)
+    other = state.other_player_id(player_id)
+    state.start_turn(other)
+    state.draw_cards(other)
+
+
+def rollout(state: FightState, player_id: str, max_turns: int, rng: random.Random) -> float:
+    """Play random affordable cards for both sides for up to max_turns turns and score the result."""
+    turns = 0
+    while not state.is_game_over:
+        current = state.current_turn_player_id
+        hand = state.player_states[current].hand
+        while not state.is_game_over:
+            action_points = state.player_states[current].action_points
+            playable = [card for card in hand if card.cost <= action_points]
+            if not playable:
+                break
+            card = rng.choice(playable)
+            state.play_card(current, card)
+            apply_card_effects(state, current, state.other_player_id(current), card)
+        turns += 1
+        if state.is_game_over or turns > max_turns:
+            break
+        end_turn(state, current)
+    return evaluate(state, player_id)
+
+
+def evaluate(state: FightState, player_id: str) -> float:
+    """Value of a state for a player: 1 won, 0 lost, otherwise squashed hit point difference."""
+    own = state.player_states[player_id].hit_points
+    other = state.player_states[state.other_player_id(player_id)].hit_points
+    if own <= 0 or other <= 0:
+        return 0.5 if own <= 0 and other <= 0 else float(own > 0)
+    return 0.5 + 0.5 * math.tanh((own - other) / VALUE_SCALE)
+
+#endregion
+
+
+#region Search
+
+class _Node:
+    """Statistics of one state's actions."""
+    __slots__ = ("actions", "visits", "values", "total")
+
+    def __init__(self, actions: List[str]):
+        self.actions = actions
+        self.visits = [0] * len(actions)
+        self.values = [0.0] * len(actions)
+        self.total = 0
+
+    def select(self, exploration: float, rng: random.Random) -> int:
+        """Index of the next action to try: untried ones first, then UCB1."""
+        untried = [i for i, n in enumerate(self.visits) if n == 0]
+        if untried:
+            return rng.choice(untried)
+        log_total = math.log(self.total)
+        best_index = 0
+        best_score = -1.0
+        for i, (n, w) in enumerate(zip(self.visits, self.values)):
+            score = w / n + exploration * math.sqrt(log_total / n)
+            if score > best_score:
+                best_index = i
+                best_score = score
+        return best_index
+
+
+class MctsSearch:
+    """Single-process UCT search over one turn, with a transposition table."""
+
+    def __init__(self, root: RootView, rng: random.Random, exploration: float = DEFAULT_EXPLORATION,
+                 rollout_turns: int = DEFAULT_ROLLOUT_TURNS, table: Optional[Dict[Tuple, _Node]] = None):
+        """
+        Initialize a new instance of the MctsSearch class.
+
+        Args:
+            root: The position to search from
+            rng: Random source for sampling and rollouts
+            exploration: UCB1 exploration constant
+            rollout_turns: Turns a rollout plays past the leaf before scoring
+            table: Transposition table to use, possibly filled by earlier searches
+        """
+        self.root = root
+        self.rng = rng
+        self.exploration = exploration
+        self.rollout_turns = rollout_turns
+        self.table: Dict[Tuple, _Node] = {} if table is None else table
+        self.iterations = 0
+        self.root_key = canonical_key(determinize(root, rng), root.player_id, root.opponent_id)
+
+    def run(self, deadline: float, max_iterations: Optional[int] = None) -> int:
+        """
+        Search until time.time() reaches deadline or max_iterations are done.
+
+        Returns:
+            int: Iterations run by this call
+        """
+        done = 0
+        while (max_iterations is None or done < max_iterations) and (done % 16 or time.time() < deadline):
+            self._iterate()
+            done += 1
+        self.iterations += done
+        return done
+
+    def _iterate(self):
+        root = self.root
+        player_id = root.player_id
+        rng = self.rng
+        table = self.table
+        state = determinize(root, rng)
+        key = self.root_key
+        path: List[Tuple[_Node, int]] = []
+        while True:
+            if state.is_game_over:
+                value = evaluate(state, player_id)
+                break
+            node = table.get(key)
+            if node is None:
+                table[key] = _Node(legal_actions(state, player_id))
+                value = rollout(state, player_id, self.rollout_turns, rng)
+                break
+            index = node.select(self.exploration, rng)
+            path.append((node, index))
+            action = node.actions[index]
+            if action == END_TURN:
+                end_turn(state, player_id)
+                value = rollout(state, player_id, self.rollout_turns, rng)
+                break
+            play(state, player_id, action)
+            key = canonical_key(state, player_id, root.opponent_id)
+        for node, index in path:
+            node.visits[index] += 1
+            node.values[index] += value
+            node.total += 1
+
+    def root_stats(self) -> Dict[str, Tuple[int, float]]:
+        """Action -> (visits, summed value) at the root."""
+        node = self.table.get(self.root_key)
+        if node is None:
+            return {}
+        return {action: (n, w) for action, n, w in zip(node.actions, node.visits, node.values)}
+
+    def principal_variation(self, first_action: Optional[str] = None) -> List[str]:
+        """Most visited action sequence from the root, ending with END_TURN where the tree reaches it."""
+        root = self.root
+        state = determinize(root, self.rng)
+        key = self.root_key
+        sequence: List[str] = []
+        while not state.is_game_over:
+            node = self.table.get(key)
+            if node is None or node.total == 0:
+                break
+            if first_action is not None and not sequence and first_action in node.actions:
+                action = first_action
+            else:
+                action = node.actions[max(range(len(node.actions)), key=node.visits.__getitem__)]
+            sequence.append(action)
+            if action == END_TURN:
+                break
+            play(state, root.player_id, action)
+            key = canonical_key(state, root.player_id, root.opponent_id)
+        return sequence
+
+
+# Per-process transposition table, kept between decisions
+_table: Dict[Tuple, _Node] = {}
+
+
+def _search_worker(args: Tuple) -> Tuple[Dict[str, Tuple[int, float]], int, List[str]]:
+    """Run one root-parallel search in a pool worker."""
+    global _table
+    root, seed, deadline, exploration, rollout_turns, max_nodes = args
+    if len(_table) > max_nodes:
+        _table = {}
+    search = MctsSearch(root, random.Random(seed), exploration, rollout_turns, _table)
+    search.run(deadline)
+    # The table stays behind; only the root statistics and the line of play travel back
+    return search.root_stats(), search.iterations, search.principal_variation()
+
+#endregion
+
+
+class MctsPlanner:
+    """
+    Chooses card plays with root-parallel MCTS under a wall-clock budget.
+
+    With workers=0 the search runs in the calling process; otherwise a pool
+    of spawned processes searches in parallel and stays up between decisions.
+    """
+
+    def __init__(self, budget: float = DEFAULT_BUDGET, workers: int = 0,
+                 exploration: float = DEFAULT_EXPLORATION, rollout_turns: int = DEFAULT_ROLLOUT_TURNS,
+                 max_nodes: int = DEFAULT_MAX_NODES, seed: Optional[int] = None):
+        """
+        Initialize a new instance of the MctsPlanner class.
+
+        Args:
+            budget: Seconds of search per decision
+            workers: Search processes, 0 to search in-process
+            exploration: UCB1 exploration constant
+            rollout_turns: Turns a rollout plays past the leaf before scoring
+            max_nodes: Transposition table size at which a process starts a fresh table
+            seed: Random seed
+        """
+        self.budget = budget
+        self.workers = workers
+        self.exploration = exploration
+        self.rollout_turns = rollout_turns
+        self.max_nodes = max_nodes
+        self.rng = random.Random(seed)
+        self.decisions = 0
+        self.iterations = 0
+        self._table: Dict[Tuple, _Node] = {}
+        self._pool = None
+
+    def start(self):
+        """Start the worker pool, if any."""
+        if self.workers > 0 and self._pool is None:
+            self._pool = mp.get_context("spawn").Pool(self.workers)
+
+    def close(self):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "MctsPlanner":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def decide(self, root: RootView, budget: Optional[float] = None) -> Decision:
+        """
+        Search a position and pick the most visited root action.
+
+        Args:
+            root: The position, with root.player_id to move
+            budget: Seconds to search, self.budget by default
+
+        Returns:
+            The decision; action is a card id or END_TURN
+        """
+        affordable = [c for c in root.player.hand if c.cost <= root.player.action_points]
+        if not affordable:
+            return Decision(END_TURN, [END_TURN], {END_TURN: 0}, {END_TURN: 0.0}, 0)
+
+        deadline = time.time() + (self.budget if budget is None else budget)
+        if self.workers > 0:
+            self.start()
+            jobs = [(root, self.rng.getrandbits(64), deadline, self.exploration, self.rollout_turns, self.max_nodes)
+                    for _ in range(self.workers)]
+            results = self._pool.map(_search_worker, jobs)
+        else:
+            if len(self._table) > self.max_nodes:
+                self._table = {}
+            search = MctsSearch(root, self.rng, self.exploration, self.rollout_turns, self._table)
+            search.run(deadline)
+            results = [(search.root_stats(), search.iterations, search.principal_variation())]
+
+        visits: Dict[str, int] = {}
+        values: Dict[str, float] = {}
+        iterations = 0
+        for stats, worker_iterations, _ in results:
+            iterations += worker_iterations
+            for action, (n, w) in stats.items():
+                visits[action] = visits.get(action, 0) + n
+                values[action] = values.get(action, 0.0) + w
+        action = max(visits, key=lambda a: (visits[a], values[a])) if visits else END_TURN
+        # The line of play from the worker that explored the chosen action most
+        best = max(results, key=lambda result: result[0].get(action, (0, 0.0))[0])
+        sequence = best[2] if best[2] and best[2][0] == action else [action]
+
+        self.decisions += 1
+        self.iterations += iterations
+        return Decision(action, sequence, visits,
+                        {a: values[a] / visits[a] for a in visits if visits[a]}, iterations)
+
+    def decide_for(self, context: Any, budget: Optional[float] = None) -> Decision:
+        """Search the current card-battle state of a GameContext."""
+        return self.decide(root_view(context.player_id, context.snapshot()), budget)
+
+
+class PlannerAgent:
+    """
+    Plays a GameContext's turns with an MctsPlanner.
+
+    Attached as a server message callback, every ExtFightStateUpdate that
+    makes it this player's turn triggers a search, and the chosen card (or
+    the end of the turn) is sent; the next state update triggers the next
+    decision. Planning runs on the thread that dispatches messages, so
+    threaded contexts should use an inbound_capacity to keep the socket
+    drained meanwhile. No new decision is made until the state has changed
+    since the last action sent, so step() may also be driven by hand.
+    """
+
+    def __init__(self, context: Any, planner: MctsPlanner, attach: bool = True):
+        """
+        Initialize a new instance of the PlannerAgent class.
+
+        Args:
+            context: The GameContext to play for
+            planner: The planner to decide with
+            attach: Register as a server message callback on the context
+        """
+        self.context = context
+        self.planner = planner
+        self.last_decision: Optional[Decision] = None
+        self._sent_version: Optional[int] = None
+        if attach:
+            context.add_server_message_callback(self._on_server_message)
+
+    def _on_server_message(self, msg: Any):
+        if msg.message_type in ("ExtFightStateUpdate", "ExtTurnEnded", "ExtFightEnded"):
+            self.step()
+
+    def step(self) -> bool:
+        """
+        Decide and send one action if it is this player's turn.
+
+        Returns:
+            bool: True if an action was sent
+        """
+        context = self.context
+        if not (context.is_in_fight and context.is_player_turn):
+            return False
+        if context.observation_version == self._sent_version:
+            # Still waiting for the server to answer the last action
+            return False
+        version = context.observation_version
+        decision = self.planner.decide_for(context)
+        self.last_decision = decision
+        if decision.action == END_TURN:
+            sent = context.send({"MessageType": "ExtEndTurnRequest"})
+        else:
+            sent = context.send({"MessageType": "ExtPlayCardRequest", "CardId": decision.action})
+        if sent:
+            self._sent_version = version
+        return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the MCTS planner against random play in the simulator")
+    parser.add_argument("--fights", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Seconds of search per decision")
+    parser.add_argument("--workers", type=int, default=0, help="Search processes, 0 to search in-process")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from GameContext import GameContext
+
+    rng = random.Random(args.seed)
+    wins = 0
+    with MctsPlanner(args.budget, args.workers, seed=args.seed) as planner:
+        for fight in range(args.fights):
+            sim = FightSimulator(seed=args.seed + fight, include_svg=False)
+            contexts = {}
+            for player_id in (sim.player1_id, sim.player2_id):
+                contexts[player_id] = GameContext("ws://localhost")
+                sim.attach(contexts[player_id], player_id)
+            # Alternate who moves first
+            planner_id = sim.player1_id if fight % 2 == 0 else sim.player2_id
+            agent = PlannerAgent(contexts[planner_id], planner, attach=False)
+            sim.start_fight()
+            for _ in range(1000):
+                if not sim.is_active:
+                    break
+                turn_id = sim.state.current_turn_player_id
+                if turn_id == planner_id:
+                    agent.step()
+                    continue
+                context = contexts[turn_id]
+                playable = [c for c in context.cards_in_hand if c.cost <= context.player_action_points]
+                if playable:
+                    context.send({"MessageType": "ExtPlayCardRequest", "CardId": rng.choice(playable).id})
+                else:
+                    context.send({"MessageType": "ExtEndTurnRequest"})
+            wins += sim.winner_id == planner_id
+            print(f"fight {fight}: winner {'planner' if sim.winner_id == planner_id else 'random'}")
+        print(f"planner won {wins}/{args.fights}, "
+              f"{planner.iterations / max(planner.decisions, 1):,.0f} iterations per decision")
+
+
+if __name__ == "__main__":
+    main()
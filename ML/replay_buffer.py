@@ -0,0 +1,613 @@
+"""
+Shared-memory prioritized replay buffer fed from GameContext transitions.
+
+Transitions live in preallocated arrays in one shared memory segment:
+
+    observations        float32 (capacity, state_dim)
+    actions             int64   (capacity,)
+    rewards             float32 (capacity,)
+    dones               uint8   (capacity,)
+    next_observations   float32 (capacity, state_dim)
+
+The slots are split into one shard per writer. A writer is the only process
+that touches its shard and its published counter, so writers append without
+locks, like SharedRingBuffer in agent_pool.py. Each shard is a ring: once
+full, the writer overwrites its oldest transitions.
+
+The sum-tree of priorities belongs to the learner process alone. Before each
+sample the learner picks up the slots published since the last one at the
+current maximum priority. Sampling is proportional to priority ** alpha, with
+importance weights (N * P(i)) ** -beta normalized by the batch maximum.
+
+A sampled slot that its writer overwrote while the batch was being gathered
+comes back with valid False and weight 0, so a lagging learner never trains
+on a torn record.
+
+Rewards come from the card battle: hit point changes seen through
+ExtEffectApplied and ExtFightStateUpdate (damage dealt minus damage taken,
+times HIT_POINT_REWARD), plus WIN_REWARD or -WIN_REWARD on ExtFightEnded,
+which also sets the done flag.
+
+Run from the ML directory, e.g.:
+    python replay_buffer.py --writers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from messages import decode_message
+from observation import DEFAULT_STATE_DIM
+
+DEFAULT_CAPACITY = 10000  # training.replay_buffer_size in config.json
+DEFAULT_BATCH_SIZE = 64  # training.batch_size in config.json
+DEFAULT_ALPHA = 0.6
+DEFAULT_BETA = 0.4
+PRIORITY_EPSILON = 1e-6
+
+HIT_POINT_REWARD = 0.1
+WIN_REWARD = 1.0
+
+
+class ReplayBatch(NamedTuple):
+    """A sampled batch; the arrays are reused by the next sample() call."""
+    observations: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    dones: np.ndarray
+    next_observations: np.ndarray
+    weights: np.ndarray
+    indices: np.ndarray
+    sequence: np.ndarray
+    valid: np.ndarray
+
+
+def _layout(capacity: int, state_dim: int, num_writers: int) -> Tuple[Dict[str, Tuple[int, Tuple[int, ...], Any]], int]:
+    """Offset, shape and dtype of every array in the segment, and the segment size."""
+    fields = (
+        ("counters", (num_writers,), np.int64),
+        ("observations", (capacity, state_dim), np.float32),
+        ("next_observations", (capacity, state_dim), np.float32),
+        ("actions", (capacity,), np.int64),
+        ("rewards", (capacity,), np.float32),
+        ("dones", (capacity,), np.uint8),
+    )
+    layout = {}
+    offset = 0
+    for name, shape, dtype in fields:
+        layout[name] = (offset, shape, dtype)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        # Keep every array 8-byte aligned
+        offset += (size + 7) // 8 * 8
+    return layout, max(offset, 1)
+
+
+class _SharedArrays:
+    """Views of the replay arrays in a shared memory segment."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, capacity: int, state_dim: int, num_writers: int):
+        self.shm = shm
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.num_writers = num_writers
+        # Slots beyond num_writers * shard_capacity stay unused
+        self.shard_capacity = capacity // num_writers
+        layout, _ = _layout(capacity, state_dim, num_writers)
+        for name, (offset, shape, dtype) in layout.items():
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+
+    @property
+    def spec(self) -> Tuple[str, int, int, int]:
+        """What a writer process needs to attach: (name, capacity, state_dim, num_writers)."""
+        return self.shm.name, self.capacity, self.state_dim, self.num_writers
+
+    def _release(self):
+        # Views into shared memory must go before the segment is closed
+        for name in ("counters", "observations", "next_observations", "actions", "rewards", "dones"):
+            setattr(self, name, None)
+        self.shm.close()
+
+
+class SumTree:
+    """Binary tree of priority sums over a power-of-two leaf array, updated and queried in batches."""
+
+    def __init__(self, capacity: int):
+        """
+        Initialize a new instance of the SumTree class.
+
+        Args:
+            capacity: Number of leaves
+        """
+        self.capacity = capacity
+        self.leaf_offset = 1 << max(capacity - 1, 0).bit_length()
+        self.depth = self.leaf_offset.bit_length() - 1
+        # Node 1 is the root, node i has children 2i and 2i + 1
+        self.nodes = np.zeros(2 * self.leaf_offset, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        return float(self.nodes[1])
+
+    def get(self, indices: np.ndarray) -> np.ndarray:
+        """Priorities of leaves."""
+        return self.nodes[self.leaf_offset + indices]
+
+    def update(self, indices: np.ndarray, priorities: np.ndarray):
+        """Set leaf priorities and recompute their ancestors, one level per pass."""
+        nodes = self.nodes
+        positions = self.leaf_offset + np.asarray(indices, dtype=np.int64)
+        nodes[positions] = priorities
+        for _ in range(self.depth):
+            positions = np.unique(positions >> 1)
+            nodes[positions] = nodes[2 * positions] + nodes[2 * positions + 1]
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """Leaf index of each prefix-sum value in [0, total)."""
+        nodes = self.nodes
+        positions = np.ones(len(values), dtype=np.int64)
+        values = np.array(values, dtype=np.float64)
+        for _ in range(self.depth):
+            left = 2 * positions
+            left_sum = nodes[left]
+            # Rounding can leave a value past the left sum with nothing on the right
+            go_right = (values >= left_sum) & (nodes[left + 1] > 0.0)
+            values -= np.where(go_right, left_sum, 0.0)
+            positions = left + go_right
+        return positions - self.leaf_offset
+
+
+class ReplayWriter:
+    """
+    Appends transitions to one shard of a PrioritizedReplayBuffer.
+
+    Create one per process from the buffer's spec. Appends from threads of
+    the same process are serialized by a thread lock; processes never wait
+    for each other.
+    """
+
+    def __init__(self, spec: Tuple[str, int, int, int], writer_id: int):
+        """
+        Initialize a new instance of the ReplayWriter class.
+
+        Args:
+            spec: PrioritizedReplayBuffer.spec of the learner's buffer
+            writer_id: Shard to write, in [0, num_writers)
+        """
+        name, capacity, state_dim, num_writers = spec
+        if not 0 <= writer_id < num_writers:
+            raise ValueError(f"writer_id must be in [0, {num_writers}), got {writer_id}")
+        self.writer_id = writer_id
+        self._arrays = _SharedArrays(shared_memory.SharedMemory(name=name), capacity, state_dim, num_writers)
+        self._base = writer_id * self._arrays.shard_capacity
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        """Transitions appended by this writer so far."""
+        return int(self._arrays.counters[self.writer_id])
+
+    def append(self, observation: np.ndarray, action: int, reward: float, done: bool,
+               next_observation: np.ndarray):
+        """Write one transition, overwriting the shard's oldest once it is full."""
+        arrays = self._arrays
+        with self._lock:
+            count = int(arrays.counters[self.writer_id])
+            slot = self._base + count % arrays.shard_capacity
+            arrays.observations[slot] = observation
+            arrays.actions[slot] = action
+            arrays.rewards[slot] = reward
+            arrays.dones[slot] = done
+            arrays.next_observations[slot] = next_observation
+            # Publish only after the data is in place
+            arrays.counters[self.writer_id] = count + 1
+
+    def close(self):
+        """Release the mapping; the learner owns the segment."""
+        self._arrays._release()
+
+
+class PrioritizedReplayBuffer:
+    """
+    Learner side: owns the shared segment and the sum-tree, and samples batches.
+
+    Writers attach with ReplayWriter(buffer.spec, writer_id). The learner may
+    also append directly through add().
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, state_dim: int = DEFAULT_STATE_DIM,
+                 num_writers: int = 1, alpha: float = DEFAULT_ALPHA, beta: float = DEFAULT_BETA,
+                 seed: Optional[int] = None):
+        """
+        Initialize a new instance of the PrioritizedReplayBuffer class.
+
+        Args:
+            capacity: Total transitions held, split evenly between writers
+            state_dim: Length of each observation vector
+            num_writers: Number of ReplayWriter shards
+            alpha: Priority exponent, 0 for uniform sampling
+            beta: Importance weight exponent, usually annealed towards 1 by the caller
+            seed: Random seed for sampling
+        """
+        if num_writers < 1 or capacity < num_writers:
+            raise ValueError(f"Need 1 <= num_writers <= capacity, got {num_writers} writers for {capacity} slots")
+        self.alpha = alpha
+        self.beta = beta
+        self.max_priority = 1.0
+        self.rng = np.random.default_rng(seed)
+
+        _, size = _layout(capacity, state_dim, num_writers)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        self._arrays = _SharedArrays(shm, capacity, state_dim, num_writers)
+        self._arrays.counters[:] = 0
+        self.tree = SumTree(capacity)
+        # Absolute append index held by each slot, -1 while empty
+        self._slot_sequence = np.full(capacity, -1, dtype=np.int64)
+        self._synced = np.zeros(num_writers, dtype=np.int64)
+        self._size = 0
+        self._own_writer: Optional[ReplayWriter] = None
+        self._batch: Optional[ReplayBatch] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], num_writers: int = 1, **kwargs) -> "PrioritizedReplayBuffer":
+        """Create a buffer sized by the training and model sections of config.json."""
+        training = config.get("training", {})
+        model = config.get("model", {})
+        return cls(training.get("replay_buffer_size", DEFAULT_CAPACITY),
+                   model.get("state_dim", DEFAULT_STATE_DIM), num_writers, **kwargs)
+
+    @property
+    def spec(self) -> Tuple[str, int, int, int]:
+        """Arguments for ReplayWriter in another process."""
+        return self._arrays.spec
+
+    @property
+    def observations(self) -> np.ndarray:
+        """The shared observation array itself, for learners that gather on their own."""
+        return self._arrays.observations
+
+    @property
+    def next_observations(self) -> np.ndarray:
+        return self._arrays.next_observations
+
+    @property
+    def actions(self) -> np.ndarray:
+        return self._arrays.actions
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._arrays.rewards
+
+    @property
+    def dones(self) -> np.ndarray:
+        return self._arrays.dones
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, observation: np.ndarray, action: int, reward: float, done: bool,
+            next_observation: np.ndarray):
+        """Append from the learner process, through writer 0's shard."""
+        if self._own_writer is None:
+            self._own_writer = ReplayWriter(self.spec, 0)
+        self._own_writer.append(observation, action, reward, done, next_observation)
+
+    def sync(self) -> int:
+        """
+        Give slots published since the last call the maximum priority.
+
+        sample() calls this itself.
+
+        Returns:
+            int: Transitions picked up
+        """
+        arrays = self._arrays
+        shard_capacity = arrays.shard_capacity
+        counters = arrays.counters.copy()
+        new_slots = []
+        new_sequence = []
+        for writer_id in np.nonzero(counters != self._synced)[0]:
+            end = int(counters[writer_id])
+            # Anything older than one shard has been overwritten already
+            start = max(int(self._synced[writer_id]), end - shard_capacity)
+            sequence = np.arange(start, end, dtype=np.int64)
+            new_slots.append(writer_id * shard_capacity + sequence % shard_capacity)
+            new_sequence.append(sequence)
+            self._synced[writer_id] = end
+        if not new_slots:
+            return 0
+        slots = np.concatenate(new_slots)
+        self._size += int(np.count_nonzero(self._slot_sequence[slots] < 0))
+        self._slot_sequence[slots] = np.concatenate(new_sequence)
+        self.tree.update(slots, np.full(len(slots), self.max_priority ** self.alpha))
+        return len(slots)
+
+    def _allocate_batch(self, batch_size: int) -> ReplayBatch:
+        state_dim = self._arrays.state_dim
+        return ReplayBatch(
+            np.empty((batch_size, state_dim), dtype=np.float32),
+            np.empty(batch_size, dtype=np.int64),
+            np.empty(batch_size, dtype=np.float32),
+            np.empty(batch_size, dtype=np.uint8),
+            np.empty((batch_size, state_dim), dtype=np.float32),
+            np.empty(batch_size, dtype=np.float32),
+            np.empty(batch_size, dtype=np.int64),
+            np.empty(batch_size, dtype=np.int64),
+            np.empty(batch_size, dtype=bool),
+        )
+
+    def sample(self, batch_size: int = DEFAULT_BATCH_SIZE, beta: Optional[float] = None) -> Optional[ReplayBatch]:
+        """
+        Draw a prioritized batch, one sample per equal slice of the priority mass.
+
+        The batch is gathered into arrays allocated once per batch size and
+        overwritten by the next call, so copy anything kept longer.
+
+        Args:
+            batch_size: Number of transitions
+            beta: Importance weight exponent, self.beta by default
+
+        Returns:
+            The batch, or None while the buffer is empty
+        """
+        self.sync()
+        total = self.tree.total
+        if self._size == 0 or total <= 0.0:
+            return None
+
+        batch = self._batch
+        if batch is None or len(batch.indices) != batch_size:
+            batch = self._batch = self._allocate_batch(batch_size)
+        segment = total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        indices = self.tree.find(np.minimum(values, np.nextafter(total, 0.0)))
+
+        arrays = self._arrays
+        batch.indices[:] = indices
+        batch.sequence[:] = self._slot_sequence[indices]
+        np.take(arrays.observations, indices, axis=0, out=batch.observations)
+        np.take(arrays.actions, indices, out=batch.actions)
+        np.take(arrays.rewards, indices, out=batch.rewards)
+        np.take(arrays.dones, indices, out=batch.dones)
+        np.take(arrays.next_observations, indices, axis=0, out=batch.next_observations)
+
+        # A writer overwrites sequence k while appending k + shard_capacity; check after gathering
+        shard_capacity = arrays.shard_capacity
+        published = arrays.counters[np.minimum(indices // shard_capacity, arrays.num_writers - 1)]
+        np.greater(batch.sequence, published - shard_capacity, out=batch.valid)
+
+        probabilities = self.tree.get(indices) / total
+        weights = (self._size * np.maximum(probabilities, 1e-12)) ** -(self.beta if beta is None else beta)
+        weights[~batch.valid] = 0.0
+        max_weight = weights.max()
+        batch.weights[:] = weights / max_weight if max_weight > 0.0 else 0.0
+        return batch
+
+    def update_priorities(self, indices: np.ndarray, sequence: np.ndarray, priorities: np.ndarray):
+        """
+        Set new priorities (e.g. absolute TD errors) for sampled transitions.
+
+        Slots overwritten since they were sampled keep the priority they got
+        on arrival.
+
+        Args:
+            indices: ReplayBatch.indices
+            sequence: ReplayBatch.sequence
+            priorities: New priority per transition, before alpha
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        priorities = np.abs(np.asarray(priorities, dtype=np.float64)) + PRIORITY_EPSILON
+        sequence = np.asarray(sequence)
+        current = (self._slot_sequence[indices] == sequence) & (sequence >= 0)
+        if not current.any():
+            return
+        indices = indices[current]
+        priorities = priorities[current]
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and per-writer append counts."""
+        counters = self._arrays.counters.copy()
+        return {
+            "size": self._size,
+            "capacity": self._arrays.capacity,
+            "appended": int(counters.sum()),
+            "per_writer": [int(c) for c in counters],
+            "max_priority": self.max_priority,
+        }
+
+    def close(self):
+        """Release and unlink the segment; attached writers should be closed first."""
+        if self._own_writer is not None:
+            self._own_writer.close()
+            self._own_writer = None
+        self._batch = None
+        shm = self._arrays.shm
+        self._arrays._release()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "PrioritizedReplayBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TransitionRecorder:
+    """
+    Turns one GameContext's decisions and fight messages into replay transitions.
+
+    Call record(action) whenever the agent sends an action; the previous
+    decision's transition is written then, with the observation at this
+    decision as its next observation. observe(msg) accumulates the reward
+    from hit point changes and closes the transition on ExtFightEnded.
+    Attached as a server message callback it sees every message the context
+    receives, from a live connection or an attached FightSimulator.
+    """
+
+    def __init__(self, context: Any, writer: ReplayWriter, attach: bool = True):
+        """
+        Initialize a new instance of the TransitionRecorder class.
+
+        Args:
+            context: The GameContext whose transitions to record
+            writer: Where to append them
+            attach: Register as a server message callback on the context
+        """
+        self.context = context
+        self.writer = writer
+        self.transitions = 0
+        self._observation = np.zeros(context.get_observation().shape, dtype=np.float32)
+        self._action: Optional[int] = None
+        self._reward = 0.0
+        self._hit_points = (0, 0)
+        if attach:
+            context.add_server_message_callback(self.observe)
+
+    def record(self, action: int):
+        """Note the action the agent is sending in the current state."""
+        context = self.context
+        observation = context.get_observation()
+        if self._action is not None:
+            self._track_hit_points()
+            self._write(False, observation)
+        else:
+            self._hit_points = (context.player_hit_points, context.opponent_hit_points)
+        self._observation[:] = observation
+        self._action = action
+        self._reward = 0.0
+
+    def observe(self, msg: Any):
+        """Account for a server message; takes decoded messages or raw dicts."""
+        if isinstance(msg, dict):
+            msg = decode_message(msg)
+            if msg is None:
+                return
+        if self._action is None:
+            return
+        message_type = msg.message_type
+        if message_type == "ExtEffectApplied" or message_type == "ExtFightStateUpdate":
+            self._track_hit_points()
+        elif message_type == "ExtFightEnded":
+            player_id = self.context.player_id
+            if msg.winner_id == player_id:
+                self._reward += WIN_REWARD
+            elif msg.loser_id == player_id:
+                self._reward -= WIN_REWARD
+            else:
+                return
+            self._write(True, self.context.get_observation())
+            self._action = None
+
+    def _track_hit_points(self):
+        context = self.context
+        player_hit_points = context.player_hit_points
+        opponent_hit_points = context.opponent_hit_points
+        previous_player, previous_opponent = self._hit_points
+        self._reward += HIT_POINT_REWARD * ((previous_opponent - opponent_hit_points)
+                                            - (previous_player - player_hit_points))
+        self._hit_points = (player_hit_points, opponent_hit_points)
+
+    def _write(self, done: bool, next_observation: np.ndarray):
+        self.writer.append(self._observation, self._action, self._reward, done, next_observation)
+        self.transitions += 1
+
+
+#region Demo
+
+
+def _writer_main(spec: Tuple[str, int, int, int], writer_id: int, num_fights: int, stop_event: Any,
+                 seed: int):
+    """Play random simulator fights and record both sides into one shard."""
+    # Imported here so the learner process does not pay for them
+    from GameContext import GameContext
+    from batch_env import action_to_message, context_action_mask
+    from simulator import FightSimulator
+
+    rng = np.random.default_rng(seed)
+    writer = ReplayWriter(spec, writer_id)
+    pairs = []
+    for pair in range(num_fights):
+        simulator = FightSimulator(f"w{writer_id}_p{pair}_a", f"w{writer_id}_p{pair}_b",
+                                   seed=seed + pair, include_svg=False)
+        recorders = {}
+        for player_id in (simulator.player1_id, simulator.player2_id):
+            context = GameContext("ws://localhost")
+            simulator.attach(context, player_id)
+            recorders[player_id] = TransitionRecorder(context, writer)
+        pairs.append((simulator, recorders))
+    try:
+        while not stop_event.is_set():
+            for simulator, recorders in pairs:
+                if not simulator.is_active:
+                    simulator.start_fight()
+                recorder = recorders[simulator.state.current_turn_player_id]
+                mask = context_action_mask(recorder.context)
+                action = int(rng.choice(np.flatnonzero(mask)))
+                recorder.record(action)
+                recorder.context.send(action_to_message(action))
+    finally:
+        for _, recorders in pairs:
+            for recorder in recorders.values():
+                recorder.context.dispose()
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a replay buffer from simulator writers and sample it")
+    parser.add_argument("--writers", type=int, default=2, help="Writer processes")
+    parser.add_argument("--fights", type=int, default=8, help="Simulator fights per writer")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    buffer = PrioritizedReplayBuffer(args.capacity, num_writers=args.writers, seed=0)
+    mp = multiprocessing.get_context("spawn")
+    stop_event = mp.Event()
+    processes = [mp.Process(target=_writer_main, args=(buffer.spec, w, args.fights, stop_event, w * 1000),
+                            daemon=True)
+                 for w in range(args.writers)]
+    for process in processes:
+        process.start()
+    try:
+        batches = 0
+        invalid = 0
+        started_at = time.perf_counter()
+        deadline = started_at + args.seconds
+        while time.perf_counter() < deadline:
+            batch = buffer.sample(args.batch_size)
+            if batch is None:
+                time.sleep(0.01)
+                continue
+            # Stand-in for TD errors
+            buffer.update_priorities(batch.indices, batch.sequence, np.abs(batch.rewards))
+            batches += 1
+            invalid += int(np.count_nonzero(~batch.valid))
+        elapsed = time.perf_counter() - started_at
+        stats = buffer.stats()
+        print(f"appended {stats['appended']:,} transitions ({stats['appended'] / elapsed:,.0f}/s) "
+              f"from {args.writers} writers, size {stats['size']:,}")
+        print(f"sampled {batches:,} batches of {args.batch_size} ({batches / elapsed:,.0f}/s), "
+              f"{invalid} overwritten while sampled")
+    finally:
+        stop_event.set()
+        for process in processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        buffer.close()
+
+
+#endregion
+
+
+if __name__ == "__main__":
+    main()
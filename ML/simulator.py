@@ -0,0 +1,1097 @@
+"""
+Headless in-process card battle simulator.
+
+Mirrors GameServer.Application.Models.FightState, the card effect handlers and
+the message flow of GameServer.Application.Actors.FightActor, so a GameContext
+attached to a FightSimulator receives the same Ext* messages it would get from
+the real server. Keep this module in sync with the C# rules.
+
+Only messages that actually reach a client are delivered: the server sends
+ExtEffectApplied and the player's own ExtCardPlayCompleted to the map actor,
+which does not forward them. Pass include_map_notifications=True to deliver
+them to both players anyway.
+"""
+import argparse
+import functools
+import json
+import os
+import random
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from card_library import ALL_CARDS, get_card
+from messages import get_message_type
+from models import CardInfo
+from svg_cache import svg_hash
+
+# Mirrors FightState constants
+STARTING_HP = 10
+STARTING_ACTION_POINTS = 3
+MAX_HAND_SIZE = 10
+CARDS_PER_TURN = 5
+
+# Mirrors Deck/Player: every player gets a deck of 25 random library cards
+DECK_SIZE = 25
+
+# Card SVG files shipped with the server
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "..", "Server", "src", "GameServer.Application", "Assets")
+
+
+class StatusEffect:
+    """Mirrors GameServer.Application.Models.StatusEffect."""
+    __slots__ = ("id", "name", "description", "duration", "type", "magnitude", "source")
+
+    def __init__(self, id: str, name: str, description: str, duration: int,
+                 type: str, magnitude: int, source: Optional[str]):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.duration = duration
+        self.type = type
+        self.magnitude = magnitude
+        self.source = source
+
+    def apply(self, state: "FightState", target_id: str):
+        """Apply the per-turn part of the effect, other types act during damage calculation."""
+        if self.type == "DamageOverTime":
+            state.apply_damage(target_id, self.magnitude)
+        elif self.type == "HealOverTime":
+            state.apply_healing(target_id, self.magnitude)
+        elif self.type == "ActionPointBoost":
+            state.get_player_state(target_id).action_points += self.magnitude
+
+    def tick(self):
+        """Decrement the remaining duration."""
+        self.duration -= 1
+
+    @property
+    def is_expired(self) -> bool:
+        return self.duration <= 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Encode as a StatusEffectInfo payload."""
+        return {"Id": self.id, "Name": self.name, "Description": self.description,
+                "Duration": self.duration, "Type": self.type, "Magnitude": self.magnitude}
+
+
+class PlayerFightState:
+    """Mirrors GameServer.Application.Models.PlayerFightState."""
+
+    def __init__(self, starting_hp: int, deck: Sequence[CardInfo], rng: random.Random):
+        self.hit_points = starting_hp
+        self.max_hit_points = starting_hp
+        self.action_points = 0
+        self.hand: List[CardInfo] = []
+        self.active_effects: List[StatusEffect] = []
+        self.cards: List[CardInfo] = list(deck)
+        self.discard_pile: List[CardInfo] = []
+        self._random = rng
+        self.shuffle()
+
+    def apply_status_effect(self, effect: StatusEffect):
+        """Add an effect, replacing an existing one with the same id."""
+        for existing in self.active_effects:
+            if existing.id == effect.id:
+                self.active_effects.remove(existing)
+                break
+        self.active_effects.append(effect)
+
+    def process_status_effects(self, state: "FightState", player_id: str):
+        """Apply and tick every active effect, removing the expired ones."""
+        for effect in list(self.active_effects):
+            effect.apply(state, player_id)
+            effect.tick()
+            if effect.is_expired:
+                self.active_effects.remove(effect)
+
+    def draw_cards(self, count: int) -> List[CardInfo]:
+        """Draw up to count cards, reshuffling the discard pile into an empty deck."""
+        drawn = []
+        for _ in range(count):
+            if not self.cards:
+                if not self.discard_pile:
+                    break
+                self.shuffle_discard_into_deck()
+            drawn.append(self.cards.pop(0))
+        return drawn
+
+    def shuffle(self):
+        self._random.shuffle(self.cards)
+
+    def shuffle_discard_into_deck(self):
+        self.cards.extend(self.discard_pile)
+        self.discard_pile.clear()
+        self.shuffle()
+
+    def to_dict(self, player_id: str) -> Dict[str, Any]:
+        """Encode as a PlayerFightStateDto payload."""
+        return {
+            "PlayerId": player_id,
+            "HitPoints": self.hit_points,
+            "ActionPoints": self.action_points,
+            "Hand": [card_to_dict(card) for card in self.hand],
+            "DeckCount": len(self.cards),
+            "DiscardPileCount": len(self.discard_pile),
+            "StatusEffects": [effect.to_dict() for effect in self.active_effects],
+        }
+
+
+class FightState:
+    """Mirrors GameServer.Application.Models.FightState."""
+
+    def __init__(self, player1_id: str, player2_id: str,
+                 deck1: Sequence[CardInfo], deck2: Sequence[CardInfo], rng: random.Random):
+        self.current_turn_player_id = player1_id
+        self.player_states: Dict[str, PlayerFightState] = {
+            player1_id: PlayerFightState(STARTING_HP, deck1, rng),
+            player2_id: PlayerFightState(STARTING_HP, deck2, rng),
+        }
+        self._random = rng
+
+    def new_effect_id(self, prefix: str) -> str:
+        """Unique status effect id with a Guid suffix, like the server."""
+        return f"{prefix}_{uuid.uuid4()}"
+
+    def is_players_turn(self, player_id: str) -> bool:
+        return self.current_turn_player_id == player_id
+
+    def other_player_id(self, player_id: str) -> str:
+        for pid in self.player_states:
+            if pid != player_id:
+                return pid
+        raise ValueError(f"Player {player_id} has no opponent")
+
+    def get_player_state(self, player_id: str) -> PlayerFightState:
+        return self.player_states[player_id]
+
+    def start_turn(self, player_id: str):
+        """Process the player's status effects and grant action points."""
+        if player_id not in self.player_states:
+            raise ValueError(f"Player {player_id} not in fight")
+        self.current_turn_player_id = player_id
+        state = self.player_states[player_id]
+        state.process_status_effects(self, player_id)
+        state.action_points += STARTING_ACTION_POINTS
+
+    def apply_status_effect(self, player_id: str, effect: StatusEffect):
+        if player_id not in self.player_states:
+            raise ValueError(f"Player {player_id} not in fight")
+        self.player_states[player_id].apply_status_effect(effect)
+
+    def draw_cards(self, player_id: str) -> List[CardInfo]:
+        """Draw the cards for a new turn, up to the maximum hand size."""
+        state = self.player_states[player_id]
+        drawn = state.draw_cards(min(CARDS_PER_TURN, MAX_HAND_SIZE - len(state.hand)))
+        state.hand.extend(drawn)
+        return drawn
+
+    def can_play_card(self, player_id: str, card: CardInfo) -> bool:
+        # CardLock effects are not enforced by the server yet
+        state = self.player_states[player_id]
+        return state.action_points >= card.cost and card in state.hand
+
+    def play_card(self, player_id: str, card: CardInfo):
+        if not self.can_play_card(player_id, card):
+            raise ValueError("Cannot play this card")
+        state = self.player_states[player_id]
+        state.action_points -= card.cost
+        state.hand.remove(card)
+
+    def discard_hand(self, player_id: str):
+        state = self.player_states[player_id]
+        state.discard_pile.extend(state.hand)
+        state.hand.clear()
+
+    def apply_damage(self, target_id: str, amount: int, attacker_id: Optional[str] = None):
+        """Apply damage after boost, dodge and reduction effects, then reflect damage back."""
+        state = self.player_states[target_id]
+        if attacker_id is None:
+            attacker_id = self.other_player_id(target_id)
+        attacker_state = self.player_states[attacker_id]
+
+        boost = sum(e.magnitude for e in attacker_state.active_effects if e.type == "DamageBoost") / 100.0
+        boosted_damage = amount + int(amount * boost)
+
+        for effect in state.active_effects:
+            if effect.type == "DodgeChance" and self._random.randrange(100) < effect.magnitude:
+                return
+
+        reduction = sum(e.magnitude for e in state.active_effects if e.type == "DamageReduction")
+        state.hit_points = max(0, state.hit_points - max(0, boosted_damage - reduction))
+
+        for effect in state.active_effects:
+            if effect.type == "DamageReflection":
+                attacker_state.hit_points = max(0, attacker_state.hit_points - effect.magnitude)
+
+    def apply_healing(self, target_id: str, amount: int):
+        state = self.player_states[target_id]
+        state.hit_points = min(state.max_hit_points, state.hit_points + amount)
+
+    def increase_max_hit_points(self, target_id: str, amount: int):
+        self.player_states[target_id].max_hit_points += amount
+        self.apply_healing(target_id, amount)
+
+    @property
+    def is_game_over(self) -> bool:
+        return any(s.hit_points <= 0 for s in self.player_states.values())
+
+    def get_winner_id(self) -> Optional[str]:
+        if not self.is_game_over:
+            return None
+        for pid, state in self.player_states.items():
+            if state.hit_points > 0:
+                return pid
+        raise ValueError("No player survived")
+
+
+#region Card Effects
+
+def _effect_applied(target_id: str, effect_type: str, value: int, source: str) -> Dict[str, Any]:
+    return {"MessageType": "ExtEffectApplied", "TargetPlayerId": target_id,
+            "EffectType": effect_type, "Value": value, "Source": source}
+
+
+def _basic_attack(state, player_id, target_id, card):
+    damage = card.cost * 2
+    state.apply_damage(target_id, damage)
+    return f"Dealt {damage} damage", [_effect_applied(target_id, "Damage", damage, card.name)]
+
+
+def _basic_defense(state, player_id, target_id, card):
+    healing = card.cost * 2
+    state.apply_healing(player_id, healing)
+    return f"Healed for {healing}", [_effect_applied(player_id, "Heal", healing, card.name)]
+
+
+def _basic_utility(state, player_id, target_id, card):
+    action_points = (card.cost + 1) // 2
+    state.get_player_state(player_id).action_points += action_points
+    return (f"Gained {action_points} action points",
+            [_effect_applied(player_id, "ActionPoints", action_points, card.name)])
+
+
+def _basic_special(state, player_id, target_id, card):
+    damage = card.cost * 2
+    healing = damage // 2
+    state.apply_damage(target_id, damage)
+    state.apply_healing(player_id, healing)
+    return (f"Dealt {damage} damage and healed for {healing}",
+            [_effect_applied(target_id, "Damage", damage, card.name),
+             _effect_applied(player_id, "Heal", healing, card.name)])
+
+
+def _direct_damage(state, player_id, target_id, card):
+    damage = card.cost * 2 + card.cost
+    state.apply_damage(target_id, damage)
+    return f"Dealt {damage} direct damage", [_effect_applied(target_id, "Damage", damage, card.name)]
+
+
+def _area_of_effect(state, player_id, target_id, card):
+    damage = int(card.cost * 2 * 0.8)
+    state.apply_damage(target_id, damage)
+    return f"Dealt {damage} area damage", [_effect_applied(target_id, "AreaDamage", damage, card.name)]
+
+
+def _piercing(state, player_id, target_id, card):
+    damage = card.cost * 2
+    state.apply_damage(target_id, damage)
+    return f"Dealt {damage} piercing damage", [_effect_applied(target_id, "PiercingDamage", damage, card.name)]
+
+
+def _vampiric(state, player_id, target_id, card):
+    damage = int(card.cost * 2 * 0.7)
+    healing = damage // 2
+    state.apply_damage(target_id, damage)
+    state.apply_healing(player_id, healing)
+    return (f"Dealt {damage} vampiric damage and healed for {healing}",
+            [_effect_applied(target_id, "VampiricDamage", damage, card.name),
+             _effect_applied(player_id, "VampiricHeal", healing, card.name)])
+
+
+def _combo(state, player_id, target_id, card):
+    damage = card.cost * 2 + card.cost
+    state.apply_damage(target_id, damage)
+    return f"Dealt {damage} combo damage", [_effect_applied(target_id, "ComboDamage", damage, card.name)]
+
+
+def _shield(state, player_id, target_id, card):
+    healing = card.cost * 2
+    shield = card.cost
+    duration = 2
+    state.apply_healing(player_id, healing)
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("shield"), "Shield", f"Reduces incoming damage by {shield}",
+        duration, "DamageReduction", shield, card.name))
+    return (f"Healed for {healing} and gained {shield} shield for {duration} turns",
+            [_effect_applied(player_id, "Heal", healing, card.name),
+             _effect_applied(player_id, "Shield", shield, card.name)])
+
+
+def _redirect(state, player_id, target_id, card):
+    healing = int(card.cost * 2 * 0.7)
+    damage = card.cost
+    duration = 2
+    state.apply_healing(player_id, healing)
+    state.apply_damage(target_id, damage)
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("redirect"), "Damage Reflection", f"Reflects {damage} damage back to attacker",
+        duration, "DamageReflection", damage, card.name))
+    return (f"Healed for {healing}, redirected {damage} damage, and gained damage reflection for {duration} turns",
+            [_effect_applied(player_id, "Heal", healing, card.name),
+             _effect_applied(target_id, "RedirectDamage", damage, card.name),
+             _effect_applied(player_id, "DamageReflection", damage, card.name)])
+
+
+def _heal(state, player_id, target_id, card):
+    healing = card.cost * 2 + card.cost
+    state.apply_healing(player_id, healing)
+    return f"Healed for {healing}", [_effect_applied(player_id, "EnhancedHeal", healing, card.name)]
+
+
+def _dodge(state, player_id, target_id, card):
+    healing = int(card.cost * 2 * 0.6)
+    dodge_chance = 50
+    duration = 2
+    state.apply_healing(player_id, healing)
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("dodge"), "Dodge", f"Provides a {dodge_chance}% chance to avoid damage",
+        duration, "DodgeChance", dodge_chance, card.name))
+    return (f"Healed for {healing} and gained {dodge_chance}% dodge chance for {duration} turns",
+            [_effect_applied(player_id, "Heal", healing, card.name),
+             _effect_applied(player_id, "DodgeChance", dodge_chance, card.name)])
+
+
+def _fortify(state, player_id, target_id, card):
+    # The server reports cost * 2 healing but only heals by the max health increase
+    healing = card.cost * 2
+    increase = card.cost // 2
+    state.increase_max_hit_points(player_id, increase)
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("maxhealth"), "Fortify", f"Increases maximum health by {increase}",
+        -1, "MaxHealthBoost", increase, card.name))
+    return (f"Healed for {healing} and permanently increased max health by {increase}",
+            [_effect_applied(player_id, "Heal", healing, card.name),
+             _effect_applied(player_id, "MaxHealthIncrease", increase, card.name)])
+
+
+def _draw(state, player_id, target_id, card):
+    count = max(1, card.cost // 2)
+    return f"Drew {count} cards", [_effect_applied(player_id, "DrawCards", count, card.name)]
+
+
+def _energy_boost(state, player_id, target_id, card):
+    total = (card.cost + 1) // 2 + card.cost // 2
+    future = card.cost // 2
+    duration = 3
+    state.get_player_state(player_id).action_points += total
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("apboost"), "Energy Boost", f"Grants {future} additional action points each turn",
+        duration, "ActionPointBoost", future, card.name))
+    return (f"Gained {total} action points and +{future} action points per turn for {duration} turns",
+            [_effect_applied(player_id, "ActionPoints", total, card.name),
+             _effect_applied(player_id, "ActionPointBoost", future, card.name)])
+
+
+def _discard(state, player_id, target_id, card):
+    count = max(1, card.cost // 2)
+    return (f"Forced opponent to discard {count} cards",
+            [_effect_applied(target_id, "ForceDiscard", count, card.name)])
+
+
+def _lock(state, player_id, target_id, card):
+    duration = card.cost
+    state.apply_status_effect(target_id, StatusEffect(
+        state.new_effect_id("lock"), "Card Lock", f"Prevents playing certain card types for {duration} turns",
+        duration, "CardLock", 1, card.name))
+    return (f"Locked opponent's cards for {duration} turns",
+            [_effect_applied(target_id, "CardLock", duration, card.name)])
+
+
+def _transform(state, player_id, target_id, card):
+    count = max(1, card.cost // 2)
+    return f"Transformed {count} cards in hand", [_effect_applied(player_id, "TransformCards", count, card.name)]
+
+
+def _ultimate(state, player_id, target_id, card):
+    damage = card.cost * 3
+    healing = damage // 2
+    duration = 3
+    state.apply_damage(target_id, damage)
+    state.apply_healing(player_id, healing)
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("ultimate_dmgboost"), "Ultimate: Damage Boost", "Increases damage dealt by 50%",
+        duration, "DamageBoost", 50, card.name))
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("ultimate_ap"), "Ultimate: Action Point Boost",
+        "Grants 1 additional action point each turn", duration, "ActionPointBoost", 1, card.name))
+    return (f"Ultimate attack! Dealt {damage} damage, healed for {healing}, "
+            f"and gained powerful boosts for {duration} turns",
+            [_effect_applied(target_id, "UltimateDamage", damage, card.name),
+             _effect_applied(player_id, "UltimateHeal", healing, card.name),
+             _effect_applied(player_id, "UltimatePowerup", duration, card.name)])
+
+
+def _environment(state, player_id, target_id, card):
+    power = card.cost
+    duration = card.cost
+    # The same effect instance is applied to both players, so it ticks on both turns
+    effect = StatusEffect(state.new_effect_id("environment"), "Environment Change",
+                          f"Changes battle rules for {duration} turns", duration,
+                          "EnvironmentEffect", power, card.name)
+    state.apply_status_effect(player_id, effect)
+    state.apply_status_effect(target_id, effect)
+    return (f"Changed battle environment for {duration} turns",
+            [_effect_applied("global", "EnvironmentChange", power, card.name)])
+
+
+def _summon(state, player_id, target_id, card):
+    damage = card.cost
+    duration = card.cost
+    state.apply_damage(target_id, damage)
+    state.apply_status_effect(target_id, StatusEffect(
+        state.new_effect_id("summon"), "Summoned Ally", f"Deals {damage} damage each turn",
+        duration, "DamageOverTime", damage, card.name))
+    return (f"Summoned an ally that dealt {damage} damage and will deal {damage} damage "
+            f"each turn for {duration} turns",
+            [_effect_applied(target_id, "SummonDamage", damage, card.name),
+             _effect_applied(player_id, "SummonCreated", duration, card.name)])
+
+
+def _curse(state, player_id, target_id, card):
+    damage = card.cost
+    duration = card.cost
+    state.apply_damage(target_id, damage)
+    state.apply_status_effect(target_id, StatusEffect(
+        state.new_effect_id("curse"), "Curse", f"Deals {damage // 2} damage each turn",
+        duration, "DamageOverTime", damage // 2, card.name))
+    return (f"Applied a curse that dealt {damage} damage and will deal {damage // 2} damage "
+            f"each turn for {duration} turns",
+            [_effect_applied(target_id, "CurseDamage", damage, card.name),
+             _effect_applied(target_id, "CurseApplied", duration, card.name)])
+
+
+def _fusion(state, player_id, target_id, card):
+    damage = card.cost * 3 // 2
+    healing = damage // 2
+    action_points = card.cost // 2
+    duration = 2
+    state.apply_damage(target_id, damage)
+    state.apply_healing(player_id, healing)
+    state.get_player_state(player_id).action_points += action_points
+    state.apply_status_effect(target_id, StatusEffect(
+        state.new_effect_id("fusion_dot"), "Fusion: Damage Over Time", f"Deals {damage // 3} damage each turn",
+        duration, "DamageOverTime", damage // 3, card.name))
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("fusion_hot"), "Fusion: Healing Over Time", f"Heals for {healing // 3} each turn",
+        duration, "HealOverTime", healing // 3, card.name))
+    state.apply_status_effect(player_id, StatusEffect(
+        state.new_effect_id("fusion_ap"), "Fusion: Action Point Boost",
+        f"Grants {action_points // 2} additional action points each turn",
+        duration, "ActionPointBoost", action_points // 2, card.name))
+    return (f"Fusion effect! Dealt {damage} damage, healed for {healing}, gained {action_points} action points, "
+            f"and applied ongoing effects for {duration} turns",
+            [_effect_applied(target_id, "FusionDamage", damage, card.name),
+             _effect_applied(player_id, "FusionHeal", healing, card.name),
+             _effect_applied(player_id, "FusionActionPoints", action_points, card.name)])
+
+
+EffectHandler = Callable[[FightState, str, str, CardInfo], Tuple[str, List[Dict[str, Any]]]]
+
+# Mirrors CardEffectHandlerRegistration: fallbacks per card type, then per (type, subtype)
+FALLBACK_EFFECT_HANDLERS: Dict[str, EffectHandler] = {
+    "Attack": _basic_attack,
+    "Defense": _basic_defense,
+    "Utility": _basic_utility,
+    "Special": _basic_special,
+}
+
+EFFECT_HANDLERS: Dict[Tuple[str, str], EffectHandler] = {
+    ("Attack", "DirectDamage"): _direct_damage,
+    ("Attack", "AreaOfEffect"): _area_of_effect,
+    ("Attack", "Piercing"): _piercing,
+    ("Attack", "Vampiric"): _vampiric,
+    ("Attack", "Combo"): _combo,
+    ("Defense", "Shield"): _shield,
+    ("Defense", "Redirect"): _redirect,
+    ("Defense", "Heal"): _heal,
+    ("Defense", "Dodge"): _dodge,
+    ("Defense", "Fortify"): _fortify,
+    ("Utility", "Draw"): _draw,
+    ("Utility", "EnergyBoost"): _energy_boost,
+    ("Utility", "Discard"): _discard,
+    ("Utility", "Lock"): _lock,
+    ("Utility", "Transform"): _transform,
+    ("Special", "Ultimate"): _ultimate,
+    ("Special", "Environment"): _environment,
+    ("Special", "Summon"): _summon,
+    ("Special", "Curse"): _curse,
+    ("Special", "Fusion"): _fusion,
+}
+
+
+def apply_card_effects(state: FightState, player_id: str, target_id: str,
+                       card: CardInfo) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Apply a played card through its effect handler.
+
+    Returns:
+        The effect description and the ExtEffectApplied notifications
+    """
+    handler = EFFECT_HANDLERS.get((card.type, card.subtype)) or FALLBACK_EFFECT_HANDLERS.get(card.type)
+    if handler is None:
+        return "Card played", []
+    return handler(state, player_id, target_id, card)
+
+#endregion
+
+
+# CardInfo payloads as sent by the server (no type or subtype), built once per card
+_CARD_DICTS: Dict[str, Dict[str, Any]] = {
+    card.id: {"Id": card.id, "Name": card.name, "Description": card.description, "Cost": card.cost}
+    for card in ALL_CARDS
+}
+
+
+def card_to_dict(card: CardInfo) -> Dict[str, Any]:
+    """Encode a card as a CardInfo payload."""
+    payload = _CARD_DICTS.get(card.id)
+    if payload is None:
+        payload = {"Id": card.id, "Name": card.name, "Description": card.description, "Cost": card.cost}
+    return payload
+
+
+def random_deck(rng: random.Random, size: int = DECK_SIZE) -> List[CardInfo]:
+    """Build a deck of random library cards, like a newly created server Player."""
+    return [rng.choice(ALL_CARDS) for _ in range(size)]
+
+
+def _delivers(method: Callable) -> Callable:
+    """Deliver the messages a public simulator call queued once it returns."""
+    @functools.wraps(method)
+    def wrapper(self: "FightSimulator", *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._flush()
+    return wrapper
+
+
+class FightSimulator:
+    """
+    Runs card battles in-process and delivers the resulting server messages.
+
+    Listeners receive the raw message dicts a connected client would receive.
+    Attach a GameContext to route its send() calls here and its inbound
+    messages through the same dispatch path as socket frames (callbacks and
+    metrics included), so agents work unchanged against the simulator or the
+    real server.
+
+    Messages are delivered in order from an outbox, never from inside
+    another delivery: a request sent from a listener or callback is applied
+    at once, but its replies arrive after the current message has been
+    handled, as they would over a socket. A call made outside any delivery
+    returns once everything it caused has been delivered.
+    """
+
+    def __init__(self, player1_id: str = "player_1", player2_id: str = "player_2",
+                 seed: Optional[int] = None, include_svg: bool = True,
+                 include_map_notifications: bool = False):
+        """
+        Initialize a new instance of the FightSimulator class.
+
+        Args:
+            player1_id: Id of the challenging player, who takes the first turn
+            player2_id: Id of the challenged player
+            seed: Seed for deck building, shuffles and dodge rolls
+            include_svg: Load card SVGs from the server assets, otherwise send empty strings
+            include_map_notifications: Also deliver the messages the server sends to the map actor
+        """
+        self.player1_id = player1_id
+        self.player2_id = player2_id
+        self.include_svg = include_svg
+        self.include_map_notifications = include_map_notifications
+        self.random = random.Random(seed)
+        self.state: Optional[FightState] = None
+        self.fight_id: Optional[str] = None
+        self.is_active = False
+        self.winner_id: Optional[str] = None
+        self._fight_count = 0
+        self._svg_cache: Dict[str, str] = {}
+        self._svg_hashes: Dict[str, str] = {}
+        self._cached_svg_hashes: Dict[str, Dict[str, str]] = {player1_id: {}, player2_id: {}}
+        self._listeners: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {player1_id: [], player2_id: []}
+        self._outbox: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self._delivering = False
+
+    #region Connections
+
+    def add_listener(self, player_id: str, listener: Callable[[Dict[str, Any]], None]):
+        """
+        Add a function called with every message delivered to a player.
+
+        Args:
+            player_id: Id of the receiving player
+            listener: Function taking the raw message dict
+        """
+        self._listeners[player_id].append(listener)
+
+    def attach(self, context: Any, player_id: str):
+        """
+        Connect a GameContext as one of the players.
+
+        The context receives an ExtPlayerIdResponse immediately, and its send()
+        calls are handled by this simulator from then on.
+
+        Args:
+            context: The GameContext to connect
+            player_id: The player it plays as
+        """
+        context.simulator = self
+        self.add_listener(player_id, context.deliver)
+        context.deliver({"MessageType": "ExtPlayerIdResponse", "PlayerId": player_id})
+
+    @_delivers
+    def receive(self, player_id: str, message: Any) -> bool:
+        """
+        Handle a client request from a player.
+
+        Args:
+            player_id: Id of the sending player
+            message: The request dict, e.g. {"MessageType": "ExtPlayCardRequest", "CardId": "atk_001"}
+
+        Returns:
+            bool: True if the request type is handled by the simulator
+        """
+        message_type = get_message_type(message)
+        if message_type == "ExtPlayCardRequest":
+            self.play_card(player_id, message.get("CardId"))
+        elif message_type == "ExtEndTurnRequest":
+            self.end_turn(player_id)
+        elif message_type == "ExtCachedCardImagesRequest":
+            self._cached_svg_hashes[player_id] = dict(message.get("CardSvgHashes") or {})
+        elif message_type == "ExtPlayerIdRequest":
+            self._send(player_id, {"MessageType": "ExtPlayerIdResponse", "PlayerId": player_id})
+        else:
+            print(f"Simulator does not handle {message_type}")
+            return False
+        return True
+
+    def _send(self, player_id: str, message: Dict[str, Any]):
+        if self._listeners[player_id]:
+            self._outbox.append((player_id, message))
+
+    def _flush(self):
+        """Deliver queued messages in order; a no-op when called from inside a delivery."""
+        if self._delivering:
+            return
+        self._delivering = True
+        try:
+            outbox = self._outbox
+            while outbox:
+                player_id, message = outbox.popleft()
+                for listener in self._listeners[player_id]:
+                    listener(message)
+        finally:
+            self._delivering = False
+
+    def _broadcast(self, message: Dict[str, Any]):
+        self._send(self.player1_id, message)
+        self._send(self.player2_id, message)
+
+    def _send_to_map(self, message: Dict[str, Any]):
+        # The map actor drops these unless asked to mirror the intended broadcast
+        if self.include_map_notifications:
+            self._broadcast(message)
+
+    #endregion
+
+    #region Fight Flow
+
+    @_delivers
+    def start_fight(self, deck1: Optional[Sequence[CardInfo]] = None,
+                    deck2: Optional[Sequence[CardInfo]] = None) -> str:
+        """
+        Start a new fight and the first turn of player 1.
+
+        Args:
+            deck1: Deck template of player 1, a random deck by default
+            deck2: Deck template of player 2, a random deck by default
+
+        Returns:
+            The id of the new fight
+        """
+        self._fight_count += 1
+        self.fight_id = f"fight_{self._fight_count}"
+        self.state = FightState(self.player1_id, self.player2_id,
+                                deck1 if deck1 is not None else random_deck(self.random),
+                                deck2 if deck2 is not None else random_deck(self.random),
+                                self.random)
+        self.is_active = True
+        self.winner_id = None
+        self._broadcast({"MessageType": "ExtFightStarted", "FightId": self.fight_id,
+                         "Player1Id": self.player1_id, "Player2Id": self.player2_id})
+        self._start_turn(self.player1_id)
+        return self.fight_id
+
+    def _start_turn(self, player_id: str):
+        state = self.state
+        player_state = state.get_player_state(player_id)
+        active_effects = list(player_state.active_effects)
+
+        state.start_turn(player_id)
+
+        for effect in active_effects:
+            if effect.type == "DamageOverTime" or effect.type == "HealOverTime":
+                self._send_to_map(_effect_applied(player_id, effect.type, effect.magnitude, effect.source))
+
+        drawn = state.draw_cards(player_id)
+        if self._listeners[player_id]:
+            self._send(player_id, {"MessageType": "ExtTurnStarted", "ActivePlayerId": player_id})
+            card_svg_data = {}
+            for card in drawn:
+                svg_data = self._svg_for(player_id, card.id)
+                card_svg_data[card.id] = svg_data
+                self._send(player_id, {"MessageType": "ExtCardDrawn", "CardInfo": card_to_dict(card),
+                                       "SvgData": svg_data})
+            self._send(player_id, {"MessageType": "ExtCardImages", "CardSvgData": card_svg_data})
+
+        self._send_fight_state_update()
+
+    @_delivers
+    def end_turn(self, player_id: str):
+        """
+        End a player's turn, discarding their hand and starting the opponent's turn.
+
+        Args:
+            player_id: Id of the player ending their turn
+        """
+        if not self.is_active:
+            return
+        self.state.discard_hand(player_id)
+        self._send(player_id, {"MessageType": "ExtTurnEnded", "PlayerId": player_id})
+        self._start_turn(self.player2_id if player_id == self.player1_id else self.player1_id)
+
+    @_delivers
+    def play_card(self, player_id: str, card_id: str) -> Optional[str]:
+        """
+        Play a card from a player's hand.
+
+        Args:
+            player_id: Id of the player playing the card
+            card_id: Id of the card to play
+
+        Returns:
+            The effect description, or None if the card was not played
+        """
+        if not self.is_active or not self.state.is_players_turn(player_id):
+            return None
+
+        state = self.state
+        card = next((c for c in state.get_player_state(player_id).hand if c.id == card_id), None)
+        if card is None:
+            return None
+
+        try:
+            if not state.can_play_card(player_id, card):
+                self._send_to_map({"MessageType": "ExtCardPlayFailed", "CardId": card_id,
+                                   "ErrorMessage": "Not enough action points"})
+                return None
+
+            state.play_card(player_id, card)
+            target_id = state.other_player_id(player_id)
+            effect, notifications = apply_card_effects(state, player_id, target_id, card)
+            for notification in notifications:
+                self._send_to_map(notification)
+
+            played = {"MessageType": "ExtCardPlayCompleted", "PlayerId": player_id,
+                      "PlayedCard": card_to_dict(card), "Effect": effect, "IsVisible": True}
+            self._send_to_map(played)
+            if self._listeners[target_id]:
+                self._send(target_id, {"MessageType": "ExtCardImages",
+                                       "CardSvgData": {card.id: self._svg_for(target_id, card.id)}})
+                self._send(target_id, played)
+
+            if state.is_game_over:
+                # Like the server, a double knockout raises here and the fight carries on
+                winner_id = state.get_winner_id()
+                self._end_fight(winner_id, state.other_player_id(winner_id), "Player defeated")
+                return effect
+
+            self._send_fight_state_update()
+            return effect
+        except ValueError as e:
+            self._send_to_map({"MessageType": "ExtCardPlayFailed", "CardId": card_id, "ErrorMessage": str(e)})
+            return None
+
+    def abandon_fight(self):
+        """
+        End the running fight without a winner, e.g. one stalled after a double knockout.
+
+        The server has no draws, so no ExtFightEnded is sent: attached contexts
+        keep the abandoned fight until start_fight replaces it.
+        """
+        if not self.is_active:
+            return
+        self.is_active = False
+        self.winner_id = None
+
+    def _end_fight(self, winner_id: str, loser_id: str, reason: str):
+        self.is_active = False
+        self.winner_id = winner_id
+        self._broadcast({"MessageType": "ExtFightEnded", "FightId": self.fight_id,
+                         "WinnerId": winner_id, "LoserId": loser_id, "Reason": reason})
+
+    def _send_fight_state_update(self):
+        if not (self._listeners[self.player1_id] or self._listeners[self.player2_id]):
+            return
+        state = self.state
+        self._broadcast({
+            "MessageType": "ExtFightStateUpdate",
+            "CurrentTurnPlayerId": state.current_turn_player_id,
+            "PlayerState": state.get_player_state(self.player1_id).to_dict(self.player1_id),
+            "OpponentState": state.get_player_state(self.player2_id).to_dict(self.player2_id),
+        })
+
+    def _svg_for(self, player_id: str, card_id: str) -> str:
+        # Like PlayerActor, send nothing for SVGs the client advertised as cached
+        svg_data = self.get_card_svg_data(card_id)
+        cached_hash = self._cached_svg_hashes[player_id].get(card_id)
+        if cached_hash is None or not svg_data:
+            return svg_data
+        content_hash = self._svg_hashes.get(card_id)
+        if content_hash is None:
+            content_hash = self._svg_hashes[card_id] = svg_hash(svg_data)
+        return "" if cached_hash == content_hash else svg_data
+
+    def get_card_svg_data(self, card_id: str) -> str:
+        """Read a card's SVG from the server assets, falling back to the card template."""
+        if not self.include_svg:
+            return ""
+        svg_data = self._svg_cache.get(card_id)
+        if svg_data is None:
+            path = os.path.join(ASSETS_DIR, f"{card_id}.txt")
+            if not os.path.exists(path):
+                path = os.path.join(ASSETS_DIR, "card_template.txt")
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    svg_data = f.read()
+            except OSError:
+                svg_data = ""
+            self._svg_cache[card_id] = svg_data
+        return svg_data
+
+    #endregion
+
+    #region Agents
+
+    def playable_cards(self, player_id: str) -> List[CardInfo]:
+        """Cards the player can play right now, empty when it is not their turn."""
+        if not self.is_active or not self.state.is_players_turn(player_id):
+            return []
+        state = self.state.get_player_state(player_id)
+        return [card for card in state.hand if card.cost <= state.action_points]
+
+    def step_random(self, rng: Optional[random.Random] = None) -> bool:
+        """
+        Take one random action for the player whose turn it is.
+
+        Plays a random affordable card, or ends the turn when none is left.
+
+        Returns:
+            bool: True while the fight is still running
+        """
+        if not self.is_active:
+            return False
+        rng = rng or self.random
+        player_id = self.state.current_turn_player_id
+        playable = self.playable_cards(player_id)
+        if playable:
+            self.play_card(player_id, rng.choice(playable).id)
+        else:
+            self.end_turn(player_id)
+        return self.is_active
+
+    def run_random_fight(self, max_steps: int = 1000) -> int:
+        """
+        Play a whole fight with random actions for both players.
+
+        Args:
+            max_steps: Maximum number of actions before giving up
+
+        Returns:
+            int: Number of actions taken
+        """
+        self.start_fight()
+        steps = 0
+        while steps < max_steps and self.step_random():
+            steps += 1
+        return steps
+
+    #endregion
+
+
+#region Parity Check
+
+def _load_player_state(state: PlayerFightState, dto: Dict[str, Any]):
+    """Overwrite the observable parts of a simulated player with a PlayerFightStateDto payload."""
+    state.hit_points = dto.get("HitPoints", 0)
+    state.max_hit_points = max(state.max_hit_points, state.hit_points)
+    state.action_points = dto.get("ActionPoints", 0)
+    state.hand = [get_card(card["Id"]) or CardInfo(card["Id"], card.get("Name"), None, None,
+                                                   card.get("Cost", 0), card.get("Description"))
+                  for card in dto.get("Hand") or ()]
+    # Deck contents are hidden, only the counts matter for the rules
+    state.cards = [None] * dto.get("DeckCount", 0)
+    state.discard_pile = [None] * dto.get("DiscardPileCount", 0)
+    state.active_effects = [StatusEffect(e.get("Id"), e.get("Name"), e.get("Description"), e.get("Duration", 0),
+                                         e.get("Type"), e.get("Magnitude", 0), None)
+                            for e in dto.get("StatusEffects") or ()]
+
+
+def _load_fight_state(fight: FightState, dtos: Dict[str, Dict[str, Any]]):
+    """Load both players, sharing effect instances that were applied to both (same id)."""
+    shared: Dict[str, StatusEffect] = {}
+    for pid, dto in dtos.items():
+        state = fight.get_player_state(pid)
+        _load_player_state(state, dto)
+        state.active_effects = [shared.setdefault(effect.id, effect) for effect in state.active_effects]
+
+
+def _observable(state: PlayerFightState) -> Dict[str, Any]:
+    return {
+        "HitPoints": state.hit_points,
+        "ActionPoints": state.action_points,
+        "HandCount": len(state.hand),
+        "DeckCount": len(state.cards),
+        "DiscardPileCount": len(state.discard_pile),
+        "StatusEffects": sorted((e.type, e.magnitude, e.duration) for e in state.active_effects),
+    }
+
+
+def _observable_dto(dto: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "HitPoints": dto.get("HitPoints", 0),
+        "ActionPoints": dto.get("ActionPoints", 0),
+        "HandCount": len(dto.get("Hand") or ()),
+        "DeckCount": dto.get("DeckCount", 0),
+        "DiscardPileCount": dto.get("DiscardPileCount", 0),
+        "StatusEffects": sorted((e.get("Type"), e.get("Magnitude", 0), e.get("Duration", 0))
+                                for e in dto.get("StatusEffects") or ()),
+    }
+
+
+def check_parity(messages: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Replay the rules of this simulator against a recorded server message stream.
+
+    Every ExtFightStateUpdate is predicted from the previous one: a change of
+    turn player is replayed as end turn + start turn, otherwise the card that
+    left the active player's hand is played. Transitions that depend on a
+    dodge roll or follow a knockout are skipped. Max hit points are tracked from Fortify plays since
+    the server does not send them.
+
+    Args:
+        messages: Raw message dicts in the order one client received them
+
+    Returns:
+        Dict with the number of checked and skipped transitions and a list of mismatches
+    """
+    report: Dict[str, Any] = {"fights": 0, "checked": 0, "skipped": 0, "mismatches": []}
+    fight: Optional[FightState] = None
+    previous: Optional[Dict[str, Any]] = None
+    player_ids: Tuple[str, str] = ("", "")
+
+    for index, message in enumerate(messages):
+        message_type = get_message_type(message)
+        if message_type == "ExtFightStarted":
+            player_ids = (message.get("Player1Id"), message.get("Player2Id"))
+            fight = FightState(player_ids[0], player_ids[1], [], [], random.Random(0))
+            previous = None
+            report["fights"] += 1
+            continue
+        if message_type == "ExtFightEnded":
+            fight = None
+            previous = None
+            continue
+        if message_type != "ExtFightStateUpdate" or fight is None:
+            continue
+
+        dtos = {player_ids[0]: message.get("PlayerState") or {}, player_ids[1]: message.get("OpponentState") or {}}
+        if previous is None:
+            previous = message
+            _load_fight_state(fight, dtos)
+            continue
+
+        previous_dtos = {player_ids[0]: previous.get("PlayerState") or {},
+                         player_ids[1]: previous.get("OpponentState") or {}}
+        _load_fight_state(fight, previous_dtos)
+        fight.current_turn_player_id = previous.get("CurrentTurnPlayerId")
+        previous = message
+
+        active_id = fight.current_turn_player_id
+        next_id = message.get("CurrentTurnPlayerId")
+        card = None
+        if next_id == active_id:
+            before = [c.id for c in fight.get_player_state(active_id).hand]
+            for card_id in (c["Id"] for c in dtos[active_id].get("Hand") or ()):
+                if card_id in before:
+                    before.remove(card_id)
+            card = get_card(before[0]) if len(before) == 1 else None
+
+        if next_id == active_id and card is None:
+            report["skipped"] += 1
+        elif (any(s.hit_points <= 0 for s in fight.player_states.values())
+              or all(dto.get("HitPoints", 0) <= 0 for dto in dtos.values())):
+            # Around a double knockout card plays are applied without a state update
+            report["skipped"] += 1
+        elif any(e.type == "DodgeChance" for s in fight.player_states.values() for e in s.active_effects):
+            # Outcome depends on a dodge roll, only keep track of max hit points
+            if card is not None and card.subtype == "Fortify":
+                fight.get_player_state(active_id).max_hit_points += card.cost // 2
+            report["skipped"] += 1
+        else:
+            if card is None:
+                action = "end_turn"
+                fight.discard_hand(active_id)
+                fight.start_turn(next_id)
+                fight.draw_cards(next_id)
+            else:
+                action = card.id
+                fight.play_card(active_id, next(c for c in fight.get_player_state(active_id).hand
+                                                 if c.id == card.id))
+                apply_card_effects(fight, active_id, fight.other_player_id(active_id), card)
+
+            report["checked"] += 1
+            for pid, dto in dtos.items():
+                predicted = _observable(fight.get_player_state(pid))
+                actual = _observable_dto(dto)
+                if predicted != actual:
+                    report["mismatches"].append({"index": index, "action": action, "player_id": pid,
+                                                 "predicted": predicted, "actual": actual})
+
+        # Resync to the recorded state; max hit points persist across updates
+        _load_fight_state(fight, dtos)
+
+    return report
+
+#endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check simulator rules against a recorded server trace")
+    parser.add_argument("trace", help="JSON-lines file of server messages recorded by one client")
+    args = parser.parse_args()
+
+    with open(args.trace, "r", encoding="utf-8") as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+    report = check_parity(messages)
+    print(f"fights: {report['fights']}  checked: {report['checked']}  skipped: {report['skipped']}  "
+          f"mismatches: {len(report['mismatches'])}")
+    for mismatch in report["mismatches"][:20]:
+        print(mismatch)
+
+
+if __name__ == "__main__":
+    main()
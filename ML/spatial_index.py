@@ -0,0 +1,178 @@
+"""
+Grid bucket index of player positions on a map.
+
+Players are hashed into square cells of cell_size tiles, so range and
+nearest-neighbour queries only visit the cells around the query point
+instead of every player on the map. Distances are Chebyshev (max of |dx| and
+|dy|), which is the number of moves between two tiles since the server
+allows diagonal steps (MapPosition.IsAdjacent).
+"""
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+Cell = Tuple[int, int]
+
+DEFAULT_CELL_SIZE = 8
+
+
+class SpatialIndex:
+    """Incrementally updated grid of player positions."""
+
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE):
+        """
+        Initialize a new instance of the SpatialIndex class.
+
+        Args:
+            cell_size: Width and height of a bucket in tiles
+        """
+        if cell_size < 1:
+            raise ValueError(f"cell_size must be positive, got {cell_size}")
+        self.cell_size = cell_size
+        self._positions: Dict[str, Tuple[int, int]] = {}
+        self._cells: Dict[Cell, Set[str]] = {}
+        self._tiles: Dict[Tuple[int, int], Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self._positions
+
+    def _cell(self, x: int, y: int) -> Cell:
+        return x // self.cell_size, y // self.cell_size
+
+    #region Updates
+
+    def set_position(self, player_id: str, x: int, y: int):
+        """Insert a player, or move them if already indexed."""
+        old = self._positions.get(player_id)
+        if old == (x, y):
+            return
+        if old is not None:
+            self._discard(player_id, old)
+        self._positions[player_id] = (x, y)
+        self._cells.setdefault(self._cell(x, y), set()).add(player_id)
+        self._tiles.setdefault((x, y), set()).add(player_id)
+
+    def remove(self, player_id: str):
+        """Remove a player; unknown ids are ignored."""
+        old = self._positions.pop(player_id, None)
+        if old is not None:
+            self._discard(player_id, old)
+
+    def clear(self):
+        """Remove every player."""
+        self._positions.clear()
+        self._cells.clear()
+        self._tiles.clear()
+
+    def _discard(self, player_id: str, position: Tuple[int, int]):
+        cell = self._cell(*position)
+        members = self._cells[cell]
+        members.discard(player_id)
+        if not members:
+            del self._cells[cell]
+        occupants = self._tiles[position]
+        occupants.discard(player_id)
+        if not occupants:
+            del self._tiles[position]
+
+    #endregion
+
+    #region Queries
+
+    def position_of(self, player_id: str) -> Optional[Tuple[int, int]]:
+        """Indexed (x, y) of a player, or None."""
+        return self._positions.get(player_id)
+
+    def occupants(self, x: int, y: int) -> Set[str]:
+        """Ids of the players standing on a tile (a copy)."""
+        return set(self._tiles.get((x, y), ()))
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        """Check if any indexed player stands on a tile."""
+        return (x, y) in self._tiles
+
+    def within(self, x: int, y: int, radius: int,
+               predicate: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, int]]:
+        """
+        Players within a Chebyshev distance of a tile.
+
+        Args:
+            x: Query tile column
+            y: Query tile row
+            radius: Maximum distance, inclusive
+            predicate: Optional filter on player id
+
+        Returns:
+            (player_id, distance) pairs sorted by distance, then id
+        """
+        if radius < 0:
+            return []
+        positions = self._positions
+        result = []
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                members = self._cells.get((cx, cy))
+                if not members:
+                    continue
+                for player_id in members:
+                    px, py = positions[player_id]
+                    distance = max(abs(px - x), abs(py - y))
+                    if distance <= radius and (predicate is None or predicate(player_id)):
+                        result.append((player_id, distance))
+        result.sort(key=lambda item: (item[1], item[0]))
+        return result
+
+    def nearest(self, x: int, y: int,
+                predicate: Optional[Callable[[str], bool]] = None) -> Optional[Tuple[str, int]]:
+        """
+        Closest player to a tile, searching outwards one ring of cells at a time.
+
+        Args:
+            x: Query tile column
+            y: Query tile row
+            predicate: Optional filter on player id
+
+        Returns:
+            (player_id, distance) of the closest matching player, ties broken by id, or None
+        """
+        positions = self._positions
+        cells = self._cells
+        cx, cy = self._cell(x, y)
+        best: Optional[Tuple[int, str]] = None
+        remaining = len(cells)
+        ring = 0
+        while remaining > 0:
+            for cell in self._ring(cx, cy, ring):
+                members = cells.get(cell)
+                if not members:
+                    continue
+                remaining -= 1
+                for player_id in members:
+                    if predicate is not None and not predicate(player_id):
+                        continue
+                    px, py = positions[player_id]
+                    candidate = (max(abs(px - x), abs(py - y)), player_id)
+                    if best is None or candidate < best:
+                        best = candidate
+            # Every tile in the next ring is at least ring * cell_size + 1 away
+            if best is not None and best[0] <= ring * self.cell_size:
+                break
+            ring += 1
+        return None if best is None else (best[1], best[0])
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int) -> Iterator[Cell]:
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+    #endregion
@@ -0,0 +1,244 @@
+"""
+Type-filtered subscriptions to a GameContext's server messages.
+
+add_server_message_callback hands every message to every callback on the
+thread that applied it, so one slow consumer (a logger, a learner hook)
+stalls the receive path for all message types. A Subscription instead names
+the message types it wants and where its callback runs:
+
+- inline (executor=None): on the receiving thread, right after the state update
+- a concurrent.futures.Executor, e.g. a ThreadPoolExecutor shared by many subscribers
+- an asyncio event loop, via call_soon_threadsafe
+
+Routing is one dict lookup per message: the table maps each subscribed type
+to the tuple of its subscribers (wildcard subscribers included), and is
+rebuilt copy-on-write when subscriptions change, so the receive path never
+takes a lock for it.
+
+An off-thread subscriber queues messages on its own FIFO and at most one
+drain of that queue is scheduled at a time, so its callback sees messages in
+arrival order, one after the other, whatever executor runs it. Enqueueing
+never blocks the receiving thread; with max_pending set, the oldest queued
+message is dropped once the subscriber falls that far behind.
+
+Every subscription counts deliveries, drops and errors, tracks its queue
+depth, and records handler time and queue wait into LatencyHistograms, see
+Subscriptions.stats().
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+from metrics import LatencyHistogram
+
+ALL_MESSAGES = "*"
+
+# Messages one scheduled drain handles before yielding its executor slot
+DRAIN_BATCH = 64
+
+SubscriptionExecutor = Union[Executor, asyncio.AbstractEventLoop, None]
+
+
+class Subscription:
+    """One callback, the message types it receives and where it runs."""
+
+    def __init__(self, message_types: Optional[FrozenSet[str]], callback: Callable[[Any], None],
+                 executor: SubscriptionExecutor = None, max_pending: int = 0):
+        """
+        Initialize a new instance of the Subscription class.
+
+        Args:
+            message_types: Message types delivered, None for every type
+            callback: Function taking the decoded server message
+            executor: Where the callback runs, inline on the receiving thread by default
+            max_pending: Off-thread only; drop the oldest queued message beyond this many (0 is unbounded)
+        """
+        if max_pending < 0:
+            raise ValueError(f"max_pending must not be negative, got {max_pending}")
+        self.message_types = message_types
+        self.callback = callback
+        self.executor = executor
+        self.max_pending = max_pending
+        self.active = True
+
+        # (message, enqueued ns) pairs waiting for the drain; only used off-thread
+        self._queue: Deque[Tuple[Any, int]] = deque()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+        # Counters
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.handler_time = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+
+    @property
+    def depth(self) -> int:
+        """Messages queued and not yet handled."""
+        return len(self._queue)
+
+    def deliver(self, message: Any):
+        """Run the callback on message now, or queue it for the executor."""
+        if self.executor is None:
+            self._handle(message)
+            return
+        with self._lock:
+            if not self.active:
+                return
+            queue = self._queue
+            if self.max_pending and len(queue) >= self.max_pending:
+                queue.popleft()
+                self.dropped += 1
+            queue.append((message, time.perf_counter_ns()))
+            if len(queue) > self.max_depth:
+                self.max_depth = len(queue)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._schedule()
+
+    def _schedule(self):
+        try:
+            if isinstance(self.executor, asyncio.AbstractEventLoop):
+                self.executor.call_soon_threadsafe(self._drain)
+            else:
+                self.executor.submit(self._drain)
+        except RuntimeError as e:
+            # Executor shut down or loop closed: nothing will ever drain this queue
+            print(f"Error scheduling subscription: {e}")
+            self.cancel()
+
+    def _drain(self):
+        """Handle up to DRAIN_BATCH queued messages in order, then reschedule if more are waiting."""
+        for _ in range(DRAIN_BATCH):
+            with self._lock:
+                if not self._queue:
+                    self._scheduled = False
+                    return
+                message, enqueued = self._queue.popleft()
+            self.queue_wait.record(time.perf_counter_ns() - enqueued)
+            self._handle(message)
+        with self._lock:
+            if not self._queue:
+                self._scheduled = False
+                return
+        self._schedule()
+
+    def _handle(self, message: Any):
+        if not self.active:
+            return
+        started = time.perf_counter_ns()
+        try:
+            self.callback(message)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error in subscription callback: {e}")
+        self.handler_time.record(time.perf_counter_ns() - started)
+        self.delivered += 1
+
+    def cancel(self):
+        """Stop delivering and drop queued messages; a callback already running finishes."""
+        with self._lock:
+            self.active = False
+            self._queue.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, queue depth and latency summaries in milliseconds."""
+        return {
+            "message_types": sorted(self.message_types) if self.message_types is not None else ALL_MESSAGES,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "handler": self.handler_time.summary(),
+            "queue_wait": self.queue_wait.summary(),
+        }
+
+
+class Subscriptions:
+    """Routing table from message type to subscribers."""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+
+        # (routes by type, wildcard subscribers), rebuilt by _rebuild and replaced as one tuple,
+        # so publish reads a consistent pair without the lock
+        self._table: Tuple[Dict[str, Tuple[Subscription, ...]], Tuple[Subscription, ...]] = ({}, ())
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def __bool__(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, message_types: Union[str, Iterable[str], None], callback: Callable[[Any], None],
+                  executor: SubscriptionExecutor = None, max_pending: int = 0) -> Subscription:
+        """
+        Add a subscription.
+
+        Args:
+            message_types: A message type, several, or None (or ALL_MESSAGES) for every type
+            callback: Function taking the decoded server message
+            executor: Executor or event loop to run the callback on, inline by default
+            max_pending: Off-thread only; drop the oldest queued message beyond this many (0 is unbounded)
+
+        Returns:
+            The Subscription, for unsubscribe() and its stats
+        """
+        if message_types is None or message_types == ALL_MESSAGES:
+            types = None
+        elif isinstance(message_types, str):
+            types = frozenset((message_types,))
+        else:
+            types = frozenset(message_types)
+        subscription = Subscription(types, callback, executor, max_pending)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            self._rebuild()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscription and drop its queued messages."""
+        subscription.cancel()
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+                self._rebuild()
+
+    def _rebuild(self):
+        """Recompute the routing table; called with the lock held."""
+        wildcard = tuple(s for s in self._subscriptions if s.message_types is None)
+        routes: Dict[str, Tuple[Subscription, ...]] = {}
+        for message_type in {t for s in self._subscriptions if s.message_types is not None for t in s.message_types}:
+            # Keep subscription order, so subscribers of one type are called in the order they subscribed
+            routes[message_type] = tuple(s for s in self._subscriptions
+                                         if s.message_types is None or message_type in s.message_types)
+        self._table = (routes, wildcard)
+
+    def publish(self, message_type: str, message: Any):
+        """Deliver a message to the subscribers of its type."""
+        routes, wildcard = self._table
+        for subscription in routes.get(message_type, wildcard):
+            subscription.deliver(message)
+
+    def close(self):
+        """Cancel every subscription."""
+        with self._lock:
+            subscriptions = self._subscriptions
+            self._subscriptions = []
+            self._rebuild()
+        for subscription in subscriptions:
+            subscription.cancel()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Stats of every subscription, in subscription order."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        return [subscription.stats() for subscription in subscriptions]
@@ -0,0 +1,197 @@
+"""
+Process-wide, content-addressed cache of card SVG data.
+
+SVGs are stored once per content hash, so the many cards that fall back to
+the same template share one string, and every GameContext holds references
+to the cached strings instead of the copies each message decodes. Entries
+are evicted least recently used beyond max_bytes.
+
+With a directory, blobs are also written to <directory>/<hash>.svg and read
+back through mmap on a memory miss, so the cache survives restarts and
+evicted entries cost a file read instead of a network resend.
+
+The hashes match CardSvgHash on the server (lowercase hex SHA-256 of the
+UTF-8 text), which is what lets a client advertise its cache with an
+ExtCachedCardImagesRequest.
+"""
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+def svg_hash(svg_data: str) -> str:
+    """Content hash of SVG data, as computed by the server."""
+    return hashlib.sha256(svg_data.encode("utf-8")).hexdigest()
+
+
+class SvgCache:
+    """LRU cache of SVG strings keyed by content hash, with a card id to hash index."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, directory: Optional[str] = None):
+        """
+        Initialize a new instance of the SvgCache class.
+
+        Args:
+            max_bytes: Total SVG size kept in memory before evicting
+            directory: Optional directory persisting the blobs across processes
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._blobs: "OrderedDict[str, str]" = OrderedDict()
+        self._card_hashes: Dict[str, str] = {}
+        self._pinned: set = set()
+        # Contexts run handlers on their own websocket threads
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            index_path = os.path.join(directory, "cards.txt")
+            if os.path.exists(index_path):
+                with open(index_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        card_id, _, content_hash = line.strip().partition(" ")
+                        if content_hash and os.path.exists(self._blob_path(content_hash)):
+                            self._card_hashes[card_id] = content_hash
+
+    def put(self, card_id: str, svg_data: str) -> str:
+        """
+        Store the SVG of a card.
+
+        Args:
+            card_id: Id of the card
+            svg_data: The SVG text as received
+
+        Returns:
+            The cached string with the same content; keep this instead of svg_data
+        """
+        with self._lock:
+            # Cards are usually resent unchanged; comparing is cheaper than hashing
+            known_hash = self._card_hashes.get(card_id)
+            cached = self._blobs.get(known_hash) if known_hash is not None else None
+            if cached is not None and cached == svg_data:
+                self._blobs.move_to_end(known_hash)
+                self.hits += 1
+                return cached
+
+        content_hash = svg_hash(svg_data)
+        with self._lock:
+            previous = self._card_hashes.get(card_id)
+            self._card_hashes[card_id] = content_hash
+            cached = self._blobs.get(content_hash)
+            if cached is not None:
+                self._blobs.move_to_end(content_hash)
+                self.hits += 1
+                return cached
+            self.misses += 1
+            self._blobs[content_hash] = svg_data
+            self.size += len(svg_data)
+            self._evict()
+
+        if self.directory is not None:
+            self._write(content_hash, svg_data, card_id if previous != content_hash else None)
+        return svg_data
+
+    def get(self, card_id: str) -> Optional[str]:
+        """Cached SVG of a card, or None."""
+        with self._lock:
+            content_hash = self._card_hashes.get(card_id)
+            if content_hash is None:
+                return None
+            cached = self._blobs.get(content_hash)
+            if cached is not None:
+                self._blobs.move_to_end(content_hash)
+                return cached
+        return self._load(content_hash)
+
+    def card_hashes(self, pin: bool = False) -> Dict[str, str]:
+        """
+        Card id to content hash of every card the cache can serve.
+
+        Args:
+            pin: Keep these SVGs in memory from now on, for hashes advertised to a server
+
+        Returns:
+            A copy of the index
+        """
+        with self._lock:
+            if self.directory is None:
+                hashes = {card_id: h for card_id, h in self._card_hashes.items() if h in self._blobs}
+            else:
+                hashes = dict(self._card_hashes)
+            if pin:
+                self._pinned.update(hashes.values())
+        if pin and self.directory is not None:
+            for card_id in hashes:
+                self.get(card_id)
+        return hashes
+
+    def clear(self):
+        """Drop everything held in memory; files on disk are kept."""
+        with self._lock:
+            self._blobs.clear()
+            self._card_hashes.clear()
+            self._pinned.clear()
+            self.size = 0
+
+    def _evict(self):
+        blobs = self._blobs
+        for content_hash in list(blobs):
+            if self.size <= self.max_bytes:
+                break
+            if content_hash in self._pinned:
+                continue
+            self.size -= len(blobs.pop(content_hash))
+        if self.directory is None:
+            live = blobs.keys()
+            for card_id in [c for c, h in self._card_hashes.items() if h not in live]:
+                del self._card_hashes[card_id]
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.svg")
+
+    def _write(self, content_hash: str, svg_data: str, new_card_id: Optional[str]):
+        try:
+            path = self._blob_path(content_hash)
+            if not os.path.exists(path):
+                # Write then rename so other processes never map a partial file
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, "w", encoding="utf-8", newline="") as f:
+                    f.write(svg_data)
+                os.replace(temp_path, path)
+            if new_card_id is not None:
+                with open(os.path.join(self.directory, "cards.txt"), "a", encoding="utf-8") as f:
+                    f.write(f"{new_card_id} {content_hash}\n")
+        except OSError as e:
+            print(f"Error writing SVG cache: {e}")
+
+    def _load(self, content_hash: str) -> Optional[str]:
+        if self.directory is None:
+            return None
+        try:
+            with open(self._blob_path(content_hash), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    svg_data = ""
+                else:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        svg_data = str(mapped[:], "utf-8")
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._blobs.get(content_hash)
+            if cached is not None:
+                return cached
+            self._blobs[content_hash] = svg_data
+            self.size += len(svg_data)
+            self._evict()
+        return svg_data
+
+
+# Shared by every GameContext in the process
+default_svg_cache = SvgCache()
@@ -0,0 +1,17 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The ML modules import each other as top-level modules, as when run from the ML directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIMULATOR_TRACE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "simulator_trace.jsonl")
+
+
+@pytest.fixture
+def simulator_trace():
+    """One FightSimulator fight as player_1's attached client receives it, as message dicts."""
+    with open(SIMULATOR_TRACE, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
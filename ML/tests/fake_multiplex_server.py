@@ -0,0 +1,86 @@
+"""
+In-process stand-in for the game server's multiplexed WebSocket sessions.
+
+Implements the part of GameSession in WebSocketServer.cs that
+MultiplexConnection relies on: the first frame of a new SessionId creates a
+player, ExtPlayerIdRequest is answered with its id, replies carry the
+SessionId as their first field and ExtCloseSessionRequest stops one player.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from websockets.asyncio.server import serve
+
+
+class FakeMultiplexServer:
+    """Serves multiplexed sessions on a local port from a background event loop."""
+
+    def __init__(self):
+        self.players: Dict[str, str] = {}  # SessionId -> player id
+        self.closed_sessions: List[str] = []
+        self.received: List[Dict[str, Any]] = []
+        self.paths: List[str] = []
+        self.port: Optional[int] = None
+        self._player_ids = itertools.count(1)
+        self._connections = set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/ws"
+
+    def start(self) -> "FakeMultiplexServer":
+        self._thread.start()
+
+        async def start_serving():
+            return await serve(self._handle, "127.0.0.1", 0)
+
+        self._server = asyncio.run_coroutine_threadsafe(start_serving(), self._loop).result(5.0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        async def shutdown():
+            self._server.close()
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(5.0)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5.0)
+
+    def push(self, session_id: str, message: Dict[str, Any]):
+        """Send a server message to one session, tagged like the server does."""
+        frame = json.dumps({"SessionId": session_id, **message}, separators=(",", ":"))
+        for connection in list(self._connections):
+            asyncio.run_coroutine_threadsafe(connection.send(frame), self._loop).result(5.0)
+
+    def drop_connections(self):
+        """Abort every connection without a closing handshake, like a crashed server."""
+        for connection in list(self._connections):
+            self._loop.call_soon_threadsafe(connection.transport.abort)
+
+    async def _handle(self, connection):
+        self._connections.add(connection)
+        self.paths.append(connection.request.path)
+        try:
+            async for frame in connection:
+                message = json.loads(frame)
+                self.received.append(message)
+                session_id = message["SessionId"]
+                if message["MessageType"] == "ExtCloseSessionRequest":
+                    self.players.pop(session_id, None)
+                    self.closed_sessions.append(session_id)
+                    continue
+                player_id = self.players.setdefault(session_id, f"player_{next(self._player_ids)}")
+                if message["MessageType"] == "ExtPlayerIdRequest":
+                    await connection.send(json.dumps({"SessionId": session_id, "MessageType": "ExtPlayerIdResponse",
+                                                      "PlayerId": player_id}, separators=(",", ":")))
+        except Exception:
+            pass
+        finally:
+            self._connections.discard(connection)
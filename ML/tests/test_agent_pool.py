@@ -0,0 +1,121 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from GameContext import GameContext
+from agent_pool import (NUM_STATS, STAT_DROPPED, STAT_TRANSITIONS, AgentPool, SharedRingBuffer, _connect_threaded,
+                        _Worker, random_policy, transition_size)
+from observation import DEFAULT_STATE_DIM
+
+
+def _records(start, count, record_size=3):
+    return np.arange(start * record_size, (start + count) * record_size, dtype=np.float32).reshape(count, record_size)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRingBuffer.create(4, 3)
+    yield ring
+    ring.close()
+
+
+def test_ring_wraps_around(ring):
+    assert ring.push_many(_records(0, 3)) == 3
+    np.testing.assert_array_equal(ring.pop_batch(2), _records(0, 2))
+
+    # Records 3 and 4 go to the last slot and the first
+    assert ring.push_many(_records(3, 3)) == 3
+    assert len(ring) == 4
+    np.testing.assert_array_equal(ring.pop_batch(), np.concatenate((_records(2, 1), _records(3, 3))))
+    assert len(ring) == 0 and ring.pop_batch().shape == (0, 3)
+
+
+def test_full_ring_drops_what_does_not_fit(ring):
+    assert ring.push_many(_records(0, 6)) == 4
+    assert ring.push_many(_records(6, 1)) == 0
+
+    np.testing.assert_array_equal(ring.pop_batch(), _records(0, 4))
+
+
+def test_consumer_sees_records_through_an_attached_view(ring):
+    other = SharedRingBuffer.attach(ring.name, ring.capacity, ring.record_size)
+    try:
+        other.push_many(_records(0, 2))
+        np.testing.assert_array_equal(ring.pop_batch(), _records(0, 2))
+        assert len(other) == 0
+    finally:
+        other.close()
+
+
+def _worker(transitions, max_fight_steps=2000):
+    stats = np.zeros(NUM_STATS)
+    worker = _Worker(0, 4, "simulator", "ws://localhost", random_policy, DEFAULT_STATE_DIM, transitions, None,
+                     stats, threading.Event(), max_fight_steps, seed=0)
+    return worker, stats
+
+
+def _run(worker, iterations):
+    for _ in range(iterations):
+        worker._start_idle_fights()
+        worker._step()
+        worker._flush()
+
+
+def test_worker_counts_transitions_dropped_by_a_full_ring():
+    transitions = SharedRingBuffer.create(8, transition_size(DEFAULT_STATE_DIM))
+    try:
+        worker, stats = _worker(transitions)
+        _run(worker, 50)
+        worker.dispose()
+
+        assert stats[STAT_TRANSITIONS] == 8 and len(transitions) == 8
+        assert stats[STAT_DROPPED] > 0
+    finally:
+        transitions.close()
+
+
+def test_overlong_fights_are_abandoned_as_draws():
+    transitions = SharedRingBuffer.create(1024, transition_size(DEFAULT_STATE_DIM))
+    try:
+        worker, stats = _worker(transitions, max_fight_steps=2)
+        _run(worker, 20)
+        worker.dispose()
+        records = transitions.pop_batch()
+    finally:
+        transitions.close()
+
+    d = DEFAULT_STATE_DIM
+    done = records[:, d + 2] > 0.5
+    assert done.any()
+    # Every agent decides at most twice a fight, so no episode has more than two transitions
+    assert len(records) <= 2 * done.sum()
+    # Abandoned fights end as draws and new ones start on the same simulators
+    assert (records[done, d + 1] == 0.0).sum() > done.sum() / 2
+    assert all(agent.simulator.fight_id != "fight_1" for agent in worker.agents)
+
+
+def test_server_backend_refuses_asyncio_contexts():
+    with pytest.raises(ValueError):
+        _connect_threaded(GameContext("ws://localhost", use_asyncio=True))
+
+
+def test_monitor_restarts_a_dead_worker():
+    pool = AgentPool(num_workers=1, contexts_per_worker=2, heartbeat_timeout=30.0, seed=0)
+    pool.start(monitor_interval=0)
+    try:
+        first = pool._processes[0]
+        deadline = time.time() + 30.0
+        while pool.stats()[0]["steps"] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        first.terminate()
+        first.join(timeout=5.0)
+
+        assert pool.monitor() == [0]
+        worker = pool.stats()[0]
+        assert worker["alive"] and worker["restarts"] == 1
+        assert pool._processes[0] is not first
+        assert pool.monitor() == []
+    finally:
+        pool.shutdown()
@@ -0,0 +1,113 @@
+import asyncio
+
+import GameContext as game_context
+from GameContext import GameContext
+from async_transport import AsyncWebSocketTransport
+
+
+class _FakeConnection:
+    """Yields a fixed list of frames like an open websockets connection, then ends."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for frame in self.frames:
+            yield frame
+
+
+class _SlowConnection:
+    """Accepts frames once the gate opens, like a socket whose send buffer is full."""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.sent = []
+        self.closed = False
+
+    async def send(self, data):
+        await self.gate.wait()
+        self.sent.append(data)
+
+    async def close(self):
+        self.closed = True
+        self.gate.set()
+
+
+def _connected_context():
+    context = GameContext("ws://localhost", use_asyncio=True, codec="json")
+    context.transport = AsyncWebSocketTransport(context.server_url, context._process_message)
+    context.transport.connection = _SlowConnection()
+    context.transport._connected = True
+    return context
+
+
+def _player_id_frames(count):
+    return [f'{{"MessageType": "ExtPlayerIdResponse", "PlayerId": "p{i}"}}' for i in range(count)]
+
+
+def test_state_keeps_updating_without_recv():
+    async def run():
+        context = GameContext("ws://localhost", use_asyncio=True)
+        transport = AsyncWebSocketTransport(context.server_url, context._process_message, context.max_queue)
+        transport.connection = _FakeConnection(_player_id_frames(400))
+        await transport._read_loop()
+        return context
+
+    context = asyncio.run(run())
+    assert context.player_id == "p399"
+
+
+def test_full_recv_queue_drops_oldest():
+    async def run():
+        context = GameContext("ws://localhost", use_asyncio=True)
+        transport = AsyncWebSocketTransport(context.server_url, context._process_message, max_queue=8)
+        transport.connection = _FakeConnection(_player_id_frames(400))
+        await transport._read_loop()
+        received = []
+        while not transport.inbound.empty():
+            try:
+                received.append(await transport.recv())
+            except ConnectionError:
+                break
+        return context, transport, received
+
+    context, transport, received = asyncio.run(run())
+    assert context.player_id == "p399"
+    # The close marker takes one slot, the rest are the newest messages in order
+    assert [m.player_id for m in received] == [f"p{i}" for i in range(393, 400)]
+    assert transport.dropped == 400 + 1 - 8
+
+
+def test_send_keeps_its_tasks_and_refuses_beyond_the_limit():
+    async def run():
+        context = _connected_context()
+        connection = context.transport.connection
+        accepted = [context.send({"MessageType": "ExtEndTurnRequest", "Index": i})
+                    for i in range(game_context.MAX_PENDING_SENDS + 1)]
+        await asyncio.sleep(0)
+        pending = len(context._send_tasks)
+        connection.gate.set()
+        await asyncio.gather(*context._send_tasks)
+        return context, connection, accepted, pending
+
+    context, connection, accepted, pending = asyncio.run(run())
+    assert accepted == [True] * game_context.MAX_PENDING_SENDS + [False]
+    assert pending == game_context.MAX_PENDING_SENDS and not context._send_tasks
+    assert [f'"Index": {i}}}' in frame for i, frame in enumerate(connection.sent)] == \
+        [True] * game_context.MAX_PENDING_SENDS
+
+
+def test_dispose_closes_the_transport_in_the_background():
+    async def run():
+        context = _connected_context()
+        connection = context.transport.connection
+        context.dispose()
+        assert len(game_context._closing_tasks) == 1
+        await asyncio.gather(*game_context._closing_tasks)
+        return connection
+
+    assert asyncio.run(run()).closed
+    assert not game_context._closing_tasks
@@ -0,0 +1,183 @@
+import random
+
+import numpy as np
+import pytest
+
+from GameContext import GameContext
+from batch_env import END_TURN, NUM_ACTIONS, BatchFightEnv, action_to_message, context_action_mask
+from card_library import ALL_CARDS, CARD_INDEX
+from models import STATUS_EFFECT_INDEX
+from observation import NUM_CARDS
+from simulator import STARTING_HP, FightSimulator
+
+ENVIRONMENT_EFFECT = STATUS_EFFECT_INDEX["EnvironmentEffect"]
+
+
+def _counts(cards):
+    counts = np.zeros(NUM_CARDS, dtype=np.int32)
+    for card in cards:
+        counts[CARD_INDEX[card.id]] += 1
+    return counts
+
+
+def _load_piles(env, sim):
+    """Copy the simulator's hands, decks and discard piles into fight 0."""
+    for p, player_id in enumerate((sim.player1_id, sim.player2_id)):
+        state = sim.state.get_player_state(player_id)
+        env.hand[0, p] = _counts(state.hand)
+        env.deck[0, p] = _counts(state.cards)
+        env.discard[0, p] = _counts(state.discard_pile)
+
+
+def _load(env, sim):
+    """Copy the whole simulator fight state into fight 0."""
+    env.effect_type[0] = -1
+    env.environment_present[0] = False
+    environments = {}
+    for p, player_id in enumerate((sim.player1_id, sim.player2_id)):
+        state = sim.state.get_player_state(player_id)
+        env.hit_points[0, p] = state.hit_points
+        env.max_hit_points[0, p] = state.max_hit_points
+        env.action_points[0, p] = state.action_points
+        slot = 0
+        for effect in state.active_effects:
+            if effect.type == "EnvironmentEffect":
+                # One instance shared by both players takes one environment slot
+                k = environments.setdefault(effect.id, len(environments))
+                env.environment_magnitude[0, k] = effect.magnitude
+                env.environment_duration[0, k] = effect.duration
+                env.environment_present[0, p, k] = True
+                continue
+            env.effect_type[0, p, slot] = STATUS_EFFECT_INDEX[effect.type]
+            env.effect_magnitude[0, p, slot] = effect.magnitude
+            env.effect_duration[0, p, slot] = effect.duration
+            slot += 1
+    env.turn[0] = 0 if sim.state.current_turn_player_id == sim.player1_id else 1
+    _load_piles(env, sim)
+
+
+def _effects(env, sim):
+    """(type, magnitude, duration) of every active effect per player, from both sides."""
+    expected, actual = [], []
+    for p, player_id in enumerate((sim.player1_id, sim.player2_id)):
+        expected.append(sorted((STATUS_EFFECT_INDEX[e.type], e.magnitude, e.duration)
+                               for e in sim.state.get_player_state(player_id).active_effects))
+        slots = [(t, m, d) for t, m, d in zip(env.effect_type[0, p], env.effect_magnitude[0, p],
+                                              env.effect_duration[0, p]) if t >= 0]
+        slots += [(ENVIRONMENT_EFFECT, m, d) for m, d, present in zip(
+            env.environment_magnitude[0], env.environment_duration[0], env.environment_present[0, p]) if present]
+        actual.append(sorted(slots))
+    return expected, actual
+
+
+def _assert_same_state(env, sim, exact_hands):
+    for p, player_id in enumerate((sim.player1_id, sim.player2_id)):
+        state = sim.state.get_player_state(player_id)
+        assert env.hit_points[0, p] == state.hit_points
+        assert env.max_hit_points[0, p] == state.max_hit_points
+        assert env.action_points[0, p] == state.action_points
+        assert (env.hand[0, p].sum(), env.deck[0, p].sum(), env.discard[0, p].sum()) == \
+            (len(state.hand), len(state.cards), len(state.discard_pile))
+        # Draws pick different cards, but never change which cards a player owns
+        owned = env.hand[0, p] + env.deck[0, p] + env.discard[0, p]
+        np.testing.assert_array_equal(owned, _counts(state.hand + state.cards + state.discard_pile))
+        if exact_hands:
+            np.testing.assert_array_equal(env.hand[0, p], _counts(state.hand))
+    expected, actual = _effects(env, sim)
+    assert actual == expected
+    assert env.turn[0] == (0 if sim.state.current_turn_player_id == sim.player1_id else 1)
+
+
+def _choose(sim, rng):
+    """A random affordable card of the player to act, or END_TURN; Dodge cards are left out
+    because the two implementations roll dodges from different random streams."""
+    state = sim.state.get_player_state(sim.state.current_turn_player_id)
+    playable = [card for card in state.hand if card.cost <= state.action_points and card.subtype != "Dodge"]
+    if not playable or rng.random() < 0.2:
+        return END_TURN
+    return CARD_INDEX[rng.choice(playable).id]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_step_matches_simulator(seed):
+    sim = FightSimulator(seed=seed, include_svg=False)
+    contexts = []
+    for player_id in (sim.player1_id, sim.player2_id):
+        context = GameContext("ws://localhost")
+        sim.attach(context, player_id)
+        contexts.append(context)
+    sim.start_fight()
+    env = BatchFightEnv(1, seed=seed, max_turns=1000)
+    _load(env, sim)
+    rng = random.Random(seed)
+
+    for _ in range(300):
+        action = _choose(sim, rng)
+        actor = env.turn[0]
+        contexts[actor].send(action_to_message(action))
+        _, rewards, done, info = env.step(np.array([action]))
+
+        if not sim.is_active:
+            winner = 0 if sim.winner_id == sim.player1_id else 1
+            # Damage reflection can knock out the player who played the card
+            assert done[0] and info["winner"][0] == winner
+            assert rewards[0] == (1.0 if winner == actor else -1.0)
+            return
+        assert not done[0]
+        _assert_same_state(env, sim, exact_hands=action != END_TURN)
+        if action == END_TURN:
+            _load_piles(env, sim)
+        for p, context in enumerate(contexts):
+            np.testing.assert_array_equal(env.observations(player=p)[0], context.get_observation())
+            if env.turn[0] == p:
+                np.testing.assert_array_equal(env.action_mask()[0], context_action_mask(context))
+
+
+def test_observations_match_game_context(simulator_trace):
+    context = GameContext("ws://localhost")
+    context.on_receive({"MessageType": "ExtPlayerIdResponse", "PlayerId": "player_1"})
+    env = BatchFightEnv(1, seed=0)
+    checked = 0
+
+    for message in simulator_trace:
+        context.on_receive(message)
+        if message["MessageType"] != "ExtFightStateUpdate":
+            continue
+        # Load the fight as the context sees it; only pile sizes and the opponent's hand size are known
+        for side, update in ((0, message["PlayerState"]), (1, message["OpponentState"])):
+            env.hit_points[0, side] = update["HitPoints"]
+            env.action_points[0, side] = update["ActionPoints"]
+            env.deck[0, side] = 0
+            env.deck[0, side, 0] = update["DeckCount"]
+            env.discard[0, side] = 0
+            env.discard[0, side, 0] = update["DiscardPileCount"]
+        env.hand[0] = 0
+        env.hand[0, 0] = _counts(context.cards_in_hand)
+        env.hand[0, 1, 0] = len(context.opponent_cards_in_hand)
+        env.effect_type[0] = -1
+        env.environment_present[0] = False
+        for side, effects in ((0, context.player_status_effects), (1, context.opponent_status_effects)):
+            for slot, effect in enumerate(effects):
+                env.effect_type[0, side, slot] = STATUS_EFFECT_INDEX[effect.type]
+                env.effect_magnitude[0, side, slot] = effect.magnitude
+        env.turn[0] = 0 if context.is_player_turn else 1
+
+        np.testing.assert_array_equal(env.observations(player=0)[0], context.get_observation())
+        checked += 1
+
+    assert checked >= 5
+
+
+def test_finished_fights_reset_and_others_carry_on():
+    env = BatchFightEnv(2, seed=0)
+    env.hit_points[0, 1] = 1
+    env.hand[:, 0] = 0
+    card = next(i for i, c in enumerate(ALL_CARDS) if c.type == "Attack" and c.subtype == "DirectDamage")
+    env.hand[:, 0, card] = 1
+    env.action_points[:, 0] = ALL_CARDS[card].cost
+
+    _, rewards, done, info = env.step(np.array([card, END_TURN]))
+
+    assert done.tolist() == [True, False] and rewards[0] == 1.0 and info["winner"].tolist() == [0, -1]
+    assert env.hit_points[0].tolist() == [STARTING_HP, STARTING_HP] and env.turn.tolist() == [0, 1]
+    assert env.action_mask().shape == (2, NUM_ACTIONS)
@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+import pytest
+
+from GameContext import GameContext
+from benchmarks import generate_message_stream
+from codec import available_codecs
+from simulator import FightSimulator
+
+STATE_ATTRIBUTES = (
+    "player_id", "player_position", "current_map_id", "current_tilemap_data", "other_player_info",
+    "active_fights", "current_fight_id", "opponent_id", "cards_in_hand",
+    "player_hit_points", "player_action_points", "player_deck_count", "player_discard_pile_count",
+    "opponent_hit_points", "opponent_action_points", "opponent_deck_count", "opponent_discard_pile_count",
+    "opponent_cards_in_hand", "player_status_effects", "opponent_status_effects", "last_played_card",
+    "current_turn_player_id", "pending_move",
+)
+
+
+def _plain(value):
+    """Reduce state to builtins, keeping the class name so a struct never equals its model."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    slots = getattr(type(value), "__slots__", None)
+    if slots:
+        return (type(value).__name__, {name: _plain(getattr(value, name)) for name in slots
+                                       if name not in ("tiles", "fingerprint")})
+    return value
+
+
+def _state(context):
+    return {name: _plain(getattr(context, name)) for name in STATE_ATTRIBUTES}
+
+
+def _frames():
+    messages = generate_message_stream(num_fights=2, num_players=6)
+    # Everything the synthetic stream lacks: moves, departures and a simulated fight
+    messages[3:3] = [
+        {"MessageType": "ExtMoveInitiated", "NewPosition": {"X": 1, "Y": 0}},
+        {"MessageType": "ExtMoveCompleted", "NewPosition": {"X": 1, "Y": 0}},
+        {"MessageType": "ExtMoveFailed", "AttemptedPosition": {"X": 2, "Y": 0}, "ErrorMessage": "Blocked"},
+        {"MessageType": "ExtPlayerLeftMap", "PlayerId": "player_5"},
+        {"MessageType": "ExtMapListResponse", "Maps": [{"Id": "map1", "Name": "Map", "Width": 32, "Height": 32,
+                                                        "PlayerCount": 3}]},
+    ]
+    sim = FightSimulator(seed=3, include_svg=False, include_map_notifications=True)
+    sim.add_listener(sim.player1_id, messages.append)
+    sim.run_random_fight()
+    return [json.dumps(message) for message in messages]
+
+
+@pytest.mark.parametrize("codec", [name for name in available_codecs() if name != "json"])
+def test_codecs_produce_the_same_state(codec):
+    frames = _frames()
+    reference = GameContext("ws://localhost", codec="json")
+    context = GameContext("ws://localhost", codec=codec)
+    for frame in frames:
+        reference._process_message(frame)
+        context._process_message(frame)
+        assert _state(context) == _state(reference), frame
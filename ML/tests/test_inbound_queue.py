@@ -0,0 +1,116 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from inbound_queue import CoalescingQueue
+
+
+def _position(player_id, x):
+    return SimpleNamespace(message_type="ExtPlayerPositionChange", player_id=player_id, x=x)
+
+
+def _left(player_id):
+    return SimpleNamespace(message_type="ExtPlayerLeftMap", player_id=player_id)
+
+
+def _drain(queue):
+    messages = []
+    while len(queue):
+        messages.append(queue.get(timeout=0))
+    return messages
+
+
+def _wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_position_is_not_applied_ahead_of_an_earlier_left_map():
+    queue = CoalescingQueue(capacity=8)
+    queue.put(_position("a", 1))
+    left = _left("a")
+    queue.put(left)
+    queue.put(_position("a", 2))
+    queue.put(_position("b", 1))
+    queue.put(_position("a", 3))
+
+    messages = _drain(queue)
+
+    assert messages[0] is left
+    assert [(m.player_id, m.x) for m in messages[1:]] == [("b", 1), ("a", 3)]
+    assert queue.coalesced == 2
+
+
+def test_coalesced_entry_is_requeued_after_it_was_dispatched():
+    queue = CoalescingQueue(capacity=8)
+    queue.put(_position("a", 1))
+    assert queue.get(timeout=0).x == 1
+    queue.put(_position("a", 2))
+
+    assert [m.x for m in _drain(queue)] == [2]
+    assert queue.coalesced == 0
+
+
+def test_new_position_evicts_the_oldest_position_when_full():
+    queue = CoalescingQueue(capacity=3)
+    queue.put(_position("a", 1))
+    queue.put(_left("b"))
+    queue.put(_position("c", 1))
+    # Superseding "a" moves it behind "c", so "c" is now the oldest position
+    assert queue.put(_position("a", 2))
+
+    assert queue.put(_position("d", 1))
+
+    assert (queue.dropped, len(queue)) == (1, 3)
+    assert [(m.message_type, m.player_id) for m in _drain(queue)] == [
+        ("ExtPlayerLeftMap", "b"), ("ExtPlayerPositionChange", "a"), ("ExtPlayerPositionChange", "d")]
+
+
+def test_new_position_is_dropped_when_full_of_other_messages():
+    queue = CoalescingQueue(capacity=1)
+    queue.put(_left("b"))
+
+    assert not queue.put(_position("c", 1))
+
+    assert queue.dropped == 1
+    assert [m.message_type for m in _drain(queue)] == ["ExtPlayerLeftMap"]
+
+
+def test_producer_blocks_when_full_until_consumed():
+    queue = CoalescingQueue(capacity=1)
+    queue.put(_left("a"))
+    results = []
+    producer = threading.Thread(target=lambda: results.append(queue.put(_left("b"))))
+    producer.start()
+
+    _wait_until(lambda: queue.blocked == 1)
+    assert producer.is_alive()
+    assert queue.get(timeout=1).player_id == "a"
+    producer.join(timeout=2)
+
+    assert results == [True]
+    assert queue.get(timeout=1).player_id == "b"
+
+
+def test_close_wakes_blocked_producer_and_waiting_consumer():
+    full = CoalescingQueue(capacity=1)
+    full.put(_left("a"))
+    empty = CoalescingQueue(capacity=1)
+    results = {}
+    producer = threading.Thread(target=lambda: results.setdefault("put", full.put(_left("b"))))
+    consumer = threading.Thread(target=lambda: results.setdefault("get", empty.get()))
+    producer.start()
+    consumer.start()
+    _wait_until(lambda: full.blocked == 1)
+
+    full.close()
+    empty.close()
+    producer.join(timeout=2)
+    consumer.join(timeout=2)
+
+    assert results == {"put": False, "get": None}
+    # What was queued before close can still be drained
+    assert full.get().player_id == "a"
+    assert full.get() is None
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from GameContext import GameContext
+from batch_env import END_TURN, NUM_ACTIONS
+from inference import BrokerAgent, InferenceBroker
+from observation import DEFAULT_STATE_DIM
+
+
+class _RecordingPolicy:
+    """Ends the turn for every request and remembers the batch sizes it was called with."""
+
+    def __init__(self, error=None):
+        self.batch_sizes = []
+        self.error = error
+
+    def __call__(self, observations, masks):
+        self.batch_sizes.append(len(observations))
+        if self.error is not None:
+            raise self.error
+        return np.full(len(observations), END_TURN)
+
+
+def _request(value=0.0):
+    return np.full(DEFAULT_STATE_DIM, value, dtype=np.float32), np.ones(NUM_ACTIONS, dtype=bool)
+
+
+def test_requests_are_batched_up_to_max_batch_size():
+    policy = _RecordingPolicy()
+    broker = InferenceBroker(policy, max_batch_size=4, max_wait=0.01)
+    futures = [broker.submit(*_request(i)) for i in range(10)]
+
+    with broker:
+        assert [future.result(timeout=2.0) for future in futures] == [END_TURN] * 10
+
+    assert policy.batch_sizes == [4, 4, 2]
+    stats = broker.stats()
+    assert (stats["decisions"], stats["batches"], stats["full_batches"], stats["pending"]) == (10, 3, 2, 0)
+    assert stats["latency"]["count"] == 10
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    policy = _RecordingPolicy()
+    with InferenceBroker(policy, max_batch_size=64, max_wait=0.05) as broker:
+        started = time.perf_counter()
+        assert broker.decide(*_request(), timeout=2.0) == END_TURN
+        waited = time.perf_counter() - started
+
+    assert policy.batch_sizes == [1]
+    assert 0.04 <= waited < 1.0
+
+
+def test_policy_error_reaches_every_request_in_the_batch():
+    error = RuntimeError("policy failed")
+    broker = InferenceBroker(_RecordingPolicy(error), max_batch_size=4, max_wait=0.01)
+    futures = [broker.submit(*_request()) for _ in range(3)]
+    answered = threading.Event()
+    callback_results = []
+    broker.submit_callback(*_request(), lambda action: (callback_results.append(action), answered.set()))
+
+    with broker:
+        for future in futures:
+            assert future.exception(timeout=2.0) is error
+        assert answered.wait(2.0)
+
+    assert callback_results == [None]
+    assert (broker.errors, broker.decisions) == (1, 0)
+
+
+def test_closed_broker_rejects_requests():
+    broker = InferenceBroker(_RecordingPolicy())
+    broker.start()
+    broker.close()
+
+    with pytest.raises(RuntimeError):
+        broker.submit(*_request()).result(timeout=1.0)
+
+
+def test_broker_agent_acts_on_the_dispatch_thread(simulator_trace):
+    context = GameContext("ws://localhost", inbound_capacity=16)
+    context.start_dispatcher()
+    dispatch_thread = context.dispatch_thread
+    sent = []
+    done = threading.Event()
+
+    def send(message):
+        sent.append((message, threading.current_thread(), context.is_player_turn))
+        done.set()
+        return True
+
+    context.send = send
+    with InferenceBroker(_RecordingPolicy(), max_wait=0.001) as broker:
+        BrokerAgent(context, broker)
+        context.deliver({"MessageType": "ExtPlayerIdResponse", "PlayerId": "player_1"})
+        for message in simulator_trace:
+            context.deliver(message)
+            if message["MessageType"] == "ExtFightStateUpdate":
+                break
+        assert done.wait(2.0)
+    context.dispose()
+
+    assert sent == [({"MessageType": "ExtEndTurnRequest"}, dispatch_thread, True)]
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from load_test import (Stage, format_summary, parse_mix, parse_schedule, share, summarize)
+from metrics import Metrics
+
+
+def test_parse_schedule():
+    assert parse_schedule("100:30, 500:60.5,1000:60") == [Stage(100, 30.0), Stage(500, 60.5), Stage(1000, 60.0)]
+    with pytest.raises(ValueError):
+        parse_schedule("100")
+    with pytest.raises(ValueError):
+        parse_schedule("many:30")
+
+
+def test_parse_mix():
+    assert parse_mix("walker=0.5, fighter=2") == {"walker": 0.5, "fighter": 2.0}
+    # A script without a weight counts once
+    assert parse_mix("churner") == {"churner": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("sleeper=1")
+
+
+@pytest.mark.parametrize("total", [0, 1, 7, 100, 1001])
+@pytest.mark.parametrize("parts", [1, 3, 8])
+def test_shares_add_up_and_differ_by_at_most_one(total, parts):
+    shares = [share(total, index, parts) for index in range(parts)]
+
+    assert sum(shares) == total
+    assert max(shares) - min(shares) <= 1
+    assert shares == sorted(shares, reverse=True)
+
+
+def _metrics():
+    metrics = Metrics()
+    now = 0
+    for _ in range(4):
+        metrics.record_sent("ExtPlayerMoveRequest", now)
+        metrics.record_received("ExtMoveCompleted", 0, now + 2_000_000)
+        now += 10_000_000
+    for _ in range(12):
+        metrics.record_received("ExtPlayerPositionChange", 0, now)
+    metrics.record_sent("ExtPlayCardRequest", now)
+    metrics.record_received("ExtCardPlayFailed", 0, now + 1_000_000)
+    metrics.record_frame(None, 10, 0, 0)
+    return metrics
+
+
+def test_summarize():
+    counters = {"connects": 10, "connect_failures": 2, "disconnects": 1, "timeout:move": 3, "timeout:turn": 1,
+                "challenges_accepted": 4}
+
+    summary = summarize(Stage(12, 2.0), 9, counters, _metrics())
+
+    assert (summary["clients"], summary["connected"], summary["seconds"]) == (12, 9, 2.0)
+    assert (summary["sent_per_s"], summary["received_per_s"]) == (2.5, 8.5)
+    assert summary["received_per_request"] == 17 / 5
+    assert summary["positions_per_move"] == 3.0
+    assert summary["errors"] == {"ExtCardPlayFailed": 1, "connect_failures": 2, "disconnects": 1, "timeouts": 4}
+    # 5 requests and 12 connection attempts
+    assert summary["error_rate"] == 8 / 17
+    assert summary["challenges"] == {"challenges_accepted": 4, "challenges_unanswered": 0}
+    assert list(summary["round_trip"]) == ["ExtPlayCardRequest", "ExtPlayerMoveRequest"]
+    assert summary["round_trip"]["ExtPlayerMoveRequest"]["count"] == 4
+    assert summary["decode_failures"] == 1
+    json.dumps(summary)
+
+
+def test_summarize_an_idle_stage():
+    summary = summarize(Stage(0, 1.0), 0, {}, Metrics())
+
+    assert (summary["received_per_request"], summary["positions_per_move"], summary["error_rate"]) == (0.0, 0.0, 0.0)
+    assert summary["errors"] == {} and summary["round_trip"] == {}
+
+
+def test_format_summary_labels_client_side_counts():
+    text = format_summary(0, summarize(Stage(12, 2.0), 9, {"disconnects": 1}, _metrics()))
+
+    assert text.splitlines()[0].startswith("stage 0: 9/12 clients connected")
+    assert "client-side 3.4 received per request" in text
+    assert "  errors: ExtCardPlayFailed=1, disconnects=1" in text
+    assert "ExtPlayerMoveRequest" in text and "ExtPlayCardRequest" in text
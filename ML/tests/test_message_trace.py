@@ -0,0 +1,88 @@
+import json
+import random
+
+import pytest
+
+from GameContext import GameContext
+from message_trace import INBOUND, OUTBOUND, TraceReader, TraceRecorder, _compressor_factories
+
+
+def _record(directory, frames, **kwargs):
+    with TraceRecorder(str(directory), compression="zlib", **kwargs) as recorder:
+        for i, frame in enumerate(frames):
+            recorder.record(INBOUND, frame, timestamp=1000.0 + i)
+
+
+def test_replay_runs_callbacks_and_metrics(tmp_path, simulator_trace):
+    frames = [json.dumps(message) for message in simulator_trace]
+    _record(tmp_path, frames)
+    context = GameContext("ws://localhost")
+    context.player_id = "player_1"
+    metrics = context.enable_metrics()
+    received = []
+    hit_points = []
+
+    def callback(msg):
+        received.append(msg.message_type)
+        if msg.message_type == "ExtFightStateUpdate":
+            hit_points.append((context.player_hit_points, context.opponent_hit_points))
+
+    context.add_server_message_callback(callback)
+
+    with TraceReader(str(tmp_path)) as reader:
+        delivered = reader.replay(context)
+
+    assert delivered == len(frames)
+    assert received == [message["MessageType"] for message in simulator_trace]
+    assert sum(metrics.received.values()) == len(frames)
+    assert hit_points[-1] == (3, 6)
+
+
+def _traffic(simulator_trace, fights):
+    """fights copies of the fight with their own fight ids, plus an outbound request after each message."""
+    records = []
+    for fight in range(fights):
+        for message in simulator_trace:
+            if "FightId" in message:
+                message = dict(message, FightId=f"fight_{fight}")
+            records.append((INBOUND, json.dumps(message).encode("utf-8")))
+            records.append((OUTBOUND, b'{"MessageType": "ExtEndTurnRequest"}'))
+    return [(1000.0 + i, direction, frame) for i, (direction, frame) in enumerate(records)]
+
+
+@pytest.mark.parametrize("compression", sorted(_compressor_factories()))
+def test_round_trip_across_segments(tmp_path, simulator_trace, compression):
+    traffic = _traffic(simulator_trace, fights=6)
+    with TraceRecorder(str(tmp_path), compression=compression, block_bytes=1024, segment_bytes=4096) as recorder:
+        for timestamp, direction, frame in traffic:
+            recorder.record(direction, frame, timestamp=timestamp)
+
+    with TraceReader(str(tmp_path)) as reader:
+        assert len(reader.segment_numbers) > 2
+        assert list(reader.records()) == traffic
+        assert list(reader.records(OUTBOUND)) == [r for r in traffic if r[1] == OUTBOUND]
+
+        episodes = reader.episodes()
+        assert [e["fight_id"] for e in episodes] == [f"fight_{i}" for i in range(6)]
+        assert {e["winner_id"] for e in episodes} == {"player_1"}
+        # Some episode starts in one segment and ends in another
+        assert any(e["start"][0] != e["end"][0] for e in episodes)
+        inbound = [r for r in traffic if r[1] == INBOUND]
+        for i, episode in enumerate(episodes):
+            assert reader.episode_records(episode) == inbound[i * len(simulator_trace):(i + 1) * len(simulator_trace)]
+        assert len(reader.sample_episode(random.Random(0))) == len(simulator_trace)
+
+
+def test_recorder_appends_after_existing_segments(tmp_path, simulator_trace):
+    first = _traffic(simulator_trace, fights=1)
+    second = [(t + len(first), d, f) for t, d, f in first]
+    for records in (first, second):
+        with TraceRecorder(str(tmp_path), compression="zlib") as recorder:
+            for timestamp, direction, frame in records:
+                recorder.record(direction, frame, timestamp=timestamp)
+
+    with TraceReader(str(tmp_path)) as reader:
+        assert reader.segment_numbers == [0, 1]
+        assert list(reader.records()) == first + second
+        # Both recordings used fight_0, and each was indexed when it ended
+        assert [e["start"][0] for e in reader.episodes()] == [0, 1]
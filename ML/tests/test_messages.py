@@ -0,0 +1,72 @@
+import pytest
+
+from messages import MESSAGE_CLASSES, decode_message, get_message_type
+from models import MapPosition
+
+
+def test_get_message_type_reads_current_and_legacy_keys():
+    assert get_message_type({"MessageType": "ExtTurnEnded"}) == "ExtTurnEnded"
+    assert get_message_type({"Type": "ExtTurnEnded"}) == "ExtTurnEnded"
+    assert get_message_type({"MessageType": "ExtTurnEnded", "Type": "Other"}) == "ExtTurnEnded"
+    assert get_message_type({}) is None
+
+
+def test_unknown_message_type_decodes_to_none():
+    assert decode_message({"MessageType": "ExtSomethingNew"}) is None
+    assert decode_message({}) is None
+
+
+@pytest.mark.parametrize("cls", MESSAGE_CLASSES, ids=lambda cls: cls.message_type)
+def test_every_message_type_decodes_to_its_class(cls):
+    assert type(decode_message({"MessageType": cls.message_type})) is cls
+
+
+def test_legacy_type_key_decodes():
+    message = decode_message({"Type": "ExtPlayerLeftMap", "PlayerId": "p1"})
+
+    assert message.message_type == "ExtPlayerLeftMap"
+    assert message.player_id == "p1"
+
+
+def test_join_map_completed_decodes_nested_payloads():
+    message = decode_message({
+        "MessageType": "ExtJoinMapCompleted",
+        "MapId": "map_1",
+        "PlayerId": "p1",
+        "Position": {"X": 2, "Y": 3},
+        "TilemapData": {"Width": 3, "Height": 2, "TileData": [0, 1, 2, 3, 4, 5]},
+        "PlayerInfo": {"p2": {"Position": {"X": 1, "Y": 0}, "FightId": "fight_1"}},
+    })
+
+    assert (message.map_id, message.player_id, message.position) == ("map_1", "p1", MapPosition(2, 3))
+    assert message.tilemap_data.get_tile(2, 1) == 5
+    assert message.tilemap_data.get_tile(3, 0) == -1
+    assert message.player_info["p2"].position == MapPosition(1, 0)
+    assert message.player_info["p2"].fight_id == "fight_1"
+
+
+def test_fight_state_update_decodes_with_defaults():
+    message = decode_message({
+        "MessageType": "ExtFightStateUpdate",
+        "CurrentTurnPlayerId": "p1",
+        "PlayerState": {
+            "PlayerId": "p1", "HitPoints": 7, "ActionPoints": 2, "DeckCount": 20, "DiscardPileCount": 3,
+            "Hand": [{"Id": "atk_001", "Name": "Fireball", "Description": "Deal 4 damage to target", "Cost": 2}],
+            "StatusEffects": [{"Type": "Burn", "Magnitude": 2, "Duration": 3}],
+        },
+    })
+
+    player = message.player_state
+    assert message.current_turn_player_id == "p1"
+    assert (player.hit_points, player.action_points, player.deck_count, player.discard_pile_count) == (7, 2, 20, 3)
+    assert [(card.id, card.cost) for card in player.hand] == [("atk_001", 2)]
+    assert [(e.type, e.value, e.duration) for e in player.status_effects] == [("Burn", 2, 3)]
+    # A missing state decodes to the defaults rather than None
+    opponent = message.opponent_state
+    assert (opponent.hit_points, opponent.hand, opponent.status_effects) == (50, [], [])
+
+
+def test_missing_optional_payloads_decode_to_none():
+    assert decode_message({"MessageType": "ExtMoveCompleted"}).new_position is None
+    assert decode_message({"MessageType": "ExtCardDrawn"}).card_info is None
+    assert decode_message({"MessageType": "ExtCardPlayCompleted"}).is_visible is True
@@ -0,0 +1,105 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+from metrics import SUB_BUCKET_BITS, LatencyHistogram
+
+
+def _values(seed=0, n=2000):
+    rng = random.Random(seed)
+    return [int(rng.lognormvariate(13, 2)) for _ in range(n)] + [0, 1, 31, 32, 33, 2 ** 40, 2 ** 62]
+
+
+def test_small_values_have_exact_buckets():
+    for value in range(2 << SUB_BUCKET_BITS):
+        assert LatencyHistogram.bucket_index(value) == value
+        assert LatencyHistogram.bucket_value(value) == value
+
+
+def test_every_value_falls_between_its_bucket_bounds():
+    values = list(range(5000)) + [2 ** k + d for k in range(5, 63) for d in (-1, 0, 1)] + [2 ** 63 - 1]
+    previous = 0
+    for value in values:
+        index = LatencyHistogram.bucket_index(value)
+        low = LatencyHistogram.bucket_value(index)
+        high = LatencyHistogram.bucket_value(index + 1)
+        assert low <= value < high
+        # Buckets are at most 1 / 2 ** SUB_BUCKET_BITS of their lower bound wide
+        assert (high - low) * (1 << SUB_BUCKET_BITS) <= max(low, 1 << SUB_BUCKET_BITS)
+        if value >= previous:
+            assert index >= LatencyHistogram.bucket_index(previous)
+        previous = value
+    assert LatencyHistogram.bucket_index(2 ** 63 - 1) < len(LatencyHistogram().counts)
+
+
+def test_record_many_matches_record():
+    values = _values() + [-5]
+    one_by_one = LatencyHistogram()
+    for value in values:
+        one_by_one.record(value)
+    batched = LatencyHistogram()
+    batched.record_many(np.array(values[:100]))
+    batched.record_many(np.array(values[100:]))
+    batched.record_many(np.array([], dtype=np.int64))
+
+    assert batched.counts == one_by_one.counts
+    assert (batched.count, batched.total, batched.min, batched.max) == \
+        (one_by_one.count, one_by_one.total, one_by_one.min, one_by_one.max)
+
+
+@pytest.mark.parametrize("percent", [1, 50, 90, 99, 99.9, 100])
+def test_percentile_is_within_one_bucket(percent):
+    values = sorted(_values(seed=1))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    exact = values[max(1, int(len(values) * percent / 100.0 + 0.5)) - 1]
+    reported = histogram.percentile(percent)
+    assert exact <= reported <= max(exact + exact // (1 << SUB_BUCKET_BITS), exact)
+    assert reported <= histogram.max
+
+
+def test_merge_matches_recording_everything():
+    values = _values(seed=2)
+    merged = LatencyHistogram()
+    for part in (values[:700], values[700:], []):
+        histogram = LatencyHistogram()
+        for value in part:
+            histogram.record(value)
+        merged.merge(histogram)
+    whole = LatencyHistogram()
+    for value in values:
+        whole.record(value)
+
+    assert merged.counts == whole.counts
+    assert (merged.count, merged.total, merged.min, merged.max) == (whole.count, whole.total, whole.min, whole.max)
+
+
+def test_empty_summary():
+    summary = LatencyHistogram().summary()
+
+    assert summary["count"] == 0
+    assert summary["p99_ms"] == 0.0 and summary["mean_ms"] == 0.0
+
+
+def test_only_the_players_own_fight_end_drops_pending_fight_requests():
+    from GameContext import GameContext
+
+    context = GameContext("ws://localhost")
+    context.send = lambda message: context.metrics.record_sent(message["MessageType"], time.perf_counter_ns())
+    metrics = context.enable_metrics()
+    context.on_receive({"MessageType": "ExtPlayerIdResponse", "PlayerId": "p1"})
+    context.on_receive({"MessageType": "ExtFightStarted", "FightId": "fight_1", "Player1Id": "p1", "Player2Id": "p2"})
+
+    context.send({"MessageType": "ExtEndTurnRequest"})
+    context.on_receive({"MessageType": "ExtFightEnded", "FightId": "fight_2", "WinnerId": "p3", "LoserId": "p4"})
+    context.on_receive({"MessageType": "ExtTurnEnded", "PlayerId": "p1"})
+    assert metrics.round_trip["ExtEndTurnRequest"].count == 1
+
+    context.send({"MessageType": "ExtEndTurnRequest"})
+    context.on_receive({"MessageType": "ExtFightEnded", "FightId": "fight_1", "WinnerId": "p2", "LoserId": "p1"})
+    context.on_receive({"MessageType": "ExtTurnEnded", "PlayerId": "p1"})
+    assert metrics.round_trip["ExtEndTurnRequest"].count == 1
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+
+from GameContext import GameContext
+from fake_multiplex_server import FakeMultiplexServer
+from multiplex import MultiplexConnection, multiplex_url, session_id_of
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+@pytest.fixture
+def server():
+    server = FakeMultiplexServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def connection(server):
+    connection = MultiplexConnection(server.url)
+    assert connection.connect(timeout=5.0)
+    yield connection
+    connection.close()
+
+
+def test_session_id_of():
+    assert session_id_of('{"SessionId":"s1","MessageType":"ExtTurnEnded"}') == "s1"
+    assert session_id_of(b'{"SessionId":"s1","MessageType":"ExtTurnEnded"}') == "s1"
+    # Escaped ids and tags that do not lead are found by a full parse
+    assert session_id_of('{"SessionId":"a\\"b","MessageType":"ExtTurnEnded"}') == 'a"b'
+    assert session_id_of('{"MessageType": "ExtTurnEnded", "SessionId": "s2"}') == "s2"
+    assert session_id_of('{"MessageType":"ExtTurnEnded"}') is None
+    assert session_id_of("not json") is None
+
+
+def test_multiplex_url():
+    assert multiplex_url("ws://host/ws") == "ws://host/ws?multiplex=1"
+    assert multiplex_url("ws://host/ws?a=1") == "ws://host/ws?a=1&multiplex=1"
+    assert multiplex_url("ws://host/ws?multiplex=1") == "ws://host/ws?multiplex=1"
+
+
+def test_attached_contexts_get_their_own_players(server, connection):
+    contexts = [GameContext(connection.server_url), GameContext(connection.server_url, inbound_capacity=16)]
+    session_ids = [connection.attach(context) for context in contexts]
+
+    assert _wait_until(lambda: all(context.player_id for context in contexts))
+    assert [context.player_id for context in contexts] == [server.players[s] for s in session_ids]
+    assert len(set(session_ids)) == 2 and server.paths == ["/ws?multiplex=1"]
+    assert contexts[1].dispatch_thread is not None
+    with pytest.raises(ValueError):
+        connection.attach(GameContext(connection.server_url), session_ids[0])
+    for context in contexts:
+        context.dispose()
+
+
+def test_frames_are_routed_by_session_id(server, connection):
+    contexts = [GameContext(connection.server_url) for _ in range(3)]
+    received = {}
+    for context in contexts:
+        types = received[context] = []
+        context.add_server_message_callback(lambda msg, types=types: types.append(msg.message_type))
+        connection.attach(context)
+    assert _wait_until(lambda: all(context.player_id for context in contexts))
+
+    target = contexts[1]
+    server.push(target.session_id, {"MessageType": "ExtTurnEnded", "PlayerId": target.player_id})
+    server.push("unknown_session", {"MessageType": "ExtTurnEnded", "PlayerId": "nobody"})
+
+    assert _wait_until(lambda: connection.unrouted == 1)
+    for context, types in received.items():
+        assert types == ["ExtPlayerIdResponse"] + (["ExtTurnEnded"] if context is target else [])
+    assert connection.stats()["sessions"] == 3
+    for context in contexts:
+        context.dispose()
+
+
+def test_detach_closes_the_session(server, connection):
+    context = GameContext(connection.server_url)
+    session_id = connection.attach(context)
+    assert _wait_until(lambda: context.player_id is not None)
+
+    context.dispose()
+
+    assert context.multiplexer is None and context.session_id is None
+    assert _wait_until(lambda: server.closed_sessions == [session_id])
+    assert session_id not in server.players and connection.stats()["sessions"] == 0
+    server.push(session_id, {"MessageType": "ExtTurnEnded", "PlayerId": context.player_id})
+    assert _wait_until(lambda: connection.unrouted == 1)
+
+
+def test_dropped_connection_releases_every_context(server, connection):
+    contexts = [GameContext(connection.server_url) for _ in range(2)]
+    for context in contexts:
+        connection.attach(context)
+    assert _wait_until(lambda: all(context.player_id for context in contexts))
+
+    server.drop_connections()
+
+    assert _wait_until(lambda: not connection.contexts)
+    assert not connection.connected
+    for context in contexts:
+        assert context.multiplexer is None
+        assert context.send({"MessageType": "ExtEndTurnRequest"}) is False
@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from GameContext import GameContext
+from card_library import ALL_CARDS
+from models import STATUS_EFFECT_TYPES, StatusEffectInfo
+from observation import (IN_FIGHT_OFFSET, OBSERVATION_SIZE, OPPONENT_EFFECT_COUNT_OFFSET,
+                         OPPONENT_EFFECT_MAGNITUDE_OFFSET, OPPONENT_STATS_OFFSET, PLAYER_EFFECT_COUNT_OFFSET,
+                         PLAYER_EFFECT_MAGNITUDE_OFFSET, PLAYER_HAND_OFFSET, PLAYER_STATS_OFFSET, PLAYER_TURN_OFFSET,
+                         REGION_ALL, REGION_OPPONENT_EFFECTS, REGION_OPPONENT_STATS, REGION_PLAYER_EFFECTS,
+                         REGION_PLAYER_HAND, REGION_PLAYER_STATS, REGION_TURN, ObservationEncoder)
+
+
+def _context(**overrides):
+    """The fight state attributes the encoder reads, as a GameContext holds them."""
+    fields = dict(
+        current_fight_id="fight_1", current_turn_player_id="p1", is_player_turn=True,
+        player_hit_points=40, player_action_points=3, player_deck_count=20, player_discard_pile_count=5,
+        cards_in_hand=(ALL_CARDS[0], ALL_CARDS[0], ALL_CARDS[3]),
+        opponent_hit_points=35, opponent_action_points=0, opponent_deck_count=18, opponent_discard_pile_count=7,
+        opponent_cards_in_hand=(ALL_CARDS[1],),
+        player_status_effects=(StatusEffectInfo(STATUS_EFFECT_TYPES[0], 2, 3),
+                               StatusEffectInfo(STATUS_EFFECT_TYPES[0], 4, 1)),
+        opponent_status_effects=(StatusEffectInfo(STATUS_EFFECT_TYPES[2], 5, 2),),
+    )
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_encode_layout():
+    encoder = ObservationEncoder()
+    row = encoder.encode(_context())
+
+    assert row.shape == (encoder.state_dim,) and row.dtype == np.float32
+    assert (row[IN_FIGHT_OFFSET], row[PLAYER_TURN_OFFSET]) == (1.0, 1.0)
+    assert list(row[PLAYER_STATS_OFFSET:PLAYER_STATS_OFFSET + 5]) == [40, 3, 20, 5, 3]
+    assert list(row[OPPONENT_STATS_OFFSET:OPPONENT_STATS_OFFSET + 5]) == [35, 0, 18, 7, 1]
+    hand = row[PLAYER_HAND_OFFSET:PLAYER_HAND_OFFSET + len(ALL_CARDS)]
+    assert (hand[0], hand[3], hand.sum()) == (2.0, 1.0, 3.0)
+    assert (row[PLAYER_EFFECT_COUNT_OFFSET], row[PLAYER_EFFECT_MAGNITUDE_OFFSET]) == (2.0, 6.0)
+    assert (row[OPPONENT_EFFECT_COUNT_OFFSET + 2], row[OPPONENT_EFFECT_MAGNITUDE_OFFSET + 2]) == (1.0, 5.0)
+    assert not row[OBSERVATION_SIZE:].any()
+
+
+def test_encode_outside_a_fight():
+    row = ObservationEncoder().encode(_context(current_fight_id=None, current_turn_player_id=None,
+                                               cards_in_hand=(), player_status_effects=()))
+
+    assert (row[IN_FIGHT_OFFSET], row[PLAYER_TURN_OFFSET]) == (0.0, 0.0)
+    assert not row[PLAYER_HAND_OFFSET:PLAYER_HAND_OFFSET + len(ALL_CARDS)].any()
+
+
+def test_encode_fills_a_reused_buffer():
+    encoder = ObservationEncoder()
+    out = np.full(encoder.state_dim, 9.0, dtype=np.float32)
+    context = _context()
+
+    assert encoder.encode(context, out) is out
+    np.testing.assert_array_equal(out, encoder.encode(context))
+
+
+# Slices of the observation each region rewrites
+REGION_SLICES = {
+    REGION_TURN: slice(IN_FIGHT_OFFSET, PLAYER_STATS_OFFSET),
+    REGION_PLAYER_STATS: slice(PLAYER_STATS_OFFSET, OPPONENT_STATS_OFFSET),
+    REGION_OPPONENT_STATS: slice(OPPONENT_STATS_OFFSET, PLAYER_HAND_OFFSET),
+    REGION_PLAYER_HAND: slice(PLAYER_HAND_OFFSET, PLAYER_EFFECT_COUNT_OFFSET),
+    REGION_PLAYER_EFFECTS: slice(PLAYER_EFFECT_COUNT_OFFSET, OPPONENT_EFFECT_COUNT_OFFSET),
+    REGION_OPPONENT_EFFECTS: slice(OPPONENT_EFFECT_COUNT_OFFSET, OBSERVATION_SIZE),
+}
+
+
+@pytest.mark.parametrize("regions", [REGION_TURN, REGION_OPPONENT_STATS, REGION_PLAYER_HAND,
+                                     REGION_PLAYER_EFFECTS, REGION_PLAYER_HAND | REGION_PLAYER_EFFECTS])
+def test_update_rewrites_only_the_given_regions(regions):
+    encoder = ObservationEncoder()
+    before = _context()
+    after = _context(is_player_turn=False, player_hit_points=30, opponent_hit_points=12,
+                     cards_in_hand=(ALL_CARDS[5],), opponent_cards_in_hand=(),
+                     player_status_effects=(StatusEffectInfo(STATUS_EFFECT_TYPES[1], 3, 1),),
+                     opponent_status_effects=())
+    row = encoder.encode(before)
+
+    encoder.update(after, row, regions)
+
+    for region, region_slice in REGION_SLICES.items():
+        expected = encoder.encode(after if region & regions else before)
+        np.testing.assert_array_equal(row[region_slice], expected[region_slice])
+    encoder.update(after, row, REGION_ALL & ~regions)
+    np.testing.assert_array_equal(row, encoder.encode(after))
+
+
+def test_encode_batch_rows_match_encode():
+    encoder = ObservationEncoder()
+    contexts = [_context(), _context(player_hit_points=1, cards_in_hand=())]
+    batch = encoder.encode_batch(contexts)
+
+    assert batch.shape == (2, encoder.state_dim)
+    for row, context in zip(batch, contexts):
+        np.testing.assert_array_equal(row, encoder.encode(context))
+    with pytest.raises(ValueError):
+        encoder.encode_batch(contexts, encoder.allocate(1))
+
+
+def test_state_dim_must_fit_the_layout():
+    with pytest.raises(ValueError):
+        ObservationEncoder(OBSERVATION_SIZE - 1)
+
+
+def test_persistent_observation_tracks_every_message(simulator_trace):
+    context = GameContext("ws://localhost")
+    context.on_receive({"MessageType": "ExtPlayerIdResponse", "PlayerId": "player_1"})
+    encoder = ObservationEncoder()
+    observation = context.get_observation()
+    versions = [context.observation_version]
+
+    for message in simulator_trace:
+        context.on_receive(message)
+        assert context.get_observation() is observation
+        np.testing.assert_array_equal(observation, encoder.encode(context), err_msg=message["MessageType"])
+        versions.append(context.observation_version)
+
+    assert versions == sorted(versions) and versions[-1] > versions[0]
@@ -0,0 +1,34 @@
+from simulator import FightSimulator, check_parity
+
+
+def test_simulator_trace_is_self_consistent(simulator_trace):
+    # The trace came from FightSimulator, so this checks check_parity against the
+    # simulator's own output; parity with the server needs a recorded server trace
+    report = check_parity(simulator_trace)
+
+    assert report["fights"] == 1
+    assert report["checked"] >= 10
+    assert report["mismatches"] == []
+
+
+def test_changed_outcome_is_reported(simulator_trace):
+    # The update after player_2's Lightning Strike, 9 damage taking player_1 from 10 to 1
+    index = next(i for i, m in enumerate(simulator_trace)
+                 if m["MessageType"] == "ExtFightStateUpdate" and m["PlayerState"]["HitPoints"] == 1)
+    simulator_trace[index]["PlayerState"]["HitPoints"] = 2
+
+    mismatch = check_parity(simulator_trace)["mismatches"][0]
+
+    assert (mismatch["index"], mismatch["action"], mismatch["player_id"]) == (index, "atk_002", "player_1")
+    assert (mismatch["predicted"]["HitPoints"], mismatch["actual"]["HitPoints"]) == (1, 2)
+
+
+def test_random_simulator_fights_are_self_consistent():
+    for seed in range(10):
+        sim = FightSimulator(seed=seed, include_svg=False)
+        messages = []
+        sim.add_listener(sim.player1_id, messages.append)
+        sim.run_random_fight()
+        report = check_parity(messages)
+        assert report["checked"] > 0
+        assert report["mismatches"] == []
@@ -0,0 +1,130 @@
+from GameContext import GameContext
+from models import MapPosition, TilemapData
+from pathfinding import UNREACHABLE, PathCache
+
+WALL = 1
+
+# 0 is floor, 1 is wall; the wall column at x=3 has a gap at y=4
+ROWS = [
+    "0001000",
+    "0001000",
+    "0001000",
+    "0001000",
+    "0000000",
+]
+
+
+def _tilemap(rows=ROWS):
+    return TilemapData(len(rows[0]), len(rows), [int(tile) for row in rows for tile in row])
+
+
+def _steps(path):
+    return [(step.x, step.y) for step in path]
+
+
+def test_open_map_distances_are_chebyshev():
+    tilemap = _tilemap(["0000", "0000", "0000"])
+    field = PathCache().distance_field("m", tilemap, (0, 0))
+
+    assert [[field.distance(x, y) for x in range(4)] for y in range(3)] == [[0, 1, 2, 3], [1, 1, 2, 3], [2, 2, 2, 3]]
+    assert field.distance(4, 0) == UNREACHABLE
+
+
+def test_path_goes_through_the_gap():
+    cache = PathCache(blocked_tiles={WALL})
+    path = cache.find_path("m", _tilemap(), MapPosition(0, 0), MapPosition(6, 0))
+
+    # Four diagonal moves down to the gap and four back up
+    assert len(path) == 8
+    assert _steps(path)[3] == (3, 4)
+    assert _steps(path)[-1] == (6, 0)
+
+
+def test_stop_distance_and_unreachable_targets():
+    cache = PathCache(blocked_tiles={WALL})
+    tilemap = _tilemap()
+
+    assert _steps(cache.find_path("m", tilemap, MapPosition(0, 4), MapPosition(4, 4), stop_distance=1)) == \
+        [(1, 4), (2, 4), (3, 4)]
+    assert cache.find_path("m", tilemap, MapPosition(0, 0), MapPosition(3, 0)) == []
+    assert cache.find_path("m", tilemap, MapPosition(0, 0), MapPosition(0, 0)) == []
+    walled = _tilemap(["010", "010", "010"])
+    assert cache.find_path("w", walled, MapPosition(0, 0), MapPosition(2, 0)) == []
+
+
+def test_cache_hits_evicts_and_invalidates_on_new_tiles():
+    cache = PathCache(max_fields=2)
+    tilemap = _tilemap()
+
+    first = cache.distance_field("m", tilemap, (0, 0))
+    assert cache.distance_field("m", tilemap, (0, 0)) is first
+    cache.distance_field("m", tilemap, (1, 0))
+    cache.distance_field("m", tilemap, (2, 0))
+    assert (cache.hits, cache.misses) == (1, 3)
+    # (0, 0) was least recently used and is evicted
+    assert cache.distance_field("m", tilemap, (0, 0)) is not first
+
+    changed = _tilemap(["0000000"] * 5)
+    cache.distance_field("m", changed, (2, 0))
+    assert cache.misses == 5
+
+
+def _walking_context(rows=ROWS, start=(0, 0)):
+    context = GameContext("ws://localhost")
+    context.path_cache = PathCache(blocked_tiles={WALL})
+    context.current_map_id = "m"
+    context.current_tilemap_data = _tilemap(rows)
+    context.player_position = MapPosition(*start)
+    sent = []
+    context.send = lambda message: sent.append((message["NewPosition"]["X"], message["NewPosition"]["Y"]))
+    return context, sent
+
+
+def _complete(context, position):
+    context.on_receive({"MessageType": "ExtMoveCompleted", "NewPosition": {"X": position[0], "Y": position[1]}})
+
+
+def _fail(context, position):
+    context.on_receive({"MessageType": "ExtMoveFailed", "AttemptedPosition": {"X": position[0], "Y": position[1]},
+                        "ErrorMessage": "Tile occupied"})
+
+
+def test_path_to_sends_each_step_after_the_previous_completes():
+    context, sent = _walking_context(["0000"], start=(0, 0))
+
+    planned = context.path_to(MapPosition(3, 0))
+    assert _steps(planned) == [(1, 0), (2, 0), (3, 0)]
+    assert sent == [(1, 0)]
+    _complete(context, (1, 0))
+    _complete(context, (2, 0))
+    _complete(context, (3, 0))
+
+    assert sent == [(1, 0), (2, 0), (3, 0)]
+    assert context.move_path == []
+
+
+def test_path_to_routes_around_a_rejected_step_once():
+    context, sent = _walking_context(["00000", "00000", "00000"], start=(0, 1))
+    context.path_to(MapPosition(4, 1))
+    assert sent == [(1, 1)]
+
+    _fail(context, (1, 1))
+    detour = sent[-1]
+    assert detour in ((1, 0), (1, 2))
+    assert context.move_path[-1] == MapPosition(4, 1)
+
+    _complete(context, detour)
+    _fail(context, sent[-1])
+    # A second rejection in a row would need another reroute: the walk stops
+    _fail(context, sent[-1])
+    assert context.move_path == []
+
+
+def test_reroute_avoids_occupied_tiles():
+    context, sent = _walking_context(["00000", "00000", "00000"], start=(0, 1))
+    context.player_index.set_position("other", 1, 0)
+    context.path_to(MapPosition(4, 1))
+
+    _fail(context, (1, 1))
+
+    assert sent[-1] == (1, 2)
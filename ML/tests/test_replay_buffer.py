@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from replay_buffer import SumTree
+
+
+def _expected_leaf(priorities, values):
+    """Leaf whose prefix-sum interval [sum before it, sum through it) contains each value."""
+    return np.searchsorted(np.cumsum(priorities), values, side="right")
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 64, 1000])
+def test_find_matches_prefix_sums(capacity):
+    rng = np.random.default_rng(capacity)
+    tree = SumTree(capacity)
+    priorities = np.zeros(capacity)
+    for _ in range(20):
+        indices = rng.integers(0, capacity, size=rng.integers(1, 2 * capacity + 1))
+        values = rng.random(len(indices)) * 10.0
+        values[rng.random(len(indices)) < 0.2] = 0.0
+        tree.update(indices, values)
+        # With repeated indices the last priority wins, as in a numpy assignment
+        priorities[indices] = values
+
+        assert tree.total == pytest.approx(priorities.sum())
+        np.testing.assert_allclose(tree.get(np.arange(capacity)), priorities)
+        if tree.total == 0.0:
+            continue
+        queries = rng.random(256) * tree.total
+        leaves = tree.find(queries)
+        np.testing.assert_array_equal(leaves, _expected_leaf(priorities, queries))
+        assert (priorities[leaves] > 0.0).all()
+
+
+def test_find_at_interval_boundaries():
+    tree = SumTree(4)
+    tree.update(np.arange(4), np.array([1.0, 0.0, 2.0, 3.0]))
+
+    np.testing.assert_array_equal(tree.find(np.array([0.0, 0.999, 1.0, 2.999, 3.0, 5.999])), [0, 0, 2, 2, 3, 3])
+
+
+def test_find_never_returns_an_empty_leaf_at_the_total():
+    tree = SumTree(8)
+    tree.update(np.array([0, 3]), np.array([0.1, 0.2]))
+
+    # Rounding can put a value at or past the total; it lands on the last non-empty leaf
+    assert tree.find(np.array([tree.total, np.nextafter(tree.total, 1.0)])).tolist() == [3, 3]
+
+
+def test_sampling_follows_priorities():
+    tree = SumTree(3)
+    tree.update(np.arange(3), np.array([1.0, 2.0, 7.0]))
+    rng = np.random.default_rng(0)
+
+    counts = np.bincount(tree.find(rng.random(20000) * tree.total), minlength=3) / 20000
+
+    np.testing.assert_allclose(counts, [0.1, 0.2, 0.7], atol=0.02)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+from GameContext import GameContext
+from codec import available_codecs
+from models import MapPosition
+
+
+def _answering_context(codec, reply):
+    """A context whose send() is answered by the frames reply(message) returns, as a server would."""
+    context = GameContext("ws://localhost", codec=codec)
+
+    def send(message):
+        loop = asyncio.get_running_loop()
+        for frame in reply(message):
+            loop.call_soon(context._process_message, json.dumps(frame))
+        return True
+
+    context.send = send
+    return context
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_move_resolves_with_every_codec(codec):
+    def reply(message):
+        position = message["NewPosition"]
+        if position["X"] > 5:
+            return [{"MessageType": "ExtMoveFailed", "AttemptedPosition": position, "ErrorMessage": "Blocked"}]
+        return [{"MessageType": "ExtMoveInitiated", "NewPosition": position},
+                {"MessageType": "ExtMoveCompleted", "NewPosition": position}]
+
+    async def run():
+        context = _answering_context(codec, reply)
+        moved = await context.move(MapPosition(1, 2), timeout=1.0)
+        blocked = await context.move(MapPosition(6, 2), timeout=1.0)
+        return context, moved, blocked
+
+    context, moved, blocked = asyncio.run(run())
+    assert moved is True
+    assert blocked is False
+    assert context.player_position == MapPosition(1, 2)
+
+
+def _in_fight(context):
+    for frame in ({"MessageType": "ExtPlayerIdResponse", "PlayerId": "p1"},
+                  {"MessageType": "ExtFightStarted", "FightId": "fight_1", "Player1Id": "p1", "Player2Id": "p2"},
+                  {"MessageType": "ExtTurnStarted", "ActivePlayerId": "p1"}):
+        context.on_receive(frame)
+
+
+OTHER_FIGHT_ENDED = {"MessageType": "ExtFightEnded", "FightId": "fight_2", "WinnerId": "p3", "LoserId": "p4",
+                     "Reason": "Player defeated"}
+
+
+def test_end_turn_ignores_another_fight_ending():
+    async def run(reply):
+        context = _answering_context(None, reply)
+        _in_fight(context)
+        return await context.end_turn(timeout=0.2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run(lambda message: [OTHER_FIGHT_ENDED]))
+    assert asyncio.run(run(lambda message: [OTHER_FIGHT_ENDED,
+                                            {"MessageType": "ExtTurnEnded", "PlayerId": "p1"}])) is True
+    own_fight_ended = dict(OTHER_FIGHT_ENDED, FightId="fight_1", WinnerId="p2", LoserId="p1")
+    assert asyncio.run(run(lambda message: [own_fight_ended])) is True
+
+
+def test_play_card_ignores_another_fight_ending():
+    async def run():
+        context = _answering_context(None, lambda message: [OTHER_FIGHT_ENDED])
+        _in_fight(context)
+        context.on_receive({"MessageType": "ExtFightStateUpdate", "CurrentTurnPlayerId": "p1",
+                            "PlayerState": {"PlayerId": "p1", "ActionPoints": 3,
+                                            "Hand": [{"Id": "atk_001", "Name": "Fireball", "Cost": 2}]},
+                            "OpponentState": {"PlayerId": "p2"}})
+        return await context.play_card("atk_001", timeout=0.2)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
@@ -0,0 +1,103 @@
+from GameContext import GameContext
+from planner import MctsPlanner, PlannerAgent
+from simulator import FightSimulator
+
+
+def _attached(seed=0):
+    sim = FightSimulator(seed=seed, include_svg=False)
+    contexts = {}
+    for player_id in (sim.player1_id, sim.player2_id):
+        contexts[player_id] = GameContext("ws://localhost")
+        sim.attach(contexts[player_id], player_id)
+    return sim, contexts
+
+
+def _first_card_agent(context):
+    """Plays the first affordable card, or ends the turn, from server message callbacks."""
+    state = {"sent_version": None}
+
+    def callback(msg):
+        if msg.message_type not in ("ExtFightStateUpdate", "ExtTurnEnded"):
+            return
+        if not (context.is_in_fight and context.is_player_turn):
+            return
+        if context.observation_version == state["sent_version"]:
+            return
+        state["sent_version"] = context.observation_version
+        playable = [c for c in context.cards_in_hand if c.cost <= context.player_action_points]
+        if playable:
+            context.send({"MessageType": "ExtPlayCardRequest", "CardId": playable[0].id})
+        else:
+            context.send({"MessageType": "ExtEndTurnRequest"})
+
+    context.add_server_message_callback(callback)
+
+
+def test_attached_context_runs_callbacks_and_metrics():
+    sim, contexts = _attached()
+    context = contexts[sim.player1_id]
+    metrics = context.enable_metrics()
+    received = []
+    context.add_server_message_callback(lambda msg: received.append(msg.message_type))
+
+    sim.run_random_fight()
+
+    assert "ExtFightStarted" in received
+    assert received[-1] == "ExtFightEnded"
+    assert sum(metrics.received.values()) == len(received)
+
+
+def test_callback_agents_play_a_whole_fight():
+    sim, contexts = _attached(seed=3)
+    for context in contexts.values():
+        _first_card_agent(context)
+
+    sim.start_fight()
+
+    assert not sim.is_active
+    assert sim.winner_id in contexts
+    for context in contexts.values():
+        assert not context.is_in_fight
+
+
+def test_replies_arrive_after_the_message_being_handled():
+    sim, contexts = _attached()
+    context = contexts[sim.player1_id]
+    handling = []
+    overlaps = []
+
+    def callback(msg):
+        if handling:
+            overlaps.append(msg.message_type)
+        handling.append(msg)
+        if msg.message_type == "ExtFightStarted":
+            # A reply to this may only be delivered once this callback has returned
+            context.send({"MessageType": "ExtEndTurnRequest"})
+        handling.pop()
+
+    context.add_server_message_callback(callback)
+    sim.start_fight()
+
+    assert overlaps == []
+
+
+def test_planner_agent_plays_from_callbacks():
+    sim, contexts = _attached(seed=1)
+    with MctsPlanner(budget=0.002, seed=1) as planner:
+        PlannerAgent(contexts[sim.player1_id], planner)
+        _first_card_agent(contexts[sim.player2_id])
+        sim.start_fight()
+
+    assert not sim.is_active
+
+
+def test_abandoned_fight_has_no_winner_and_a_new_one_can_start():
+    sim, contexts = _attached(seed=1)
+    sim.start_fight()
+
+    sim.abandon_fight()
+
+    assert not sim.is_active and sim.winner_id is None
+    assert sim.play_card(sim.player1_id, contexts[sim.player1_id].cards_in_hand[0].id) is None
+    assert sim.start_fight() == "fight_2"
+    assert all(context.current_fight_id == "fight_2" for context in contexts.values())
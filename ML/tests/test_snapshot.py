@@ -0,0 +1,62 @@
+import numpy as np
+
+from GameContext import GameContext
+from models import MapPosition
+from observation import ObservationEncoder
+
+
+def _playing_context():
+    context = GameContext("ws://localhost")
+    context.on_receive({"MessageType": "ExtPlayerIdResponse", "PlayerId": "player_1"})
+    return context
+
+
+def test_snapshot_shares_state_and_is_unchanged_by_later_messages(simulator_trace):
+    context = _playing_context()
+    snapshots = []
+    for message in simulator_trace:
+        context.on_receive(message)
+        snapshot = context.snapshot()
+        assert snapshot.player_hand is context.cards_in_hand
+        assert snapshot.opponent_status_effects is context.opponent_status_effects
+        snapshots.append((snapshot, tuple(snapshot)))
+
+    for snapshot, fields in snapshots:
+        assert tuple(snapshot) == fields
+
+
+def test_restore_brings_back_state_and_observation(simulator_trace):
+    context = _playing_context()
+    encoder = ObservationEncoder()
+    taken = []
+    for message in simulator_trace:
+        context.on_receive(message)
+        if message["MessageType"] == "ExtFightStateUpdate":
+            taken.append((context.snapshot(), encoder.encode(context)))
+    context.player_position = MapPosition(4, 2)
+
+    for snapshot, observation in reversed(taken):
+        context.restore(snapshot)
+        assert context.snapshot() == snapshot
+        np.testing.assert_array_equal(context.get_observation(), observation)
+    # Map state is not part of a snapshot
+    assert context.player_position == MapPosition(4, 2)
+
+
+def test_forked_snapshot_restores_into_another_context(simulator_trace):
+    context = _playing_context()
+    for message in simulator_trace:
+        context.on_receive(message)
+        if message["MessageType"] == "ExtFightStateUpdate":
+            break
+    snapshot = context.snapshot()
+    fork = snapshot._replace(opponent_hit_points=snapshot.opponent_hit_points - 6,
+                             player_hand=snapshot.player_hand[1:])
+
+    other = GameContext("ws://localhost")
+    other.restore(fork)
+
+    assert other.is_in_fight and other.opponent_hit_points == context.opponent_hit_points - 6
+    assert other.cards_in_hand == context.cards_in_hand[1:]
+    assert other.player_status_effects is context.player_status_effects
+    assert context.snapshot() == snapshot
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from spatial_index import SpatialIndex
+
+
+def _brute_nearest(positions, x, y, predicate=None):
+    candidates = [(max(abs(px - x), abs(py - y)), player_id) for player_id, (px, py) in positions.items()
+                  if predicate is None or predicate(player_id)]
+    if not candidates:
+        return None
+    distance, player_id = min(candidates)
+    return player_id, distance
+
+
+def test_nearest_on_an_empty_index():
+    assert SpatialIndex().nearest(3, 4) is None
+
+
+def test_nearest_breaks_ties_by_id():
+    index = SpatialIndex(cell_size=4)
+    index.set_position("b", 5, 5)
+    index.set_position("a", 3, 3)
+    index.set_position("c", 4, 9)
+
+    assert index.nearest(4, 4) == ("a", 1)
+    assert index.nearest(4, 4, predicate=lambda player_id: player_id != "a") == ("b", 1)
+    assert index.nearest(4, 4, predicate=lambda player_id: False) is None
+
+
+def test_nearest_looks_past_the_first_ring_for_a_closer_player():
+    # "far" shares the query's cell, "near" is one tile away across the cell border
+    index = SpatialIndex(cell_size=8)
+    index.set_position("far", 0, 0)
+    index.set_position("near", 8, 7)
+
+    assert index.nearest(7, 7) == ("near", 1)
+
+
+@pytest.mark.parametrize("cell_size", [1, 3, 8])
+def test_nearest_matches_brute_force(cell_size):
+    rng = random.Random(cell_size)
+    index = SpatialIndex(cell_size)
+    positions = {}
+    for step in range(400):
+        player_id = f"p{rng.randrange(40)}"
+        if rng.random() < 0.2:
+            index.remove(player_id)
+            positions.pop(player_id, None)
+        else:
+            position = (rng.randrange(-30, 30), rng.randrange(-30, 30))
+            index.set_position(player_id, *position)
+            positions[player_id] = position
+
+        x, y = rng.randrange(-40, 40), rng.randrange(-40, 40)
+        assert index.nearest(x, y) == _brute_nearest(positions, x, y)
+        even = lambda player_id: int(player_id[1:]) % 2 == 0
+        assert index.nearest(x, y, even) == _brute_nearest(positions, x, y, even)
+    assert len(index) == len(positions)
+
+
+def test_within_and_occupants_follow_moves():
+    index = SpatialIndex(cell_size=4)
+    index.set_position("a", 1, 1)
+    index.set_position("b", 1, 1)
+    index.set_position("c", 6, 2)
+
+    assert index.occupants(1, 1) == {"a", "b"}
+    assert index.within(2, 2, 4) == [("a", 1), ("b", 1), ("c", 4)]
+    index.set_position("a", 6, 3)
+    index.remove("b")
+    assert not index.is_occupied(1, 1)
+    assert index.within(2, 2, 4) == [("a", 4), ("c", 4)]
+    assert index.within(2, 2, -1) == []
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from types import SimpleNamespace
+
+from GameContext import GameContext
+from subscriptions import ALL_MESSAGES, DRAIN_BATCH, Subscriptions
+
+
+def _message(message_type, index=0):
+    return SimpleNamespace(message_type=message_type, index=index)
+
+
+class _ManualExecutor(Executor):
+    """Holds submitted drains until run() is called."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted.append((fn, args))
+
+    def run(self):
+        while self.submitted:
+            fn, args = self.submitted.pop(0)
+            fn(*args)
+
+
+def test_publish_routes_by_type_in_subscription_order():
+    subscriptions = Subscriptions()
+    calls = []
+    subscriptions.subscribe("ExtTurnEnded", lambda m: calls.append(("turn", m.index)))
+    subscriptions.subscribe(None, lambda m: calls.append(("all", m.index)))
+    subscriptions.subscribe(("ExtTurnEnded", "ExtFightEnded"), lambda m: calls.append(("fight", m.index)))
+
+    subscriptions.publish("ExtTurnEnded", _message("ExtTurnEnded", 1))
+    subscriptions.publish("ExtFightEnded", _message("ExtFightEnded", 2))
+    subscriptions.publish("ExtCardDrawn", _message("ExtCardDrawn", 3))
+
+    assert calls == [("turn", 1), ("all", 1), ("fight", 1), ("all", 2), ("fight", 2), ("all", 3)]
+
+
+def test_unsubscribed_callback_is_no_longer_called():
+    subscriptions = Subscriptions()
+    calls = []
+    subscription = subscriptions.subscribe(ALL_MESSAGES, calls.append)
+    subscriptions.unsubscribe(subscription)
+
+    subscriptions.publish("ExtTurnEnded", _message("ExtTurnEnded"))
+
+    assert calls == [] and len(subscriptions) == 0 and not subscription.active
+
+
+def test_executor_subscriber_sees_messages_in_order():
+    subscriptions = Subscriptions()
+    received = []
+    done = threading.Event()
+    count = 5 * DRAIN_BATCH
+
+    def callback(message):
+        received.append(message.index)
+        if message.index == count - 1:
+            done.set()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        subscription = subscriptions.subscribe("ExtPlayerPositionChange", callback, executor)
+        for index in range(count):
+            subscriptions.publish("ExtPlayerPositionChange", _message("ExtPlayerPositionChange", index))
+        assert done.wait(5.0)
+
+    assert received == list(range(count))
+    assert (subscription.delivered, subscription.dropped, subscription.depth) == (count, 0, 0)
+
+
+def test_loop_subscriber_runs_on_the_loop_thread():
+    async def run():
+        subscriptions = Subscriptions()
+        received = []
+        done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def callback(message):
+            received.append((message.index, threading.current_thread()))
+            if message.index == 9:
+                done.set()
+
+        subscriptions.subscribe("ExtTurnEnded", callback, loop)
+        publisher = threading.Thread(target=lambda: [subscriptions.publish("ExtTurnEnded", _message("ExtTurnEnded", i))
+                                                     for i in range(10)])
+        publisher.start()
+        await asyncio.wait_for(done.wait(), 5.0)
+        publisher.join()
+        return received
+
+    received = asyncio.run(run())
+
+    assert [index for index, _ in received] == list(range(10))
+    assert {thread for _, thread in received} == {threading.current_thread()}
+
+
+def test_max_pending_drops_the_oldest_queued_messages():
+    subscriptions = Subscriptions()
+    executor = _ManualExecutor()
+    received = []
+    subscription = subscriptions.subscribe("ExtTurnEnded", lambda m: received.append(m.index), executor, max_pending=3)
+
+    for index in range(10):
+        subscriptions.publish("ExtTurnEnded", _message("ExtTurnEnded", index))
+
+    # Only one drain is scheduled however many messages are queued
+    assert len(executor.submitted) == 1
+    assert (subscription.depth, subscription.max_depth, subscription.dropped) == (3, 3, 7)
+    executor.run()
+    assert received == [7, 8, 9]
+    assert (subscription.depth, subscription.delivered) == (0, 3)
+
+
+def test_stats_count_deliveries_errors_and_latency():
+    subscriptions = Subscriptions()
+    executor = _ManualExecutor()
+
+    def failing(message):
+        raise ValueError("callback failed")
+
+    subscriptions.subscribe("ExtTurnEnded", failing)
+    subscriptions.subscribe(None, lambda m: None, executor, max_pending=1)
+    for index in range(3):
+        subscriptions.publish("ExtTurnEnded", _message("ExtTurnEnded", index))
+
+    inline, queued = subscriptions.stats()
+    assert inline["message_types"] == ["ExtTurnEnded"]
+    assert (inline["delivered"], inline["errors"], inline["handler"]["count"]) == (3, 3, 3)
+    assert queued["message_types"] == ALL_MESSAGES
+    assert (queued["delivered"], queued["dropped"], queued["depth"], queued["queue_wait"]["count"]) == (0, 2, 1, 0)
+    executor.run()
+    assert subscriptions.stats()[1]["queue_wait"]["count"] == 1
+
+
+def test_context_subscription_sees_the_updated_state():
+    context = GameContext("ws://localhost")
+    seen = []
+    context.subscribe("ExtPlayerIdResponse", lambda m: seen.append((m.player_id, context.player_id)))
+
+    context.on_receive({"MessageType": "ExtPlayerIdResponse", "PlayerId": "p1"})
+    context.dispose()
+    context.on_receive({"MessageType": "ExtPlayerIdResponse", "PlayerId": "p2"})
+
+    assert seen == [("p1", "p1")]
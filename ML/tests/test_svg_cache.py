@@ -0,0 +1,76 @@
+import hashlib
+
+from svg_cache import SvgCache, svg_hash
+
+
+def _svg(text):
+    # A string built at runtime, so identity checks are not satisfied by interning
+    return "".join(["<svg>", text, "</svg>"])
+
+
+def test_hash_matches_the_server():
+    assert svg_hash("<svg/>") == hashlib.sha256(b"<svg/>").hexdigest()
+
+
+def test_equal_svgs_share_one_string():
+    cache = SvgCache()
+    first = cache.put("atk_001", _svg("template"))
+    second = cache.put("atk_002", _svg("template"))
+
+    assert second is first
+    assert cache.size == len(first)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.put("atk_001", _svg("template")) is first
+    assert cache.hits == 2
+
+
+def test_least_recently_used_is_evicted():
+    size = len(_svg("a"))
+    cache = SvgCache(max_bytes=2 * size)
+    cache.put("a", _svg("a"))
+    cache.put("b", _svg("b"))
+    cache.get("a")
+    cache.put("c", _svg("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == _svg("a") and cache.get("c") == _svg("c")
+    assert cache.size == 2 * size
+    # Without a directory, evicted cards are not advertised
+    assert set(cache.card_hashes()) == {"a", "c"}
+
+
+def test_pinned_svgs_are_never_evicted():
+    size = len(_svg("a"))
+    cache = SvgCache(max_bytes=2 * size)
+    cache.put("a", _svg("a"))
+    cache.put("b", _svg("b"))
+
+    advertised = cache.card_hashes(pin=True)
+    cache.put("c", _svg("c"))
+    cache.put("d", _svg("d"))
+
+    assert advertised == {"a": svg_hash(_svg("a")), "b": svg_hash(_svg("b"))}
+    assert cache.get("a") == _svg("a") and cache.get("b") == _svg("b")
+    assert cache.get("c") is None and cache.get("d") is None
+    assert cache.size == 2 * size
+
+    cache.clear()
+    cache.put("e", _svg("e"))
+    cache.put("f", _svg("f"))
+    cache.put("g", _svg("g"))
+    assert cache.get("e") is None
+
+
+def test_directory_serves_evicted_and_restarted_caches(tmp_path):
+    size = len(_svg("a"))
+    cache = SvgCache(max_bytes=size, directory=str(tmp_path))
+    cache.put("a", _svg("a"))
+    cache.put("b", _svg("b"))
+
+    # Evicted from memory, read back from disk
+    assert cache.get("a") == _svg("a")
+    assert set(cache.card_hashes()) == {"a", "b"}
+
+    restarted = SvgCache(directory=str(tmp_path))
+    assert restarted.card_hashes() == {"a": svg_hash(_svg("a")), "b": svg_hash(_svg("b"))}
+    assert restarted.get("b") == _svg("b")
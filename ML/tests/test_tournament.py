@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+from tournament import ELO_BASE, fit_elo
+
+
+def _elo_difference(win_ratio):
+    return 400.0 * math.log10(win_ratio)
+
+
+def test_two_entrants_without_a_prior():
+    wins = np.array([[0.0, 3.0], [1.0, 0.0]])
+    ratings, errors = fit_elo(wins, np.zeros((2, 2)), prior_games=0.0)
+
+    assert ratings[0] - ratings[1] == pytest.approx(_elo_difference(3.0))
+    assert ratings.mean() == pytest.approx(ELO_BASE)
+    assert errors[0] == pytest.approx(errors[1]) and 0.0 < errors[0] < math.inf
+
+
+def test_prior_and_draws_count_as_half_wins():
+    wins = np.array([[0.0, 3.0], [1.0, 0.0]])
+    draws = np.array([[0.0, 2.0], [2.0, 0.0]])
+    ratings, _ = fit_elo(wins, draws, prior_games=1.0)
+
+    # 3 + 1 + 0.5 points against 1 + 1 + 0.5
+    assert ratings[0] - ratings[1] == pytest.approx(_elo_difference(4.5 / 2.5))
+
+
+def test_recovers_ratings_behind_expected_results():
+    true_ratings = np.array([1700.0, 1600.0, 1450.0, 1250.0])
+    expected = 1.0 / (1.0 + 10.0 ** ((true_ratings[None, :] - true_ratings[:, None]) / 400.0))
+    wins = 1000.0 * expected
+    np.fill_diagonal(wins, 0.0)
+
+    ratings, errors = fit_elo(wins, np.zeros((4, 4)), prior_games=0.0)
+
+    np.testing.assert_allclose(ratings - ratings.mean(), true_ratings - true_ratings.mean(), atol=1e-6)
+    assert (errors < 20.0).all()
+
+
+def test_entrants_without_games_are_unrated():
+    wins = np.zeros((3, 3))
+    wins[0, 1] = wins[1, 0] = 2.0
+    ratings, errors = fit_elo(wins, np.zeros((3, 3)))
+
+    assert ratings.tolist() == pytest.approx([ELO_BASE] * 3)
+    assert errors[2] == math.inf and errors[0] < math.inf
+
+
+def test_errors_shrink_with_more_games():
+    wins = np.array([[0.0, 6.0], [4.0, 0.0]])
+    _, few = fit_elo(wins, np.zeros((2, 2)))
+    _, many = fit_elo(100 * wins, np.zeros((2, 2)))
+
+    assert many[0] < few[0] / 5
@@ -0,0 +1,574 @@
+"""
+Deck and policy tournaments played in-process on the simulator rules.
+
+The evaluation pass that runs every training.eval_interval episodes (see
+config.json) ranks candidate decks and policy checkpoints against each other.
+Live server fights are far too slow for that, so a Tournament plays its
+matchups on FightSimulator, which mirrors the server's FightState rules,
+spread over a pool of spawned processes.
+
+An Entrant is a deck of at most DECK_SIZE library card ids and a policy with
+the AgentPool signature, (observations, masks) -> actions, or None for random
+play. Matchups are scheduled round-robin, or Swiss for large fields: each
+round pairs entrants of similar score that have not met yet.
+
+Results are cached per matchup of (deck hash, policy version) pairs. A deck
+hash ignores card order, since decks are shuffled before every fight, and
+game i of a matchup always uses the same seed, so a cached matchup is never
+replayed and a longer one only plays its missing games. Give the cache a
+path to keep it across runs; bump the policy version whenever a policy's
+weights change.
+
+Ratings are the maximum-likelihood Bradley-Terry fit of all games on the Elo
+scale (draws count half), with 95% confidence intervals from the observed
+Fisher information.
+
+Run from the ML directory, e.g.:
+    python tournament.py --decks 16 --games 50 --workers 4 --cache tournament_cache.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from GameContext import GameContext
+from batch_env import action_to_message, context_action_mask
+from card_library import get_card
+from simulator import DECK_SIZE, FightSimulator, random_deck
+
+RANDOM_POLICY = "random"
+DEFAULT_GAMES = 20  # Games per matchup, half of them with each entrant moving first
+MAX_FIGHT_STEPS = 1000  # Actions after which a fight counts as a draw, e.g. after a double knockout
+CACHE_VERSION = 1
+
+# Elo scale of the ratings
+ELO_BASE = 1500.0
+ELO_SCALE = 400.0 / math.log(10.0)
+CONFIDENCE_Z = 1.96  # 95% intervals
+
+# Virtual games per matchup, split as a draw, so a clean sweep still has a finite rating
+PRIOR_GAMES = 1.0
+
+Policy = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+class Entrant(NamedTuple):
+    """A deck and the policy that plays it."""
+    name: str
+    deck: Tuple[str, ...]  # Card ids
+    policy_version: str = RANDOM_POLICY
+    policy: Optional[Policy] = None  # None plays random affordable cards
+
+    @property
+    def key(self) -> str:
+        """Cache key: the deck hash and the policy version."""
+        return f"{deck_hash(self.deck)}:{self.policy_version}"
+
+
+class Standing(NamedTuple):
+    """One row of the ranking."""
+    name: str
+    deck_hash: str
+    policy_version: str
+    elo: float
+    elo_low: float
+    elo_high: float
+    games: int
+    wins: int
+    losses: int
+    draws: int
+
+
+def deck_hash(deck: Iterable[str]) -> str:
+    """Order-independent hash of a deck's card ids."""
+    return hashlib.sha256(",".join(sorted(deck)).encode("utf-8")).hexdigest()[:16]
+
+
+def validate_deck(deck: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Check a deck against the server's Deck rules.
+
+    Args:
+        deck: Card ids
+
+    Returns:
+        The card ids as a tuple
+
+    Raises:
+        ValueError: If the deck is empty, has more than DECK_SIZE cards or an unknown card
+    """
+    cards = tuple(deck)
+    if not cards or len(cards) > DECK_SIZE:
+        raise ValueError(f"A deck holds 1 to {DECK_SIZE} cards, got {len(cards)}")
+    unknown = sorted({card_id for card_id in cards if get_card(card_id) is None})
+    if unknown:
+        raise ValueError(f"Unknown cards: {', '.join(unknown)}")
+    return cards
+
+
+#region Games
+
+
+def play_games(first: Entrant, second: Entrant, first_game: int, num_games: int,
+               max_steps: int = MAX_FIGHT_STEPS) -> Tuple[int, int, int, int]:
+    """
+    Play games first_game..first_game + num_games - 1 of a matchup.
+
+    Game i is seeded from the entrants' keys and i alone, so it plays out the
+    same wherever it runs. first moves first in even games, second in odd ones.
+
+    Args:
+        first: Entrant whose results are counted
+        second: Its opponent
+        first_game: Index of the first game to play
+        num_games: Number of games
+        max_steps: Actions after which a fight is a draw
+
+    Returns:
+        (wins, losses, draws, actions) from first's side
+    """
+    sim = FightSimulator(include_svg=False)
+    first_deck = [get_card(card_id) for card_id in first.deck]
+    second_deck = [get_card(card_id) for card_id in second.deck]
+    contexts: Dict[str, GameContext] = {}
+    if first.policy is not None or second.policy is not None:
+        # Policies decide from observations, so both sides get a context to keep one
+        for player_id in (sim.player1_id, sim.player2_id):
+            contexts[player_id] = GameContext("ws://localhost")
+            sim.attach(contexts[player_id], player_id)
+
+    wins = losses = draws = steps = 0
+    for game in range(first_game, first_game + num_games):
+        rng = random.Random(f"{first.key}|{second.key}|{game}")
+        sim.random.seed(rng.getrandbits(64))
+        if game % 2 == 0:
+            players = {sim.player1_id: first, sim.player2_id: second}
+            sim.start_fight(first_deck, second_deck)
+        else:
+            players = {sim.player1_id: second, sim.player2_id: first}
+            sim.start_fight(second_deck, first_deck)
+        for _ in range(max_steps):
+            if not sim.is_active:
+                break
+            player_id = sim.state.current_turn_player_id
+            policy = players[player_id].policy
+            if policy is None:
+                playable = sim.playable_cards(player_id)
+                if playable:
+                    sim.play_card(player_id, rng.choice(playable).id)
+                else:
+                    sim.end_turn(player_id)
+            else:
+                context = contexts[player_id]
+                action = policy(context.get_observation()[None], context_action_mask(context)[None])[0]
+                context.send(action_to_message(int(action)))
+            steps += 1
+
+        if sim.is_active:
+            draws += 1
+        elif players[sim.winner_id] is first:
+            wins += 1
+        else:
+            losses += 1
+    return wins, losses, draws, steps
+
+
+def _play_worker(args: Tuple) -> Tuple[int, int, int, int, int, int]:
+    """Play a chunk of a matchup in a pool worker."""
+    matchup, first, second, first_game, num_games, max_steps = args
+    return (matchup, num_games) + play_games(first, second, first_game, num_games, max_steps)
+
+
+#endregion
+
+
+#region Result Cache
+
+
+class ResultCache:
+    """
+    Game results per matchup of entrant keys, optionally kept in a JSON file.
+
+    A matchup is stored once, from the side of the lower key, as
+    [games, wins, losses, draws, actions] over its games 0..games-1.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize a new instance of the ResultCache class.
+
+        Args:
+            path: JSON file to load from and save to, in memory only by default
+        """
+        self.path = path
+        self._results: Dict[str, List[int]] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == CACHE_VERSION:
+                    self._results = data.get("matchups", {})
+                else:
+                    print(f"Ignoring tournament cache {path} of version {data.get('version')}")
+            except (OSError, ValueError) as e:
+                print(f"Error loading tournament cache {path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @staticmethod
+    def _key(key_a: str, key_b: str) -> str:
+        return f"{key_a}|{key_b}"
+
+    def get(self, key_a: str, key_b: str) -> Tuple[int, int, int, int, int]:
+        """(games, wins, losses, draws, actions) of a matchup from key_a's side, zeros if never played."""
+        if key_a <= key_b:
+            result = self._results.get(self._key(key_a, key_b))
+            return tuple(result) if result else (0, 0, 0, 0, 0)
+        games, wins, losses, draws, steps = self.get(key_b, key_a)
+        return games, losses, wins, draws, steps
+
+    def add(self, key_a: str, key_b: str, games: int, wins: int, losses: int, draws: int, steps: int):
+        """Add the results of more games of a matchup, from key_a's side."""
+        if key_a > key_b:
+            key_a, key_b, wins, losses = key_b, key_a, losses, wins
+        result = self._results.setdefault(self._key(key_a, key_b), [0, 0, 0, 0, 0])
+        for i, value in enumerate((games, wins, losses, draws, steps)):
+            result[i] += value
+
+    def save(self):
+        """Write the cache to its path, if it has one."""
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "matchups": self._results}, f)
+        os.replace(temp_path, self.path)
+
+
+#endregion
+
+
+#region Ratings
+
+
+def fit_elo(wins: np.ndarray, draws: np.ndarray, prior_games: float = PRIOR_GAMES,
+            max_iterations: int = 10000, tolerance: float = 1e-10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit Bradley-Terry strengths to a results matrix and convert them to Elo.
+
+    Uses the minorization-maximization updates of Hunter (2004), counting a
+    draw as half a win for each side.
+
+    Args:
+        wins: (N, N) games entrant i won against entrant j
+        draws: (N, N) symmetric games drawn between i and j
+        prior_games: Virtual drawn games added to every matchup that was played
+        max_iterations: Iteration limit
+        tolerance: Stop once no log-strength moves by more than this
+
+    Returns:
+        (Elo ratings centred on ELO_BASE, their standard errors; inf for entrants without games)
+    """
+    n = len(wins)
+    games = wins + wins.T + draws
+    played = games > 0
+    games = games + prior_games * played
+    scores = (wins + 0.5 * draws + 0.5 * prior_games * played).sum(axis=1)
+    rated = games.sum(axis=1) > 0
+
+    strengths = np.ones(n)
+    for _ in range(max_iterations):
+        denominators = (games / (strengths[:, None] + strengths[None, :])).sum(axis=1)
+        updated = np.where(rated, scores / np.where(rated, denominators, 1.0), 1.0)
+        updated /= np.exp(np.log(updated[rated]).mean()) if rated.any() else 1.0
+        converged = np.abs(np.log(updated) - np.log(strengths)).max() < tolerance
+        strengths = updated
+        if converged:
+            break
+
+    theta = np.log(strengths)
+    # Observed information of the log-strengths; its pseudo-inverse is the covariance with ratings summing to zero
+    p = strengths[:, None] / (strengths[:, None] + strengths[None, :])
+    weights = games * p * p.T
+    information = np.diag(weights.sum(axis=1)) - weights
+    covariance = np.linalg.pinv(information[np.ix_(rated, rated)])
+    errors = np.full(n, np.inf)
+    errors[rated] = np.sqrt(np.maximum(np.diag(covariance), 0.0)) * ELO_SCALE
+    return ELO_BASE + ELO_SCALE * theta, errors
+
+
+#endregion
+
+
+class Tournament:
+    """
+    Ranks entrants by playing matchups on the simulator rules.
+
+    With workers=0 the games run in the calling process; otherwise a pool of
+    spawned processes plays them and stays up between runs.
+    """
+
+    def __init__(self, games_per_matchup: int = DEFAULT_GAMES, workers: int = 0,
+                 cache: Optional[ResultCache] = None, max_steps: int = MAX_FIGHT_STEPS, chunk_games: int = 0):
+        """
+        Initialize a new instance of the Tournament class.
+
+        Args:
+            games_per_matchup: Games every scheduled matchup plays
+            workers: Game processes, 0 to play in-process
+            cache: Results of earlier runs, an empty in-memory cache by default
+            max_steps: Actions after which a fight is a draw
+            chunk_games: Games per pool task, by default enough to give every worker a few tasks
+        """
+        self.games_per_matchup = games_per_matchup
+        self.workers = workers
+        self.cache = cache if cache is not None else ResultCache()
+        self.max_steps = max_steps
+        self.chunk_games = chunk_games
+        self.entrants: List[Entrant] = []
+        self.matchups: List[Tuple[int, int]] = []  # Scheduled so far, as entrant index pairs
+
+        # Counters
+        self.games_played = 0
+        self.games_cached = 0
+        self.play_time = 0.0
+        self._pool = None
+
+    def start(self):
+        """Start the worker pool, if any."""
+        if self.workers > 0 and self._pool is None:
+            self._pool = mp.get_context("spawn").Pool(self.workers)
+
+    def close(self):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "Tournament":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, name: str, deck: Iterable[str], policy: Optional[Policy] = None,
+            policy_version: Optional[str] = None) -> Entrant:
+        """
+        Add an entrant.
+
+        Args:
+            name: Display name
+            deck: Card ids, at most DECK_SIZE
+            policy: Picklable policy with the AgentPool signature, random play by default
+            policy_version: Identifies the policy's weights in the cache; required with a policy
+
+        Returns:
+            The entrant
+        """
+        if policy is not None and not policy_version:
+            raise ValueError("A policy needs a policy_version to cache its results under")
+        entrant = Entrant(name, validate_deck(deck), policy_version or RANDOM_POLICY, policy)
+        self.entrants.append(entrant)
+        return entrant
+
+    #region Scheduling
+
+    def round_robin(self) -> List[Tuple[int, int]]:
+        """Every pair of entrants."""
+        n = len(self.entrants)
+        return [(i, j) for i in range(n) for j in range(i + 1, n)]
+
+    def swiss_round(self) -> List[Tuple[int, int]]:
+        """
+        Pair entrants of similar score that have not met yet.
+
+        Entrants are ordered by score so far and each takes the nearest
+        opponent below it it has not played; with an odd field the last
+        unpaired entrant sits the round out.
+        """
+        scores = self._score_rates()
+        met = {frozenset(matchup) for matchup in self.matchups}
+        order = sorted(range(len(self.entrants)), key=lambda i: -scores[i])
+        pairs = []
+        unpaired = list(order)
+        while len(unpaired) > 1:
+            i = unpaired.pop(0)
+            opponent = next((j for j in unpaired if frozenset((i, j)) not in met), unpaired[0])
+            unpaired.remove(opponent)
+            pairs.append((i, opponent))
+        return pairs
+
+    def _score_rates(self) -> np.ndarray:
+        wins, draws = self._results()
+        games = (wins + wins.T + draws).sum(axis=1)
+        return (wins.sum(axis=1) + 0.5 * draws.sum(axis=1)) / np.maximum(games, 1)
+
+    #endregion
+
+    #region Playing
+
+    def play(self, matchups: Sequence[Tuple[int, int]]):
+        """
+        Bring every matchup up to games_per_matchup games, playing only what the cache is missing.
+
+        Args:
+            matchups: Entrant index pairs
+        """
+        entrants = self.entrants
+        games = self.games_per_matchup
+        cached = [self.cache.get(entrants[i].key, entrants[j].key)[0] for i, j in matchups]
+        self.games_cached += sum(min(count, games) for count in cached)
+        missing = sum(max(games - count, 0) for count in cached)
+        # A few tasks per worker balances uneven game lengths without pickling the entrants too often
+        chunk = self.chunk_games or max(1, math.ceil(missing / (4 * self.workers)) if self.workers else games)
+        # Play from the side of the lower key, so game i is the same game whichever way round it was scheduled
+        ordered = [sorted((entrants[i], entrants[j]), key=lambda entrant: entrant.key) for i, j in matchups]
+        jobs = []
+        for matchup, (first, second) in enumerate(ordered):
+            for first_game in range(cached[matchup], games, chunk):
+                jobs.append((matchup, first, second, first_game, min(chunk, games - first_game), self.max_steps))
+
+        if self.workers > 0 and jobs:
+            # Spawning the pool is not counted as play time
+            self.start()
+        started = time.perf_counter()
+        if self._pool is not None and jobs:
+            results = self._pool.imap_unordered(_play_worker, jobs)
+        else:
+            results = (_play_worker(job) for job in jobs)
+        for matchup, num_games, wins, losses, draws, steps in results:
+            first, second = ordered[matchup]
+            self.cache.add(first.key, second.key, num_games, wins, losses, draws, steps)
+            self.games_played += num_games
+        self.play_time += time.perf_counter() - started
+        self.matchups.extend(matchups)
+
+    def run(self, format: str = "round_robin", rounds: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Schedule and play a whole tournament, then rank the entrants.
+
+        Args:
+            format: "round_robin" or "swiss"
+            rounds: Swiss rounds, enough to separate the field (ceil(log2 N) + 1) by default
+
+        Returns:
+            The report, see report()
+        """
+        if format == "round_robin":
+            self.play(self.round_robin())
+        elif format == "swiss":
+            if rounds is None:
+                rounds = math.ceil(math.log2(max(len(self.entrants), 2))) + 1
+            for _ in range(rounds):
+                self.play(self.swiss_round())
+        else:
+            raise ValueError(f"Unknown tournament format {format!r}")
+        self.cache.save()
+        return self.report()
+
+    #endregion
+
+    #region Ranking
+
+    def _played(self) -> List[Tuple[int, int]]:
+        """Distinct matchups scheduled so far."""
+        return sorted({(min(i, j), max(i, j)) for i, j in self.matchups})
+
+    def _results(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Wins and draws matrices over every cached game of the scheduled matchups."""
+        n = len(self.entrants)
+        wins = np.zeros((n, n))
+        draws = np.zeros((n, n))
+        for i, j in self._played():
+            _, won, lost, drawn, _ = self.cache.get(self.entrants[i].key, self.entrants[j].key)
+            wins[i, j] += won
+            wins[j, i] += lost
+            draws[i, j] += drawn
+            draws[j, i] += drawn
+        return wins, draws
+
+    def standings(self) -> List[Standing]:
+        """Entrants by descending Elo."""
+        wins, draws = self._results()
+        elo, errors = fit_elo(wins, draws)
+        rows = []
+        for i, entrant in enumerate(self.entrants):
+            won, lost, drawn = wins[i].sum(), wins[:, i].sum(), draws[i].sum()
+            margin = CONFIDENCE_Z * errors[i]
+            rows.append(Standing(entrant.name, deck_hash(entrant.deck), entrant.policy_version,
+                                 float(elo[i]), float(elo[i] - margin), float(elo[i] + margin),
+                                 int(round(won + lost + drawn)), int(round(won)), int(round(lost)),
+                                 int(round(drawn))))
+        rows.sort(key=lambda row: -row.elo)
+        return rows
+
+    def report(self) -> Dict[str, Any]:
+        """Standings and game counters; games_per_sec only counts games actually played."""
+        return {
+            "standings": self.standings(),
+            "matchups": len(self._played()),
+            "games_played": self.games_played,
+            "games_cached": self.games_cached,
+            "play_time": self.play_time,
+            "games_per_sec": self.games_played / self.play_time if self.play_time > 0 else 0.0,
+        }
+
+    #endregion
+
+
+def print_report(report: Dict[str, Any]):
+    """Print a report as a table."""
+    print(f"{'#':>3}  {'entrant':<20} {'policy':<12} {'deck':<16} {'elo':>7} {'95% ci':>15} "
+          f"{'games':>6} {'w-l-d':>12}")
+    for rank, row in enumerate(report["standings"], 1):
+        ci = f"{row.elo_low:.0f}..{row.elo_high:.0f}" if math.isfinite(row.elo_low) else "-"
+        print(f"{rank:>3}  {row.name:<20} {row.policy_version:<12} {row.deck_hash:<16} {row.elo:7.0f} {ci:>15} "
+              f"{row.games:>6} {f'{row.wins}-{row.losses}-{row.draws}':>12}")
+    print(f"{report['matchups']} matchups, {report['games_played']:,} games played, "
+          f"{report['games_cached']:,} cached, {report['games_per_sec']:,.0f} games/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank decks and policies in a simulated tournament")
+    parser.add_argument("--decks", type=int, default=8, help="Random decks played by random policies")
+    parser.add_argument("--deck-file", help='JSON list of {"name": ..., "cards": [card ids]} decks to enter')
+    parser.add_argument("--policies", type=int, default=0,
+                        help="Also enter this many seeded MlpPolicy stand-ins for checkpoints, on the first deck")
+    parser.add_argument("--format", choices=("round_robin", "swiss"), default="round_robin")
+    parser.add_argument("--rounds", type=int, default=None, help="Swiss rounds")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help="Games per matchup")
+    parser.add_argument("--workers", type=int, default=0, help="Game processes, 0 to play in-process")
+    parser.add_argument("--cache", default=None, help="JSON file to keep results in across runs")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random decks and policies")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    decks: List[Tuple[str, List[str]]] = []
+    if args.deck_file:
+        with open(args.deck_file, "r", encoding="utf-8") as f:
+            decks.extend((deck["name"], deck["cards"]) for deck in json.load(f))
+    decks.extend((f"deck_{i}", [card.id for card in random_deck(rng)]) for i in range(args.decks))
+
+    with Tournament(args.games, args.workers, ResultCache(args.cache)) as tournament:
+        for name, cards in decks:
+            tournament.add(name, cards)
+        if args.policies and decks:
+            from inference import MlpPolicy
+            for i in range(args.policies):
+                seed = args.seed + i
+                tournament.add(f"mlp_{seed}", decks[0][1], MlpPolicy(seed=seed), f"mlp-seed{seed}")
+        print_report(tournament.run(args.format, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ namespace GameServer.Application.Actors
         private PID? currentFight;
         private string? pendingMapJoin;
         private MapPosition? pendingMove;
+        private Dictionary<string, string> cachedCardSvgHashes = new Dictionary<string, string>();
 
         public PlayerActor(PID mapManagerActor, string playerName, SendToClientDelegate<ExtServerMessage> sendToClient)
         {
@@ -302,6 +303,7 @@ namespace GameServer.Application.Actors
                 ExtFightChallengeRequest msg => OnFightChallengeSend(context, msg),
                 ExtPlayCardRequest msg => OnPlayCard(context, msg),
                 ExtEndTurnRequest msg => OnEndTurn(context, msg),
+                ExtCachedCardImagesRequest msg => OnCachedCardImages(context, msg),
                 _ => Task.CompletedTask
             };
             await handle;
@@ -309,11 +311,39 @@ namespace GameServer.Application.Actors
 
         private async Task OnOutgoingClientMessage(IContext context, ExtServerMessage extServerMessage)
         {
+            // Skip card SVGs the client already has cached
+            if (cachedCardSvgHashes.Count > 0)
+            {
+                extServerMessage = extServerMessage switch
+                {
+                    ExtCardImages msg => new ExtCardImages(msg.CardSvgData.ToDictionary(
+                        entry => entry.Key,
+                        entry => IsCardSvgCached(entry.Key, entry.Value) ? string.Empty : entry.Value)),
+                    ExtCardDrawn msg when msg.CardInfo != null && IsCardSvgCached(msg.CardInfo.Id, msg.SvgData) =>
+                        new ExtCardDrawn(msg.CardInfo, string.Empty),
+                    _ => extServerMessage
+                };
+            }
+
             // Log outgoing message at debug level with JSON
             this.LogDebug("Sending client message: {0}", JsonConfig.Serialize(extServerMessage));
             await _sendToClient(extServerMessage);
         }
 
+        private Task OnCachedCardImages(IContext context, ExtCachedCardImagesRequest msg)
+        {
+            this.LogDebug("Client has {0} cached card images", msg.CardSvgHashes.Count);
+            cachedCardSvgHashes = new Dictionary<string, string>(msg.CardSvgHashes);
+            return Task.CompletedTask;
+        }
+
+        private bool IsCardSvgCached(string cardId, string svgData)
+        {
+            return !string.IsNullOrEmpty(svgData) &&
+                   cachedCardSvgHashes.TryGetValue(cardId, out var hash) &&
+                   hash == CardSvgHash.Compute(svgData);
+        }
+
         private async Task OnRequestMapList(IContext context, ExtMapListRequest extMapListRequest)
         {
             this.LogInformation("Player requested map list");
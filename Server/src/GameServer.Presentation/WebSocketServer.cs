@@ -1,4 +1,6 @@
+using System.Collections.Concurrent;
 using System.Text;
+using System.Web;
 using WsServer = NetCoreServer.WsServer;
 using WsSession = NetCoreServer.WsSession;
 using TcpSession = NetCoreServer.TcpSession;
@@ -8,6 +10,7 @@ using Proto;
 using GameServer.Shared;
 using GameServer.Application.Messages.Internal;
 using GameServer.Shared.Messages.Base;
+using GameServer.Shared.Messages.Connection;
 using GameServer.Shared.Messages.Map;
 using GameServer.Infrastructure;
 
@@ -28,15 +31,36 @@ namespace GameServer.Presentation
         protected override TcpSession CreateSession() => new GameSession(this);
     }
 
+    /// <summary>
+    /// One WebSocket connection. By default the connection is one player, created on connect.
+    /// Connecting with ?multiplex=1 makes it carry many players instead: every frame has a SessionId
+    /// field, the first frame of a new SessionId creates its PlayerActor, and every reply to that
+    /// player is sent back with the same SessionId.
+    /// </summary>
     public class GameSession : WsSession
     {
         const int CreatePlayerTimeout = 5000;
+        const string MultiplexQueryKey = "multiplex";
+        const string SessionIdField = "SessionId";
 
         private readonly GameWebSocketServer server;
         private readonly ActorSystem actorSystem;
         private PID? playerActor;
         private readonly string sessionId;
         private PID? self;
+        private bool multiplexed;
+        private readonly ConcurrentDictionary<string, MultiplexedPlayer> multiplexedPlayers = new ConcurrentDictionary<string, MultiplexedPlayer>();
+
+        /// <summary>
+        /// A logical player of a multiplexed connection. Messages that arrive while its actor
+        /// is being created are held in Pending and forwarded in order once it exists.
+        /// </summary>
+        private sealed class MultiplexedPlayer
+        {
+            public PID? Actor;
+            public List<ExtClientMessage>? Pending = new List<ExtClientMessage>();
+            public bool Closed;
+        }
 
         public GameSession(WsServer server) : base(server)
         {
@@ -49,6 +73,19 @@ namespace GameServer.Presentation
         {
             LoggingService.Logger.Information($"WebSocket session connected: {sessionId}");
 
+            var queryStart = request.Url.IndexOf('?');
+            if (queryStart >= 0)
+            {
+                var multiplex = HttpUtility.ParseQueryString(request.Url.Substring(queryStart + 1))[MultiplexQueryKey];
+                multiplexed = multiplex == "1" || string.Equals(multiplex, "true", StringComparison.OrdinalIgnoreCase);
+            }
+            if (multiplexed)
+            {
+                // Players are created per SessionId as their first frames arrive
+                LoggingService.Logger.Information($"WebSocket session {sessionId} is multiplexed");
+                return;
+            }
+
             //TODO investigate other librarys to handle this async, for now wrap in Task.Run and wait with Result
             // Create player actor immediately on connection
             var createResponse = Task.Run(() => actorSystem.Root.RequestAsync<CreatePlayerResponse>(
@@ -66,17 +103,19 @@ namespace GameServer.Presentation
 
             if (playerActor != null)
             {
-                // If player is in a map, ensure they leave properly
-                actorSystem.Root.Send(playerActor, new ExtLeaveMapRequest(null)); // null mapId will force leave from any map
-
-                // Stop the player actor
-                actorSystem.Root.Poison(playerActor);
+                StopPlayer(playerActor);
                 playerActor = null;
             }
+
+            foreach (var multiplexedSessionId in multiplexedPlayers.Keys)
+            {
+                CloseMultiplexedPlayer(multiplexedSessionId);
+            }
         }
 
         /// <summary>
-        /// Send all incomming messages to the player actor which was created OnWsConnected 
+        /// Send all incomming messages to the player actor which was created OnWsConnected,
+        /// or on a multiplexed connection to the player of the frame's SessionId
         /// </summary>
         /// <param name="buffer"></param>
         /// <param name="offset"></param>
@@ -89,6 +128,11 @@ namespace GameServer.Presentation
                 var message = Encoding.UTF8.GetString(buffer, (int)offset, (int)size);
                 // Log incoming JSON message at debug level
                 LoggingService.Logger.Debug($"Received message: {message}");
+                if (multiplexed)
+                {
+                    OnMultiplexedMessage(message);
+                    return;
+                }
                 var baseMessage = JsonConfig.Deserialize<ExtClientMessage>(message);
                 actorSystem.Root.Send(playerActor, baseMessage);
             }
@@ -98,6 +142,116 @@ namespace GameServer.Presentation
             }
         }
 
+        private void OnMultiplexedMessage(string message)
+        {
+            var baseMessage = JsonConfig.Deserialize<ExtClientMessage>(message, SessionIdField, out var multiplexedSessionId);
+            if (string.IsNullOrEmpty(multiplexedSessionId))
+            {
+                LoggingService.Logger.Warning($"Dropping message without {SessionIdField} on multiplexed session {sessionId}");
+                return;
+            }
+
+            if (baseMessage is ExtCloseSessionRequest)
+            {
+                CloseMultiplexedPlayer(multiplexedSessionId);
+                return;
+            }
+
+            // Frames of one connection are received one at a time, so only this thread adds players
+            if (!multiplexedPlayers.TryGetValue(multiplexedSessionId, out var multiplexedPlayer))
+            {
+                multiplexedPlayer = CreateMultiplexedPlayer(multiplexedSessionId);
+            }
+
+            // Read the actor under the lock; the creation callback sets it from another thread
+            PID? actor;
+            lock (multiplexedPlayer)
+            {
+                actor = multiplexedPlayer.Actor;
+                if (actor == null)
+                {
+                    multiplexedPlayer.Pending?.Add(baseMessage!);
+                    return;
+                }
+            }
+            actorSystem.Root.Send(actor, baseMessage!);
+        }
+
+        /// <summary>
+        /// Ask the game actor for a new player without blocking the receive thread;
+        /// the player's messages queue up in Pending until the actor exists
+        /// </summary>
+        private MultiplexedPlayer CreateMultiplexedPlayer(string multiplexedSessionId)
+        {
+            var multiplexedPlayer = new MultiplexedPlayer();
+            multiplexedPlayers[multiplexedSessionId] = multiplexedPlayer;
+
+            var playerId = Guid.NewGuid().ToString();
+            LoggingService.Logger.Information($"Creating player {playerId} for {SessionIdField} {multiplexedSessionId} on session {sessionId}");
+            actorSystem.Root.RequestAsync<CreatePlayerResponse>(
+                server.gameActor,
+                new CreatePlayer(playerId, $"Player_{playerId}", (ExtServerMessage msg) => SendResponse(multiplexedSessionId, (dynamic)msg)),
+                TimeSpan.FromMilliseconds(CreatePlayerTimeout)
+            ).ContinueWith(task => OnMultiplexedPlayerCreated(multiplexedSessionId, multiplexedPlayer, task));
+            return multiplexedPlayer;
+        }
+
+        private void OnMultiplexedPlayerCreated(string multiplexedSessionId, MultiplexedPlayer multiplexedPlayer, Task<CreatePlayerResponse> task)
+        {
+            if (!task.IsCompletedSuccessfully)
+            {
+                LoggingService.Logger.Error($"Failed to create player for {SessionIdField} {multiplexedSessionId}: {task.Exception?.GetBaseException().Message}");
+                // A later frame with the same SessionId tries again
+                multiplexedPlayers.TryRemove(new KeyValuePair<string, MultiplexedPlayer>(multiplexedSessionId, multiplexedPlayer));
+                return;
+            }
+
+            var actor = task.Result.PlayerActor;
+            lock (multiplexedPlayer)
+            {
+                if (multiplexedPlayer.Closed)
+                {
+                    StopPlayer(actor);
+                    return;
+                }
+                // Forward under the lock so frames arriving meanwhile stay behind the pending ones
+                foreach (var pendingMessage in multiplexedPlayer.Pending!)
+                {
+                    actorSystem.Root.Send(actor, pendingMessage);
+                }
+                multiplexedPlayer.Pending = null;
+                multiplexedPlayer.Actor = actor;
+            }
+        }
+
+        private void CloseMultiplexedPlayer(string multiplexedSessionId)
+        {
+            if (!multiplexedPlayers.TryRemove(multiplexedSessionId, out var multiplexedPlayer))
+            {
+                return;
+            }
+
+            lock (multiplexedPlayer)
+            {
+                // A player still being created is stopped as soon as it exists
+                multiplexedPlayer.Closed = true;
+                multiplexedPlayer.Pending = null;
+                if (multiplexedPlayer.Actor != null)
+                {
+                    StopPlayer(multiplexedPlayer.Actor);
+                }
+            }
+        }
+
+        private void StopPlayer(PID player)
+        {
+            // If player is in a map, ensure they leave properly
+            actorSystem.Root.Send(player, new ExtLeaveMapRequest(null)); // null mapId will force leave from any map
+
+            // Stop the player actor
+            actorSystem.Root.Poison(player);
+        }
+
         private Task SendResponse<T>(T response)
         {
             var json = JsonConfig.Serialize(response);
@@ -106,5 +260,14 @@ namespace GameServer.Presentation
             SendTextAsync(json);
             return Task.CompletedTask;
         }
+
+        private Task SendResponse<T>(string multiplexedSessionId, T response)
+        {
+            var json = JsonConfig.Serialize(response, SessionIdField, multiplexedSessionId);
+            // Log outgoing JSON message at debug level
+            LoggingService.Logger.Debug($"Sending message: {json}");
+            SendTextAsync(json);
+            return Task.CompletedTask;
+        }
     }
 }
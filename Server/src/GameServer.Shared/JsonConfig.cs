@@ -26,8 +26,20 @@ namespace GameServer.Shared
             ContractResolver = ContractResolver
         };
 
+        private static readonly JsonSerializer Serializer = JsonSerializer.Create(Settings);
+
         public static string Serialize<T>(T obj) => JsonConvert.SerializeObject(obj, Settings);
 
+        /// <summary>
+        /// Serialize a message with an extra leading string field, e.g. the session tag of a multiplexed connection
+        /// </summary>
+        public static string Serialize<T>(T obj, string field, string value)
+        {
+            var json = Serialize(obj);
+            // Messages always serialize to a non-empty object, so splice the field in after the opening brace
+            return "{" + JsonConvert.ToString(field) + ":" + JsonConvert.ToString(value) + "," + json.Substring(1);
+        }
+
         public static T? Deserialize<T>(string json) => DeserializeInt<T>(json);
 
         public static object? Deserialize(string json) => DeserializeInt(json);
@@ -43,6 +55,22 @@ namespace GameServer.Shared
             throw new Exception("Unknown message type");
         }
 
+        /// <summary>
+        /// Deserialize a message and read an extra string field that is not part of its type, e.g. a session tag
+        /// </summary>
+        public static T? Deserialize<T>(string json, string field, out string? value)
+        {
+            var jsonObject = JObject.Parse(json);
+            value = jsonObject.Value<string>(field);
+            var typeName = jsonObject.Value<string>("MessageType");
+            if (typeName != null && MessageTypes.TryGetValue(typeName, out Type type))
+            {
+                return (T?)jsonObject.ToObject(type, Serializer);
+            }
+
+            throw new Exception("Unknown message type");
+        }
+
         public static object? DeserializeInt(string json)
         {
             var jsonObject = JObject.Parse(json);
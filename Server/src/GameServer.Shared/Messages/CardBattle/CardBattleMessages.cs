@@ -170,6 +170,20 @@ namespace GameServer.Shared.Messages.CardBattle
         }
     }
 
+    /// <summary>
+    /// Client request listing the card SVGs it already has cached, by card id and content hash.
+    /// The server then sends an empty string instead of SVG data whose hash matches.
+    /// </summary>
+    public class ExtCachedCardImagesRequest : ExtClientMessage, IExtRequest
+    {
+        public Dictionary<string, string> CardSvgHashes { get; }
+
+        public ExtCachedCardImagesRequest(Dictionary<string, string> cardSvgHashes) : base()
+        {
+            CardSvgHashes = cardSvgHashes ?? new Dictionary<string, string>();
+        }
+    }
+
     /// <summary>
     /// Client request to end the current turn
     /// </summary>
@@ -24,4 +24,13 @@ namespace GameServer.Shared.Messages.Connection
             PlayerId = playerId;
         }
     }
+
+    /// <summary>
+    /// Client request to end one logical session of a multiplexed connection.
+    /// The session's player leaves its map and is stopped; the connection stays open.
+    /// </summary>
+    public class ExtCloseSessionRequest : ExtClientMessage, IExtRequest
+    {
+        public ExtCloseSessionRequest() : base() { }
+    }
 }
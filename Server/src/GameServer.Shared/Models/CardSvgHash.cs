@@ -0,0 +1,25 @@
+using System;
+using System.Runtime.CompilerServices;
+using System.Security.Cryptography;
+using System.Text;
+
+namespace GameServer.Shared.Models
+{
+    /// <summary>
+    /// Content hash clients use to advertise the card SVGs they already have cached
+    /// </summary>
+    public static class CardSvgHash
+    {
+        // SVG strings are cached per card by the fight actors, so hash each instance once
+        private static readonly ConditionalWeakTable<string, string> hashes = new ConditionalWeakTable<string, string>();
+
+        /// <summary>
+        /// Lowercase hex SHA-256 of the UTF-8 encoded SVG data
+        /// </summary>
+        public static string Compute(string svgData)
+        {
+            return hashes.GetValue(svgData, data =>
+                Convert.ToHexString(SHA256.HashData(Encoding.UTF8.GetBytes(data))).ToLowerInvariant());
+        }
+    }
+}